@@ -1,9 +1,8 @@
 import tkinter as tk
 from tkinterdnd2 import TkinterDnD, DND_FILES
 import os
-import requests
 from tkinter import ttk, filedialog, messagebox
-from threading import Thread, Lock, Event
+from threading import Lock, Event
 import queue
 import logging
 import concurrent.futures
@@ -20,6 +19,8 @@ from datetime import datetime
 import json
 import sys
 from utilities.temp_dir_manager import get_temp_dir, get_temp_file, copy_to_output_dir
+from utilities.range_downloader import RangeDownloader, DEFAULT_MAX_CONNECTIONS
+from utilities.download_scheduler import DownloadScheduler, UpdateCoalescer, UI_REFRESH_MS, tile_priority
 
 logger = logging.getLogger(__name__)
 
@@ -32,9 +33,7 @@ class UltraVerboseDownloaderer:
         # Initialize ALL tracking variables first
         self.urls = []
         self.file_info = {}
-        self.download_queue = queue.PriorityQueue()
         self.max_concurrent_downloads = 10
-        self.current_downloads = 0
         self.lock = Lock()
         self.active_downloads = set()
         self.paused = Event()
@@ -44,11 +43,28 @@ class UltraVerboseDownloaderer:
         # Initialize selection tracking
         self.selected_files = set()  # For Treeview items
         self.item_url_map = {}      # Maps Treeview items to URLs
+        self.url_item_map = {}      # Maps URLs to Treeview rows for targeted updates
+
+        # Path the queue is ordered by (tiles nearest the path download first)
+        self.priority_path = None
+
+        # Called on the Tk thread with all downloaded LAS/LAZ paths whenever a batch of downloads finishes
+        self.tiles_downloaded_callback = None
+        self._new_completions = False
 
         # Add retry configuration
         self.max_retries = 3  # Maximum number of retry attempts
         self.retry_delay = 5  # Delay in seconds between retries
 
+        # Segmented download engine sharing one connection pool across all workers
+        self.range_downloader = RangeDownloader(
+            pool_size=self.max_concurrent_downloads * DEFAULT_MAX_CONNECTIONS
+        )
+
+        # Workers block on the scheduler while idle or paused; row updates are batched per UI refresh
+        self.scheduler = DownloadScheduler(self.run_download, max_workers=self.max_concurrent_downloads)
+        self.ui_updates = UpdateCoalescer()
+
         logger.info("Initialized all tracking variables")
 
         # Set up UI with original layout
@@ -210,7 +226,7 @@ class UltraVerboseDownloaderer:
 
                 # Always add to download queue unless complete
                 if info['status'] != 'Complete':
-                    self.download_queue.put((url, filename))
+                    self.queue_download(url)
 
             # Fetch file size asynchronously if not already known
             if info['total_size'] == 0:
@@ -305,7 +321,7 @@ class UltraVerboseDownloaderer:
 
                     # Add to download queue if not complete
                     if info['status'] != 'Complete':
-                        self.download_queue.put((url, filename))
+                        self.queue_download(url)
 
             # Single UI update for all files
             self.refresh_file_list()
@@ -325,59 +341,89 @@ class UltraVerboseDownloaderer:
         asyncio.run(self.fetch_all_file_sizes_async())
 
     def update_file_list(self, url):
-        """Thread-safe update of the file list display"""
-        try:
-            info = self.file_info[url]
-            filename = info['filename']
+        """Thread-safe request to redraw a file's row; rows are redrawn in batches by the UI refresh loop"""
+        self.ui_updates.mark(url)
 
-            def do_update():
-                for item in self.file_list.get_children():
-                    if self.file_list.item(item)['values'][1] == filename:
-                        # Get current values to ensure smooth updates
-                        current_values = self.file_list.item(item)['values']
+    def _update_file_row(self, url):
+        """Redraw one file's row from file_info - must run on the Tk thread"""
+        try:
+            info = self.file_info.get(url)
+            item = self.url_item_map.get(url)
+            if info is None or item is None:
+                return
+            if not self.file_list.exists(item):
+                self.url_item_map.pop(url, None)
+                return
 
-                        # Ensure progress never decreases
-                        new_progress = info.get('progress', 0)
-                        if current_values and len(current_values) > 4:
-                            try:
-                                current_progress = float(current_values[4].rstrip('%'))
-                                new_progress = max(current_progress, new_progress)
-                            except (ValueError, AttributeError):
-                                pass
+            filename = info['filename']
 
-                        # Ensure speed is never negative
-                        speed = max(0, info.get('speed', 0))
-                        speed_text = self.format_speed(speed) if speed > 0 else ""
-
-                        # Format ETA only if downloading
-                        eta_text = self.format_eta(info.get('eta', 0)) if info.get('status', '').startswith('Downloading') else ""
-
-                        # Keep status clean without speed/ETA info
-                        status = info.get('status', 'Unknown')
-                        if status.startswith('Downloading'):
-                            status = 'Downloading'
-
-                        self.file_list.item(item, values=(
-                            current_values[0],  # Keep checkbox state
-                            filename,
-                            self.format_size(info.get('total_size', 0)),
-                            self.format_size(info.get('size_on_disk', 0)),
-                            f"{new_progress:.1f}%",
-                            speed_text,
-                            eta_text,
-                            status
-                        ))
-                        break
+            # Get current values to ensure smooth updates
+            current_values = self.file_list.item(item)['values']
 
-            # Ensure update happens in main thread
-            if threading.current_thread() is threading.main_thread():
-                do_update()
-            else:
-                self.master.after(0, do_update)
+            # Ensure progress never decreases
+            new_progress = info.get('progress', 0)
+            if current_values and len(current_values) > 4:
+                try:
+                    current_progress = float(current_values[4].rstrip('%'))
+                    new_progress = max(current_progress, new_progress)
+                except (ValueError, AttributeError):
+                    pass
+
+            # Ensure speed is never negative
+            speed = max(0, info.get('speed', 0))
+            speed_text = self.format_speed(speed) if speed > 0 else ""
+
+            # Format ETA only if downloading
+            eta_text = self.format_eta(info.get('eta', 0)) if info.get('status', '').startswith('Downloading') else ""
+
+            # Keep status clean without speed/ETA info
+            status = info.get('status', 'Unknown')
+            if status.startswith('Downloading'):
+                status = 'Downloading'
+
+            self.file_list.item(item, values=(
+                current_values[0] if current_values else "",  # Keep checkbox state
+                filename,
+                self.format_size(info.get('total_size', 0)),
+                self.format_size(info.get('size_on_disk', 0)),
+                f"{new_progress:.1f}%",
+                speed_text,
+                eta_text,
+                status
+            ))
 
         except Exception as e:
             logger.error(f"Error updating file list: {str(e)}")
 
+    def flush_ui_updates(self):
+        """Redraw all rows changed since the last refresh"""
+        for url in self.ui_updates.drain():
+            self._update_file_row(url)
+
+    def completed_lidar_files(self):
+        """Local paths of all downloaded LAS/LAZ files"""
+        with self.lock:
+            filenames = [info['filename'] for info in self.file_info.values()
+                         if info.get('status') == 'Complete'
+                         and info.get('filename', '').lower().endswith(('.laz', '.las'))]
+        paths = [os.path.join(self.destination_folder, filename) for filename in filenames]
+        return [path for path in paths if os.path.exists(path)]
+
+    def report_downloaded_tiles(self):
+        """Pass the downloaded tiles to tiles_downloaded_callback once the queue has drained"""
+        if not self._new_completions or self.tiles_downloaded_callback is None:
+            return
+        if self.scheduler.queued_count or self.scheduler.active_urls():
+            return
+
+        self._new_completions = False
+        lidar_files = self.completed_lidar_files()
+        if lidar_files:
+            try:
+                self.tiles_downloaded_callback(lidar_files)
+            except Exception as e:
+                logger.error(f"Error handling downloaded tiles: {e}", exc_info=True)
+
     def on_item_click(self, event):
         """Handle clicks in the file list"""
         try:
@@ -497,6 +543,7 @@ class UltraVerboseDownloaderer:
 
             # Allow downloads to proceed
             self.paused.set()
+            self.scheduler.resume()
 
             # Update status of all selected files to Queued
             with self.lock:
@@ -511,132 +558,96 @@ class UltraVerboseDownloaderer:
 
                         # Queue file for download if not already in active downloads
                         if url not in self.active_downloads:
-                            self.download_queue.put((url, self.file_info[url]['filename']))
+                            self.queue_download(url)
                             logger.info(f"Queued file for download: {self.file_info[url]['filename']}")
 
             # Ensure worker threads are running
             worker_count = self.ensure_workers_running()
             logger.info(f"Download workers running: {worker_count}")
 
-            # Force an immediate UI refresh
-            self.master.after(10, self.refresh_all_file_statuses)
+            # Redraw all rows on the next UI refresh
+            self.refresh_all_file_statuses()
 
         except Exception as e:
             logger.error(f"Error starting downloads: {str(e)}", exc_info=True)
             messagebox.showerror("Error", f"Failed to start downloads: {str(e)}")
 
     def ensure_workers_running(self):
-        """Ensure we have enough worker threads running"""
+        """Ensure the scheduler's worker threads are running"""
         try:
-            with self.lock:
-                # Calculate how many new workers we need
-                current = self.current_downloads
-                needed = self.max_concurrent_downloads
-                to_create = max(0, needed - current)
-
-                if to_create > 0:
-                    logger.info(f"Starting {to_create} new worker threads (current: {current}, target: {needed})")
-
-                # Create workers as needed
-                for _ in range(to_create):
-                    thread = Thread(target=self.download_worker)
-                    thread.daemon = True
-                    thread.start()
-                    self.current_downloads += 1
-
-                return self.current_downloads
+            worker_count = self.scheduler.start()
+            logger.info(f"Download workers running: {worker_count} (target: {self.max_concurrent_downloads})")
+            return worker_count
 
         except Exception as e:
             logger.error(f"Error ensuring workers: {e}", exc_info=True)
             return 0
 
-    def download_worker(self):
-        """Worker thread for downloading files"""
-        worker_id = threading.get_ident()
-        logger.info(f"Worker thread {worker_id} started")
-
-        try:
-            while True:
-                # Check if we should exit (app is closing)
-                if not hasattr(self, 'master') or not self.master.winfo_exists():
-                    logger.info(f"Worker {worker_id} detected application closing, exiting")
-                    break
-
-                # Check if downloads are paused - sleep briefly and continue the loop
-                if not self.paused.is_set():
-                    time.sleep(0.1)
-                    continue
-
-                # Try to get a file from the queue with timeout
-                try:
-                    url, filename = self.download_queue.get(timeout=0.5)
-                except queue.Empty:
-                    # No files in queue, wait briefly and try again
-                    time.sleep(0.1)
-                    continue
-
-                logger.debug(f"Worker {worker_id} got file from queue: {filename}")
+    def set_priority_path(self, start, end):
+        """
+        Order queued downloads by tile distance from the path between two sites.
 
-                # Check if this file is already being downloaded
-                skip_file = False
-                with self.lock:
-                    if url in self.active_downloads:
-                        logger.debug(f"File {filename} is already being downloaded, skipping")
-                        skip_file = True
-                    else:
-                        # Mark file as being downloaded
-                        self.active_downloads.add(url)
+        Args:
+            start: (lat, lon) of site A
+            end: (lat, lon) of site B
+        """
+        self.priority_path = (tuple(start), tuple(end))
 
-                        # Update status in file_info
-                        if url in self.file_info:
-                            self.file_info[url]['status'] = 'Downloading'
+    def download_priority(self, url):
+        """Scheduler priority for a file: an explicit 'priority' in its info, else its tile's distance to the path"""
+        info = self.file_info.get(url, {})
+        priority = info.get('priority')
+        if priority is None and self.priority_path:
+            priority = tile_priority(info.get('metadata', {}).get('bounds'), *self.priority_path)
+        return priority
 
-                # Skip this file if already being downloaded
-                if skip_file:
-                    self.download_queue.task_done()
-                    continue
+    def queue_download(self, url):
+        """Queue a file with the scheduler, nearest-to-path first"""
+        return self.scheduler.submit(url, self.download_priority(url))
 
-                # Update UI outside of lock
-                self.master.after(0, lambda u=url: self.update_file_list(u))
+    def run_download(self, url):
+        """Download one scheduled file - runs on a scheduler worker thread"""
+        worker_name = threading.current_thread().name
 
-                # Download the file - this can take a while
-                try:
-                    self.download_file(url)
-                except Exception as e:
-                    logger.error(f"Error in worker {worker_id} downloading {filename}: {e}", exc_info=True)
-                    # Mark file as having an error - updating UI will happen in the finally block
-                    with self.lock:
-                        if url in self.file_info:
-                            self.file_info[url]['status'] = 'Error'
-                            self.file_info[url]['error'] = str(e)
+        # Check if this file is already being downloaded
+        with self.lock:
+            if url not in self.file_info or url in self.active_downloads:
+                logger.debug(f"File {url} is already being downloaded or was removed, skipping")
+                return
 
-                finally:
-                    # Always mark file as no longer being downloaded
-                    with self.lock:
-                        if url in self.active_downloads:
-                            self.active_downloads.remove(url)
-                        self.download_queue.task_done()
+            # Mark file as being downloaded
+            self.active_downloads.add(url)
+            self.file_info[url]['status'] = 'Downloading'
+            filename = self.file_info[url]['filename']
 
-                    # Update UI with final status
-                    self.master.after(0, lambda u=url: self.update_file_list(u))
+        logger.debug(f"Worker {worker_name} got file from queue: {filename}")
+        self.update_file_list(url)
 
+        # Download the file - this can take a while
+        try:
+            self.download_file(url)
         except Exception as e:
-            logger.error(f"Worker {worker_id} thread exiting due to error: {str(e)}", exc_info=True)
+            logger.error(f"Error in worker {worker_name} downloading {filename}: {e}", exc_info=True)
+            with self.lock:
+                if url in self.file_info:
+                    self.file_info[url]['status'] = 'Error'
+                    self.file_info[url]['error'] = str(e)
 
         finally:
-            # Decrement the worker count when the thread exits
+            # Always mark file as no longer being downloaded
             with self.lock:
-                self.current_downloads -= 1
-                logger.info(f"Worker {worker_id} exiting. Remaining workers: {self.current_downloads}")
+                self.active_downloads.discard(url)
+            self.update_file_list(url)
 
     def pause_downloads(self):
         """Pause all active downloads"""
         try:
             logger.info("Pausing all downloads...")
 
-            # Clear the paused flag to signal workers to pause
+            # Clear the paused flag to stop active transfers, and stop handing out queued files
             # This needs to happen BEFORE acquiring the lock to prevent deadlock
             self.paused.clear()
+            self.scheduler.pause()
 
             # Use a small delay to let worker threads notice the pause flag
             # This prevents a race condition where we change statuses before workers notice
@@ -677,6 +688,7 @@ class UltraVerboseDownloaderer:
             # Set the paused flag to allow downloads to proceed
             # This needs to happen BEFORE acquiring the lock to prevent deadlock
             self.paused.set()
+            self.scheduler.resume()
 
             # Use a small delay to let worker threads notice the resume flag
             self.master.after(50, self._update_resumed_statuses)
@@ -699,14 +711,14 @@ class UltraVerboseDownloaderer:
 
                         # Re-add to download queue if not already in active downloads
                         if url not in self.active_downloads:
-                            self.download_queue.put((url, self.file_info[url]['filename']))
+                            self.queue_download(url)
                             files_resumed += 1
 
                 # Then check for any queued files that need to be started
                 for url in self.file_info:
                     if self.file_info[url]['status'] == 'Queued' and url not in self.active_downloads:
-                        self.download_queue.put((url, self.file_info[url]['filename']))
-                        queued_files += 1
+                        if self.queue_download(url):
+                            queued_files += 1
 
             # Start worker threads if needed - outside of lock
             worker_count = self.ensure_workers_running()
@@ -726,31 +738,10 @@ class UltraVerboseDownloaderer:
     def refresh_all_file_statuses(self):
         """Force refresh of all file statuses in the UI"""
         try:
-            for url in self.file_info:
-                self.update_file_list(url)
+            self.ui_updates.mark_many(list(self.file_info))
         except Exception as e:
             logger.error(f"Error refreshing file statuses: {e}", exc_info=True)
 
-    def download_next_file(self):
-        with self.lock:
-            if self.current_downloads >= self.max_concurrent_downloads:
-                return
-
-            if self.download_queue.empty():
-                return
-
-            if not self.paused.is_set():
-                return
-
-            _, url = self.download_queue.get()
-            self.current_downloads += 1
-            self.active_downloads.add(url)
-
-            thread = Thread(target=self.download_file, args=(url,))
-            thread.start()
-
-            self.master.after(100, self.download_next_file)
-
     def download_file(self, url):
         """Download a file from the given URL with improved progress tracking and error handling"""
         try:
@@ -795,200 +786,90 @@ class UltraVerboseDownloaderer:
                         })
                     self.update_file_list(url)
                     logger.info(f"File {filename} already complete")
+                    self._new_completions = True
                     return True
 
-            # Wait for total_size to be available if needed
-            if total_size == 0:
-                with self.lock:
-                    info['status'] = 'Waiting for size info'
-                self.update_file_list(url)
-
-                # Try to fetch size if not yet available
-                response = requests.head(url, allow_redirects=True)
-                if 'content-length' in response.headers:
-                    total_size = int(response.headers['content-length'])
-                    with self.lock:
-                        info['total_size'] = total_size
-
-                # If we still don't have size, we'll log but continue
-                if total_size == 0:
-                    logger.warning(f"Could not determine size for {filename}")
-
             # Setup for download with proper retry handling
             retry_count = 0
             max_retries = self.max_retries
 
             while retry_count <= max_retries:
-                try:
-                    # Update status to show retry attempt if needed
-                    if retry_count > 0:
-                        with self.lock:
-                            info['status'] = f"Retrying ({retry_count}/{max_retries})"
-                            info['retry_count'] = retry_count
-                        self.update_file_list(url)
-                        logger.info(f"Retry #{retry_count} for {filename}")
-
-                    # Check for partial download to resume
-                    downloaded_size = 0
-                    headers = {'User-Agent': 'UltraVerboseDownloaderer/1.0'}
-
-                    mode = 'wb'
-                    if os.path.exists(local_filename):
-                        downloaded_size = os.path.getsize(local_filename)
-                        if downloaded_size > 0:
-                            headers['Range'] = f'bytes={downloaded_size}-'
-                            mode = 'ab'
-                            logger.info(f"Resuming download of {filename} from {self.format_size(downloaded_size)}")
-
-                    # First verify the file is available
-                    # Disable SSL verification for USGS servers
-                    verify_ssl = not ('rockyweb.usgs.gov' in url or 'usgs.gov' in url)
-
-                    with requests.head(url, headers=headers, timeout=30, allow_redirects=True, verify=verify_ssl) as head_response:
-                        head_response.raise_for_status()
-
-                        # Verify expected total size from server
-                        server_size = int(head_response.headers.get('content-length', 0))
-                        if 'content-range' in head_response.headers:
-                            # Extract total size from content-range
-                            content_range = head_response.headers['content-range']
-                            if '/' in content_range:
-                                server_total = int(content_range.split('/')[-1])
-                                if total_size > 0 and server_total != total_size:
-                                    logger.warning(f"Server reported size {server_total} differs from expected size {total_size}")
-                                    total_size = server_total
-                        elif total_size == 0 and server_size > 0:
-                            total_size = server_size
-
-                        with self.lock:
-                            info['total_size'] = total_size
-
-                    # Start the actual download
+                # Update status to show retry attempt if needed
+                if retry_count > 0:
                     with self.lock:
-                        info['status'] = 'Downloading'
+                        info['status'] = f"Retrying ({retry_count}/{max_retries})"
+                        info['retry_count'] = retry_count
                     self.update_file_list(url)
+                    logger.info(f"Retry #{retry_count} for {filename}")
 
-                    # Disable SSL verification for USGS servers
-                    verify_ssl = not ('rockyweb.usgs.gov' in url or 'usgs.gov' in url)
-
-                    # Get the response
-                    response = requests.get(url, headers=headers, stream=True, timeout=30, verify=verify_ssl)
-                    response.raise_for_status()
-
-                    # Process the response
-                    with response:
-
-                        # Get content length for this response
-                        content_length = int(response.headers.get('content-length', 0))
-                        if content_length == 0 and response.status_code == 206:
-                            # Handle case where server doesn't provide content-length for range requests
-                            expected_remaining = total_size - downloaded_size
-                            logger.info(f"Server didn't provide content-length. Expected remaining: {self.format_size(expected_remaining)}")
-
-                        # If we're getting the whole file at once, make sure we have the correct total size
-                        if response.status_code == 200 and content_length > 0:
-                            total_size = content_length
-                            with self.lock:
-                                info['total_size'] = total_size
-
-                        # Open file for writing
-                        with open(local_filename, mode) as f:
-                            chunk_size = 8192  # 8KB chunks
-                            for chunk in response.iter_content(chunk_size=chunk_size):
-                                if chunk:
-                                    # Check if download should be paused
-                                    if not self.paused.is_set():
-                                        # Update status without holding the lock for too long
-                                        with self.lock:
-                                            info['status'] = 'Paused'
-
-                                        # Update UI outside the lock
-                                        self.master.after(0, lambda u=url: self.update_file_list(u))
-
-                                        # Wait for pause to be cleared - sleep in small increments
-                                        # to allow quick response when unpaused
-                                        while not self.paused.is_set():
-                                            # Check for cancel during pause
-                                            if url not in self.active_downloads:
-                                                logger.info(f"Download cancelled while paused: {filename}")
-                                                return False
-                                            time.sleep(0.1)
-
-                                        # Once unpaused, update status back to Downloading
-                                        with self.lock:
-                                            info['status'] = 'Downloading'
-                                        self.master.after(0, lambda u=url: self.update_file_list(u))
-
-                                    # Check if download was cancelled
-                                    if url not in self.active_downloads:
-                                        logger.info(f"Download cancelled: {filename}")
-                                        with self.lock:
-                                            info['status'] = 'Cancelled'
-                                        self.master.after(0, lambda u=url: self.update_file_list(u))
-                                        return False
-
-                                    # Write chunk and update progress
-                                    f.write(chunk)
-                                    downloaded_size += len(chunk)
-                                    self.update_progress(url, downloaded_size, total_size)
-
-                        # Verify final size
-                        final_size = os.path.getsize(local_filename)
-                        if total_size > 0 and final_size != total_size:
-                            logger.warning(f"Download completed but size mismatch: {self.format_size(final_size)} vs expected {self.format_size(total_size)}")
-
-                            # If we're very close (within 0.1%), consider it complete anyway
-                            if abs(final_size - total_size) / total_size < 0.001:
-                                logger.info(f"Size difference of {abs(final_size - total_size)} bytes is within tolerance, marking as complete")
-                                final_status = 'Complete'
-                            else:
-                                # Not close enough - retry or fail
-                                raise Exception(f"Size mismatch: {self.format_size(final_size)} vs expected {self.format_size(total_size)}")
-                        else:
-                            final_status = 'Complete'
+                with self.lock:
+                    info['status'] = 'Downloading'
+                self.update_file_list(url)
 
-                        # Mark as complete
-                        with self.lock:
-                            info.update({
-                                'status': final_status,
-                                'progress': 100,
-                                'size_on_disk': final_size,
-                                'speed': 0,
-                                'eta': 0,
-                                'end_time': time.time()
-                            })
-                        self.update_file_list(url)
-                        logger.info(f"Download completed: {filename} - Size: {self.format_size(final_size)}")
+                # Disable SSL verification for USGS servers
+                verify_ssl = not ('rockyweb.usgs.gov' in url or 'usgs.gov' in url)
 
-                        return True
+                # Segmented, resumable download; pausing or cancelling stops it with the resume state kept
+                result = self.range_downloader.download(
+                    url,
+                    local_filename,
+                    progress_callback=lambda done, total, u=url: self.update_progress(u, done, total),
+                    should_stop=lambda u=url: not self.paused.is_set() or u not in self.active_downloads,
+                    verify=verify_ssl
+                )
 
-                except Exception as e:
-                    retry_count += 1
-                    logger.error(f"Download error: {str(e)}", exc_info=True)
-
-                    # Check if we should retry
-                    if retry_count <= max_retries:
-                        wait_time = 2 ** retry_count  # Exponential backoff
-                        logger.warning(f"Will retry download in {wait_time}s: {filename}")
-
-                        with self.lock:
-                            info.update({
-                                'status': f'Retrying ({retry_count}/{max_retries})',
-                                'error': str(e)
-                            })
-                        self.update_file_list(url)
-                        time.sleep(wait_time)
-                    else:
-                        with self.lock:
-                            info.update({
-                                'status': 'Failed',
-                                'error': str(e),
-                                'retry_count': retry_count,
-                                'end_time': time.time()
-                            })
-                        self.update_file_list(url)
-                        logger.error(f"Download failed after {max_retries} retries: {filename}")
-                        return False
+                if result.status == 'complete':
+                    with self.lock:
+                        info.update({
+                            'status': 'Complete',
+                            'progress': 100,
+                            'total_size': result.size,
+                            'size_on_disk': result.size,
+                            'speed': 0,
+                            'eta': 0,
+                            'end_time': time.time()
+                        })
+                    self.update_file_list(url)
+                    logger.info(f"Download completed: {filename} - Size: {self.format_size(result.size)} "
+                                f"at {self.format_speed(result.speed)}")
+                    self._new_completions = True
+                    return True
+
+                if result.status == 'stopped':
+                    cancelled = url not in self.active_downloads
+                    with self.lock:
+                        info['status'] = 'Cancelled' if cancelled else 'Paused'
+                        info['speed'] = 0
+                    self.update_file_list(url)
+                    logger.info(f"Download {'cancelled' if cancelled else 'paused'}: {filename}")
+                    return False
+
+                retry_count += 1
+                logger.error(f"Download error: {result.error}")
+
+                # Check if we should retry
+                if retry_count <= max_retries:
+                    wait_time = 2 ** retry_count  # Exponential backoff
+                    logger.warning(f"Will retry download in {wait_time}s: {filename}")
+
+                    with self.lock:
+                        info.update({
+                            'status': f'Retrying ({retry_count}/{max_retries})',
+                            'error': result.error
+                        })
+                    self.update_file_list(url)
+                    time.sleep(wait_time)
+                else:
+                    with self.lock:
+                        info.update({
+                            'status': 'Failed',
+                            'error': result.error,
+                            'retry_count': retry_count,
+                            'end_time': time.time()
+                        })
+                    self.update_file_list(url)
+                    logger.error(f"Download failed after {max_retries} retries: {filename}")
+                    return False
 
         except Exception as e:
             logger.error(f"Critical error in download_file: {str(e)}", exc_info=True)
@@ -1076,10 +957,9 @@ class UltraVerboseDownloaderer:
                     })
                     should_update_ui = False
 
-            # Update UI outside of lock
+            # Mark the row for the next batched UI refresh
             if should_update_ui:
-                # Always use master.after to update UI
-                self.master.after(0, lambda u=url: self.update_file_list(u))
+                self.update_file_list(url)
 
         except Exception as e:
             logger.error(f"Error updating progress: {str(e)}", exc_info=True)
@@ -1235,8 +1115,10 @@ class UltraVerboseDownloaderer:
     def on_closing(self):
         if self.active_downloads:
             if messagebox.askokcancel("Quit", "Active downloads are in progress. Are you sure you want to quit?"):
+                self.scheduler.shutdown()
                 self.master.quit()
         else:
+            self.scheduler.shutdown()
             self.master.quit()
 
     def remove_selected(self):
@@ -1296,7 +1178,7 @@ class UltraVerboseDownloaderer:
                     })
 
                     # Add to download queue
-                    self.download_queue.put((url, info['filename']))
+                    self.queue_download(url)
                     logger.info(f"Queued {info['filename']} for infinite retry")
                     self.update_file_list(url)
 
@@ -1308,6 +1190,7 @@ class UltraVerboseDownloaderer:
 
             # Set the paused flag to allow downloads to proceed
             self.paused.set()
+            self.scheduler.resume()
 
             messagebox.showinfo("Infinite Retry", f"Started infinite retry for {len(incomplete_items)} downloads. The system will keep retrying until all downloads complete successfully.")
 
@@ -1359,7 +1242,7 @@ class UltraVerboseDownloaderer:
                     # Add to download queue after delay
                     self.master.after(
                         delay * 1000,  # Convert to milliseconds
-                        lambda u=url, f=info['filename']: self.download_queue.put((u, f))
+                        lambda u=url: self.queue_download(u)
                     )
 
                     self.update_file_list(url)
@@ -1401,7 +1284,7 @@ class UltraVerboseDownloaderer:
                 delay = len(self.file_info) * 500  # 500ms between each download
                 self.master.after(
                     delay,
-                    lambda u=url, f=info['filename']: self.download_queue.put((u, f))
+                    lambda u=url: self.queue_download(u)
                 )
 
                 logger.info(f"Scheduled restart for {info['filename']}")
@@ -1915,13 +1798,13 @@ class UltraVerboseDownloaderer:
             return False
 
     def start_periodic_refresh(self):
-        """Start periodic UI refresh to keep display up-to-date"""
+        """Start the fixed-rate UI refresh that redraws rows changed by the workers"""
         try:
-            # Refresh all file statuses
-            self.refresh_all_file_statuses()
+            self.flush_ui_updates()
+            self.report_downloaded_tiles()
 
             # Schedule next refresh
-            self.master.after(2000, self.start_periodic_refresh)
+            self.master.after(UI_REFRESH_MS, self.start_periodic_refresh)
         except Exception as e:
             logger.error(f"Error in periodic refresh: {e}", exc_info=True)
 
@@ -1930,6 +1813,7 @@ class UltraVerboseDownloaderer:
         try:
             # Clear existing items
             self.file_list.delete(*self.file_list.get_children())
+            self.url_item_map.clear()
 
             # Add all files in current state
             for url, info in self.file_info.items():
@@ -1979,6 +1863,7 @@ class UltraVerboseDownloaderer:
                         eta_text,
                         info['status']
                     ))
+                    self.url_item_map[url] = item_id
 
                     # Apply tags based on status
                     if info['status'] == 'Complete':
@@ -2008,17 +1893,13 @@ class UltraVerboseDownloaderer:
                     self.file_info = {}
 
                     # Clear the download queue
-                    while not self.download_queue.empty():
-                        try:
-                            self.download_queue.get_nowait()
-                            self.download_queue.task_done()
-                        except queue.Empty:
-                            break
+                    self.scheduler.clear()
 
                     # Reset other tracking variables
                     self.active_downloads.clear()
                     self.selected_files.clear()
                     self.item_url_map.clear()
+                    self.url_item_map.clear()
 
                 # Clear the file list in the UI
                 self.file_list.delete(*self.file_list.get_children())
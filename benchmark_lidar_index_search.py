@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark LIDAR Index Polygon Filtering
+
+This script builds a synthetic LIDAR index with 50,000 files and compares:
+1. The original per-file Polygon/intersects loop used by search_lidar_index
+2. The vectorized filter_files_by_polygon used now
+
+Both filters must return the same files; the script reports the timings.
+Both run under the same logging configuration. The default WARNING level
+times the filtering alone; --log-level INFO adds the per-file logging the
+legacy loop did in the application. Log records go to os.devnull so the
+terminal does not dominate the timings.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+import sqlite3
+from shapely.geometry import Polygon
+
+from utilities.lidar_index_db import init_database, add_project, search_files_by_bbox
+from utilities.lidar_index_search import filter_files_by_polygon
+
+# The legacy filter logs through the same logger as search_lidar_index
+logger = logging.getLogger('utilities.lidar_index_search')
+
+def build_synthetic_index(db_path, file_count, seed=42):
+    """Create an index of 1 km-ish tiles scattered over a state-sized area."""
+    init_database(db_path)
+    project_id = add_project({'name': 'SYNTHETIC_2024', 'prefix': 'SYNTHETIC_2024/', 'year': 2024}, db_path)
+
+    rng = random.Random(seed)
+    rows = []
+    for i in range(file_count):
+        min_x = rng.uniform(-109.0, -102.0)
+        min_y = rng.uniform(37.0, 41.0)
+        rows.append((project_id, 'usgs-lidar-public', f"SYNTHETIC_2024/tile_{i}.laz", f"tile_{i}.laz",
+                     'laz', min_x, min_y, min_x + 0.01, min_y + 0.01))
+
+    # Insert directly so the benchmark setup itself stays fast
+    conn = sqlite3.connect(db_path)
+    conn.executemany("""
+    INSERT INTO files (project_id, bucket, key, filename, format, min_x, min_y, max_x, max_y)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+def legacy_filter(files, polygon):
+    """The original per-file filter from search_lidar_index, logging included."""
+    filtered_files = []
+    for idx, file in enumerate(files):
+        logger.info(f"File {idx+1}/{len(files)}: {file.get('key')}")
+        logger.info(f"  File bounds: {file.get('min_x')}, {file.get('min_y')} to {file.get('max_x')}, {file.get('max_y')}")
+        file_bbox = [
+            (file['min_x'], file['min_y']),
+            (file['min_x'], file['max_y']),
+            (file['max_x'], file['max_y']),
+            (file['max_x'], file['min_y'])
+        ]
+        logger.info(f"  File bbox points: {file_bbox}")
+        file_polygon = Polygon(file_bbox)
+        logger.info(f"  File polygon created: {file_polygon}")
+        does_intersect = polygon.intersects(file_polygon)
+        logger.info(f"  Intersection check result: {does_intersect}")
+        if does_intersect:
+            filtered_files.append(file)
+    return filtered_files
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark LIDAR index polygon filtering')
+    parser.add_argument('--files', type=int, default=50000, help='Number of synthetic files in the index')
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING'],
+                        help='Logging level both filters run under')
+    args = parser.parse_args()
+
+    # One logging configuration for both filters
+    log_stream = open(os.devnull, 'w')
+    logging.basicConfig(
+        level=getattr(logging, args.log_level),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(log_stream)]
+    )
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        print(f"Building synthetic index with {args.files} files...")
+        build_synthetic_index(db_path, args.files)
+
+        # A diagonal corridor across the whole area so most bbox hits are not polygon hits
+        polygon = Polygon([(-109.0, 37.0), (-108.8, 37.0), (-102.0, 40.8), (-102.0, 41.0), (-109.0, 37.2)])
+        min_x, min_y, max_x, max_y = polygon.bounds
+
+        start = time.perf_counter()
+        files = search_files_by_bbox(min_x, min_y, max_x, max_y, db_path=db_path)
+        bbox_time = time.perf_counter() - start
+        print(f"Bbox query: {len(files)} candidates in {bbox_time:.3f}s")
+
+        start = time.perf_counter()
+        legacy = legacy_filter(files, polygon)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = filter_files_by_polygon(files, Polygon(polygon.exterior.coords))
+        vectorized_time = time.perf_counter() - start
+
+        if [f['key'] for f in legacy] != [f['key'] for f in vectorized]:
+            print("❌ Legacy and vectorized filters returned different files")
+            return 1
+
+        print(f"Logging level: {args.log_level} (both filters)")
+        print(f"Legacy filter:     {len(legacy)} files in {legacy_time:.3f}s")
+        print(f"Vectorized filter: {len(vectorized)} files in {vectorized_time:.3f}s")
+        if vectorized_time > 0:
+            print(f"Speedup: {legacy_time / vectorized_time:.1f}x")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
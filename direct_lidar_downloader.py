@@ -24,6 +24,8 @@ from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 
+from utilities.download_service import DownloadJournal, DEFAULT_JOURNAL_NAME, apply_journal_to_tower_parameters
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -226,69 +228,16 @@ def extract_lidar_files(tower_params: Dict[str, Any]) -> List[Dict[str, Any]]:
         logger.error(f"Error extracting LIDAR files: {str(e)}", exc_info=True)
         return []
 
-def update_tower_parameters(tower_params: Dict[str, Any], file_info: Dict[str, Any], local_path: str) -> Dict[str, Any]:
-    """
-    Update tower parameters with local file path
-
-    Args:
-        tower_params: Tower parameters dictionary
-        file_info: File information dictionary
-        local_path: Local file path
-
-    Returns:
-        Dict[str, Any]: Updated tower parameters
-    """
-    try:
-        project_name = file_info['project_name']
-        filename = file_info['filename']
-
-        # Find the file in the tower parameters
-        for i, file_data in enumerate(tower_params['lidar_data'][project_name]['files']):
-            if file_data['filename'] == filename:
-                # Update local file path
-                tower_params['lidar_data'][project_name]['files'][i]['local_file_path'] = local_path
-                break
-
-        return tower_params
-
-    except Exception as e:
-        logger.error(f"Error updating tower parameters: {str(e)}", exc_info=True)
-        return tower_params
-
-def save_tower_parameters(tower_params: Dict[str, Any], file_path: str = 'tower_parameters.json') -> bool:
-    """
-    Save tower parameters to file
-
-    Args:
-        tower_params: Tower parameters dictionary
-        file_path: Path to save the tower parameters
-
-    Returns:
-        bool: True if successful, False otherwise
-    """
-    try:
-        # Create backup of existing file
-        if os.path.exists(file_path):
-            backup_path = f"{file_path}.bak.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            os.rename(file_path, backup_path)
-            logger.info(f"Created backup of tower parameters at {backup_path}")
-
-        # Save updated parameters
-        with open(file_path, 'w') as f:
-            json.dump(tower_params, f, indent=2)
-
-        logger.info(f"Saved updated tower parameters to {file_path}")
-        return True
-
-    except Exception as e:
-        logger.error(f"Error saving tower parameters: {str(e)}", exc_info=True)
-        return False
-
 def download_all_lidar_files(tower_params_path: str, output_dir: str, aws_key: str = None, aws_secret: str = None,
                             max_workers: int = 4, save_progress: bool = True) -> Dict[str, int]:
     """
     Download all LIDAR files from tower parameters
 
+    Each downloaded (or already present) file is appended to the download
+    journal in output_dir as it finishes; tower_parameters.json is updated
+    from the journal in one write at the end, so an interrupted run loses no
+    recorded paths.
+
     Args:
         tower_params_path: Path to the tower parameters file
         output_dir: Directory to save downloaded files
@@ -324,6 +273,9 @@ def download_all_lidar_files(tower_params_path: str, output_dir: str, aws_key: s
         'skipped': 0
     }
 
+    # Finished files are journaled as they complete and applied to tower_parameters.json at the end
+    journal = DownloadJournal(os.path.join(output_dir, DEFAULT_JOURNAL_NAME))
+
     # Create progress tracking function
     def download_with_progress(file_info):
         nonlocal stats
@@ -339,10 +291,17 @@ def download_all_lidar_files(tower_params_path: str, output_dir: str, aws_key: s
                 else:
                     stats['completed'] += 1
 
-                # Update tower parameters with local file path
+                # Record the local file path in the journal
                 if save_progress:
-                    tower_params_updated = update_tower_parameters(tower_params, file_info, result)
-                    save_tower_parameters(tower_params_updated, tower_params_path)
+                    journal.append({
+                        'url': file_info.get('download_url'),
+                        'filename': file_info['filename'],
+                        'project': file_info['project_name'],
+                        'path': result,
+                        'status': 'complete',
+                        'size': os.path.getsize(result),
+                        'time': datetime.now().isoformat(timespec='seconds'),
+                    })
         else:
             stats['failed'] += 1
 
@@ -360,6 +319,12 @@ def download_all_lidar_files(tower_params_path: str, output_dir: str, aws_key: s
         # Execute all downloads and wait for completion
         list(executor.map(download_with_progress, lidar_files))
 
+    if save_progress:
+        try:
+            apply_journal_to_tower_parameters(journal.path, tower_params_path)
+        except Exception as e:
+            logger.error(f"Error updating tower parameters from {journal.path}: {str(e)}", exc_info=True)
+
     # Print final statistics
     logger.info(f"Download complete - Total: {stats['total']}, Completed: {stats['completed']}, Skipped: {stats['skipped']}, Failed: {stats['failed']}")
 
@@ -24,7 +24,6 @@ from io import StringIO
 import matplotlib.cm as cm
 from functools import partial
 import threading
-import queue
 import zipfile
 import shutil
 import platform
@@ -246,6 +245,12 @@ def update_map(site_a, site_b):
         # Log the converted coordinates
         logger.info(f"Converted coordinates: A({lat_a}, {lon_a}), B({lat_b}, {lon_b})")
 
+        # Start the Earth Engine vegetation queries while the map is drawn
+        elevation_profile.vegetation_profiler.prefetch((lat_a, lon_a), (lat_b, lon_b))
+
+        # Download the LiDAR tiles nearest the path first
+        downloader.set_priority_path((lat_a, lon_a), (lat_b, lon_b))
+
         # Remove existing markers and paths if they exist
         map_widget.delete_all_marker()
         map_widget.delete_all_path()
@@ -292,7 +297,8 @@ def update_map(site_a, site_b):
         map_widget.set_position(center_lat, center_lon)
         map_widget.set_zoom(11)
 
-        # Update elevation profile
+        # Update elevation profile (a LiDAR corridor built for the previous path no longer applies)
+        elevation_profile.clear_lidar_corridor()
         elevation_profile.update_profile(
             start_coords=(lat_a, lon_a),
             end_coords=(lat_b, lon_b),
@@ -302,6 +308,11 @@ def update_map(site_a, site_b):
             site_b_id=site_b['site_id']
         )
 
+        # Use tiles that are already downloaded for LiDAR terrain and canopy
+        lidar_files = downloader.completed_lidar_files()
+        if lidar_files:
+            load_lidar_into_profile(lidar_files)
+
         # Update LIDAR search area
         if lidar_downloader:
             lidar_downloader.set_polygon_points(polygon_points)
@@ -311,6 +322,19 @@ def update_map(site_a, site_b):
         logger.error(error_msg, exc_info=True)
         show_error(error_msg)
 
+def load_lidar_into_profile(lidar_files):
+    """Build the elevation profile's LiDAR corridor from downloaded tiles in the background"""
+    try:
+        width_ft = lidar_downloader.polygon_width_ft.get() if lidar_downloader else 2000
+        logger.info(f"Building LiDAR corridor for the profile from {len(lidar_files)} downloaded tiles")
+
+        def report_progress(message, percent):
+            downloader.log(f"LiDAR profile: {message} ({percent:.0f}%)")
+
+        elevation_profile.load_lidar_corridor(lidar_files, width_ft, progress_callback=report_progress)
+    except Exception as e:
+        logger.error(f"Error loading LiDAR tiles into the profile: {str(e)}", exc_info=True)
+
 # Function moved to utilities/coordinates.py
 
 def polygon_click(polygon):
@@ -1625,17 +1649,13 @@ class ApplicationController:
                     self.downloader.file_info = {}
 
                     # Clear the download queue
-                    while not self.downloader.download_queue.empty():
-                        try:
-                            self.downloader.download_queue.get_nowait()
-                            self.downloader.download_queue.task_done()
-                        except queue.Empty:
-                            break
+                    self.downloader.scheduler.clear()
 
                     # Reset other tracking variables
                     self.downloader.active_downloads.clear()
                     self.downloader.selected_files.clear()
                     self.downloader.item_url_map.clear()
+                    self.downloader.url_item_map.clear()
 
                 # Clear the file list in the UI
                 self.downloader.file_list.delete(*self.downloader.file_list.get_children())
@@ -2347,17 +2367,13 @@ class ApplicationController:
                     self.downloader.file_info = {}
 
                     # Clear the download queue
-                    while not self.downloader.download_queue.empty():
-                        try:
-                            self.downloader.download_queue.get_nowait()
-                            self.downloader.download_queue.task_done()
-                        except queue.Empty:
-                            break
+                    self.downloader.scheduler.clear()
 
                     # Reset other tracking variables
                     self.downloader.active_downloads.clear()
                     self.downloader.selected_files.clear()
                     self.downloader.item_url_map.clear()
+                    self.downloader.url_item_map.clear()
 
                 # Clear the file list in the UI
                 self.downloader.file_list.delete(*self.downloader.file_list.get_children())
@@ -5989,6 +6005,9 @@ logger.info("Downloader initialized")
 
 # Initialize ApplicationController with the downloader instance
 lidar_downloader = ApplicationController(center_frame, map_widget, root, downloader)
+
+# Rebuild the profile's LiDAR corridor whenever a batch of tile downloads finishes
+downloader.tiles_downloaded_callback = load_lidar_into_profile
 lidar_downloader.legend_items_frame = legend_items_frame
 lidar_downloader.legend_canvas = legend_canvas
 logger.info("ApplicationController instance created")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Headless LIDAR Downloader
+
+Downloads LIDAR tiles without the Tk GUI, using the same scheduler and
+parallel range engine as the downloader panel. Suitable for bulk pulls on
+servers without X11.
+
+Input files are JSON in any of these layouts:
+    - a list of [url, filename, info] entries (the format add_urls_bulk accepts)
+    - TNM search results (a list of items or a response with 'items')
+    - tower_parameters.json (every file of every project under 'lidar_data')
+
+Finished files are appended to a JSON-lines journal, so re-running the same
+command resumes where it stopped. With --update-tower-params the local paths
+are written to tower_parameters.json once, after the run.
+
+Usage:
+    python headless_downloader.py FILE_LIST [FILE_LIST ...] [--output-dir DIR] [--workers N]
+        [--per-host N] [--path LAT_A LON_A LAT_B LON_B] [--update-tower-params PATH]
+"""
+
+import sys
+import json
+import logging
+import argparse
+
+from utilities.download_service import (DownloadService, load_file_list, apply_journal_to_tower_parameters,
+                                        format_metrics, DEFAULT_REPORT_INTERVAL, DEFAULT_MAX_RETRIES)
+from utilities.download_scheduler import DEFAULT_MAX_WORKERS, DEFAULT_PER_HOST_LIMIT
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Download LIDAR files without the GUI')
+    parser.add_argument('file_lists', nargs='+', help='JSON download lists (add_urls_bulk format, TNM items or tower_parameters.json)')
+    parser.add_argument('--output-dir', type=str, default='lidar_data',
+                        help='Directory to save downloaded files (default: lidar_data)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f'Concurrent file downloads (default: {DEFAULT_MAX_WORKERS})')
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST_LIMIT,
+                        help=f'Concurrent downloads per host (default: {DEFAULT_PER_HOST_LIMIT})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_MAX_RETRIES,
+                        help=f'Retries per file (default: {DEFAULT_MAX_RETRIES})')
+    parser.add_argument('--journal', type=str,
+                        help='Download journal path (default: OUTPUT_DIR/download_journal.jsonl)')
+    parser.add_argument('--path', type=float, nargs=4, metavar=('LAT_A', 'LON_A', 'LAT_B', 'LON_B'),
+                        help='Download tiles nearest this path first')
+    parser.add_argument('--report-interval', type=float, default=DEFAULT_REPORT_INTERVAL,
+                        help=f'Seconds between throughput reports (default: {DEFAULT_REPORT_INTERVAL:g})')
+    parser.add_argument('--metrics-json', type=str, help='Write the final throughput metrics to this file')
+    parser.add_argument('--update-tower-params', type=str, metavar='PATH',
+                        help='Record local file paths in this tower_parameters.json after the run')
+
+    args = parser.parse_args()
+
+    priority_path = ((args.path[0], args.path[1]), (args.path[2], args.path[3])) if args.path else None
+    service = DownloadService(args.output_dir, max_workers=args.workers, per_host_limit=args.per_host,
+                              journal_path=args.journal, max_retries=args.retries, priority_path=priority_path)
+
+    for path in args.file_lists:
+        service.add_files(load_file_list(path))
+
+    try:
+        metrics = service.run(report_interval=args.report_interval)
+    except KeyboardInterrupt:
+        print("\nInterrupted - re-run the same command to resume.")
+        return 130
+
+    if args.update_tower_params:
+        apply_journal_to_tower_parameters(service.journal.path, args.update_tower_params)
+
+    if args.metrics_json:
+        with open(args.metrics_json, 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+    print(f"\nDownload Statistics:\n  {format_metrics(metrics)}")
+    return 1 if metrics['failed'] > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -15,7 +15,7 @@ import os
 import sys
 import logging
 import argparse
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 
 # Configure logging
@@ -74,7 +74,7 @@ def crawl_command(args):
             return 1
         
         # Create crawler
-        crawler = LidarCrawler(args.db_path)
+        crawler = LidarCrawler(args.db_path, since=args.since)
         
         # Run crawler
         crawler.run(args.max_projects)
@@ -100,7 +100,7 @@ def update_command(args):
             return 1
         
         # Create crawler
-        crawler = LidarCrawler(args.db_path)
+        crawler = LidarCrawler(args.db_path, changed_only=args.changed_only, since=args.since)
         
         # Run crawler
         crawler.run(args.max_projects)
@@ -206,6 +206,18 @@ def stats_command(args):
         logger.error(f"Error getting database stats: {str(e)}", exc_info=True)
         return 1
 
+def parse_date(value):
+    """
+    Parse a YYYY-MM-DD command-line date as midnight UTC.
+    
+    Args:
+        value: Date string
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
 def main():
     """
     Main function.
@@ -227,11 +239,17 @@ def main():
     crawl_parser = subparsers.add_parser('crawl', help='Crawl LIDAR files')
     crawl_parser.add_argument('--max-projects', type=int,
                              help='Maximum number of projects to crawl')
+    crawl_parser.add_argument('--since', type=parse_date,
+                             help='Skip files last modified before this date (YYYY-MM-DD)')
     
     # Update command
     update_parser = subparsers.add_parser('update', help='Update the index with new data')
     update_parser.add_argument('--max-projects', type=int,
                               help='Maximum number of projects to update')
+    update_parser.add_argument('--since', type=parse_date,
+                              help='Skip files last modified before this date (YYYY-MM-DD)')
+    update_parser.add_argument('--changed-only', action='store_true',
+                              help='Only re-process files whose ETag changed since the last crawl')
     
     # Search command
     search_parser = subparsers.add_parser('search', help='Search for LIDAR files by location')
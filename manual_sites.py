@@ -1,11 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import logging
+import math
 import re
-import requests
-import os
 import json
 from dotenv import load_dotenv
+from utilities.terrain_engine import get_elevations
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -15,7 +15,10 @@ load_dotenv()
 
 def fetch_elevation_data(lat, lon):
     """
-    Fetch elevation data for a given coordinate using Google Maps Elevation API.
+    Fetch elevation data for a given coordinate.
+    
+    Uses the local DEM terrain engine when a DEM covers the point, otherwise
+    the Google Maps Elevation API.
     
     Args:
         lat (float): Latitude in decimal degrees
@@ -25,25 +28,11 @@ def fetch_elevation_data(lat, lon):
         float: Elevation in feet, or None if fetching failed
     """
     try:
-        api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-        if not api_key:
-            logger.error("Google Maps API key not found in environment variables")
-            return None
-            
-        url = f"https://maps.googleapis.com/maps/api/elevation/json?locations={lat},{lon}&key={api_key}"
-        
-        response = requests.get(url)
-        if response.status_code != 200:
-            logger.error(f"Error fetching elevation data: {response.status_code}")
-            return None
-            
-        data = response.json()
-        if data.get('status') != 'OK':
-            logger.error(f"API returned error: {data.get('status')}")
+        elevation_meters = get_elevations([lat], [lon])[0]
+        if math.isnan(elevation_meters):
+            logger.error(f"No elevation data available for {lat}, {lon}")
             return None
             
-        # Extract elevation in meters and convert to feet
-        elevation_meters = data['results'][0]['elevation']
         elevation_feet = elevation_meters * 3.28084  # Convert meters to feet
         
         logger.info(f"Fetched elevation for {lat}, {lon}: {elevation_feet:.2f} feet")
@@ -13,12 +13,16 @@ Features:
 - Creates a production-ready index
 
 Usage:
-    python production_lidar_indexer.py [--region REGION] [--limit LIMIT] [--db-path DB_PATH]
+    python production_lidar_indexer.py [--region REGION] [--limit LIMIT] [--db-path DB_PATH] [--workers N]
+                                       [--changed-only] [--since YYYY-MM-DD]
 
 Options:
     --region REGION    Region to index (e.g., 'CO' for Colorado, 'all' for all regions)
     --limit LIMIT      Limit the number of projects to index (for testing)
     --db-path DB_PATH  Path to the database file
+    --workers N        Number of projects to fetch from S3 concurrently (default: 1)
+    --changed-only     Skip projects/files whose ETag or manifest hash is unchanged
+    --since DATE       Only index projects whose manifest was modified on or after DATE
 """
 
 import os
@@ -30,7 +34,10 @@ import sqlite3
 import argparse
 import boto3
 import time
-from datetime import datetime
+import queue
+import hashlib
+import threading
+from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -49,16 +56,16 @@ logger = logging.getLogger(__name__)
 try:
     from utilities.lidar_index_db import (
         init_database, get_database_stats, database_exists, DEFAULT_DB_PATH,
-        add_project, add_file, start_crawl, update_crawl, optimize_database
+        add_project, add_files_bulk, start_crawl, update_crawl, optimize_database,
+        get_project_crawl_states, update_project_crawl_state, get_file_states, delete_stale_files,
+        close_thread_connections
     )
 except ImportError:
     logger.error("Could not import database module. Make sure utilities/lidar_index_db.py exists.")
     sys.exit(1)
 
 # Global variables
-MAX_WORKERS = 20  # Maximum number of worker threads for file processing
-MAX_PROJECT_WORKERS = 5  # Maximum number of worker threads for project processing
-BATCH_SIZE = 200  # Number of files to process in a batch
+BATCH_SIZE = 5000  # Number of files written per database transaction
 PROGRESS_INTERVAL = 5  # Seconds between progress updates
 
 def initialize_s3_client():
@@ -205,6 +212,49 @@ def get_projects(s3_client, region=None, limit=None):
         logger.error(f"Error getting projects: {str(e)}", exc_info=True)
         return []
 
+def _format_last_modified(last_modified):
+    """
+    Convert an S3 LastModified value to an ISO 8601 string.
+
+    Args:
+        last_modified: datetime from boto3, string, or None
+
+    Returns:
+        str: ISO 8601 timestamp or None
+    """
+    if last_modified is None:
+        return None
+    if isinstance(last_modified, datetime):
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.isoformat()
+    return str(last_modified)
+
+def head_project_manifest(s3_client, project_name):
+    """
+    Get the ETag and LastModified of a project's manifest without downloading it.
+
+    Args:
+        s3_client: Boto3 S3 client
+        project_name: Project name
+
+    Returns:
+        Dict[str, Any]: manifest_etag and manifest_last_modified, or None if the HEAD failed
+    """
+    try:
+        response = s3_client.head_object(
+            Bucket='usgs-lidar-public',
+            Key=f"{project_name}/ept-sources/manifest.json",
+            RequestPayer='requester'
+        )
+        return {
+            'manifest_etag': response.get('ETag'),
+            'manifest_last_modified': _format_last_modified(response.get('LastModified'))
+        }
+    except Exception as e:
+        logger.warning(f"Error getting manifest.json headers for project {project_name}: {str(e)}")
+        return None
+
 def extract_ept_metadata(s3_client, project_name):
     """
     Extract metadata from EPT files.
@@ -234,6 +284,7 @@ def extract_ept_metadata(s3_client, project_name):
 
             # Extract metadata from ept.json
             metadata['ept_json'] = ept_data
+            metadata['ept_etag'] = response.get('ETag')
 
             # Extract key metadata fields
             if ept_data.get('bounds'):
@@ -257,11 +308,17 @@ def extract_ept_metadata(s3_client, project_name):
                 Key=manifest_key,
                 RequestPayer='requester'
             )
-            manifest_data = json.loads(response['Body'].read().decode('utf-8'))
+            manifest_body = response['Body'].read()
+            manifest_data = json.loads(manifest_body.decode('utf-8'))
 
             # Extract metadata from manifest.json
             metadata['manifest'] = manifest_data
 
+            # Record change-detection state for incremental crawls
+            metadata['manifest_etag'] = response.get('ETag')
+            metadata['manifest_last_modified'] = _format_last_modified(response.get('LastModified'))
+            metadata['manifest_hash'] = hashlib.sha256(manifest_body).hexdigest()
+
             logger.info(f"Successfully extracted metadata from manifest.json for project {project_name}")
         except Exception as e:
             logger.warning(f"Error getting manifest.json for project {project_name}: {str(e)}")
@@ -272,19 +329,17 @@ def extract_ept_metadata(s3_client, project_name):
         logger.error(f"Error extracting EPT metadata for project {project_name}: {str(e)}", exc_info=True)
         return {}
 
-def process_source_file(source, project_id, project_metadata, project_data, db_path):
+def build_source_file_data(source, project_metadata, project_data):
     """
-    Process a source file and add it to the database.
+    Convert an EPT source entry into file data for the database.
 
     Args:
         source: Source file data
-        project_id: Project ID in the database
         project_metadata: Project metadata
         project_data: Project data
-        db_path: Path to the database file
 
     Returns:
-        int: File ID in the database
+        Dict[str, Any]: File data, or None if the source is invalid
     """
     try:
         # Extract file information
@@ -295,7 +350,7 @@ def process_source_file(source, project_id, project_metadata, project_data, db_p
         # Skip if no path or bounds
         if not path or not bounds or len(bounds) != 6:
             logger.warning(f"Skipping source file with invalid data: {path}")
-            return 0
+            return None
 
         # Extract filename from path
         filename = path.split('/')[-1]
@@ -347,79 +402,200 @@ def process_source_file(source, project_id, project_metadata, project_data, db_p
             })
         }
 
-        # Add file to database
-        file_id = add_file(file_data, project_id, db_path)
+        # Hash of the manifest entry, used to detect changed files on incremental crawls
+        file_data['source_hash'] = hashlib.sha1(json.dumps(source, sort_keys=True).encode('utf-8')).hexdigest()
 
-        return file_id
+        return file_data
 
     except Exception as e:
-        logger.error(f"Error processing source file: {str(e)}", exc_info=True)
-        return 0
+        logger.error(f"Error building file data for source: {str(e)}", exc_info=True)
+        return None
 
-def process_project(s3_client, project_data, db_path):
+def fetch_project(s3_client, project_data, previous_state=None, changed_only=False, since=None):
     """
-    Process a project and add it to the database.
+    Fetch EPT metadata for a project and build its file records.
+
+    This only talks to S3, so it is safe to run for many projects at once;
+    the results are written to the database by write_project.
+
+    For incremental crawls the manifest is checked with a HEAD request first:
+    projects whose manifest ETag matches previous_state (changed_only) or
+    that were last modified before since are returned as unchanged without
+    downloading anything.
 
     Args:
         s3_client: Boto3 S3 client
         project_data: Project data
-        db_path: Path to the database file
+        previous_state: Crawl state recorded for the project on a previous run
+        changed_only: Skip projects whose manifest has not changed
+        since: Skip projects whose manifest was last modified before this datetime
 
     Returns:
-        Dict[str, int]: Statistics about the processing
+        Dict[str, Any]: Project data, file records, crawl state and the number of invalid sources
     """
-    try:
-        project_name = project_data['name']
-        logger.info(f"Processing project: {project_name}")
-
-        # Extract EPT metadata
-        project_metadata = extract_ept_metadata(s3_client, project_name)
+    project_name = project_data['name']
+    logger.info(f"Fetching project: {project_name}")
+
+    unchanged = {
+        'project_data': project_data,
+        'files_data': [],
+        'errors': 0,
+        'unchanged': True
+    }
+
+    if changed_only or since:
+        head = head_project_manifest(s3_client, project_name)
+        if head:
+            last_modified = head.get('manifest_last_modified')
+            if since and last_modified and datetime.fromisoformat(last_modified) < since:
+                logger.info(f"Skipping project {project_name}: manifest not modified since {since.date()}")
+                return unchanged
+
+            if (changed_only and previous_state and head.get('manifest_etag')
+                    and head['manifest_etag'] == previous_state.get('manifest_etag')):
+                logger.info(f"Skipping unchanged project {project_name} (ETag {head['manifest_etag']})")
+                return unchanged
+
+    # Extract EPT metadata
+    project_metadata = extract_ept_metadata(s3_client, project_name)
+
+    crawl_state = {
+        'ept_etag': project_metadata.get('ept_etag'),
+        'manifest_etag': project_metadata.get('manifest_etag'),
+        'manifest_last_modified': project_metadata.get('manifest_last_modified'),
+        'manifest_hash': project_metadata.get('manifest_hash')
+    }
+
+    # The ETag can change without the content changing (e.g. a re-upload)
+    if (changed_only and previous_state and crawl_state['manifest_hash']
+            and crawl_state['manifest_hash'] == previous_state.get('manifest_hash')):
+        logger.info(f"Skipping project {project_name}: manifest content unchanged")
+        unchanged['crawl_state'] = crawl_state
+        return unchanged
+
+    files_data = []
+    errors = 0
+
+    # Check if we have manifest data
+    manifest_complete = 'manifest' in project_metadata and isinstance(project_metadata['manifest'], list)
+    if manifest_complete:
+        manifest_data = project_metadata['manifest']
+        logger.info(f"Found {len(manifest_data)} files in manifest for project {project_name}")
+
+        # Convert sources to file data, skipping invalid entries
+        for source in manifest_data:
+            file_data = build_source_file_data(source, project_metadata, project_data)
+            if file_data:
+                files_data.append(file_data)
+            else:
+                errors += 1
+    else:
+        logger.warning(f"No manifest data found for project {project_name}")
+
+    return {
+        'project_data': project_data,
+        'files_data': files_data,
+        'errors': errors,
+        'crawl_state': crawl_state,
+        # Only a manifest that was actually read may remove indexed files
+        'manifest_complete': manifest_complete
+    }
+
+def write_project(fetched, db_path, changed_only=False):
+    """
+    Write a fetched project and its files to the database.
 
-        # Add project to database
-        project_id = add_project(project_data, db_path)
+    Args:
+        fetched: Result of fetch_project
+        db_path: Path to the database file
+        changed_only: Only write files whose manifest entry changed since the last crawl
 
-        # Initialize stats
-        stats = {
+    Returns:
+        Dict[str, int]: Statistics about the processing
+    """
+    project_data = fetched['project_data']
+    files_data = fetched['files_data']
+    crawl_state = fetched.get('crawl_state')
+
+    if fetched.get('unchanged'):
+        # Refresh the recorded state (e.g. a new ETag for identical content)
+        if crawl_state:
+            update_project_crawl_state(project_data['name'], crawl_state, db_path)
+        return {
             'files_added': 0,
             'files_updated': 0,
-            'errors': 0
+            'files_deleted': 0,
+            'errors': 0,
+            'unchanged': True
         }
 
-        # Check if we have manifest data
-        if 'manifest' in project_metadata and isinstance(project_metadata['manifest'], list):
-            manifest_data = project_metadata['manifest']
-            logger.info(f"Processing {len(manifest_data)} files from manifest for project {project_name}")
-
-            # Process files in batches
-            for i in range(0, len(manifest_data), BATCH_SIZE):
-                batch = manifest_data[i:i+BATCH_SIZE]
-                logger.info(f"Processing batch {i//BATCH_SIZE + 1}/{(len(manifest_data) + BATCH_SIZE - 1)//BATCH_SIZE} ({len(batch)} files)")
-
-                # Process each file in the batch
-                with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                    # Submit tasks
-                    future_to_source = {
-                        executor.submit(process_source_file, source, project_id, project_metadata, project_data, db_path): source
-                        for source in batch
-                    }
-
-                    # Process results as they complete
-                    for future in as_completed(future_to_source):
-                        source = future_to_source[future]
-                        try:
-                            file_id = future.result()
-                            if file_id > 0:
-                                stats['files_added'] += 1
-                            else:
-                                stats['files_updated'] += 1
-                        except Exception as e:
-                            logger.error(f"Error processing file: {str(e)}", exc_info=True)
-                            stats['errors'] += 1
+    # Add project to database
+    project_id = add_project(project_data, db_path)
+
+    # Initialize stats
+    stats = {
+        'files_added': 0,
+        'files_updated': 0,
+        'files_deleted': 0,
+        'errors': fetched.get('errors', 0)
+    }
+
+    # Remove files that are no longer in the project's manifest; an empty
+    # manifest or one with invalid entries is not trusted to do so
+    if fetched.get('manifest_complete'):
+        if files_data and not stats['errors']:
+            stats['files_deleted'] = delete_stale_files(
+                project_id, [file_data['key'] for file_data in files_data], db_path)
         else:
-            logger.warning(f"No manifest data found for project {project_name}")
+            logger.warning(f"Not removing stale files of project {project_data['name']}: manifest has "
+                           f"{len(files_data)} valid and {stats['errors']} invalid entries")
+
+    # Only re-process files whose manifest entry is new or different
+    if changed_only:
+        file_states = get_file_states(project_id, db_path)
+        total_files = len(files_data)
+        files_data = [
+            file_data for file_data in files_data
+            if file_states.get(file_data['key'], {}).get('source_hash') != file_data.get('source_hash')
+        ]
+        logger.info(f"{len(files_data)} of {total_files} files changed in project {project_data['name']}")
+
+    # Write files in large batches, one transaction per batch
+    for i in range(0, len(files_data), BATCH_SIZE):
+        batch = files_data[i:i+BATCH_SIZE]
+        logger.info(f"Writing batch {i//BATCH_SIZE + 1}/{(len(files_data) + BATCH_SIZE - 1)//BATCH_SIZE} ({len(batch)} files)")
+
+        batch_stats = add_files_bulk(batch, project_id, db_path)
+        stats['files_added'] += batch_stats['files_added']
+        stats['files_updated'] += batch_stats['files_updated']
+        stats['errors'] += batch_stats['errors']
+
+    # Record change-detection state once all files are written
+    if crawl_state:
+        update_project_crawl_state(project_data['name'], crawl_state, db_path)
+
+    logger.info(f"Processed project {project_data['name']}: {stats}")
+    return stats
+
+def process_project(s3_client, project_data, db_path, previous_state=None, changed_only=False, since=None):
+    """
+    Process a project and add it to the database.
 
-        logger.info(f"Processed project {project_name}: {stats}")
-        return stats
+    Args:
+        s3_client: Boto3 S3 client
+        project_data: Project data
+        db_path: Path to the database file
+        previous_state: Crawl state recorded for the project on a previous run
+        changed_only: Skip unchanged projects and files
+        since: Skip projects whose manifest was last modified before this datetime
+
+    Returns:
+        Dict[str, int]: Statistics about the processing
+    """
+    try:
+        logger.info(f"Processing project: {project_data['name']}")
+        fetched = fetch_project(s3_client, project_data, previous_state, changed_only, since)
+        return write_project(fetched, db_path, changed_only)
 
     except Exception as e:
         logger.error(f"Error processing project {project_data['name']}: {str(e)}", exc_info=True)
@@ -429,72 +605,164 @@ def process_project(s3_client, project_data, db_path):
             'errors': 1
         }
 
-def index_projects(s3_client, projects, db_path=DEFAULT_DB_PATH):
+def _fetch_project_into_queue(s3_client, project_data, result_queue, previous_state=None,
+                              changed_only=False, since=None):
+    """
+    Worker task: fetch a project and hand the result to the writer thread.
+
+    Args:
+        s3_client: Boto3 S3 client
+        project_data: Project data
+        result_queue: Queue drained by the writer thread
+        previous_state: Crawl state recorded for the project on a previous run
+        changed_only: Skip unchanged projects
+        since: Skip projects whose manifest was last modified before this datetime
+    """
+    try:
+        fetched = fetch_project(s3_client, project_data, previous_state, changed_only, since)
+    except Exception as e:
+        logger.error(f"Error fetching project {project_data['name']}: {str(e)}", exc_info=True)
+        fetched = {'project_data': project_data, 'error': str(e)}
+
+    # Blocks while the writer is behind, which bounds memory use
+    result_queue.put(fetched)
+
+def index_projects(s3_client, projects, db_path=DEFAULT_DB_PATH, workers=1, changed_only=False, since=None):
     """
     Index all projects.
 
+    With more than one worker, EPT metadata for several projects is fetched
+    concurrently while a single writer thread stores the results, so SQLite
+    writes stay serialized.
+
     Args:
         s3_client: Boto3 S3 client
         projects: List of projects to index
         db_path: Path to the database file
+        workers: Number of projects to fetch concurrently
+        changed_only: Skip projects and files that have not changed since the last crawl
+        since: Skip projects whose manifest was last modified before this datetime
 
     Returns:
         Dict[str, int]: Statistics about the indexing process
     """
-    try:
-        # Start crawl
-        crawl_id = start_crawl(db_path)
-
-        # Initialize stats
-        stats = {
-            'projects_added': 0,
-            'projects_updated': 0,
-            'files_added': 0,
-            'files_updated': 0,
-            'errors': 0
-        }
+    crawl_id = None
+
+    # Initialize stats
+    stats = {
+        'projects_added': 0,
+        'projects_updated': 0,
+        'files_added': 0,
+        'files_updated': 0,
+        'files_deleted': 0,
+        'projects_unchanged': 0,
+        'errors': 0
+    }
+
+    # Change-detection state from previous crawls
+    previous_states = get_project_crawl_states(db_path) if changed_only else {}
+
+    # Initialize progress tracking
+    total_projects = len(projects)
+    start_time = time.time()
+    progress = {'completed': 0, 'last_report': start_time}
+
+    def record_project(project_stats):
+        """Add one project's stats to the totals and report progress periodically."""
+        # Update stats
+        if project_stats.get('unchanged'):
+            stats['projects_unchanged'] += 1
+        elif project_stats.get('files_added', 0) > 0:
+            stats['projects_added'] += 1
+        else:
+            stats['projects_updated'] += 1
 
-        # Initialize progress tracking
-        total_projects = len(projects)
-        start_time = time.time()
-        last_progress_time = start_time
+        stats['files_added'] += project_stats.get('files_added', 0)
+        stats['files_updated'] += project_stats.get('files_updated', 0)
+        stats['files_deleted'] += project_stats.get('files_deleted', 0)
+        stats['errors'] += project_stats.get('errors', 0)
 
-        # Process each project
-        for i, project_data in enumerate(projects):
-            try:
-                # Process the project
-                project_stats = process_project(s3_client, project_data, db_path)
+        progress['completed'] += 1
 
-                # Update stats
-                if project_stats.get('files_added', 0) > 0:
-                    stats['projects_added'] += 1
-                else:
-                    stats['projects_updated'] += 1
+        # Update progress
+        current_time = time.time()
+        if current_time - progress['last_report'] >= PROGRESS_INTERVAL:
+            elapsed_time = current_time - start_time
+            fraction = progress['completed'] / total_projects
+            estimated_total_time = elapsed_time / fraction if fraction > 0 else 0
+            estimated_remaining_time = estimated_total_time - elapsed_time
 
-                stats['files_added'] += project_stats.get('files_added', 0)
-                stats['files_updated'] += project_stats.get('files_updated', 0)
-                stats['errors'] += project_stats.get('errors', 0)
+            logger.info(f"Progress: {progress['completed']}/{total_projects} projects ({fraction:.1%})")
+            logger.info(f"Elapsed time: {elapsed_time:.1f}s, Estimated remaining time: {estimated_remaining_time:.1f}s")
+            logger.info(f"Stats so far: {stats}")
 
-                # Update progress
-                current_time = time.time()
-                if current_time - last_progress_time >= PROGRESS_INTERVAL:
-                    elapsed_time = current_time - start_time
-                    progress = (i + 1) / total_projects
-                    estimated_total_time = elapsed_time / progress if progress > 0 else 0
-                    estimated_remaining_time = estimated_total_time - elapsed_time
+            progress['last_report'] = current_time
 
-                    logger.info(f"Progress: {i+1}/{total_projects} projects ({progress:.1%})")
-                    logger.info(f"Elapsed time: {elapsed_time:.1f}s, Estimated remaining time: {estimated_remaining_time:.1f}s")
-                    logger.info(f"Stats so far: {stats}")
+            # Update crawl status (a failed progress update must not stop the crawl)
+            try:
+                update_crawl(crawl_id, 'in_progress', stats, None, db_path)
+            except Exception as e:
+                logger.warning(f"Error updating crawl progress: {str(e)}")
 
-                    # Update crawl status
-                    update_crawl(crawl_id, 'in_progress', stats, None, db_path)
+    try:
+        # Start crawl
+        crawl_id = start_crawl(db_path)
 
-                    last_progress_time = current_time
+        if workers <= 1:
+            # Process each project
+            for project_data in projects:
+                record_project(process_project(s3_client, project_data, db_path,
+                                               previous_states.get(project_data['name']),
+                                               changed_only, since))
+        else:
+            logger.info(f"Fetching projects with {workers} workers")
+            result_queue = queue.Queue(maxsize=workers * 2)
+
+            def writer():
+                """
+                Drain fetched projects into the database until the sentinel arrives.
+
+                Every error is caught, so the writer keeps draining the queue and
+                workers blocked on a full queue can always finish.
+                """
+                while True:
+                    fetched = result_queue.get()
+                    if fetched is None:
+                        # The writer's pooled connection is not reused by any other thread
+                        close_thread_connections()
+                        return
+
+                    try:
+                        if 'error' in fetched:
+                            project_stats = {'files_added': 0, 'files_updated': 0, 'errors': 1}
+                        else:
+                            try:
+                                project_stats = write_project(fetched, db_path, changed_only)
+                            except Exception as e:
+                                logger.error(f"Error writing project {fetched['project_data']['name']}: {str(e)}", exc_info=True)
+                                project_stats = {'files_added': 0, 'files_updated': 0, 'errors': 1}
+
+                        record_project(project_stats)
+                    except Exception as e:
+                        logger.error(f"Error recording project {fetched['project_data']['name']}: {str(e)}", exc_info=True)
+                        stats['errors'] += 1
+
+            writer_thread = threading.Thread(target=writer, name='lidar-index-writer', daemon=True)
+            writer_thread.start()
 
-            except Exception as e:
-                logger.error(f"Error processing project {project_data['name']}: {str(e)}", exc_info=True)
-                stats['errors'] += 1
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [
+                        executor.submit(_fetch_project_into_queue, s3_client, project_data, result_queue,
+                                        previous_states.get(project_data['name']), changed_only, since)
+                        for project_data in projects
+                    ]
+                    for future in as_completed(futures):
+                        future.result()
+            finally:
+                # Let the writer finish everything already fetched
+                result_queue.put(None)
+                writer_thread.join()
 
         # Update crawl status
         update_crawl(crawl_id, 'completed', stats, None, db_path)
@@ -508,6 +776,21 @@ def index_projects(s3_client, projects, db_path=DEFAULT_DB_PATH):
             update_crawl(crawl_id, 'failed', stats, str(e), db_path)
         return {'error': str(e)}
 
+def parse_since_date(value):
+    """
+    Parse a --since date argument.
+
+    Args:
+        value: Date in YYYY-MM-DD format
+
+    Returns:
+        datetime: Midnight UTC on that date
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
 def main():
     """
     Main function.
@@ -518,6 +801,11 @@ def main():
         parser.add_argument('--region', type=str, default='all', help='Region to index (e.g., CO for Colorado, all for all regions)')
         parser.add_argument('--limit', type=int, help='Limit the number of projects to index (for testing)')
         parser.add_argument('--db-path', type=str, default=DEFAULT_DB_PATH, help='Path to the database file')
+        parser.add_argument('--workers', type=int, default=1, help='Number of projects to fetch concurrently')
+        parser.add_argument('--changed-only', action='store_true',
+                            help='Skip projects and files whose ETag/manifest hash is unchanged since the last crawl')
+        parser.add_argument('--since', type=parse_since_date,
+                            help='Only index projects whose manifest was modified on or after this date (YYYY-MM-DD)')
         args = parser.parse_args()
 
         # Set AWS credentials
@@ -545,11 +833,12 @@ def main():
             logger.info(f"  Projects: {initial_stats['project_count']}")
             logger.info(f"  Files: {initial_stats['file_count']}")
 
-            # Ask for confirmation to continue
-            response = input("Do you want to continue indexing and add to the existing database? (y/n): ")
-            if response.lower() != 'y':
-                logger.info("Indexing cancelled by user")
-                return 0
+            # Ask for confirmation to continue (incremental runs are meant to be unattended)
+            if not (args.changed_only or args.since):
+                response = input("Do you want to continue indexing and add to the existing database? (y/n): ")
+                if response.lower() != 'y':
+                    logger.info("Indexing cancelled by user")
+                    return 0
         else:
             logger.info(f"Initializing database at {db_path}")
             init_database(db_path)
@@ -571,7 +860,7 @@ def main():
         logger.info(f"Starting indexing of {len(projects)} projects")
         start_time = datetime.now()
 
-        stats = index_projects(s3_client, projects, db_path)
+        stats = index_projects(s3_client, projects, db_path, args.workers, args.changed_only, args.since)
 
         end_time = datetime.now()
         duration = end_time - start_time
@@ -11,13 +11,22 @@ import logging
 import json
 import tempfile
 import zipfile
+from functools import lru_cache
 from urllib.request import urlretrieve
+import numpy as np
 import geopandas as gpd
+import shapely
+from shapely import wkb, wkt
 from shapely.geometry import Point, shape
-import pandas as pd
+from shapely.prepared import prep
+from shapely.strtree import STRtree
 
 logger = logging.getLogger(__name__)
 
+# Coordinates are rounded to this many decimals (~11 m) for the lookup cache
+LOOKUP_PRECISION = 4
+LOOKUP_CACHE_SIZE = 4096
+
 # Define regions for US states
 STATE_REGIONS = {
     'AL': 'Southeast', 'AK': 'West', 'AZ': 'Southwest', 'AR': 'Southeast',
@@ -47,8 +56,11 @@ class StateBoundaries:
         self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'data')
         self.geojson_path = os.path.join(self.data_dir, 'us_states.geojson')
         self.simplified_path = os.path.join(self.data_dir, 'us_states_simplified.json')
+        self.index_path = os.path.join(self.data_dir, 'us_states_index.json')
         self.states_gdf = None
         self.simplified_states = None
+        self.state_index = None
+        self._cached_lookup = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._lookup_rounded)
         
         # Create data directory if it doesn't exist
         if not os.path.exists(self.data_dir):
@@ -142,7 +154,7 @@ class StateBoundaries:
             for idx, row in self.states_gdf.iterrows():
                 # Simplify the geometry to reduce file size
                 # The tolerance parameter controls the level of simplification
-                simple_geom = row.geometry.simplify(0.01).to_wkt()
+                simple_geom = row.geometry.simplify(0.01).wkt
                 
                 state_data = {
                     'state_code': row['STUSPS'],
@@ -158,18 +170,211 @@ class StateBoundaries:
                 
             logger.info(f"Created simplified state boundaries at {self.simplified_path}")
             
-            # Load the simplified data
+            # Load the simplified data and drop any index built from older boundaries
             self.simplified_states = simplified
+            self.state_index = None
             
             return True
             
         except Exception as e:
             logger.error(f"Error creating simplified boundaries: {e}", exc_info=True)
             return False
-    
+
+    def _index_source_path(self):
+        """Return the boundary file the state index is built from, if any"""
+        for path in (self.simplified_path, self.geojson_path):
+            if os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def _source_signature(source_path):
+        """Name, size and modification time identifying the boundary file an index was built from"""
+        stat = os.stat(source_path)
+        return {'source_path': os.path.basename(source_path),
+                'source_size': stat.st_size,
+                'source_mtime': stat.st_mtime}
+
+    def _load_state_geometries(self):
+        """Load state records and simplified geometries from the loaded boundaries
+
+        Returns:
+            tuple: (list of state info dicts, list of shapely geometries)
+        """
+        records = []
+        geometries = []
+
+        if self.simplified_states:
+            for state in self.simplified_states:
+                try:
+                    # Simplified geometries are stored as WKT, older files as GeoJSON mappings
+                    geometry = state['geometry']
+                    geometries.append(wkt.loads(geometry) if isinstance(geometry, str) else shape(geometry))
+                    records.append({
+                        'state_code': state['state_code'],
+                        'state_name': state['state_name'],
+                        'region': state['region']
+                    })
+                except Exception as e:
+                    logger.error(f"Error loading geometry for state {state.get('state_code')}: {e}")
+        elif self.states_gdf is not None:
+            for idx, row in self.states_gdf.iterrows():
+                geometries.append(row.geometry.simplify(0.01))
+                records.append({
+                    'state_code': row['STUSPS'],
+                    'state_name': row['NAME'],
+                    'region': STATE_REGIONS.get(row['STUSPS'], 'Unknown')
+                })
+
+        return records, geometries
+
+    def _set_state_index(self, records, geometries):
+        """Build the in-memory STRtree and prepared geometries for the given states"""
+        self.state_index = {
+            'records': records,
+            'geometries': geometries,
+            'prepared': [prep(geometry) for geometry in geometries],
+            'tree': STRtree(geometries),
+            'lookup': {key.upper(): idx for idx, record in enumerate(records)
+                       for key in (record['state_code'], record['state_name'])}
+        }
+        if hasattr(shapely, 'prepare'):
+            shapely.prepare(geometries)
+        self._cached_lookup.cache_clear()
+
+    def build_state_index(self):
+        """Build the state index from the loaded boundaries and cache it to disk
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        records, geometries = self._load_state_geometries()
+        if not geometries:
+            logger.warning("No state boundaries loaded, cannot build state index")
+            return False
+
+        self._set_state_index(records, geometries)
+
+        source_path = self._index_source_path()
+        if source_path:
+            try:
+                # Plain JSON with hex WKB geometries; nothing executable is ever loaded back
+                temp_path = f"{self.index_path}.tmp"
+                with open(temp_path, 'w') as f:
+                    json.dump(dict(self._source_signature(source_path),
+                                   records=records,
+                                   geometries=[wkb.dumps(geometry, hex=True) for geometry in geometries]), f)
+                os.replace(temp_path, self.index_path)
+                logger.info(f"Saved state index to {self.index_path}")
+            except Exception as e:
+                logger.warning(f"Could not save state index: {e}")
+
+        return True
+
+    def load_state_index(self):
+        """Load the state index from the disk cache, rebuilding it if missing or stale
+
+        Returns:
+            bool: True if the index is available, False otherwise
+        """
+        if self.state_index is not None:
+            return True
+
+        source_path = self._index_source_path()
+        if source_path and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    cached = json.load(f)
+
+                # Geometries are only parsed when the index matches the current boundary file
+                signature = self._source_signature(source_path)
+                if all(cached.get(key) == value for key, value in signature.items()):
+                    self._set_state_index(cached['records'], [wkb.loads(g, hex=True) for g in cached['geometries']])
+                    logger.info(f"Loaded state index from {self.index_path}")
+                    return True
+            except Exception as e:
+                logger.warning(f"Error loading state index, rebuilding: {e}")
+
+        return self.build_state_index()
+
+    def _query_state_candidates(self, geometry):
+        """Return indices of states whose bounding boxes intersect the geometry"""
+        if hasattr(shapely, 'box'):
+            # Shapely 2: STRtree.query returns indices
+            return self.state_index['tree'].query(geometry)
+        # Shapely 1.x: fall back to checking every prepared state
+        return range(len(self.state_index['geometries']))
+
+    def find_state(self, lat, lon, nearest=True):
+        """Find the state containing a point using the prepared state index
+
+        Args:
+            lat (float): Latitude
+            lon (float): Longitude
+            nearest (bool, optional): Return the closest state if no state contains
+                the point. Defaults to True.
+
+        Returns:
+            dict: State information or None if not found
+        """
+        if not self.load_state_index():
+            return None
+
+        index = self.state_index
+        point = Point(lon, lat)
+
+        for idx in sorted(self._query_state_candidates(point)):
+            if index['prepared'][idx].intersects(point):
+                return dict(index['records'][idx])
+
+        if nearest and hasattr(index['tree'], 'query_nearest'):
+            nearest_idx = index['tree'].query_nearest(point)
+            if len(nearest_idx):
+                return dict(index['records'][int(nearest_idx[0])])
+
+        return None
+
+    def get_state_geometry(self, state):
+        """Get the simplified geometry for a state
+
+        Args:
+            state (str): State code (e.g. 'CO') or name (e.g. 'Colorado')
+
+        Returns:
+            shapely geometry or None if not found
+        """
+        if not isinstance(state, str) or not self.load_state_index():
+            return None
+
+        idx = self.state_index['lookup'].get(state.upper())
+        return self.state_index['geometries'][idx] if idx is not None else None
+
+    def get_state_bounds(self, state):
+        """Get the bounding box of a state
+
+        Args:
+            state (str): State code (e.g. 'CO') or name (e.g. 'Colorado')
+
+        Returns:
+            dict: min_lat, max_lat, min_lon and max_lon, or None if not found
+        """
+        geometry = self.get_state_geometry(state)
+        if geometry is None:
+            return None
+
+        min_lon, min_lat, max_lon, max_lat = geometry.bounds
+        return {'min_lat': min_lat, 'max_lat': max_lat, 'min_lon': min_lon, 'max_lon': max_lon}
+
+    def _lookup_rounded(self, lat, lon):
+        """Uncached state lookup for already rounded coordinates"""
+        return self.find_state(lat, lon)
+
     def determine_state_from_coordinates(self, lat, lon):
         """Determine which state a point falls within
         
+        Lookups go through the prepared state index and are cached on
+        coordinates rounded to LOOKUP_PRECISION decimals.
+        
         Args:
             lat (float): Latitude
             lon (float): Longitude
@@ -177,46 +382,53 @@ class StateBoundaries:
         Returns:
             dict: State information or None if not found
         """
-        # Create a Point object from coordinates
-        point = Point(lon, lat)  # Note: Point takes (x, y) which is (lon, lat)
-        
-        # First try using the simplified boundaries (faster)
-        if self.simplified_states is not None and len(self.simplified_states) > 0:
-            for state in self.simplified_states:
-                try:
-                    # Convert WKT string back to geometry
-                    state_geom = shape(state['geometry'])
-                    
-                    if state_geom.contains(point):
-                        return {
-                            'state_code': state['state_code'],
-                            'state_name': state['state_name'],
-                            'region': state['region']
-                        }
-                except Exception as e:
-                    logger.error(f"Error checking point in state: {e}")
-                    continue
-        
-        # If simplified boundaries didn't work, try using GeoPandas
-        if self.states_gdf is not None:
-            try:
-                # Use GeoPandas spatial join to find which polygon contains the point
-                point_gdf = gpd.GeoDataFrame([1], geometry=[point], crs=self.states_gdf.crs)
-                joined = gpd.sjoin(point_gdf, self.states_gdf, how='left', predicate='within')
-                
-                if joined.shape[0] > 0 and pd.notna(joined.iloc[0].get('STUSPS')):
-                    state_code = joined.iloc[0]['STUSPS']
-                    state_name = joined.iloc[0]['NAME']
-                    return {
-                        'state_code': state_code,
-                        'state_name': state_name,
-                        'region': STATE_REGIONS.get(state_code, 'Unknown')
-                    }
-            except Exception as e:
-                logger.error(f"Error using GeoPandas for state lookup: {e}")
+        state = self._cached_lookup(round(float(lat), LOOKUP_PRECISION), round(float(lon), LOOKUP_PRECISION))
+        return dict(state) if state else None
+
+    def determine_states(self, lats, lons, nearest=True):
+        """Determine the states for many points in one vectorized call
         
-        # If we still don't have a result, try finding the closest state
-        return self.find_closest_state(lat, lon)
+        Args:
+            lats (array-like): Latitudes
+            lons (array-like): Longitudes
+            nearest (bool, optional): Use the closest state for points outside
+                every state. Defaults to True.
+            
+        Returns:
+            list: State information dict (or None) for each point
+        """
+        lats = np.asarray(lats, dtype=float).ravel()
+        lons = np.asarray(lons, dtype=float).ravel()
+        if lats.shape != lons.shape:
+            raise ValueError("lats and lons must have the same length")
+
+        if not self.load_state_index():
+            return [None] * len(lats)
+
+        if not hasattr(shapely, 'points'):
+            # Shapely 1.x: no vectorized predicates, use the cached point lookup
+            return [self.determine_state_from_coordinates(lat, lon) for lat, lon in zip(lats, lons)]
+
+        index = self.state_index
+        geometries = np.asarray(index['geometries'], dtype=object)
+        points = shapely.points(lons, lats)
+        state_idx = np.full(len(points), -1, dtype=np.int64)
+
+        # Bounding-box candidates from the STRtree, then exact checks on prepared geometries
+        point_idx, candidate_idx = index['tree'].query(points)
+        hits = shapely.intersects(geometries[candidate_idx], points[point_idx])
+        order = np.lexsort((candidate_idx[hits], point_idx[hits]))
+        matched_points, first = np.unique(point_idx[hits][order], return_index=True)
+        state_idx[matched_points] = candidate_idx[hits][order][first]
+
+        unmatched = np.flatnonzero(state_idx < 0)
+        if nearest and len(unmatched):
+            nearest_points, nearest_states = index['tree'].query_nearest(points[unmatched])
+            # Ties return several states per point; keep the first like find_state
+            nearest_points, first = np.unique(nearest_points, return_index=True)
+            state_idx[unmatched[nearest_points]] = nearest_states[first]
+
+        return [dict(index['records'][idx]) if idx >= 0 else None for idx in state_idx]
     
     def find_closest_state(self, lat, lon):
         """Find the closest state to the given coordinates
@@ -295,6 +507,13 @@ class StateBoundaries:
 # Create a singleton instance
 state_boundaries = StateBoundaries()
 
+def _ensure_boundaries():
+    """Download state boundaries if none are available locally"""
+    if (state_boundaries.simplified_states is None or len(state_boundaries.simplified_states) == 0) and \
+       (state_boundaries.states_gdf is None or state_boundaries.states_gdf.empty):
+        # Try to download boundaries if not available
+        state_boundaries.download_state_boundaries()
+
 def get_state_from_coordinates(lat, lon):
     """Determine which state a point falls within
     
@@ -306,13 +525,50 @@ def get_state_from_coordinates(lat, lon):
         dict: State information or None if not found
     """
     # Make sure boundaries are loaded
-    if (state_boundaries.simplified_states is None or len(state_boundaries.simplified_states) == 0) and \
-       (state_boundaries.states_gdf is None or state_boundaries.states_gdf.empty):
-        # Try to download boundaries if not available
-        state_boundaries.download_state_boundaries()
+    _ensure_boundaries()
     
     return state_boundaries.determine_state_from_coordinates(lat, lon)
 
+def determine_states(lats, lons, nearest=True):
+    """Determine the states for many points in one vectorized call
+    
+    Args:
+        lats (array-like): Latitudes
+        lons (array-like): Longitudes
+        nearest (bool, optional): Use the closest state for points outside every state
+        
+    Returns:
+        list: State information dict (or None) for each point
+    """
+    _ensure_boundaries()
+    return state_boundaries.determine_states(lats, lons, nearest)
+
+def find_state(lat, lon, nearest=True):
+    """Find the state containing a point using the indexed state boundaries
+    
+    Args:
+        lat (float): Latitude
+        lon (float): Longitude
+        nearest (bool, optional): Return the closest state if no state contains the point
+        
+    Returns:
+        dict: State information or None if not found
+    """
+    _ensure_boundaries()
+    return state_boundaries.find_state(lat, lon, nearest)
+
+def get_state_bounds(state):
+    """Get the bounding box of a state
+    
+    Args:
+        state (str): State code (e.g. 'CO') or name (e.g. 'Colorado')
+        
+    Returns:
+        dict: min_lat, max_lat, min_lon and max_lon, or None if not found
+    """
+    _ensure_boundaries()
+    return state_boundaries.get_state_bounds(state)
+
 # Example usage
 if __name__ == "__main__":
     # Test with New York City coordinates
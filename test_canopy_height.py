@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test: Local Canopy Height Backends
+
+Checks that canopy height rasters are sampled per profile sample across
+several tiles (with the open-tile LRU cache bounded), and that uncovered
+samples come back as NaN for the next source.
+
+Run with pytest or directly: python test_canopy_height.py
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from utilities.canopy_height import RasterCanopyBackend
+
+def write_canopy_tile(path, west, north, pixel_deg, size):
+    """Canopy height rising 1 m per 0.001 degree of longitude"""
+    transform = from_origin(west, north, pixel_deg, pixel_deg)
+    cols, rows = np.meshgrid(np.arange(size), np.arange(size))
+    lons, _ = transform * (cols + 0.5, rows + 0.5)
+    heights = (np.asarray(lons) - west) * 1000
+    with rasterio.open(path, 'w', driver='GTiff', width=size, height=size, count=1, dtype='float32',
+                       crs='EPSG:4326', transform=transform, nodata=-1) as dst:
+        dst.write(heights.astype('float32'), 1)
+
+def test_per_sample_heights_across_tiles():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Four 0.01 degree tiles side by side along the path
+        for i in range(4):
+            write_canopy_tile(os.path.join(temp_dir, f'chm_{i}.tif'), -100.0 + i * 0.01, 40.01, 0.0001, 100)
+        backend = RasterCanopyBackend(canopy_dir=temp_dir, max_open_tiles=2)
+        assert len(backend.tiles) == 4
+
+        start, end = (40.005, -99.9995), (40.005, -99.9605)
+        distances = np.linspace(0, 4000, 500)
+        lats = np.full(500, 40.005)
+        lons = np.linspace(start[1], end[1], 500)
+        heights = backend.get_heights(start, end, distances, lats, lons)
+
+        assert not np.isnan(heights).any()
+        expected = ((lons + 100.0) % 0.01) * 1000
+        inside = np.abs(((lons + 100.0) / 0.01) - np.round((lons + 100.0) / 0.01)) > 0.02
+        assert np.allclose(heights[inside], expected[inside], atol=0.06)
+        assert np.ptp(heights) > 5  # varies along the path instead of a flat average
+        assert len(backend._open_tiles) <= 2
+
+        outside = backend.get_heights(start, end, [0.0], np.array([41.0]), np.array([-99.5]))
+        assert np.isnan(outside[0])
+        backend.close()
+
+if __name__ == "__main__":
+    test_per_sample_heights_across_tiles()
+    print("✅ test_per_sample_heights_across_tiles")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test: Direct LIDAR Downloader
+
+Uses moto's in-memory S3 to download the files listed in a
+tower_parameters.json and checks that each finished file is journaled as it
+completes, that the local paths reach tower_parameters.json from the
+journal, and that paths journaled by an interrupted run are applied by the
+next one.
+
+Run with pytest or directly: python test_direct_lidar_downloader.py
+"""
+
+import os
+import json
+import tempfile
+
+import boto3
+from moto import mock_aws
+
+from utilities.download_service import DownloadJournal
+
+# The downloader logs to a file in the working directory when imported
+_cwd = os.getcwd()
+os.chdir(tempfile.gettempdir())
+try:
+    import direct_lidar_downloader
+finally:
+    os.chdir(_cwd)
+
+BUCKET = 'usgs-lidar'
+
+def write_tower_parameters(path, names):
+    files = [{'filename': name, 'download_url': f's3://{BUCKET}/CO_Test_2020/laz/{name}'} for name in names]
+    with open(path, 'w') as f:
+        json.dump({'site_A': {}, 'lidar_data': {'CO_Test_2020': {'files': files}}}, f)
+
+def local_paths(path):
+    with open(path) as f:
+        files = json.load(f)['lidar_data']['CO_Test_2020']['files']
+    return {file_data['filename']: file_data.get('local_file_path') for file_data in files}
+
+@mock_aws
+def test_downloads_are_journaled_and_applied():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+    names = [f'tile_{i}.laz' for i in range(5)]
+    for i, name in enumerate(names):
+        client.put_object(Bucket=BUCKET, Key=f'CO_Test_2020/laz/{name}', Body=os.urandom(1000 + i))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        params_path = os.path.join(temp_dir, 'tower_parameters.json')
+        output_dir = os.path.join(temp_dir, 'lidar_data')
+        write_tower_parameters(params_path, names)
+
+        # An earlier run was interrupted after journaling tile_0
+        journal = DownloadJournal(os.path.join(output_dir, 'download_journal.jsonl'))
+        earlier_path = os.path.join(output_dir, 'CO_Test_2020', 'tile_0.laz')
+        os.makedirs(os.path.dirname(earlier_path))
+        with open(earlier_path, 'wb') as f:
+            f.write(b'x' * 1000)
+        journal.append({'url': f's3://{BUCKET}/CO_Test_2020/laz/tile_0.laz', 'filename': 'tile_0.laz',
+                        'path': earlier_path, 'status': 'complete', 'size': 1000})
+
+        stats = direct_lidar_downloader.download_all_lidar_files(params_path, output_dir, max_workers=3)
+        assert stats == {'total': 5, 'completed': 5, 'failed': 0, 'skipped': 0}
+
+        expected = {name: os.path.join(output_dir, 'CO_Test_2020', name) for name in names}
+        assert local_paths(params_path) == expected
+        records = journal.load()
+        assert len(records) == 5 and all(record['status'] == 'complete' for record in records.values())
+        assert records[f's3://{BUCKET}/CO_Test_2020/laz/tile_3.laz']['size'] == 1003
+
+if __name__ == "__main__":
+    test_downloads_are_journaled_and_applied()
+    print("✅ test_downloads_are_journaled_and_applied")
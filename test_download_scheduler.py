@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test: Event-Driven Download Scheduler
+
+Checks that DownloadScheduler serves jobs nearest-first, respects the
+per-host concurrency limit, keeps its workers blocked (no CPU) while a
+5,000 file queue is paused, and that progress updates are coalesced.
+
+Run with pytest or directly: python test_download_scheduler.py
+"""
+
+import time
+import threading
+
+from utilities.download_scheduler import DownloadScheduler, UpdateCoalescer, tile_priority
+
+def test_priority_order_and_dedup():
+    order = []
+    scheduler = DownloadScheduler(order.append, max_workers=1)
+    scheduler.submit('http://a/far', 500.0)
+    scheduler.submit('http://a/near', 10.0)
+    scheduler.submit('http://a/unknown')
+    scheduler.submit('http://a/mid', 100.0)
+    assert not scheduler.submit('http://a/mid', 200.0)  # already queued ahead of that
+    assert scheduler.submit('http://a/far', 1.0)        # moved to the front
+    assert scheduler.cancel('http://a/unknown')
+    scheduler.start()
+    assert scheduler.wait_idle(5)
+    assert order == ['http://a/far', 'http://a/near', 'http://a/mid']
+    scheduler.shutdown(wait=True, timeout=5)
+
+def test_per_host_limit():
+    lock = threading.Lock()
+    active, peak = {}, {}
+
+    def handler(url):
+        host = url.split('/')[2]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+        time.sleep(0.01)
+        with lock:
+            active[host] -= 1
+
+    scheduler = DownloadScheduler(handler, max_workers=8, per_host_limit=2)
+    scheduler.submit_many([(f'http://host{i % 3}/file{i}', i) for i in range(60)])
+    scheduler.start()
+    assert scheduler.wait_idle(30)
+    assert peak == {'host0': 2, 'host1': 2, 'host2': 2}
+    scheduler.shutdown(wait=True, timeout=5)
+
+def test_paused_queue_is_idle_and_drains_after_resume():
+    done = []
+    scheduler = DownloadScheduler(done.append, max_workers=10)
+    scheduler.pause()
+    scheduler.submit_many((f'http://tiles/{i}.laz', i % 97) for i in range(5000))
+    scheduler.start()
+
+    cpu_start = time.process_time()
+    time.sleep(0.5)
+    assert time.process_time() - cpu_start < 0.05
+    assert not done and scheduler.queued_count == 5000
+
+    scheduler.resume()
+    assert scheduler.wait_idle(30)
+    assert len(done) == 5000
+    scheduler.shutdown(wait=True, timeout=5)
+    assert scheduler.worker_count == 0
+
+def test_coalescer_and_tile_priority():
+    coalescer = UpdateCoalescer()
+    for _ in range(1000):
+        coalescer.mark('a')
+    coalescer.mark_many(['b', 'a'])
+    assert coalescer.drain() == {'a', 'b'}
+    assert coalescer.drain() == set()
+
+    start, end = (40.0, -100.0), (40.0, -99.0)
+    on_path = {'minX': -99.51, 'maxX': -99.49, 'minY': 39.99, 'maxY': 40.01}
+    off_path = {'minX': -99.51, 'maxX': -99.49, 'minY': 40.09, 'maxY': 40.11}
+    beyond_end = {'minX': -98.91, 'maxX': -98.89, 'minY': 39.99, 'maxY': 40.01}
+    assert tile_priority(on_path, start, end) < 1
+    assert abs(tile_priority(off_path, start, end) - 11119) < 20
+    assert abs(tile_priority(beyond_end, start, end) - 8527) < 20
+    assert tile_priority(None, start, end) is None
+
+if __name__ == "__main__":
+    for test in (test_priority_order_and_dedup, test_per_host_limit,
+                 test_paused_queue_is_idle_and_drains_after_resume, test_coalescer_and_tile_priority):
+        test()
+        print(f"✅ {test.__name__}")
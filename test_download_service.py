@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test: Headless Download Service
+
+Serves tiles from a local HTTP server and checks that the headless service
+downloads add_urls_bulk style lists and tower_parameters.json projects,
+journals each finished file, skips journaled files on the next run, reports
+throughput, that the CLI runs without a display, and that journaled paths
+are recorded per project in tower_parameters.json with a backup kept.
+
+Run with pytest or directly: python test_download_service.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+from test_range_downloader import RangeServer
+from utilities.download_service import DownloadService, DownloadJournal, load_file_list, apply_journal_to_tower_parameters
+
+def make_tiles(server, count, size=300 * 1024):
+    tiles = {}
+    for i in range(count):
+        data = os.urandom(size + i)
+        tiles[f'tile_{i}.laz'] = (server.add(f'/lidar/tile_{i}.laz', data), data)
+    return tiles
+
+def test_bulk_list_journal_and_resume():
+    server = RangeServer()
+    tiles = make_tiles(server, 6)
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            list_path = os.path.join(temp_dir, 'files.json')
+            with open(list_path, 'w') as f:
+                json.dump([[url, name, {'filename': name, 'total_size': len(data), 'status': 'Queued'}]
+                           for name, (url, data) in tiles.items()], f)
+            output_dir = os.path.join(temp_dir, 'out')
+
+            reports = []
+            service = DownloadService(output_dir, max_workers=3, per_host_limit=2)
+            assert service.add_files(load_file_list(list_path)) == (6, 0, 0)
+            metrics = service.run(report_interval=0.05, report_callback=reports.append)
+
+            assert metrics['completed'] == 6 and metrics['failed'] == 0
+            assert metrics['bytes_downloaded'] == sum(len(data) for _, data in tiles.values())
+            assert metrics['average_speed'] > 0 and reports[-1] is metrics
+            for name, (_, data) in tiles.items():
+                with open(os.path.join(output_dir, name), 'rb') as f:
+                    assert f.read() == data
+
+            records = DownloadJournal(service.journal.path).load()
+            assert len(records) == 6 and all(r['status'] == 'complete' for r in records.values())
+
+            # A second run finds everything done without any requests
+            service = DownloadService(output_dir)
+            assert service.add_files(load_file_list(list_path)) == (0, 6, 0)
+            metrics = service.run(report_interval=0.05, report_callback=lambda m: None)
+            assert metrics['skipped'] == 6 and metrics['bytes_downloaded'] == 0
+    finally:
+        server.close()
+
+def test_tower_parameters_and_headless_cli():
+    server = RangeServer()
+    tiles = make_tiles(server, 3)
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            params_path = os.path.join(temp_dir, 'tower_parameters.json')
+            files = [{'filename': name, 'download_url': url, 'size_bytes': len(data), 'local_file_path': ''}
+                     for name, (url, data) in tiles.items()]
+            with open(params_path, 'w') as f:
+                json.dump({'lidar_data': {'CO_Project_2020': {'files': files}}}, f)
+
+            entries = load_file_list(params_path)
+            assert [e[2]['metadata']['project'] for e in entries] == ['CO_Project_2020'] * 3
+
+            output_dir = os.path.join(temp_dir, 'out')
+            metrics_path = os.path.join(temp_dir, 'metrics.json')
+            env = {k: v for k, v in os.environ.items() if k != 'DISPLAY'}
+            result = subprocess.run(
+                [sys.executable, 'headless_downloader.py', params_path, '--output-dir', output_dir,
+                 '--update-tower-params', params_path, '--metrics-json', metrics_path],
+                cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=120
+            )
+            assert result.returncode == 0, result.stderr
+            with open(metrics_path) as f:
+                assert json.load(f)['completed'] == 3
+
+            with open(params_path) as f:
+                saved = json.load(f)['lidar_data']['CO_Project_2020']['files']
+            assert all(entry['local_file_path'] == os.path.join(output_dir, entry['filename']) for entry in saved)
+            assert apply_journal_to_tower_parameters(os.path.join(output_dir, 'download_journal.jsonl'), params_path) == 0
+    finally:
+        server.close()
+
+def test_journal_is_applied_per_project():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        params_path = os.path.join(temp_dir, 'tower_parameters.json')
+        # Both projects have a tile of the same name
+        with open(params_path, 'w') as f:
+            json.dump({'lidar_data': {
+                'CO_A_2020': {'files': [{'filename': 'tile_0.laz'}, {'filename': 'a_only.laz'}]},
+                'CO_B_2021': {'files': [{'filename': 'tile_0.laz'}]}
+            }}, f)
+
+        journal = DownloadJournal(os.path.join(temp_dir, 'download_journal.jsonl'))
+        journal.append({'url': 'https://host/B/tile_0.laz', 'filename': 'tile_0.laz', 'project': 'CO_B_2021',
+                        'path': '/data/B/tile_0.laz', 'status': 'complete'})
+        journal.append({'url': 'https://host/A/a_only.laz', 'filename': 'a_only.laz', 'project': None,
+                        'path': '/data/A/a_only.laz', 'status': 'complete'})
+        # Without a project, an ambiguous filename is left alone
+        journal.append({'url': 'https://host/tile_0.laz', 'filename': 'tile_0.laz', 'project': None,
+                        'path': '/data/tile_0.laz', 'status': 'complete'})
+
+        assert apply_journal_to_tower_parameters(journal.path, params_path) == 2
+        with open(params_path) as f:
+            lidar_data = json.load(f)['lidar_data']
+        assert 'local_file_path' not in lidar_data['CO_A_2020']['files'][0]
+        assert lidar_data['CO_A_2020']['files'][1]['local_file_path'] == '/data/A/a_only.laz'
+        assert lidar_data['CO_B_2021']['files'][0]['local_file_path'] == '/data/B/tile_0.laz'
+
+        # The previous file was backed up before it was rewritten
+        backups = [name for name in os.listdir(temp_dir) if name.startswith('tower_parameters.json.bak.')]
+        assert len(backups) == 1
+        with open(os.path.join(temp_dir, backups[0])) as f:
+            assert 'local_file_path' not in json.dumps(json.load(f))
+
+if __name__ == "__main__":
+    for test in (test_bulk_list_journal_and_resume, test_tower_parameters_and_headless_cli,
+                 test_journal_is_applied_per_project):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test: Persistent Elevation Cache
+
+Checks that ElevationCache.get_or_fetch sends only de-duplicated cache
+misses to the provider, that a repeated request makes no fetch at all,
+that expired samples are fetched again and removed, and that eviction
+trims the cache to max_entries, least recently used first.
+
+Run with pytest or directly: python test_elevation_cache.py
+"""
+
+import os
+import time
+import tempfile
+
+import numpy as np
+
+from utilities.elevation_cache import ElevationCache
+
+def recording_fetch(calls):
+    """Provider stub returning a deterministic elevation per point"""
+    def fetch(lats, lons):
+        calls.append((np.array(lats), np.array(lons)))
+        return 1000 + (np.asarray(lats) - 40) * 1e4 + (np.asarray(lons) + 105) * 1e3
+    return fetch
+
+def test_only_unique_misses_are_fetched_and_repeats_are_free():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = ElevationCache(os.path.join(temp_dir, 'elevation_cache.db'))
+        try:
+            calls = []
+            fetch = recording_fetch(calls)
+            cache.put_many([40.001], [-105.001], [42.0])
+
+            # 40.0000004 rounds to the same 5-decimal key as 40.0; 40.001 is already cached
+            lats = np.array([40.0, 40.0000004, 40.0, 40.002, 40.001, 40.002])
+            lons = np.array([-105.0, -105.0, -105.0, -105.002, -105.001, -105.002])
+            elevations = cache.get_or_fetch(lats, lons, fetch)
+
+            assert len(calls) == 1
+            fetched = sorted(zip(calls[0][0].tolist(), calls[0][1].tolist()))
+            assert fetched == [(40.0, -105.0), (40.002, -105.002)]
+            assert elevations[4] == 42.0
+            assert elevations[0] == elevations[1] == elevations[2] and elevations[3] == elevations[5]
+            assert cache.stats()['misses'] == 5 and cache.stats()['hits'] == 1
+
+            calls.clear()
+            again = cache.get_or_fetch(lats, lons, fetch)
+            assert calls == [] and np.array_equal(again, elevations)
+            assert cache.stats()['entries'] == 3 and cache.stats()['hits'] == 7
+
+            # Points the provider has no data for are not cached
+            missing = cache.get_or_fetch([41.0], [-106.0], lambda lats, lons: np.full(len(lats), np.nan))
+            assert np.isnan(missing[0]) and cache.stats()['entries'] == 3
+        finally:
+            cache.close()
+
+def test_expired_samples_are_refetched_and_evicted():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = ElevationCache(os.path.join(temp_dir, 'elevation_cache.db'), ttl_days=1)
+        try:
+            calls = []
+            fetch = recording_fetch(calls)
+            cache.get_or_fetch([40.0, 40.1], [-105.0, -105.1], fetch)
+
+            # Age one sample past the TTL
+            key = int(cache.keys_for([40.0], [-105.0])[0])
+            with cache._lock:
+                cache._conn.execute("UPDATE elevations SET created_at = ? WHERE key = ?", (time.time() - 2 * 86400, key))
+                cache._conn.commit()
+            assert np.isnan(cache.get_many([40.0], [-105.0])[0])
+
+            calls.clear()
+            cache.get_or_fetch([40.0, 40.1], [-105.0, -105.1], fetch)
+            assert len(calls) == 1 and calls[0][0].tolist() == [40.0]
+
+            with cache._lock:
+                cache._conn.execute("UPDATE elevations SET created_at = ?", (time.time() - 2 * 86400,))
+                cache._conn.commit()
+            cache.evict()
+            assert cache.stats()['entries'] == 0 and cache.stats()['evicted'] == 2
+        finally:
+            cache.close()
+
+def test_least_recently_used_entries_are_evicted():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'elevation_cache.db')
+        cache = ElevationCache(db_path, max_entries=10)
+        try:
+            lats = [40 + i * 0.01 for i in range(15)]
+            lons = [-105.0] * 15
+            cache.put_many(lats, lons, range(15))
+            # Entry i was last used at time i, then entries 0-4 are read again now
+            with cache._lock:
+                cache._conn.executemany("UPDATE elevations SET last_access = ? WHERE key = ?",
+                                        [(i, int(key)) for i, key in enumerate(cache.keys_for(lats, lons))])
+                cache._conn.commit()
+            cache.get_many(lats[:5], lons[:5])
+
+            cache.evict()
+            remaining = cache.get_many(lats, lons)
+            assert np.isnan(remaining[5:10]).all()
+            assert remaining[:5].tolist() == [0, 1, 2, 3, 4] and remaining[10:].tolist() == list(range(10, 15))
+            assert cache.stats()['entries'] == 10 and cache.stats()['evicted'] == 5
+        finally:
+            cache.close()
+
+        # A cache reopened with a smaller limit is trimmed when it opens
+        cache = ElevationCache(db_path, max_entries=4)
+        try:
+            assert cache.stats()['entries'] == 4 and cache.stats()['evicted'] == 6
+        finally:
+            cache.close()
+
+if __name__ == "__main__":
+    for test in (test_only_unique_misses_are_fetched_and_repeats_are_free,
+                 test_expired_samples_are_refetched_and_evicted,
+                 test_least_recently_used_entries_are_evicted):
+        test()
+        print(f"✅ {test.__name__}")
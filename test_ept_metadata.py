@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test: Batched EPT Metadata Retrieval
+
+Uses moto's in-memory S3 to check that metadata for a search result is
+fetched with each project's ept.json and source list requested once, that
+the per-file, list.json and manifest.json lookups give the same metadata as
+before, and that a repeated conversion is answered from the SQLite cache
+without any S3 request.
+
+Run with pytest or directly: python test_ept_metadata.py
+"""
+
+import os
+import json
+import tempfile
+from collections import Counter
+
+import boto3
+from moto import mock_aws
+
+import utilities.ept_metadata as ept_metadata
+from utilities.ept_metadata import EptMetadataCache, ept_project_for_file, fetch_ept_metadata
+from utilities.lidar_index_search import convert_to_tnm_format, retrieve_ept_metadata
+
+BUCKET = 'usgs-lidar-public'
+
+def put_json(client, key, data):
+    client.put_object(Bucket=BUCKET, Key=key, Body=json.dumps(data).encode())
+
+def index_file(project, filename, file_id):
+    return {'id': file_id, 'key': f'{project}/laz/{filename}', 'bucket': BUCKET, 'filename': filename,
+            'size': 1000, 'format': 'laz', 'project_name': project}
+
+@mock_aws
+def test_metadata_is_fetched_once_per_project():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+
+    # Project A: its own JSON for even tiles, list.json for the rest
+    put_json(client, 'CO_A_2020/ept.json', {'bounds': [0, 0, 0, 1, 1, 1], 'points': 123,
+                                            'schema': [{'name': 'X'}], 'srs': {'wkt': 'WKT_A'}})
+    put_json(client, 'CO_A_2020/ept-sources/list.json',
+             [{'path': f'laz/A_{i:02d}.laz', 'source': 'list', 'points': 1000 + i} for i in range(30)])
+    for i in range(0, 30, 2):
+        put_json(client, f'CO_A_2020/ept-sources/A_{i:02d}.laz.json',
+                 {'source': 'file', 'tile': i, 'points': 2000 + i, 'srs': {'wkt': 'WKT_FILE'}})
+    # Project B: no ept.json, a manifest only
+    put_json(client, 'CO_B_2020/ept-sources/manifest.json',
+             [{'path': f'B_{i:02d}.laz', 'source': 'manifest'} for i in range(5)])
+
+    files = [index_file('CO_A_2020', f'A_{i:02d}.laz', i) for i in range(30)] + \
+            [index_file('CO_B_2020', f'B_{i:02d}.laz', 100 + i) for i in range(6)]
+
+    requests = Counter()
+    ept_client = boto3.client('s3', region_name='us-west-2')
+    ept_client.meta.events.register('provide-client-params.s3.GetObject',
+                                    lambda params, **kwargs: requests.update([params['Key']]))
+    create_s3_client = ept_metadata.create_s3_client
+    shared_cache = ept_metadata._ept_metadata_cache
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        ept_metadata.create_s3_client = lambda **kwargs: ept_client
+        ept_metadata._ept_metadata_cache = EptMetadataCache(os.path.join(temp_dir, 'ept_metadata.db'))
+        try:
+            result = convert_to_tnm_format(files, retrieve_metadata=True)
+            raw = {item['title']: item['rawMetadata'] for item in result['items']}
+            assert len(raw) == 36
+
+            assert raw['A_04.laz']['file_metadata'] == {'source': 'file', 'tile': 4, 'points': 2004,
+                                                        'srs': {'wkt': 'WKT_FILE'}}
+            assert raw['A_05.laz']['file_metadata'] == {'path': 'laz/A_05.laz', 'source': 'list', 'points': 1005}
+            assert raw['A_05.laz']['ept_json_url'].endswith('CO_A_2020/ept.json')
+            # Point counts are per file, never the project total from ept.json
+            points = {item['title']: item['pointCount'] for item in result['items']}
+            assert points['A_04.laz'] == 2004 and points['A_05.laz'] == 1005 and points['B_05.laz'] == 10
+            assert result['items'][4]['coordinateSystem'] == 'WKT_FILE'
+            assert all('points' not in metadata and 'srs' not in metadata for metadata in raw.values())
+            assert raw['B_03.laz']['file_metadata']['source'] == 'manifest'
+            assert 'file_metadata' not in raw['B_05.laz']
+
+            # Project documents once each, one request per file without a cached answer
+            assert requests['CO_A_2020/ept.json'] == 1 and requests['CO_B_2020/ept.json'] == 1
+            assert requests['CO_A_2020/ept-sources/list.json'] == 1
+            assert requests['CO_B_2020/ept-sources/manifest.json'] == 1
+            assert 'CO_A_2020/ept-sources/manifest.json' not in requests
+            assert sum(requests.values()) == 2 + 36 + 3
+
+            # Repeating the conversion, or asking for a single file, makes no S3 requests
+            requests.clear()
+            again = convert_to_tnm_format(files, retrieve_metadata=True)
+            assert [item['rawMetadata'] for item in again['items']] == [item['rawMetadata'] for item in result['items']]
+            assert retrieve_ept_metadata(BUCKET, 'CO_A_2020', 'A_04.laz')['file_metadata']['tile'] == 4
+            assert not requests
+        finally:
+            ept_metadata.create_s3_client = create_s3_client
+            ept_metadata._ept_metadata_cache.close()
+            ept_metadata._ept_metadata_cache = shared_cache
+
+def test_co_eastern_files_map_to_block_projects():
+    assert ept_project_for_file('CO_Eastern', 'USGS_LPC_CO_Eastern_B5_2018_LD1.laz') == 'CO_Eastern_B5_2018'
+    assert ept_project_for_file('CO_Eastern', 'USGS_LPC_CO_Eastern_2018_LD1.laz') == 'CO_Eastern_B1_2018'
+    assert ept_project_for_file('PA_2019', 'USGS_LPC_PA_2019_LD1.laz') == 'PA_2019'
+    assert fetch_ept_metadata([('', 'a.laz'), ('PA_2019', None)]) == {}
+
+if __name__ == "__main__":
+    for test in (test_metadata_is_fetched_once_per_project, test_co_eastern_files_map_to_block_projects):
+        test()
+        print(f"✅ {test.__name__}")
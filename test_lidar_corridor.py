@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test: LiDAR Corridor Rasters
+
+Writes small synthetic LAS tiles (UTM and state plane feet) with a ground
+plane and a block of "trees", and checks that the streaming corridor reader
+recovers the terrain and obstruction profiles and skips tiles that miss the
+corridor. Also checks that the process-pool pipeline matches the serial
+reader, honours cancellation, and benchmarks both on a larger synthetic set.
+
+Run with pytest or directly: python test_lidar_corridor.py
+"""
+
+import os
+import time
+import tempfile
+import threading
+
+import laspy
+import numpy as np
+from pyproj import CRS, Transformer
+
+from utilities.lidar_corridor import CorridorSpec, build_corridor_grid, plan_work_units, read_tile_partial
+
+START = (40.0, -99.0)
+END = (40.0, -98.95)  # ~4.3 km due east
+TREE_HEIGHT_M = 15.0
+
+def ground(x, y):
+    return 500.0 + 0.01 * (x - 480000) + 0.002 * (y - 4427000)
+
+def write_las(path, xs, ys, zs, classification, return_number, crs):
+    header = laspy.LasHeader(point_format=1, version="1.2")
+    header.offsets = [xs.min(), ys.min(), zs.min()]
+    header.scales = [0.01, 0.01, 0.01]
+    header.add_crs(CRS.from_user_input(crs))
+    las = laspy.LasData(header)
+    las.x, las.y, las.z = xs, ys, zs
+    las.classification = classification
+    las.return_number = return_number
+    las.number_of_returns = np.where(classification == 2, 1, 2)
+    las.write(path)
+
+def synthetic_points(xs, ys, tree_mask):
+    """Ground returns everywhere plus first returns on top of trees"""
+    zs = ground(xs, ys)
+    tree_x, tree_y = xs[tree_mask], ys[tree_mask]
+    all_x = np.concatenate([xs, tree_x])
+    all_y = np.concatenate([ys, tree_y])
+    all_z = np.concatenate([zs, zs[tree_mask] + TREE_HEIGHT_M])
+    classification = np.concatenate([np.full(len(xs), 2), np.full(len(tree_x), 5)]).astype(np.uint8)
+    # Ground under trees is a last return, the canopy the first
+    return_number = np.concatenate([np.where(tree_mask, 2, 1), np.ones(len(tree_x))]).astype(np.uint8)
+    return all_x, all_y, all_z, classification, return_number
+
+def utm_path_points():
+    to_utm = Transformer.from_crs("EPSG:4326", "EPSG:32614", always_xy=True)
+    (x0, x1), (y0, y1) = to_utm.transform([START[1], END[1]], [START[0], END[0]])
+    return x0, y0, x1, y1
+
+def test_corridor_profiles_from_tiles():
+    x0, y0, x1, y1 = utm_path_points()
+    rng = np.random.default_rng(3)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Two tiles splitting the path, one far away
+        paths = []
+        mid = (x0 + x1) / 2
+        for name, (xa, xb) in (('west.las', (x0 - 400, mid)), ('east.las', (mid, x1 + 400))):
+            xs = rng.uniform(xa, xb, 300000)
+            ys = rng.uniform(y0 - 80, y0 + 80, 300000)
+            trees = (xs > mid - 300) & (xs < mid + 300)
+            path = os.path.join(temp_dir, name)
+            write_las(path, *synthetic_points(xs, ys, trees), 'EPSG:32614')
+            paths.append(path)
+
+        far = os.path.join(temp_dir, 'far.las')
+        xs = rng.uniform(x0, x1, 1000)
+        ys = rng.uniform(y0 + 5000, y0 + 6000, 1000)
+        write_las(far, *synthetic_points(xs, ys, np.zeros(1000, dtype=bool)), 'EPSG:32614')
+        spec = CorridorSpec(START, END, 100, 200, 2.0)
+        assert read_tile_partial(far, spec) is None
+
+        grid = build_corridor_grid(paths + [far], START, END, width_ft=100, extension_ft=200,
+                                   resolution_m=2.0, chunk_size=50000)
+        assert grid.tiles_used == 2
+        assert grid.coverage() > 0.99
+
+        distances = np.linspace(0, grid.spec.length_m, 400)
+        to_utm = Transformer.from_crs("EPSG:4326", "EPSG:32614", always_xy=True)
+        lons = np.linspace(START[1], END[1], 400)
+        xs, ys = to_utm.transform(lons, np.linspace(START[0], END[0], 400))
+        terrain = grid.terrain_profile(distances)
+        assert np.nanmax(np.abs(terrain - ground(np.asarray(xs), np.asarray(ys)))) < 0.2
+
+        heights = grid.obstruction_profile(distances)
+        in_trees = np.abs(np.asarray(xs) - mid) < 250
+        clear = np.abs(np.asarray(xs) - mid) > 350
+        assert np.all(np.abs(heights[in_trees] - TREE_HEIGHT_M) < 0.3)
+        assert np.all(heights[clear] < 0.3)
+
+def test_state_plane_feet_tile():
+    to_sp = Transformer.from_crs("EPSG:4326", "EPSG:2231", always_xy=True)
+    start, end = (40.5, -105.0), (40.5, -104.98)
+    (x0, x1), (y0, y1) = to_sp.transform([start[1], end[1]], [start[0], end[0]])
+    rng = np.random.default_rng(4)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        xs = rng.uniform(x0 - 500, x1 + 500, 100000)
+        ys = rng.uniform(y0 - 500, y0 + 500, 100000)
+        zs = np.full(len(xs), 5280.0)
+        path = os.path.join(temp_dir, 'co.las')
+        write_las(path, xs, ys, zs, np.full(len(xs), 2, dtype=np.uint8),
+                  np.ones(len(xs), dtype=np.uint8), 'EPSG:2231')
+
+        grid = build_corridor_grid([path], start, end, width_ft=100, resolution_m=3.0)
+        terrain = grid.terrain_profile(np.linspace(0, grid.spec.length_m, 50))
+        assert np.allclose(terrain, 5280.0 * 0.3048, atol=0.01)
+
+def write_path_tiles(temp_dir, tile_count, points_per_tile, seed=5):
+    """Tiles side by side along the UTM path, each with a band of trees in the middle"""
+    x0, y0, x1, y1 = utm_path_points()
+    edges = np.linspace(x0 - 300, x1 + 300, tile_count + 1)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(tile_count):
+        xs = rng.uniform(edges[i], edges[i + 1], points_per_tile)
+        ys = rng.uniform(y0 - 80, y0 + 80, points_per_tile)
+        center = (edges[i] + edges[i + 1]) / 2
+        trees = np.abs(xs - center) < (edges[1] - edges[0]) / 4
+        path = os.path.join(temp_dir, f'tile_{i:03d}.las')
+        write_las(path, *synthetic_points(xs, ys, trees), 'EPSG:32614')
+        paths.append(path)
+    return paths
+
+def assert_same_grid(a, b):
+    assert np.array_equal(a.ground, b.ground, equal_nan=True)
+    assert np.array_equal(a.surface, b.surface, equal_nan=True)
+    assert a.points_kept == b.points_kept
+
+def test_parallel_matches_serial():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = write_path_tiles(temp_dir, 4, 100000)
+        spec = CorridorSpec(START, END, 100, 200, 2.0)
+        # Split tiles into point ranges to exercise per-chunk work units
+        units = plan_work_units(paths, spec, max_points_per_unit=40000)
+        assert len(units) > len(paths)
+
+        progress = []
+        serial = build_corridor_grid(paths, START, END, 100, 200, 2.0, workers=1)
+        parallel = build_corridor_grid(paths, START, END, 100, 200, 2.0, workers=3,
+                                       max_points_per_unit=40000,
+                                       progress_callback=lambda message, percent: progress.append(percent))
+        assert_same_grid(serial, parallel)
+        assert parallel.tiles_used == 4
+        assert len(progress) == len(units) and progress[-1] == 100
+
+def test_cancellation():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = write_path_tiles(temp_dir, 4, 50000)
+        cancel_event = threading.Event()
+
+        def cancel_after_first(message, percent):
+            cancel_event.set()
+
+        for workers in (1, 2):
+            cancel_event.clear()
+            grid = build_corridor_grid(paths, START, END, 100, 200, 2.0, workers=workers,
+                                       progress_callback=cancel_after_first, cancel_event=cancel_event)
+            assert grid is None
+
+def test_benchmark_serial_vs_pool():
+    """Synthetic tile set big enough for the pool to pay off on multi-core machines"""
+    workers = min(os.cpu_count() or 1, 8)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = write_path_tiles(temp_dir, 8, 1_000_000)
+
+        start = time.perf_counter()
+        serial = build_corridor_grid(paths, START, END, 100, 200, 1.0, workers=1)
+        serial_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parallel = build_corridor_grid(paths, START, END, 100, 200, 1.0, workers=workers)
+        parallel_time = time.perf_counter() - start
+
+        assert_same_grid(serial, parallel)
+        print(f"\n{serial.points_read:,} points: serial {serial_time:.2f}s, "
+              f"{workers} workers {parallel_time:.2f}s ({serial_time / parallel_time:.1f}x)")
+        if workers >= 4:
+            assert parallel_time < serial_time
+
+if __name__ == "__main__":
+    for test in (test_corridor_profiles_from_tiles, test_state_plane_feet_tile, test_parallel_matches_serial,
+                 test_cancellation, test_benchmark_serial_vs_pool):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test: Incremental LIDAR Crawler
+
+Uses moto's in-memory S3 to crawl a project listing with LidarCrawler and
+checks that --changed-only skips objects whose ETag is already indexed, that
+--since skips older objects, and that objects removed from S3 leave the
+index only after a complete listing.
+
+Run with pytest or directly: python test_lidar_crawler.py
+"""
+
+import os
+import json
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from moto import mock_aws
+
+from utilities.lidar_crawler import LidarCrawler
+from utilities.lidar_index_db import init_database, close_connections, add_project
+
+BUCKET = 'usgs-lidar-public'
+PROJECT = {'name': 'CO_Project_2020', 'prefix': 'CO_Project_2020/', 'year': 2020, 'source': 'USGS AWS S3'}
+
+def make_bucket():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+    client.put_object(Bucket=BUCKET, Key='CO_Project_2020/ept.json',
+                      Body=json.dumps({'bounds': [-105, 40, 1500, -104.9, 40.1, 1800]}).encode())
+    return client
+
+def put_tile(client, i, body=b'laz'):
+    client.put_object(Bucket=BUCKET, Key=f'CO_Project_2020/laz/tile_{i:03d}.laz', Body=body)
+
+def crawl(client, db_path, project_id, **kwargs):
+    crawler = LidarCrawler(db_path, **kwargs)
+    crawler.s3_client = client
+    crawler.crawl_project_files(PROJECT, project_id)
+    return crawler.stats
+
+def indexed_keys(db_path):
+    with sqlite3.connect(db_path) as conn:
+        keys = {row[0] for row in conn.execute("SELECT key FROM files")}
+        assert conn.execute("SELECT COUNT(*) FROM files_rtree").fetchone()[0] == len(keys)
+    return keys
+
+@mock_aws
+def test_incremental_crawl_skips_unchanged_and_removes_deleted_objects():
+    client = make_bucket()
+    for i in range(5):
+        put_tile(client, i)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        init_database(db_path)
+        try:
+            project_id = add_project(PROJECT, db_path)
+            stats = crawl(client, db_path, project_id)
+            assert stats['files_added'] == 5 and stats['errors'] == 0
+
+            # Unchanged ETags are skipped; a rewritten object is processed again
+            put_tile(client, 2, b'new content')
+            etag = client.head_object(Bucket=BUCKET, Key='CO_Project_2020/laz/tile_002.laz')['ETag']
+            stats = crawl(client, db_path, project_id, changed_only=True)
+            assert stats['files_unchanged'] > 0 and stats['files_added'] == 0 and stats['files_updated'] > 0
+            with sqlite3.connect(db_path) as conn:
+                changed = {row[0] for row in conn.execute("SELECT key FROM files WHERE etag = ?", (etag,))}
+            assert changed == {'CO_Project_2020/laz/tile_002.laz'}
+
+            # Nothing was modified after tomorrow
+            stats = crawl(client, db_path, project_id, since=datetime.now(timezone.utc) + timedelta(days=1))
+            assert stats['files_unchanged'] > 0 and stats['files_added'] == stats['files_updated'] == 0
+
+            # A deleted object is removed from the index
+            client.delete_object(Bucket=BUCKET, Key='CO_Project_2020/laz/tile_004.laz')
+            stats = crawl(client, db_path, project_id, changed_only=True)
+            assert stats['files_deleted'] == 1
+            assert indexed_keys(db_path) == {f'CO_Project_2020/laz/tile_{i:03d}.laz' for i in range(4)}
+
+            # An incomplete listing keeps everything
+            failing = LidarCrawler(db_path, changed_only=True)
+            failing.s3_client = client
+            failing.crawl_directory = lambda prefix, project_id, max_files=None: \
+                setattr(failing, 'listing_complete', False)
+            failing.crawl_project_files(PROJECT, project_id)
+            assert failing.stats['files_deleted'] == 0 and len(indexed_keys(db_path)) == 4
+        finally:
+            close_connections()
+
+if __name__ == "__main__":
+    test_incremental_crawl_skips_unchanged_and_removes_deleted_objects()
+    print("✅ test_incremental_crawl_skips_unchanged_and_removes_deleted_objects")
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test: LIDAR Index Database
+
+Checks add_files_bulk (added/updated/error counts, one transaction, R*Tree
+rows), the migration of a database created before the R*Tree index (new
+columns, triggers, backfill, bbox searches matching a brute-force filter
+before and after later writes), and the per-thread connection pool: one
+connection per thread, no connection shared with a later thread, and
+connections closed per thread, all at once, or when their thread has exited.
+
+Run with pytest or directly: python test_lidar_index_db.py
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+
+from utilities.lidar_index_db import (
+    init_database, add_project, add_files_bulk, search_files_by_bbox, get_connection,
+    close_connections, close_thread_connections
+)
+
+def file_data(i, **overrides):
+    data = {'bucket': 'usgs-lidar-public', 'key': f'CO_Project_2020/laz/tile_{i:03d}.laz', 'size': 1000 + i,
+            'boundingBox': {'minX': -105 + i * 0.01, 'minY': 40, 'maxX': -105 + (i + 1) * 0.01, 'maxY': 40.01},
+            'metadata': {'tile': i}}
+    data.update(overrides)
+    return data
+
+# Schema of databases created before the R*Tree index and change-detection columns
+OLD_SCHEMA = """
+CREATE TABLE projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, prefix TEXT NOT NULL, year INTEGER,
+    description TEXT, source TEXT, date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    date_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP, metadata TEXT
+);
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER NOT NULL, bucket TEXT NOT NULL, key TEXT UNIQUE NOT NULL,
+    filename TEXT NOT NULL, size INTEGER, last_modified TIMESTAMP, format TEXT,
+    min_x REAL, min_y REAL, max_x REAL, max_y REAL, polygon TEXT, metadata_source TEXT,
+    date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP, date_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP, metadata TEXT,
+    ept_json_url TEXT, ept_sources_url TEXT, ept_metadata_url TEXT, point_count INTEGER, resolution REAL,
+    point_spacing REAL, coordinate_system TEXT,
+    FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
+);
+CREATE INDEX idx_files_bbox ON files (min_x, min_y, max_x, max_y);
+"""
+
+def random_bbox(rng):
+    min_x, min_y = rng.uniform(-106, -104), rng.uniform(39, 41)
+    return min_x, min_y, min_x + rng.uniform(0, 0.2), min_y + rng.uniform(0, 0.2)
+
+def brute_force_search(db_path, min_x, min_y, max_x, max_y):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute(
+            "SELECT key FROM files WHERE min_x <= ? AND max_x >= ? AND min_y <= ? AND max_y >= ?",
+            (max_x, min_x, max_y, min_y))}
+
+def assert_searches_match(db_path, rng, count=50):
+    for _ in range(count):
+        min_x, min_y = rng.uniform(-106.1, -104), rng.uniform(38.9, 41)
+        bbox = (min_x, min_y, min_x + rng.uniform(0, 0.5), min_y + rng.uniform(0, 0.5))
+        found = {f['key'] for f in search_files_by_bbox(*bbox, db_path=db_path)}
+        assert found == brute_force_search(db_path, *bbox), bbox
+
+def is_closed(conn):
+    try:
+        conn.execute("SELECT 1")
+        return False
+    except sqlite3.ProgrammingError:
+        return True
+
+def in_thread(function):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+def test_add_files_bulk_counts_and_indexes_files():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        init_database(db_path)
+        try:
+            project_id = add_project({'name': 'CO_Project_2020', 'prefix': 'CO_Project_2020/'}, db_path)
+
+            stats = add_files_bulk([file_data(i) for i in range(10)], project_id, db_path)
+            assert stats == {'files_added': 10, 'files_updated': 0, 'errors': 0}
+
+            # Existing keys are updated in place; a broken row doesn't abort the batch
+            batch = [file_data(i, size=5) for i in range(5)] + [file_data(10), file_data(11, boundingBox=None)]
+            stats = add_files_bulk(batch, project_id, db_path)
+            assert stats == {'files_added': 1, 'files_updated': 5, 'errors': 1}
+            assert add_files_bulk([], project_id, db_path) == {'files_added': 0, 'files_updated': 0, 'errors': 0}
+
+            with sqlite3.connect(db_path) as conn:
+                assert conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 11
+                assert conn.execute("SELECT COUNT(*) FROM files_rtree").fetchone()[0] == 11
+                assert conn.execute("SELECT size FROM files WHERE key LIKE '%tile_003.laz'").fetchone()[0] == 5
+
+            found = search_files_by_bbox(-104.975, 40.001, -104.965, 40.002, db_path=db_path)
+            assert sorted(f['filename'] for f in found) == ['tile_002.laz', 'tile_003.laz']
+        finally:
+            close_connections()
+
+def test_old_database_is_migrated_to_the_rtree_index():
+    rng = random.Random(12)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        with sqlite3.connect(db_path) as conn:
+            conn.executescript(OLD_SCHEMA)
+            conn.execute("INSERT INTO projects (name, prefix) VALUES ('CO_Old_2019', 'CO_Old_2019/')")
+            rows = [(1, 'usgs-lidar-public', f'CO_Old_2019/laz/tile_{i:04d}.laz', f'tile_{i:04d}.laz', 'laz',
+                     *random_bbox(rng)) for i in range(400)]
+            # Files without a usable bounding box stay out of the R*Tree
+            rows += [(1, 'usgs-lidar-public', 'CO_Old_2019/laz/no_bbox.laz', 'no_bbox.laz', 'laz', None, None, None, None),
+                     (1, 'usgs-lidar-public', 'CO_Old_2019/laz/inverted.laz', 'inverted.laz', 'laz', -104, 40, -105, 39)]
+            conn.executemany("INSERT INTO files (project_id, bucket, key, filename, format, min_x, min_y, max_x, max_y) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+        init_database(db_path)
+        try:
+            with sqlite3.connect(db_path) as conn:
+                file_columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+                project_columns = {row[1] for row in conn.execute("PRAGMA table_info(projects)")}
+                triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+                assert conn.execute("SELECT COUNT(*) FROM files_rtree").fetchone()[0] == 400
+            assert {'etag', 'source_hash'} <= file_columns
+            assert {'ept_etag', 'manifest_etag', 'manifest_hash', 'last_crawled'} <= project_columns
+            assert triggers == {'files_rtree_insert', 'files_rtree_update', 'files_rtree_delete'}
+            assert_searches_match(db_path, rng)
+
+            # Migrating again adds nothing twice
+            init_database(db_path)
+            with sqlite3.connect(db_path) as conn:
+                assert conn.execute("SELECT COUNT(*) FROM files_rtree").fetchone()[0] == 400
+
+            # The triggers keep the index in sync with later inserts, updates and deletes
+            add_files_bulk([file_data(i) for i in range(20)], 1, db_path)
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("UPDATE files SET min_x = min_x + 0.3, max_x = max_x + 0.3 WHERE id % 7 = 0")
+                conn.execute("UPDATE files SET min_x = NULL WHERE id % 11 = 0")
+                conn.execute("DELETE FROM files WHERE id % 13 = 0")
+                valid = conn.execute("SELECT COUNT(*) FROM files WHERE min_x IS NOT NULL AND min_x <= max_x "
+                                     "AND min_y <= max_y").fetchone()[0]
+                assert conn.execute("SELECT COUNT(*) FROM files_rtree").fetchone()[0] == valid
+            assert_searches_match(db_path, rng)
+        finally:
+            close_connections()
+
+def test_pool_gives_each_thread_its_own_connection():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        init_database(db_path)
+        try:
+            main_conn = get_connection(db_path)
+            assert get_connection(db_path) is main_conn
+
+            first = in_thread(lambda: get_connection(db_path))
+            second = in_thread(lambda: get_connection(db_path))
+            # A later thread (possibly with a reused thread id) never inherits a connection
+            assert len({id(main_conn), id(first), id(second)}) == 3
+            # Opening a connection closes those of threads that have exited
+            assert is_closed(first) and not is_closed(main_conn)
+
+            def open_and_close():
+                conn = get_connection(db_path)
+                close_thread_connections()
+                return conn
+            assert is_closed(in_thread(open_and_close))
+
+            close_connections()
+            assert is_closed(main_conn) and is_closed(second)
+            reopened = get_connection(db_path)
+            assert reopened is not main_conn and not is_closed(reopened)
+        finally:
+            close_connections()
+
+if __name__ == "__main__":
+    for test in (test_add_files_bulk_counts_and_indexes_files,
+                 test_old_database_is_migrated_to_the_rtree_index,
+                 test_pool_gives_each_thread_its_own_connection):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test: Network Clearance Screening
+
+Screens a small network (including turbines beyond the ends of its links)
+and checks that screen_network reports exactly the pairs the per-link
+calculate_turbine_clearances flags for the same terrain profiles, that the
+ground comes from the sampled terrain rather than the site elevations, and
+that samples without terrain fall back to the site elevations, and that
+Google elevations are only requested when asked for.
+
+Run with pytest or directly: python test_network_clearance_screening.py
+"""
+
+import math
+import random
+
+import numpy as np
+
+import utilities.network_clearance_screening as screening
+from utilities.turbine_clearance_calculator import TurbineClearanceCalculator, TurbineData, PathData
+
+MARGIN_FT = 150.0
+
+LINKS = [
+    ('L1', PathData(40.0, -100.0, 40.12, -99.8, 1850.0, 1920.0, 180.0, 220.0, frequency_ghz=6.0)),
+    ('L2', PathData(40.05, -99.95, 39.95, -99.7, 1880.0, 1800.0, 150.0, 150.0, frequency_ghz=11.0)),
+    ('L3', PathData(40.2, -99.9, 40.2, -99.9, 1900.0, 1900.0, 100.0, 100.0))
+]
+
+def terrain(lats, lons):
+    """Rolling terrain (meters) with a ridge across the links"""
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    return 570 + 40 * np.sin(lats * 300) + 60 * np.exp(-((lons + 99.85) / 0.02) ** 2)
+
+def make_turbines(count=1500, seed=5):
+    """Turbines scattered around and beyond the ends of the links"""
+    rng = random.Random(seed)
+    turbines = []
+    for i in range(count):
+        _, path = LINKS[i % len(LINKS)]
+        t = rng.uniform(-0.3, 1.3)
+        turbines.append(TurbineData(
+            id=f"T{i}",
+            latitude=path.start_lat + (path.end_lat - path.start_lat) * t + rng.uniform(-0.004, 0.004),
+            longitude=path.start_lon + (path.end_lon - path.start_lon) * t + rng.uniform(-0.004, 0.004),
+            total_height_m=rng.uniform(80, 200),
+            hub_height_m=rng.choice([None, rng.uniform(60, 120)]),
+            rotor_diameter_m=rng.choice([None, rng.uniform(70, 160)])
+        ))
+    return turbines
+
+def per_link_flags(turbines, profiles):
+    """(link_id, turbine_id) pairs flagged by the per-link calculator"""
+    calculator = TurbineClearanceCalculator()
+    flagged = set()
+    for (link_id, path), profile in zip(LINKS, profiles):
+        for result in calculator.calculate_turbine_clearances(turbines, path, list(profile)):
+            if result.clearance_3d_fresnel_ft < MARGIN_FT:
+                flagged.add((link_id, result.turbine_id))
+    return flagged
+
+def test_screening_matches_per_link_calculator():
+    turbines = make_turbines()
+    get_elevations = screening.get_elevations
+    screening.get_elevations = lambda lats, lons, use_fallback=True: terrain(lats, lons)
+    try:
+        profiles = screening.sample_link_profiles(LINKS)
+        rows = screening.screen_network(LINKS, turbines, MARGIN_FT)
+        flat_rows = screening.screen_network(LINKS, turbines, MARGIN_FT, sample_terrain=False)
+    finally:
+        screening.get_elevations = get_elevations
+
+    expected = per_link_flags(turbines, profiles)
+    assert {(row['link_id'], row['turbine_id']) for row in rows} == expected
+    # Including turbines beyond the ends of a link, measured to the nearer end
+    path_lengths = {link_id: TurbineClearanceCalculator()._haversine_distance(
+        path.start_lat, path.start_lon, path.end_lat, path.end_lon) * 3.28084 for link_id, path in LINKS}
+    assert any(row['distance_along_path_ft'] in (0, round(path_lengths[row['link_id']], 1)) for row in rows)
+
+    # The ridge is only seen when the terrain is sampled
+    assert {(row['link_id'], row['turbine_id']) for row in flat_rows} != expected
+    flat_profiles = [np.array([path.start_elevation_ft, path.end_elevation_ft]) for _, path in LINKS]
+    assert {(row['link_id'], row['turbine_id']) for row in flat_rows} == per_link_flags(turbines, flat_profiles)
+
+def test_profile_samples_without_terrain_use_site_elevations():
+    get_elevations = screening.get_elevations
+    fallbacks = []
+
+    def no_terrain(lats, lons, use_fallback=True):
+        fallbacks.append(use_fallback)
+        return np.full(len(lats), np.nan)
+
+    screening.get_elevations = no_terrain
+    try:
+        profiles = screening.sample_link_profiles(LINKS[:2], spacing_m=100)
+        screening.sample_link_profiles(LINKS[:2], spacing_m=100, use_google_fallback=True)
+    finally:
+        screening.get_elevations = get_elevations
+
+    # The billable Google fallback is opt-in
+    assert fallbacks == [False, True]
+
+    for (_, path), profile in zip(LINKS[:2], profiles):
+        length_m = TurbineClearanceCalculator()._haversine_distance(path.start_lat, path.start_lon,
+                                                                   path.end_lat, path.end_lon)
+        assert len(profile) == math.ceil(length_m / 100) + 1
+        assert np.allclose(profile, np.linspace(path.start_elevation_ft, path.end_elevation_ft, len(profile)))
+
+if __name__ == "__main__":
+    for test in (test_screening_matches_per_link_calculator,
+                 test_profile_samples_without_terrain_use_site_elevations):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Test: Production LIDAR Indexer
+
+Uses moto's in-memory S3 to crawl EPT projects into a temporary index
+database with several fetch workers, and checks the crawl statistics, the
+crawl_history row, that a failing progress update cannot stall the writer
+thread, that incremental crawls skip projects by manifest ETag, content hash
+and --since date, and that files dropped from a manifest leave the index.
+
+Run with pytest or directly: python test_production_lidar_indexer.py
+"""
+
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+import boto3
+from moto import mock_aws
+
+from utilities.lidar_index_db import init_database, close_connections, search_files_by_bbox
+
+# The indexer logs to a file in the working directory when imported
+_cwd = os.getcwd()
+os.chdir(tempfile.gettempdir())
+try:
+    import production_lidar_indexer as indexer
+finally:
+    os.chdir(_cwd)
+
+BUCKET = 'usgs-lidar-public'
+
+def source(project, i):
+    # Web Mercator bounds around (-105, 40)
+    x, y = -11688546.53 + i * 1000, 4865942.28
+    return {'path': f's3://usgs-lidar/{project}/laz/{project}_{i:03d}.laz',
+            'bounds': [x, y, 1500, x + 1000, y + 1000, 1800], 'points': 1000 + i}
+
+def put_manifest(client, name, sources):
+    client.put_object(Bucket=BUCKET, Key=f'{name}/ept-sources/manifest.json', Body=json.dumps(sources).encode())
+
+def put_project(client, name, count):
+    client.put_object(Bucket=BUCKET, Key=f'{name}/ept.json',
+                      Body=json.dumps({'points': 123, 'srs': {'wkt': 'WKT'}}).encode())
+    put_manifest(client, name, [source(name, i) for i in range(count)])
+
+def make_bucket():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+    return client
+
+def project_list(names):
+    return [{'name': name, 'prefix': f'{name}/', 'year': 2020, 'source': 'USGS AWS S3'} for name in names]
+
+def crawl_rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT status, projects_added, files_added, error FROM crawl_history").fetchall()
+
+def indexed_keys(db_path):
+    with sqlite3.connect(db_path) as conn:
+        keys = {row[0] for row in conn.execute("SELECT key FROM files")}
+        assert conn.execute("SELECT COUNT(*) FROM files_rtree").fetchone()[0] == len(keys)
+    return keys
+
+def count_manifest_gets(client):
+    """Count GetObject requests for manifests made through client"""
+    gets = []
+    client.meta.events.register('provide-client-params.s3.GetObject',
+                                lambda params, **kwargs: gets.append(params['Key']) if
+                                params['Key'].endswith('manifest.json') else None)
+    return gets
+
+def run_with_timeout(function, timeout=60):
+    """Run function in a thread; fail instead of hanging the test run"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=function()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "index_projects did not finish"
+    return result['value']
+
+@mock_aws
+def test_concurrent_crawl_records_stats_and_history():
+    client = make_bucket()
+    names = [f'CO_Project_{i}_2020' for i in range(6)]
+    for i, name in enumerate(names):
+        put_project(client, name, 5 + i)
+    missing = project_list(['CO_Missing_2020'])
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        init_database(db_path)
+        try:
+            stats = run_with_timeout(lambda: indexer.index_projects(client, project_list(names) + missing,
+                                                                    db_path, workers=3))
+            assert stats['files_added'] == sum(5 + i for i in range(6))
+            assert stats['projects_added'] == 6 and stats['projects_updated'] == 1
+            assert stats['errors'] == 0
+            assert crawl_rows(db_path) == [('completed', 6, stats['files_added'], None)]
+
+            with sqlite3.connect(db_path) as conn:
+                assert conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == stats['files_added']
+        finally:
+            close_connections()
+
+@mock_aws
+def test_failing_progress_update_does_not_stall_the_writer():
+    client = make_bucket()
+    names = [f'CO_Project_{i}_2020' for i in range(12)]
+    for name in names:
+        put_project(client, name, 3)
+
+    update_crawl, interval = indexer.update_crawl, indexer.PROGRESS_INTERVAL
+
+    def failing_update(crawl_id, status, *args, **kwargs):
+        if status == 'in_progress':
+            raise sqlite3.OperationalError('database is locked')
+        return update_crawl(crawl_id, status, *args, **kwargs)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        init_database(db_path)
+        indexer.update_crawl, indexer.PROGRESS_INTERVAL = failing_update, 0
+        try:
+            # More projects than the queue holds (workers * 2), so a dead writer would block the workers
+            stats = run_with_timeout(lambda: indexer.index_projects(client, project_list(names), db_path, workers=2))
+            assert stats['files_added'] == 36 and stats['errors'] == 0
+            assert crawl_rows(db_path)[0][0] == 'completed'
+        finally:
+            indexer.update_crawl, indexer.PROGRESS_INTERVAL = update_crawl, interval
+            close_connections()
+
+@mock_aws
+def test_changed_only_skips_unchanged_manifests():
+    client = make_bucket()
+    names = ['CO_Project_A_2020', 'CO_Project_B_2020']
+    for name in names:
+        put_project(client, name, 4)
+    gets = count_manifest_gets(client)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        init_database(db_path)
+        try:
+            stats = indexer.index_projects(client, project_list(names), db_path, changed_only=True)
+            assert stats['files_added'] == 8 and len(gets) == 2
+
+            # Same manifest ETags: answered by HEAD requests alone
+            gets.clear()
+            stats = indexer.index_projects(client, project_list(names), db_path, changed_only=True)
+            assert stats['projects_unchanged'] == 2 and stats['files_added'] == stats['files_updated'] == 0
+            assert gets == []
+
+            # A new ETag for identical content (e.g. a re-upload) is caught by the manifest hash
+            with sqlite3.connect(db_path) as conn:
+                conn.execute("UPDATE projects SET manifest_etag = '\"stale\"'")
+            stats = indexer.index_projects(client, project_list(names), db_path, changed_only=True)
+            assert stats['projects_unchanged'] == 2 and stats['files_updated'] == 0
+            assert len(gets) == 2
+            with sqlite3.connect(db_path) as conn:
+                assert conn.execute("SELECT COUNT(*) FROM projects WHERE manifest_etag = '\"stale\"'").fetchone()[0] == 0
+
+            # Only the changed manifest entry of the changed project is rewritten
+            sources = [source('CO_Project_A_2020', i) for i in range(4)]
+            sources[1]['points'] = 99999
+            put_manifest(client, 'CO_Project_A_2020', sources)
+            stats = indexer.index_projects(client, project_list(names), db_path, changed_only=True)
+            assert stats['projects_unchanged'] == 1
+            assert stats['files_updated'] == 1 and stats['files_added'] == 0
+        finally:
+            close_connections()
+
+@mock_aws
+def test_since_skips_projects_with_older_manifests():
+    client = make_bucket()
+    names = ['CO_Project_A_2020', 'CO_Project_B_2020']
+    for name in names:
+        put_project(client, name, 3)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        init_database(db_path)
+        try:
+            tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+            stats = indexer.index_projects(client, project_list(names), db_path, since=tomorrow)
+            assert stats['projects_unchanged'] == 2 and indexed_keys(db_path) == set()
+
+            yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+            stats = indexer.index_projects(client, project_list(names), db_path, since=yesterday)
+            assert stats['projects_added'] == 2 and len(indexed_keys(db_path)) == 6
+        finally:
+            close_connections()
+
+@mock_aws
+def test_files_dropped_from_manifest_are_deleted():
+    client = make_bucket()
+    put_project(client, 'CO_Project_A_2020', 5)
+    put_project(client, 'CO_Project_B_2020', 2)
+    projects = project_list(['CO_Project_A_2020', 'CO_Project_B_2020'])
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'lidar_index.db')
+        init_database(db_path)
+        try:
+            indexer.index_projects(client, projects, db_path)
+            assert len(indexed_keys(db_path)) == 7
+
+            # Tiles 1 and 3 are withdrawn from project A
+            put_manifest(client, 'CO_Project_A_2020', [source('CO_Project_A_2020', i) for i in (0, 2, 4)])
+            stats = indexer.index_projects(client, projects, db_path, changed_only=True)
+            assert stats['files_deleted'] == 2 and stats['projects_unchanged'] == 1
+
+            expected = {f'CO_Project_A_2020/laz/CO_Project_A_2020_{i:03d}.laz' for i in (0, 2, 4)} | \
+                       {f'CO_Project_B_2020/laz/CO_Project_B_2020_{i:03d}.laz' for i in (0, 1)}
+            assert indexed_keys(db_path) == expected
+            found = {f['key'] for f in search_files_by_bbox(-106, 39, -104, 41, db_path=db_path)}
+            assert found == expected
+
+            # A manifest that cannot be read never empties a project
+            client.delete_object(Bucket=BUCKET, Key='CO_Project_A_2020/ept-sources/manifest.json')
+            stats = indexer.index_projects(client, projects, db_path)
+            assert stats['files_deleted'] == 0 and indexed_keys(db_path) == expected
+
+            # Nor does an empty manifest or one with invalid entries
+            for sources in ([], [{'path': 's3://usgs-lidar/CO_Project_A_2020/laz/bad.laz', 'bounds': []}],
+                            [source('CO_Project_A_2020', 0), {'path': '', 'bounds': []}]):
+                put_manifest(client, 'CO_Project_A_2020', sources)
+                stats = indexer.index_projects(client, projects, db_path)
+                assert stats['files_deleted'] == 0 and indexed_keys(db_path) == expected
+        finally:
+            close_connections()
+
+if __name__ == "__main__":
+    for test in (test_concurrent_crawl_records_stats_and_history,
+                 test_failing_progress_update_does_not_stall_the_writer,
+                 test_changed_only_skips_unchanged_manifests,
+                 test_since_skips_projects_with_older_manifests,
+                 test_files_dropped_from_manifest_are_deleted):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Test: Project Footprint Index
+
+Uses moto's in-memory S3 to check that project footprints are derived from
+EPT bounds (Web Mercator) and cached tile indexes, saved to the built
+registry in place of the placeholder boundaries, that only projects with a
+Projects/ tile index are searched (EPT-only names are not), that a polygon
+search opens only the tile indexes of the projects covering it plus the
+projects without a footprint in the states it touches, which it then
+resolves, and that the shared index is returned from the registry at once
+and built on a background thread.
+
+Run with pytest or directly: python test_project_footprints.py
+"""
+
+import os
+import json
+import math
+import time
+import tempfile
+
+import boto3
+import geopandas as gpd
+from moto import mock_aws
+from shapely.geometry import box, mapping
+
+import utilities.tile_index_cache as tile_index_cache
+import utilities.project_footprints as project_footprints
+import utilities.tile_index_manager as tile_index_manager
+from utilities.tile_index_cache import TileIndexCache
+from utilities.project_footprints import ProjectFootprintIndex, build_footprint_index, ept_footprint, project_region
+
+BUCKET = 'usgs-lidar-public'
+
+def web_mercator(lon, lat):
+    return (lon * 20037508.34 / 180,
+            math.log(math.tan((90 + lat) * math.pi / 360)) * 20037508.34 / math.pi)
+
+def ept_document(min_lon, min_lat, max_lon, max_lat):
+    min_x, min_y = web_mercator(min_lon, min_lat)
+    max_x, max_y = web_mercator(max_lon, max_lat)
+    return {'bounds': [min_x, min_y, 1000, max_x, max_y, 2000],
+            'srs': {'authority': 'EPSG', 'horizontal': '3857', 'vertical': '5703'}}
+
+def add_project(client, name, bounds, with_ept=True, with_tiles=True, ept_dir=True):
+    if with_ept:
+        client.put_object(Bucket=BUCKET, Key=f'{name}/ept.json', Body=json.dumps(ept_document(*bounds)).encode())
+    elif ept_dir:
+        client.put_object(Bucket=BUCKET, Key=f'{name}/README.txt', Body=b'no point cloud yet')
+    if with_tiles:
+        tiles = gpd.GeoDataFrame({'tile_id': [f'{name}_tile']}, geometry=[box(*bounds)], crs='EPSG:4326')
+        client.put_object(Bucket=BUCKET, Key=f'Projects/{name}/tile_index/{name}_tile_index.geojson',
+                          Body=tiles.to_json(drop_id=True).encode())
+
+def make_bucket():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+    return client
+
+def write_placeholder_registry(path):
+    with open(path, 'w') as f:
+        json.dump({'generated': True, 'resources': [{'name': 'CO_Denver_2020', 'state': 'CO', 'boundary': {
+            'geometry': {'type': 'Polygon', 'coordinates': [[[-180, -90], [180, -90], [180, 90], [-180, 90], [-180, -90]]]}}}]}, f)
+
+def test_ept_footprint_covers_bounds():
+    footprint = ept_footprint(ept_document(-105.2, 39.5, -104.6, 40.1))
+    min_x, min_y, max_x, max_y = footprint.bounds
+    assert -105.21 < min_x <= -105.2 and 39.49 < min_y <= 39.5
+    assert -104.6 <= max_x < -104.59 and 40.1 <= max_y < 40.11
+    assert ept_footprint({'bounds': []}) is None
+
+@mock_aws
+def test_search_opens_only_covering_projects():
+    client = make_bucket()
+
+    # 30 projects across the country, more than the old cap of 20
+    for i in range(30):
+        add_project(client, f'TX_Project_{i:02d}', (-100.0 + i, 31.0, -99.5 + i, 31.5))
+    add_project(client, 'CO_Denver_2020', (-105.2, 39.5, -104.6, 40.1))
+    add_project(client, 'PA_NoEpt_2019', (-77.0, 40.0, -76.5, 40.5), with_ept=False)
+    # The two layouts don't hold the same projects: one is EPT-only, one has tile indexes only
+    add_project(client, 'CO_EptOnly_2021', (-105.2, 39.5, -104.6, 40.1), with_tiles=False)
+    add_project(client, 'NM_TilesOnly_2019', (-106.5, 35.0, -106.0, 35.5), with_ept=False, ept_dir=False)
+
+    initialize_s3_client = tile_index_manager.initialize_s3_client
+    shared_cache = tile_index_cache._tile_index_cache
+    shared_index = project_footprints._footprint_index
+    shared_projects = tile_index_manager.PROJECT_METADATA_CACHE.pop('all_projects', None)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        registry_path = os.path.join(temp_dir, 'lidar_registry.json')
+        write_placeholder_registry(registry_path)
+
+        tile_index_manager.initialize_s3_client = lambda: client
+        tile_index_cache._tile_index_cache = TileIndexCache(os.path.join(temp_dir, 'tile_indexes'))
+        opened = []
+        client.meta.events.register('provide-client-params.s3.GetObject',
+                                    lambda params, **kwargs: opened.append(params['Key']))
+        try:
+            index = build_footprint_index(client, registry_path)
+            # Projects without EPT bounds are left to the searches, no tile index is fetched up front
+            assert len(index) == 33 and index.unresolved == ['NM_TilesOnly_2019', 'PA_NoEpt_2019']
+            assert not any(key.startswith('Projects/') for key in opened)
+            assert 'CO_EptOnly_2021' not in index.query(box(-105.0, 39.8, -104.9, 39.9))
+            assert 'NM_TilesOnly_2019/ept.json' not in opened
+            assert index.query(box(-71.0, 42.0, -70.9, 42.1)) == []
+            assert index.query(box(-72.2, 31.1, -70.9, 31.2)) == ['TX_Project_28', 'TX_Project_29']
+            assert index.query(box(-106.3, 35.2, -106.2, 35.3)) == ['NM_TilesOnly_2019']
+
+            with open(registry_path) as f:
+                saved = {r['name']: r for r in json.load(f)['resources']}
+            assert saved['CO_Denver_2020']['state'] == 'CO'
+            assert saved['CO_Denver_2020']['footprint_source'] == 'ept_bounds'
+            assert saved['CO_EptOnly_2021']['tile_index'] is False
+            assert saved['NM_TilesOnly_2019']['url'] == f's3://{BUCKET}/Projects/NM_TilesOnly_2019/'
+            assert 'footprint_source' not in saved['PA_NoEpt_2019']
+
+            # Reloading needs no S3 access
+            assert build_footprint_index(None, registry_path).query(box(-105, 39.8, -104.9, 39.9))[0] == 'CO_Denver_2020'
+
+            project_footprints._footprint_index = index
+            opened.clear()
+            results = tile_index_manager.find_tiles_intersecting_polygon(box(-105.0, 39.8, -104.9, 39.9))
+            assert list(results) == ['CO_Denver_2020']
+            assert opened == ['Projects/CO_Denver_2020/tile_index/CO_Denver_2020_tile_index.geojson']
+
+            # A project without EPT bounds is searched in its state, then resolved from its tile index
+            results = tile_index_manager.find_tiles_intersecting_polygon(box(-106.3, 35.2, -106.2, 35.3))
+            assert list(results) == ['NM_TilesOnly_2019'] and 'NM_TilesOnly_2019' in index.names
+            assert 'NM_TilesOnly_2019/ept.json' not in opened
+
+            # A project without a footprint but with EPT bounds has them fetched by the search
+            index = ProjectFootprintIndex({'CO_Denver_2020': None}, {'CO_Denver_2020': project_region('CO_Denver_2020')})
+            project_footprints._footprint_index = index
+            opened.clear()
+            results = tile_index_manager.find_tiles_intersecting_polygon(box(-105.0, 39.8, -104.9, 39.9))
+            assert list(results) == ['CO_Denver_2020'] and index.names == ['CO_Denver_2020']
+            assert opened[0] == 'CO_Denver_2020/ept.json'
+
+            # The rebuild takes the footprint of the tile index the search cached
+            index = build_footprint_index(client, registry_path, refresh=True)
+            assert index.unresolved == ['PA_NoEpt_2019'] and 'NM_TilesOnly_2019' in index.names
+        finally:
+            tile_index_manager.initialize_s3_client = initialize_s3_client
+            tile_index_cache._tile_index_cache.close()
+            tile_index_cache._tile_index_cache = shared_cache
+            project_footprints._footprint_index = shared_index
+            tile_index_manager.TILE_INDEX_CACHE.clear()
+            tile_index_manager.SPATIAL_INDEX_CACHE.clear()
+            tile_index_manager.PROJECT_METADATA_CACHE.pop('all_projects', None)
+            if shared_projects is not None:
+                tile_index_manager.PROJECT_METADATA_CACHE['all_projects'] = shared_projects
+
+@mock_aws
+def test_first_search_does_not_wait_for_the_build():
+    client = make_bucket()
+    add_project(client, 'CO_Denver_2020', (-105.2, 39.5, -104.6, 40.1))
+
+    shared_index = project_footprints._footprint_index
+    paths = (project_footprints.DEFAULT_REGISTRY_PATH, project_footprints.BUILT_REGISTRY_PATH)
+    shared_projects = tile_index_manager.PROJECT_METADATA_CACHE.pop('all_projects', None)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_footprints.DEFAULT_REGISTRY_PATH = os.path.join(temp_dir, 'lidar_registry.json')
+        project_footprints.BUILT_REGISTRY_PATH = os.path.join(temp_dir, 'lidar_registry.local.json')
+        write_placeholder_registry(project_footprints.DEFAULT_REGISTRY_PATH)
+        with open(project_footprints.DEFAULT_REGISTRY_PATH) as f:
+            shipped = f.read()
+        project_footprints._footprint_index = None
+        try:
+            # The shipped placeholders are returned at once, limited to the project's state
+            first = project_footprints.get_project_footprint_index(client)
+            assert first.unresolved == ['CO_Denver_2020']
+            assert first.query(box(-105.0, 39.8, -104.9, 39.9)) == ['CO_Denver_2020']
+            assert first.query(box(-70.0, 44.0, -69.9, 44.1)) == []
+
+            deadline = time.time() + 30
+            while project_footprints._footprint_index is first and time.time() < deadline:
+                time.sleep(0.05)
+            built = project_footprints.get_project_footprint_index(client)
+            assert built.names == ['CO_Denver_2020'] and built.unresolved == []
+
+            # The build is saved next to the shipped registry, which is left as it was
+            with open(project_footprints.DEFAULT_REGISTRY_PATH) as f:
+                assert f.read() == shipped
+            assert os.path.exists(project_footprints.BUILT_REGISTRY_PATH)
+        finally:
+            project_footprints.DEFAULT_REGISTRY_PATH, project_footprints.BUILT_REGISTRY_PATH = paths
+            project_footprints._footprint_index = shared_index
+            tile_index_manager.PROJECT_METADATA_CACHE.pop('all_projects', None)
+            if shared_projects is not None:
+                tile_index_manager.PROJECT_METADATA_CACHE['all_projects'] = shared_projects
+
+@mock_aws
+def test_stale_index_is_refreshed_in_the_background():
+    client = make_bucket()
+    add_project(client, 'CO_Denver_2020', (-105.2, 39.5, -104.6, 40.1))
+    add_project(client, 'CO_Boulder_2021', (-105.4, 39.9, -105.1, 40.1))
+
+    shared_index = project_footprints._footprint_index
+    registry_path = project_footprints.BUILT_REGISTRY_PATH
+    shared_projects = tile_index_manager.PROJECT_METADATA_CACHE.pop('all_projects', None)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_footprints.BUILT_REGISTRY_PATH = os.path.join(temp_dir, 'lidar_registry.local.json')
+        with open(project_footprints.BUILT_REGISTRY_PATH, 'w') as f:
+            json.dump({'generated': False, 'projects_listed_at': 0, 'resources': [
+                {'name': 'CO_Denver_2020', 'tile_index': True,
+                 'boundary': {'geometry': mapping(box(-105.2, 39.5, -104.6, 40.1))}}]}, f)
+        project_footprints._footprint_index = None
+        try:
+            # The first call answers from the registry as it is
+            first = project_footprints.get_project_footprint_index(client)
+            assert first.names == ['CO_Denver_2020'] and first.unresolved == []
+
+            deadline = time.time() + 30
+            while project_footprints._footprint_index is first and time.time() < deadline:
+                time.sleep(0.05)
+            refreshed = project_footprints.get_project_footprint_index(client)
+            assert refreshed is not first and sorted(refreshed.names) == ['CO_Boulder_2021', 'CO_Denver_2020']
+        finally:
+            project_footprints.BUILT_REGISTRY_PATH = registry_path
+            project_footprints._footprint_index = shared_index
+            tile_index_manager.PROJECT_METADATA_CACHE.pop('all_projects', None)
+            if shared_projects is not None:
+                tile_index_manager.PROJECT_METADATA_CACHE['all_projects'] = shared_projects
+
+def test_every_unresolved_project_is_searched():
+    index = ProjectFootprintIndex({f'Project_{i:02d}': None for i in range(25)})
+    assert len(index.query(box(0, 0, 1, 1))) == 25
+    index.resolve('Project_00', None)
+    index.resolve('Project_01', box(0, 0, 1, 1))
+    assert index.query(box(0.5, 0.5, 2, 2)) == [f'Project_{i:02d}' for i in range(1, 25)]
+    assert index.query(box(5, 5, 6, 6)) == [f'Project_{i:02d}' for i in range(2, 25)]
+    assert len(index) == 24
+
+def test_unresolved_projects_are_limited_to_their_states():
+    assert project_region('USGS_LPC_CO_Denver_2020').contains(box(-105.0, 39.8, -104.9, 39.9))
+    # Several states, and Alaska across the antimeridian
+    region = project_region('VA-WV_ShenandoahValley_2011')
+    assert region.contains(box(-78.9, 38.4, -78.8, 38.5)) and region.contains(box(-80.1, 39.6, -80.0, 39.7))
+    assert project_region('ARRA-AK_EkluntaGlacier_2010').contains(box(173.0, 52.8, 173.1, 52.9))
+    # The registry's state is used when the name has none; unknown states can be anywhere
+    assert project_region('Guam_2012', {'state': 'GU'}).contains(box(144.7, 13.4, 144.8, 13.5))
+    assert project_region('US_MexicanBorder_UTM13_2007', {'state': 'US'}) is None
+
+    index = ProjectFootprintIndex({'CO_Denver_2020': None, 'Guam_2012': None},
+                                  {'CO_Denver_2020': project_region('CO_Denver_2020')})
+    assert index.query(box(-70.0, 44.0, -69.9, 44.1)) == ['Guam_2012']
+    assert index.resolved_for(box(-70.0, 44.0, -69.9, 44.1)) is False
+    index.resolve('Guam_2012', None)
+    assert index.resolved_for(box(-70.0, 44.0, -69.9, 44.1)) and not index.complete
+
+if __name__ == "__main__":
+    for test in (test_ept_footprint_covers_bounds, test_search_opens_only_covering_projects,
+                 test_first_search_does_not_wait_for_the_build, test_stale_index_is_refreshed_in_the_background,
+                 test_every_unresolved_project_is_searched, test_unresolved_projects_are_limited_to_their_states):
+        test()
+        print(f"✅ {test.__name__}")
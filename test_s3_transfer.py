@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test: S3 Transfer Backend
+
+Uses moto's in-memory S3 to check that S3RangeDownloader fetches objects as
+concurrent ranged GETs within the shared connection budget, skips complete
+files by ETag, resumes partial downloads, honours the bandwidth limit, and
+that AWSDownloader downloads through it.
+
+Run with pytest or directly: python test_s3_transfer.py
+"""
+
+import os
+import time
+import tempfile
+import threading
+
+import boto3
+from moto import mock_aws
+
+from utilities.s3_transfer import S3RangeDownloader, TransferBudget, recorded_etag
+from utilities.aws_downloader import AWSDownloader
+
+BUCKET = 'usgs-lidar'
+
+class CountingBudget(TransferBudget):
+    """Budget that records the peak number of connections in use"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.peak = 0
+        self.count_lock = threading.Lock()
+
+    def connection(self):
+        budget = self
+        slot = super().connection()
+
+        class Counted:
+            def __enter__(self):
+                slot.__enter__()
+                with budget.count_lock:
+                    budget.active += 1
+                    budget.peak = max(budget.peak, budget.active)
+
+            def __exit__(self, *exc):
+                with budget.count_lock:
+                    budget.active -= 1
+                return slot.__exit__(*exc)
+
+        return Counted()
+
+def make_client():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+    return client
+
+def count_gets(client):
+    calls = []
+    client.meta.events.register('before-call.s3.GetObject', lambda **kwargs: calls.append(1))
+    return calls
+
+@mock_aws
+def test_ranged_download_budget_and_etag_skip():
+    client = make_client()
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    client.put_object(Bucket=BUCKET, Key='Projects/CO_Test/tile.laz', Body=data)
+    gets = count_gets(client)
+    budget = CountingBudget(max_connections=3)
+    transfer = S3RangeDownloader(client, max_connections=6, segment_size=256 * 1024,
+                                 min_segmented_size=0, budget=budget)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'CO_Test', 'tile.laz')
+        result = transfer.download_object(BUCKET, 'Projects/CO_Test/tile.laz', path)
+        assert result.status == 'complete'
+        with open(path, 'rb') as f:
+            assert f.read() == data
+        assert len(gets) == 13  # one ranged GET per 256 KB part
+        assert 1 < budget.peak <= 3
+        assert recorded_etag(path) == client.head_object(Bucket=BUCKET, Key='Projects/CO_Test/tile.laz')['ETag']
+
+        # Complete and unchanged: skipped without any GET
+        result = transfer.download_object(BUCKET, 'Projects/CO_Test/tile.laz', path)
+        assert result.status == 'complete' and result.bytes_downloaded == 0 and len(gets) == 13
+
+        # Same size but a new ETag on the server: downloaded again
+        new_data = os.urandom(len(data))
+        client.put_object(Bucket=BUCKET, Key='Projects/CO_Test/tile.laz', Body=new_data)
+        result = transfer.download_object(BUCKET, 'Projects/CO_Test/tile.laz', path)
+        assert result.status == 'complete' and result.bytes_downloaded == len(new_data)
+        with open(path, 'rb') as f:
+            assert f.read() == new_data
+
+@mock_aws
+def test_resume_partial_download():
+    client = make_client()
+    data = os.urandom(2 * 1024 * 1024)
+    client.put_object(Bucket=BUCKET, Key='tile.laz', Body=data)
+    budget = TransferBudget(max_connections=4)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'tile.laz')
+        seen = []
+        transfer = S3RangeDownloader(client, max_connections=2, segment_size=256 * 1024,
+                                     min_segmented_size=0, budget=budget)
+        result = transfer.download_object(BUCKET, 'tile.laz', path,
+                                          progress_callback=lambda done, total: seen.append(done),
+                                          should_stop=lambda: bool(seen) and seen[-1] > 600 * 1024)
+        assert result.status == 'stopped'
+        assert os.path.exists(path + '.part.json')
+
+        result = S3RangeDownloader(client, max_connections=4, segment_size=256 * 1024,
+                                   min_segmented_size=0, budget=budget).download_object(BUCKET, 'tile.laz', path)
+        assert result.status == 'complete'
+        assert result.bytes_downloaded < len(data)
+        with open(path, 'rb') as f:
+            assert f.read() == data
+
+@mock_aws
+def test_bandwidth_limit_and_multipart_object():
+    client = make_client()
+    part = os.urandom(5 * 1024 * 1024)
+    upload = client.create_multipart_upload(Bucket=BUCKET, Key='multi.laz')
+    parts = []
+    for number in (1, 2):
+        response = client.upload_part(Bucket=BUCKET, Key='multi.laz', UploadId=upload['UploadId'],
+                                      PartNumber=number, Body=part)
+        parts.append({'PartNumber': number, 'ETag': response['ETag']})
+    client.complete_multipart_upload(Bucket=BUCKET, Key='multi.laz', UploadId=upload['UploadId'],
+                                     MultipartUpload={'Parts': parts})
+
+    budget = TransferBudget(max_connections=4, bandwidth_limit=8 * 1024 * 1024)
+    transfer = S3RangeDownloader(client, segment_size=1024 * 1024, min_segmented_size=0, budget=budget)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'multi.laz')
+        start = time.time()
+        result = transfer.download_object(BUCKET, 'multi.laz', path)
+        assert result.status == 'complete'
+        assert time.time() - start >= 0.9  # 10 MB at 8 MB/s
+        assert os.path.getsize(path) == 2 * len(part)
+        assert recorded_etag(path).endswith('-2"')
+
+@mock_aws
+def test_aws_downloader_uses_shared_backend():
+    client = make_client()
+    tiles = {f'Projects/CO_Test/LAZ/tile_{i}.laz': os.urandom(100 * 1024 + i) for i in range(4)}
+    for key, body in tiles.items():
+        client.put_object(Bucket=BUCKET, Key=key, Body=body)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        downloader = AWSDownloader(temp_dir, s3_client=client)
+        for key in tiles:
+            downloader.add_file_to_queue({'downloadURL': f's3://{BUCKET}/{key}', 'projectName': 'CO_Test'})
+        downloader.start_download(num_threads=2)
+        downloader.download_queue.join()
+        downloader.stop_download()
+
+        for key, body in tiles.items():
+            with open(os.path.join(temp_dir, 'CO_Test', os.path.basename(key)), 'rb') as f:
+                assert f.read() == body
+
+if __name__ == "__main__":
+    for test in (test_ranged_download_budget_and_etag_skip, test_resume_partial_download,
+                 test_bandwidth_limit_and_multipart_object, test_aws_downloader_uses_shared_backend):
+        test()
+        print(f"✅ {test.__name__}")
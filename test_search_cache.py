@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test: AWS Search Cache
+
+Uses moto's in-memory S3 to check that repeating an AWS corridor search is
+answered from the result cache, that a slightly wider corridor reuses the
+per-project tile-to-LAZ cache without any S3 request, that results found
+while projects lack a footprint are not cached, and that both cache levels
+expire and evict their least recently used entries.
+
+Run with pytest or directly: python test_search_cache.py
+"""
+
+import os
+import time
+import tempfile
+from datetime import date, timedelta
+
+import boto3
+import geopandas as gpd
+from moto import mock_aws
+from shapely.geometry import box
+
+import utilities.aws_search as aws_search
+import utilities.search_cache as search_cache
+import utilities.tile_index_cache as tile_index_cache
+import utilities.project_footprints as project_footprints
+import utilities.tile_index_manager as tile_index_manager
+from utilities.search_cache import SearchCache, make_search_key
+from utilities.tile_index_cache import TileIndexCache
+from utilities.project_footprints import ProjectFootprintIndex
+
+BUCKET = 'usgs-lidar-public'
+PROJECT = 'CO_Corridor_2020'
+
+def corridor(width):
+    """Polygon points (lat, lon) of an east-west corridor"""
+    return [(40.005 - width, -105.0), (40.005 - width, -104.93), (40.005 + width, -104.93),
+            (40.005 + width, -105.0), (40.005 - width, -105.0)]
+
+def count_calls(client):
+    calls = []
+    client.meta.events.register('before-call.s3', lambda model, **kwargs: calls.append(model.name))
+    return calls
+
+@mock_aws
+def test_repeated_and_near_duplicate_searches():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+
+    tiles = gpd.GeoDataFrame(
+        {'tile_id': [f'{PROJECT}_{col:02d}' for col in range(10)]},
+        geometry=[box(-105.0 + col * 0.01, 40.0, -104.99 + col * 0.01, 40.01) for col in range(10)],
+        crs='EPSG:4326'
+    )
+    client.put_object(Bucket=BUCKET, Key=f'Projects/{PROJECT}/tile_index/{PROJECT}_tile_index.geojson',
+                      Body=tiles.to_json(drop_id=True).encode())
+    for tile_id in tiles.tile_id:
+        client.put_object(Bucket=BUCKET, Key=f'Projects/{PROJECT}/laz/{tile_id}.laz', Body=b'laz')
+
+    patched = {module: module.initialize_s3_client for module in (aws_search, tile_index_manager)}
+    shared = (tile_index_cache._tile_index_cache, project_footprints._footprint_index, search_cache._search_cache)
+    window = (date.today() - timedelta(days=1), date.today() + timedelta(days=1))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for module in patched:
+            module.initialize_s3_client = lambda: client
+        tile_index_cache._tile_index_cache = TileIndexCache(os.path.join(temp_dir, 'tile_indexes'))
+        project_footprints._footprint_index = ProjectFootprintIndex({PROJECT: box(-105.0, 40.0, -104.9, 40.01)})
+        search_cache._search_cache = SearchCache(os.path.join(temp_dir, 'search_cache.db'))
+        try:
+            calls = count_calls(client)
+            result = aws_search.search_aws_lidar(corridor(0.001), *window)
+            assert result['total'] == 8
+            assert 'ListObjectsV2' in calls
+
+            # The same search again: no S3 requests at all
+            calls.clear()
+            assert aws_search.search_aws_lidar(corridor(0.001), *window)['total'] == 8
+            assert calls == []
+
+            # Same path, slightly wider: new result, tiles come from the project cache
+            calls.clear()
+            tile_index_manager.TILE_INDEX_CACHE.clear()
+            tile_index_manager.SPATIAL_INDEX_CACHE.clear()
+            wider = aws_search.search_aws_lidar(corridor(0.002), *window)
+            assert wider['total'] == 8
+            assert calls == []
+            assert search_cache._search_cache.stats()['results'] == 2
+
+            # A different date window is a different search
+            calls.clear()
+            assert aws_search.search_aws_lidar(corridor(0.001), date(2000, 1, 1), date(2000, 12, 31)).get('total', 0) == 0
+
+            # Results found while projects lack a footprint are not cached
+            search_cache._search_cache.clear()
+            project_footprints._footprint_index = ProjectFootprintIndex({PROJECT: None})
+            assert aws_search.search_aws_lidar(corridor(0.003), *window)['total'] == 8
+            assert search_cache._search_cache.stats()['results'] == 0
+            # The search resolved the footprint, so the next one is cached
+            assert project_footprints._footprint_index.complete
+            assert aws_search.search_aws_lidar(corridor(0.003), *window)['total'] == 8
+            assert search_cache._search_cache.stats()['results'] == 1
+        finally:
+            for module, function in patched.items():
+                module.initialize_s3_client = function
+            search_cache._search_cache.close()
+            tile_index_cache._tile_index_cache.close()
+            tile_index_cache._tile_index_cache, project_footprints._footprint_index, search_cache._search_cache = shared
+            tile_index_manager.TILE_INDEX_CACHE.clear()
+            tile_index_manager.SPATIAL_INDEX_CACHE.clear()
+
+def test_search_key_ttl_and_eviction():
+    square = box(-105.0, 40.0, -104.9, 40.1)
+    # Ring start, orientation and sub-precision noise don't change the key
+    assert make_search_key(square, date(2020, 1, 1), None, False) == \
+        make_search_key(box(-105.0, 40.0, -104.9, 40.1 + 1e-9, ccw=False), date(2020, 1, 1), None, False)
+    assert make_search_key(square, None, None, False) != make_search_key(square, None, None, True)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = SearchCache(os.path.join(temp_dir, 'search_cache.db'), max_results=2, max_projects=1)
+        for i in range(3):
+            cache.put_result(f'search_{i}', {'items': [], 'total': i})
+            time.sleep(0.01)
+        assert cache.get_result('search_0') is None
+        assert cache.get_result('search_2')['total'] == 2
+
+        cache.put_project_files('A', [{'key': 'a.laz', 'last_modified': date.today().isoformat()}])
+        cache.put_tile_files('A', {'a': [{'key': 'a.laz'}], 'b': []})
+        assert cache.get_tile_files('A', ['a', 'b', 'c']) == {'a': [{'key': 'a.laz'}], 'b': []}
+        time.sleep(0.01)
+        cache.put_project_files('B', [])
+        assert cache.get_project_files('A') is None and cache.get_tile_files('A', ['a']) == {}
+        cache.close()
+
+        expired = SearchCache(os.path.join(temp_dir, 'search_cache.db'), result_ttl_hours=0, project_ttl_days=0)
+        assert expired.get_result('search_2') is None and expired.get_project_files('B') is None
+        expired.close()
+
+if __name__ == "__main__":
+    for test in (test_repeated_and_near_duplicate_searches, test_search_key_ttl_and_eviction):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test: State Boundary Lookups
+
+Builds a StateBoundaries instance over a few rectangular "states" in a
+temporary data directory and checks that the vectorized determine_states
+agrees with find_state point by point (nearest state outside every state,
+None without nearest), and that the JSON state index is reused by a new
+instance, rebuilt when the boundary file changes and when it is corrupt.
+
+Run with pytest or directly: python test_state_boundaries.py
+"""
+
+import os
+import json
+import random
+import tempfile
+
+from shapely.geometry import box
+
+from state_boundaries import StateBoundaries
+
+STATES = [
+    ('CO', 'Colorado', 'West', box(-109, 37, -102, 41)),
+    ('KS', 'Kansas', 'Midwest', box(-102, 37, -94.6, 40)),
+    ('NM', 'New Mexico', 'Southwest', box(-109, 31.3, -103, 37))
+]
+
+def write_states(data_dir, states=STATES):
+    with open(os.path.join(data_dir, 'us_states_simplified.json'), 'w') as f:
+        json.dump([{'state_code': code, 'state_name': name, 'region': region, 'geometry': geometry.wkt}
+                   for code, name, region, geometry in states], f)
+
+def test_determine_states_matches_find_state():
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_states(data_dir)
+        boundaries = StateBoundaries(data_dir)
+        lats = [rng.uniform(30, 43) for _ in range(500)]
+        lons = [rng.uniform(-112, -92) for _ in range(500)]
+
+        states = boundaries.determine_states(lats, lons)
+        assert states == [boundaries.find_state(lat, lon) for lat, lon in zip(lats, lons)]
+        assert boundaries.determine_states([39.0], [-105.0]) == [{'state_code': 'CO', 'state_name': 'Colorado',
+                                                                  'region': 'West'}]
+        # Points outside every state get the nearest one, or None
+        assert boundaries.determine_states([38.5, 45.0], [-90.0, -105.0]) == \
+            [boundaries.find_state(38.5, -90.0), boundaries.find_state(45.0, -105.0)]
+        assert [s['state_code'] for s in boundaries.determine_states([38.5, 45.0], [-90.0, -105.0])] == ['KS', 'CO']
+        assert boundaries.determine_states([38.5, 39.0], [-90.0, -105.0], nearest=False)[0] is None
+        assert boundaries.determine_state_from_coordinates(39.00001, -105.0)['state_code'] == 'CO'
+        assert boundaries.get_state_bounds('kansas') == {'min_lat': 37, 'max_lat': 40, 'min_lon': -102, 'max_lon': -94.6}
+
+        try:
+            boundaries.determine_states([39.0, 40.0], [-105.0])
+            assert False, "mismatched lengths accepted"
+        except ValueError:
+            pass
+
+def test_state_index_is_cached_and_rebuilt():
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_states(data_dir)
+        assert StateBoundaries(data_dir).find_state(36, -106)['state_code'] == 'NM'
+        index_path = os.path.join(data_dir, 'us_states_index.json')
+        with open(index_path) as f:
+            assert len(json.load(f)['geometries']) == 3
+
+        # A new instance reuses the index without parsing the boundary file's geometries
+        cached = StateBoundaries(data_dir)
+        cached.build_state_index = None  # a rebuild would raise TypeError
+        assert cached.find_state(39, -100)['state_code'] == 'KS'
+
+        # A changed boundary file invalidates the index
+        write_states(data_dir, STATES + [('OK', 'Oklahoma', 'Southwest', box(-103, 33.6, -94.4, 37))])
+        assert StateBoundaries(data_dir).find_state(35, -98)['state_code'] == 'OK'
+        with open(index_path) as f:
+            assert len(json.load(f)['geometries']) == 4
+
+        # A corrupt index is rebuilt rather than trusted
+        with open(index_path, 'w') as f:
+            f.write('not json')
+        assert StateBoundaries(data_dir).find_state(35, -98)['state_code'] == 'OK'
+        with open(index_path) as f:
+            assert len(json.load(f)['records']) == 4
+
+if __name__ == "__main__":
+    for test in (test_determine_states_matches_find_state, test_state_index_is_cached_and_rebuilt):
+        test()
+        print(f"✅ {test.__name__}")
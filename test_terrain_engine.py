@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test: Local DEM Terrain Engine
+
+Builds small synthetic GeoTIFFs and checks that TerrainEngine samples them
+with bilinear interpolation, honours DEM priority and nodata, reprojects for
+projected DEMs, and returns a 1 m spaced 50 km profile quickly.
+
+Run with pytest or directly: python test_terrain_engine.py
+"""
+
+import os
+import time
+import tempfile
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from utilities.terrain_engine import TerrainEngine
+
+def plane(x, y):
+    """Linear surface, reproduced exactly by bilinear interpolation"""
+    return 1000.0 + 2.0 * x - 3.0 * y
+
+def write_geographic_dem(path, west, north, pixel_deg, width, height, nodata=None, values=None):
+    """Write a EPSG:4326 GeoTIFF whose pixel centres follow plane(lon, lat) unless values are given"""
+    transform = from_origin(west, north, pixel_deg, pixel_deg)
+    if values is None:
+        cols, rows = np.meshgrid(np.arange(width), np.arange(height))
+        lons, lats = transform * (cols + 0.5, rows + 0.5)
+        values = plane(np.asarray(lons), np.asarray(lats))
+    with rasterio.open(path, 'w', driver='GTiff', width=width, height=height, count=1,
+                       dtype='float32', crs='EPSG:4326', transform=transform, nodata=nodata,
+                       tiled=True, blockxsize=256, blockysize=256) as dst:
+        dst.write(values.astype('float32'), 1)
+
+def test_bilinear_sampling_on_plane():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'dem.tif')
+        write_geographic_dem(path, -100.0, 40.0, 0.001, 200, 200)
+        engine = TerrainEngine(dem_paths=[path])
+
+        rng = np.random.default_rng(1)
+        lons = rng.uniform(-99.999, -99.801, 500)
+        lats = rng.uniform(39.801, 39.999, 500)
+        elevations = engine.sample_elevations(lats, lons)
+        # float32 storage limits the precision of the stored plane
+        assert np.allclose(elevations, plane(lons, lats), atol=1e-3)
+
+        outside = engine.sample_elevations([41.0], [-99.9])
+        assert np.isnan(outside[0])
+        engine.close()
+
+def test_priority_and_nodata_fallthrough():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        primary = os.path.join(temp_dir, 'primary.tif')
+        secondary = os.path.join(temp_dir, 'secondary.tif')
+        values = np.full((100, 100), 50.0)
+        values[:, 50:] = -9999.0
+        write_geographic_dem(primary, -100.0, 40.0, 0.001, 100, 100, nodata=-9999.0, values=values)
+        write_geographic_dem(secondary, -100.0, 40.0, 0.001, 100, 100, values=np.full((100, 100), 75.0))
+        engine = TerrainEngine(dem_paths=[primary, secondary])
+
+        elevations = engine.sample_elevations([39.95, 39.95], [-99.98, -99.92])
+        assert elevations[0] == 50.0
+        assert elevations[1] == 75.0
+        engine.close()
+
+def test_projected_dem_in_feet():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'dtm_ft.tif')
+        # Colorado North state plane (US feet), constant 5280 ft surface
+        transform = from_origin(3100000, 1700000, 10, 10)
+        with rasterio.open(path, 'w', driver='GTiff', width=100, height=100, count=1, dtype='float32',
+                           crs='EPSG:2231', transform=transform) as dst:
+            dst.write(np.full((1, 100, 100), 5280.0, dtype='float32'))
+
+        engine = TerrainEngine(dem_paths=[path])
+        min_lon, min_lat, max_lon, max_lat = engine.sources[0].bounds_wgs84
+        elevation = engine.sample_elevations([(min_lat + max_lat) / 2], [(min_lon + max_lon) / 2])[0]
+        assert abs(elevation - 5280.0 * 0.3048) < 1e-3
+        engine.close()
+
+def test_one_meter_profile_over_50km_is_fast():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # ~10 m pixels (1/3 arc-second) covering 0.5 x 0.5 degrees
+        path = os.path.join(temp_dir, 'dem_3dep.tif')
+        write_geographic_dem(path, -100.0, 40.0, 1 / 10800, 5400, 5400)
+        engine = TerrainEngine(dem_paths=[path])
+
+        start = time.perf_counter()
+        distances, lats, lons, elevations = engine.get_profile((39.99, -99.99), (39.61, -99.58), spacing_m=1.0)
+        elapsed = time.perf_counter() - start
+
+        assert distances[-1] > 50000
+        assert len(elevations) > 50000
+        assert not np.isnan(elevations).any()
+        assert np.allclose(elevations, plane(lons, lats), atol=1e-2)
+        assert elapsed < 1.0, f"profile took {elapsed:.2f}s"
+        engine.close()
+
+if __name__ == "__main__":
+    for test in (test_bilinear_sampling_on_plane, test_priority_and_nodata_fallthrough,
+                 test_projected_dem_in_feet, test_one_meter_profile_over_50km_is_fast):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test: Persistent Tile Index Cache
+
+Uses moto's in-memory S3 to check that project tile indexes (GeoJSON and a
+projected shapefile with sidecars) are parsed once into FlatGeobuf, that a
+cold-start search reads them from disk without any S3 request, that stale
+entries are revalidated with a conditional HEAD, that a changed index is
+rebuilt, and that an S3 error does not record a project as having no tile
+index.
+
+Run with pytest or directly: python test_tile_index_cache.py
+"""
+
+import os
+import tempfile
+
+import boto3
+import geopandas as gpd
+from botocore.exceptions import EndpointConnectionError
+from moto import mock_aws
+from shapely.geometry import box
+
+import utilities.tile_index_cache as tile_index_cache
+import utilities.project_footprints as project_footprints
+import utilities.tile_index_manager as tile_index_manager
+from utilities.tile_index_cache import TileIndexCache
+from utilities.project_footprints import ProjectFootprintIndex
+
+BUCKET = 'usgs-lidar-public'
+
+def tile_grid(project, origin=(-105.0, 40.0), count=10, size=0.01):
+    tiles = [{'tile_id': f'{project}_{row}_{col}',
+              'geometry': box(origin[0] + col * size, origin[1] + row * size,
+                              origin[0] + (col + 1) * size, origin[1] + (row + 1) * size)}
+             for row in range(count) for col in range(count)]
+    return gpd.GeoDataFrame(tiles, crs='EPSG:4326')
+
+def upload_geojson(client, key, gdf):
+    client.put_object(Bucket=BUCKET, Key=key, Body=gdf.to_json(drop_id=True).encode())
+
+def upload_shapefile(client, prefix, gdf, work_dir):
+    path = os.path.join(work_dir, 'tile_index.shp')
+    gdf.to_file(path)
+    for ext in ('.shp', '.shx', '.dbf', '.prj'):
+        with open(os.path.splitext(path)[0] + ext, 'rb') as f:
+            client.put_object(Bucket=BUCKET, Key=prefix + 'tile_index' + ext, Body=f.read())
+
+def count_calls(client, operation):
+    calls = []
+    client.meta.events.register(f'before-call.s3.{operation}', lambda **kwargs: calls.append(1))
+    return calls
+
+def reset_memory_caches():
+    tile_index_manager.TILE_INDEX_CACHE.clear()
+    tile_index_manager.SPATIAL_INDEX_CACHE.clear()
+
+@mock_aws
+def test_tile_indexes_are_cached_on_disk():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+    initialize_s3_client = tile_index_manager.initialize_s3_client
+    shared_cache = tile_index_cache._tile_index_cache
+    shared_index = project_footprints._footprint_index
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        upload_geojson(client, 'Projects/CO_Json/tile_index/CO_Json_tile_index.geojson', tile_grid('CO_Json'))
+        upload_shapefile(client, 'Projects/CO_Shp/tile_index/',
+                         tile_grid('CO_Shp', origin=(-105.0475, 40.0025)).to_crs('EPSG:26913'), temp_dir)
+        projects = ['CO_Json', 'CO_Shp', 'CO_Empty']
+        search_polygon = box(-105.0, 40.0, -104.985, 40.015)
+
+        tile_index_manager.initialize_s3_client = lambda: client
+        tile_index_cache._tile_index_cache = TileIndexCache(os.path.join(temp_dir, 'cache'))
+        # No footprints: every listed project is searched
+        project_footprints._footprint_index = ProjectFootprintIndex({})
+        try:
+            reset_memory_caches()
+            results = tile_index_manager.find_tiles_intersecting_polygon(search_polygon, projects)
+            json_tiles = sorted(t['file_id'] for t in results['CO_Json'])
+            assert json_tiles == ['CO_Json_0_0', 'CO_Json_0_1', 'CO_Json_1_0', 'CO_Json_1_1']
+            assert {t['file_id'] for t in results['CO_Shp']} == {f'CO_Shp_{row}_{col}' for row in (0, 1) for col in (4, 5, 6)}
+
+            # Cold start: everything comes from the FlatGeobuf files, no S3 requests
+            reset_memory_caches()
+            tile_index_cache._tile_index_cache = TileIndexCache(os.path.join(temp_dir, 'cache'))
+            gets, lists, heads = (count_calls(client, op) for op in ('GetObject', 'ListObjectsV2', 'HeadObject'))
+            cached = tile_index_manager.find_tiles_intersecting_polygon(search_polygon, projects)
+            assert sorted(t['file_id'] for t in cached['CO_Json']) == json_tiles
+            assert not gets and not lists and not heads
+
+            # Only the tiles around the search area are read from disk
+            partial = tile_index_manager.build_spatial_index_for_project('CO_Json', search_polygon.bounds)
+            assert 4 <= len(partial) < 100
+
+            # Stale entries are revalidated with a conditional HEAD only
+            reset_memory_caches()
+            tile_index_cache._tile_index_cache = TileIndexCache(os.path.join(temp_dir, 'cache'), revalidate_hours=0)
+            tile_index_manager.find_tiles_intersecting_polygon(search_polygon, ['CO_Json'])
+            assert len(heads) == 1 and not gets and not lists
+
+            # A changed index on S3 is downloaded and parsed again
+            reset_memory_caches()
+            upload_geojson(client, 'Projects/CO_Json/tile_index/CO_Json_tile_index.geojson',
+                           tile_grid('CO_Json', count=2))
+            index = tile_index_manager.get_tile_index_for_project('CO_Json')
+            assert len(index) == 4 and len(gets) == 1
+        finally:
+            tile_index_manager.initialize_s3_client = initialize_s3_client
+            tile_index_cache._tile_index_cache.close()
+            tile_index_cache._tile_index_cache = shared_cache
+            project_footprints._footprint_index = shared_index
+            reset_memory_caches()
+
+@mock_aws
+def test_s3_errors_are_not_cached_as_missing():
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    client = boto3.client('s3', region_name='us-west-2')
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'us-west-2'})
+    upload_geojson(client, 'Projects/CO_Json/tile_index/CO_Json_tile_index.geojson', tile_grid('CO_Json'))
+    shared_cache = tile_index_cache._tile_index_cache
+
+    def unreachable(**kwargs):
+        raise EndpointConnectionError(endpoint_url='https://s3.us-west-2.amazonaws.com')
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = tile_index_cache._tile_index_cache = TileIndexCache(os.path.join(temp_dir, 'cache'))
+        try:
+            # A failed listing or download leaves no entry behind
+            for operation in ('ListObjectsV2', 'GetObject'):
+                client.meta.events.register(f'before-call.s3.{operation}', unreachable)
+                assert tile_index_manager.get_cached_tile_index_entry('CO_Json', client) is None
+                assert cache.lookup('CO_Json') is None
+                client.meta.events.unregister(f'before-call.s3.{operation}', unreachable)
+
+            # So the next search finds the tile index
+            assert tile_index_manager.get_cached_tile_index_entry('CO_Json', client)['feature_count'] == 100
+
+            # An empty listing is a definite answer and is cached
+            assert tile_index_manager.get_cached_tile_index_entry('CO_Empty', client) is None
+            assert cache.lookup('CO_Empty') is not None
+        finally:
+            tile_index_cache._tile_index_cache.close()
+            tile_index_cache._tile_index_cache = shared_cache
+
+if __name__ == "__main__":
+    for test in (test_tile_indexes_are_cached_on_disk, test_s3_errors_are_not_cached_as_missing):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test: Vectorized vs Scalar Turbine Clearances
+
+Checks that TurbineClearanceCalculator.calculate_clearances_batch (and the
+calculate_turbine_clearances wrapper built on it) agree with the per-turbine
+_calculate_single_turbine_clearance reference to within 1e-6 ft, and that
+turbines with invalid data are skipped without failing the rest.
+
+Run with pytest or directly: python test_turbine_clearance_vectorized.py
+"""
+
+import random
+
+from utilities.turbine_clearance_calculator import (
+    TurbineClearanceCalculator, TurbineData, PathData
+)
+
+TOLERANCE = 1e-6
+
+FLOAT_FIELDS = [
+    'distance_to_path_m', 'distance_to_path_ft', 'distance_along_path_m', 'distance_along_path_ft',
+    'ground_elevation_ft', 'turbine_center_height_ft', 'path_height_straight_ft', 'path_height_curved_ft',
+    'earth_curvature_bulge_ft', 'fresnel_radius_ft',
+    'clearance_straight_ft', 'clearance_curved_ft', 'clearance_fresnel_ft',
+    'clearance_3d_straight_ft', 'clearance_3d_curved_ft', 'clearance_3d_fresnel_ft'
+]
+
+def make_turbines(path, count=500, seed=7):
+    """Random turbines scattered around (and beyond the ends of) the path"""
+    rng = random.Random(seed)
+    turbines = []
+    for i in range(count):
+        t = rng.uniform(-0.2, 1.2)
+        lat = path.start_lat + (path.end_lat - path.start_lat) * t + rng.uniform(-0.05, 0.05)
+        lon = path.start_lon + (path.end_lon - path.start_lon) * t + rng.uniform(-0.05, 0.05)
+        turbines.append(TurbineData(
+            id=f"T{i}",
+            latitude=lat,
+            longitude=lon,
+            total_height_m=rng.uniform(80, 200),
+            hub_height_m=rng.choice([None, rng.uniform(60, 120)]),
+            rotor_diameter_m=rng.choice([None, rng.uniform(70, 160)])
+        ))
+    return turbines
+
+def assert_results_match(calculator, turbines, path, elevation_data=None):
+    """Compare the vectorized wrapper against the scalar reference turbine by turbine"""
+    path_length_m = calculator._haversine_distance(path.start_lat, path.start_lon, path.end_lat, path.end_lon)
+    vectorized = calculator.calculate_turbine_clearances(turbines, path, elevation_data)
+    assert len(vectorized) == len(turbines)
+
+    for turbine, result in zip(turbines, vectorized):
+        expected = calculator._calculate_single_turbine_clearance(turbine, path, path_length_m, elevation_data)
+        assert result.turbine_id == expected.turbine_id
+        for name in FLOAT_FIELDS:
+            diff = abs(getattr(result, name) - getattr(expected, name))
+            assert diff <= TOLERANCE, f"{turbine.id} {name}: {getattr(result, name)} != {getattr(expected, name)}"
+        assert result.path_side == expected.path_side
+        assert result.has_los_clearance == expected.has_los_clearance
+        assert result.has_earth_clearance == expected.has_earth_clearance
+        assert result.has_fresnel_clearance == expected.has_fresnel_clearance
+
+def test_vectorized_matches_scalar():
+    path = PathData(40.0, -100.0, 40.35, -99.4, 1850.0, 1920.0, 180.0, 220.0, frequency_ghz=6.0)
+    assert_results_match(TurbineClearanceCalculator(), make_turbines(path), path)
+
+def test_vectorized_matches_scalar_with_elevation_profile():
+    path = PathData(35.1, -101.9, 35.0, -101.2, 3600.0, 3550.0, 150.0, 150.0)
+    elevation_data = [3600 + 40 * ((i % 17) - 8) for i in range(100)]
+    assert_results_match(TurbineClearanceCalculator(), make_turbines(path, seed=11), path, elevation_data)
+
+def test_vectorized_matches_scalar_for_zero_length_path():
+    path = PathData(41.0, -95.0, 41.0, -95.0, 1000.0, 1000.0, 100.0, 100.0)
+    assert_results_match(TurbineClearanceCalculator(), make_turbines(path, count=20, seed=3), path)
+
+def test_batch_structured_array_fields():
+    path = PathData(40.0, -100.0, 40.35, -99.4, 1850.0, 1920.0, 180.0, 220.0)
+    calculator = TurbineClearanceCalculator()
+    results = calculator.calculate_clearances_batch(
+        latitudes=[40.1, 40.2], longitudes=[-99.8, -99.6],
+        total_heights_m=[150.0, 160.0], rotor_diameters_m=[120.0, float('nan')],
+        path=path
+    )
+    assert results.shape == (2,)
+    assert set(FLOAT_FIELDS) <= set(results.dtype.names)
+
+def test_invalid_turbines_are_skipped_individually():
+    path = PathData(40.0, -100.0, 40.35, -99.4, 1850.0, 1920.0, 180.0, 220.0)
+    turbines = make_turbines(path, count=5)
+    turbines[1].total_height_m = 'unknown'
+    turbines[2].latitude = None
+    turbines[3].rotor_diameter_m = float('nan')
+    turbines[4].longitude = float('inf')
+    results = TurbineClearanceCalculator().calculate_turbine_clearances(turbines, path)
+    # The unknown rotor diameter defaults like None; the others are dropped
+    assert [r.turbine_id for r in results] == ['T0', 'T3']
+    assert TurbineClearanceCalculator().calculate_turbine_clearances(turbines[1:3], path) == []
+
+if __name__ == "__main__":
+    for test in (test_vectorized_matches_scalar, test_vectorized_matches_scalar_with_elevation_profile,
+                 test_vectorized_matches_scalar_for_zero_length_path, test_batch_structured_array_fields,
+                 test_invalid_turbines_are_skipped_individually):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test: State Turbine Search
+
+Checks that TurbineProcessor.find_state_turbines answers from the local
+turbine store when it can, falls back to the online endpoints when the
+store query fails (not only when there is no GeoJSON file), that the
+GeoJSON directory is only rescanned when it changes, and that importing the
+processor does not load the state boundaries.
+
+Run with pytest or directly: python test_turbine_processor.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+import state_boundaries
+from utilities.turbine_processor import TurbineProcessor
+from utilities.turbine_store import TurbineStore
+
+CO_BOUNDS = {'min_lat': 37.0, 'max_lat': 41.0, 'min_lon': -109.05, 'max_lon': -102.04}
+
+def write_geojson(path, turbines):
+    features = [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                 'properties': {'case_id': case_id, 't_state': state, 't_ttlh': 150}}
+                for case_id, lat, lon, state in turbines]
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+def make_processor(turbine_db_dir):
+    """TurbineProcessor without Tk widgets (no display is available here)"""
+    processor = TurbineProcessor.__new__(TurbineProcessor)
+    processor.map_widget = processor.root = processor.elevation_profile = None
+    processor.polygon_points = None
+    processor.turbine_markers = []
+    processor.last_turbines = []
+    processor.turbine_db_dir = turbine_db_dir
+    processor.geojson_dir = os.path.join(turbine_db_dir, 'uswtdbGeoJSON')
+    processor.geojson_file = None
+    processor._geojson_dir_mtime = None
+    processor.turbine_store = TurbineStore(os.path.join(turbine_db_dir, 'turbines.db'))
+    return processor
+
+def find_state_turbines(processor, online):
+    """find_state_turbines('CO') with canned state bounds and online endpoints"""
+    calls = []
+    get_state_bounds = state_boundaries.get_state_bounds
+    state_boundaries.get_state_bounds = lambda state: CO_BOUNDS if state == 'CO' else None
+    processor._query_state_turbines_online = lambda state, bounds: calls.append(state) or online
+    try:
+        return processor.find_state_turbines(state_name='CO'), calls
+    finally:
+        state_boundaries.get_state_bounds = get_state_bounds
+
+def test_store_answers_and_failures_fall_back_online():
+    online = [{'case_id': 'online', 'ylat': 39.0, 'xlong': -105.0, 't_state': 'CO'}]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        processor = make_processor(temp_dir)
+
+        # No GeoJSON file: online
+        turbines, calls = find_state_turbines(processor, online)
+        assert turbines == online and calls == ['CO']
+
+        os.makedirs(processor.geojson_dir)
+        write_geojson(os.path.join(processor.geojson_dir, 'uswtdb.geojson'),
+                      [(1, 39.5, -104.5, 'CO'), (2, 38.2, -98.0, 'KS'), (3, 40.1, -103.0, 'CO')])
+        turbines, calls = find_state_turbines(processor, online)
+        assert [t['case_id'] for t in turbines] == [1, 3] and calls == []
+
+        # The GeoJSON file exists but the store cannot be queried: online, not an empty result
+        def broken_query(**kwargs):
+            raise RuntimeError('database disk image is malformed')
+        processor.turbine_store.query = broken_query
+        turbines, calls = find_state_turbines(processor, online)
+        assert turbines == online and calls == ['CO']
+
+def test_geojson_directory_is_scanned_only_when_it_changes():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        processor = make_processor(temp_dir)
+        os.makedirs(processor.geojson_dir)
+        old_path = os.path.join(processor.geojson_dir, 'uswtdb_v1.geojson')
+        write_geojson(old_path, [(1, 39.5, -104.5, 'CO')])
+        os.utime(old_path, (1_600_000_000, 1_600_000_000))
+
+        scans = []
+        listdir = os.listdir
+        os.listdir = lambda path: scans.append(path) or listdir(path)
+        try:
+            for _ in range(5):
+                assert [t['case_id'] for t in processor._load_turbines_from_geojson(state_name='CO')] == [1]
+            assert len(scans) == 1
+
+            # A newer release dropped into the directory is picked up and replaces the store
+            write_geojson(os.path.join(processor.geojson_dir, 'uswtdb_v2.geojson'),
+                          [(1, 39.5, -104.5, 'CO'), (2, 40.5, -105.5, 'CO')])
+            assert [t['case_id'] for t in processor._load_turbines_from_geojson(state_name='CO')] == [1, 2]
+            assert len(scans) == 2
+        finally:
+            os.listdir = listdir
+
+def test_import_does_not_load_state_boundaries():
+    code = "import sys, utilities.turbine_processor; print('state_boundaries' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=120,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == 'False'
+
+if __name__ == "__main__":
+    for test in (test_store_answers_and_failures_fall_back_online,
+                 test_geojson_directory_is_scanned_only_when_it_changes,
+                 test_import_does_not_load_state_boundaries):
+        test()
+        print(f"✅ {test.__name__}")
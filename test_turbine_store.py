@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test: Persistent Turbine Store
+
+Builds a TurbineStore from a generated USWTDB-style GeoJSON file and checks
+bounding-box and state queries against a brute-force filter, that the store
+is rebuilt only when a different (newer) GeoJSON file is supplied, and that
+its metadata is read once per store file rather than once per query.
+
+Run with pytest or directly: python test_turbine_store.py
+"""
+
+import os
+import json
+import random
+import tempfile
+
+from utilities.turbine_store import TurbineStore
+
+STATES = ['CO', 'KS', 'NM', 'WY']
+
+def make_turbines(count=2000, seed=9):
+    rng = random.Random(seed)
+    return [{'case_id': i, 'ylat': round(rng.uniform(31, 45), 6), 'xlong': round(rng.uniform(-111, -94), 6),
+             't_state': rng.choice(STATES), 't_ttlh': rng.uniform(80, 200)} for i in range(count)]
+
+def write_geojson(path, turbines):
+    features = [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [t['xlong'], t['ylat']]},
+                 'properties': {k: v for k, v in t.items() if k not in ('ylat', 'xlong')}} for t in turbines]
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+def case_ids(turbines):
+    return sorted(t['case_id'] for t in turbines)
+
+def test_bbox_and_state_queries_match_brute_force():
+    turbines = make_turbines()
+    rng = random.Random(4)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        geojson_path = os.path.join(temp_dir, 'uswtdb.geojson')
+        write_geojson(geojson_path, turbines)
+        store = TurbineStore(os.path.join(temp_dir, 'turbines.db'))
+        assert store.ensure_current(geojson_path) and store.count() == len(turbines)
+
+        for _ in range(25):
+            min_lat, min_lon = rng.uniform(31, 44), rng.uniform(-111, -95)
+            max_lat, max_lon = min_lat + rng.uniform(0.1, 3), min_lon + rng.uniform(0.1, 3)
+            state = rng.choice(STATES + [None])
+            expected = [t for t in turbines if min_lat <= t['ylat'] <= max_lat and min_lon <= t['xlong'] <= max_lon
+                        and (state is None or t['t_state'] == state)]
+            found = store.query(min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon, state_name=state)
+            assert case_ids(found) == case_ids(expected)
+
+        assert case_ids(store.query(state_name='KS')) == case_ids(t for t in turbines if t['t_state'] == 'KS')
+        assert store.query(state_name='TX') == []
+        found = store.query(min_lat=31, max_lat=45, min_lon=-111, max_lon=-94)[0]
+        assert found['ylat'] == turbines[found['case_id']]['ylat'] and found['t_state'] == turbines[found['case_id']]['t_state']
+
+def test_rebuilt_only_for_a_different_file_and_metadata_read_once():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        old_path = os.path.join(temp_dir, 'uswtdb_v1.geojson')
+        write_geojson(old_path, make_turbines(100))
+        store = TurbineStore(os.path.join(temp_dir, 'turbines.db'))
+        assert store.ensure_current(old_path)
+
+        connects = []
+        connect = store._connect
+        store._connect = lambda db_path=None: connects.append(db_path) or connect(db_path)
+        for _ in range(5):
+            assert not store.ensure_current(old_path)
+            assert store.has_rtree() in (True, False)
+            store.query(state_name='CO')
+        # One metadata read, then only the queries themselves
+        assert len(connects) == 1 + 5
+
+        # A newer release in a new file replaces the store and its cached metadata
+        new_path = os.path.join(temp_dir, 'uswtdb_v2.geojson')
+        write_geojson(new_path, make_turbines(150, seed=10))
+        assert store.ensure_current(new_path) and store.count() == 150
+        assert store.is_current(new_path) and not store.is_current(old_path)
+        # The same file rewritten in place is a different release too
+        write_geojson(new_path, make_turbines(120, seed=11))
+        assert store.ensure_current(new_path) and store.count() == 120
+        assert not store.ensure_current(new_path)
+
+        # Another store object (e.g. another process) sees the rebuilt store
+        assert TurbineStore(store.db_path).is_current(new_path)
+
+if __name__ == "__main__":
+    for test in (test_bbox_and_state_queries_match_brute_force,
+                 test_rebuilt_only_for_a_different_file_and_metadata_read_once):
+        test()
+        print(f"✅ {test.__name__}")
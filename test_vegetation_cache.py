@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test: Earth Engine Vegetation Result Cache
+
+Checks that vegetation results are keyed on the rounded path endpoints,
+buffer, dataset and date window, that empty results are stored and found
+like any other, and that entries expire after the TTL.
+
+Run with pytest or directly: python test_vegetation_cache.py
+"""
+
+import os
+import time
+import tempfile
+
+from utilities.vegetation_cache import VegetationCache, make_key
+
+START, END = (39.7392, -104.9903), (39.7617, -104.8810)
+GEDI = 'LARSE/GEDI/GEDI02_A_002_MONTHLY'
+WINDOW = ('2019-01-01', '2024-12-31')
+
+def test_keys_round_endpoints_and_separate_queries():
+    key = make_key(START, END, 1000, GEDI, WINDOW)
+    # Differences below the rounding precision (~1 m) share an entry
+    assert make_key((39.739201, -104.990299), END, 1000.0, GEDI, list(WINDOW)) == key
+    assert make_key((39.7393, -104.9903), END, 1000, GEDI, WINDOW) != key
+    assert make_key(END, START, 1000, GEDI, WINDOW) != key
+    assert make_key(START, END, 500, GEDI, WINDOW) != key
+    assert make_key(START, END, 1000, GEDI, ('2020-01-01', '2024-12-31')) != key
+    assert make_key(START, END, 1000, 'UMD/hansen/global_forest_change_2021_v1_9') != key
+
+def test_results_and_empty_results_are_cached():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'vegetation_cache.db')
+        cache = VegetationCache(db_path)
+        rows = [['id', 'longitude', 'latitude', 'time', 'rh98'], ['a', -104.99, 39.74, 0, 12.5]]
+        try:
+            assert cache.get(make_key(START, END, 1000, GEDI, WINDOW)) == (False, None)
+            cache.put(make_key(START, END, 1000, GEDI, WINDOW), GEDI, rows)
+            cache.put(make_key(START, END, 1000, 'hansen'), 'hansen', None)
+            cache.put(make_key(START, END, 1000, 'modis'), 'modis', [])
+        finally:
+            cache.close()
+
+        # Results survive a new session; None and [] are hits, not misses
+        cache = VegetationCache(db_path)
+        try:
+            assert cache.get(make_key(START, END, 1000, GEDI, WINDOW)) == (True, rows)
+            assert cache.get(make_key(START, END, 1000, 'hansen')) == (True, None)
+            assert cache.get(make_key(START, END, 1000, 'modis')) == (True, [])
+            assert cache.get(make_key(START, END, 500, 'modis')) == (False, None)
+            assert (cache.hits, cache.misses) == (3, 1)
+
+            cache.clear()
+            assert cache.get(make_key(START, END, 1000, GEDI, WINDOW)) == (False, None)
+        finally:
+            cache.close()
+
+def test_entries_expire_after_ttl():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'vegetation_cache.db')
+        key = make_key(START, END, 1000, 'hansen')
+        cache = VegetationCache(db_path, ttl_days=1)
+        try:
+            cache.put(key, 'hansen', 42.0)
+            assert cache.get(key) == (True, 42.0)
+            with cache._lock:
+                cache._conn.execute("UPDATE ee_results SET created_at = ?", (time.time() - 2 * 86400,))
+                cache._conn.commit()
+            assert cache.get(key) == (False, None)
+        finally:
+            cache.close()
+
+        # Without a TTL old entries are kept
+        cache = VegetationCache(db_path, ttl_days=None)
+        try:
+            assert cache.get(key) == (True, 42.0)
+        finally:
+            cache.close()
+
+if __name__ == "__main__":
+    for test in (test_keys_round_endpoints_and_separate_queries,
+                 test_results_and_empty_results_are_cached,
+                 test_entries_expire_after_ttl):
+        test()
+        print(f"✅ {test.__name__}")
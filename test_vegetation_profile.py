@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test: Cached and Non-Blocking Vegetation Profiles
+
+Replaces the Earth Engine queries of VegetationProfiler with a stub and
+checks that a cached path is drawn without querying again, that empty
+results are cached so the fallback chain is not re-run, that a failed query
+is not cached and is retried (within a session only when asked to), that
+finished queries are not kept around, and that with block=False the profile is drawn
+with zeros while the query runs in the background and with the real heights
+once it has finished.
+
+Needs the Earth Engine and GDAL packages that vegetation_profile imports.
+
+Run with pytest or directly: python test_vegetation_profile.py
+"""
+
+import os
+import tempfile
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+import utilities.canopy_height as canopy_height
+import utilities.vegetation_cache as vegetation_cache
+import vegetation_profile
+from utilities.canopy_height import RasterCanopyBackend
+from utilities.vegetation_cache import VegetationCache
+from vegetation_profile import GEDI_DATASET, HANSEN_DATASET, MODIS_DATASET, VegetationProfiler
+
+START, END = (39.7392, -104.9903), (39.7617, -104.8810)
+DISTANCES = np.array([0.0, 50.0, 100.0])
+ELEVATIONS = np.array([5280.0, 5290.0, 5300.0])
+FEET = 3.28084
+
+GEDI_ROWS = [['id', 'longitude', 'latitude', 'time', 'rh98'],
+             ['a', -104.99, 39.74, 0, 10.0],
+             ['b', -104.93, 39.75, 0, 20.0]]
+
+# Earth Engine only builds the query region; the stubbed queries ignore it
+FAKE_EE = SimpleNamespace(Geometry=SimpleNamespace(
+    LineString=lambda coords: SimpleNamespace(buffer=lambda distance: ('roi', tuple(map(tuple, coords)), distance))))
+
+class StubQueries:
+    """Stand-in for VegetationProfiler._query_dataset, answering from a dict of dataset results"""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def __call__(self, dataset, date_window, roi):
+        self.calls.append(dataset)
+        result = self.results[dataset]
+        if isinstance(result, Exception):
+            raise result
+        return result() if callable(result) else result
+
+def make_profiler(queries):
+    profiler = VegetationProfiler()
+    profiler._ee_initialized = True
+    profiler._query_dataset = queries
+    return profiler
+
+def with_stubbed_earth_engine(test):
+    """Run test(temp_dir) with a temporary vegetation cache, no local canopy tiles and a fake ee module"""
+    def run():
+        shared_cache, raster_backend, ee = (vegetation_cache._vegetation_cache,
+                                            canopy_height._raster_backend, vegetation_profile.ee)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            vegetation_cache._vegetation_cache = VegetationCache(os.path.join(temp_dir, 'vegetation_cache.db'))
+            canopy_height._raster_backend = RasterCanopyBackend(paths=[])
+            vegetation_profile.ee = FAKE_EE
+            try:
+                test()
+            finally:
+                vegetation_cache._vegetation_cache.close()
+                vegetation_cache._vegetation_cache = shared_cache
+                canopy_height._raster_backend = raster_backend
+                vegetation_profile.ee = ee
+    run.__name__ = test.__name__
+    return run
+
+@with_stubbed_earth_engine
+def test_cached_path_is_not_queried_again():
+    queries = StubQueries({GEDI_DATASET: GEDI_ROWS})
+    heights = make_profiler(queries).get_vegetation_profile(START, END, DISTANCES, ELEVATIONS)
+    assert np.allclose(heights, np.array([10.0, 15.0, 20.0]) * FEET)
+    # GEDI has data, so the fallbacks are never queried
+    assert queries.calls == [GEDI_DATASET]
+
+    # A new session draws the same profile from the cache
+    queries = StubQueries({})
+    again = make_profiler(queries).get_vegetation_profile(START, END, DISTANCES, ELEVATIONS)
+    assert np.allclose(again, heights) and queries.calls == []
+    assert vegetation_cache._vegetation_cache.hits >= 1
+
+@with_stubbed_earth_engine
+def test_empty_results_are_cached():
+    queries = StubQueries({GEDI_DATASET: GEDI_ROWS[:1], HANSEN_DATASET: None, MODIS_DATASET: None})
+    heights = make_profiler(queries).get_vegetation_profile(START, END, DISTANCES, ELEVATIONS)
+    assert np.array_equal(heights, np.zeros(3))
+    assert queries.calls == [GEDI_DATASET, HANSEN_DATASET, MODIS_DATASET]
+
+    # No coverage is remembered too: the chain is not run again
+    queries = StubQueries({})
+    assert np.array_equal(make_profiler(queries).get_vegetation_profile(START, END, DISTANCES, ELEVATIONS),
+                          np.zeros(3))
+    assert queries.calls == []
+
+@with_stubbed_earth_engine
+def test_failed_queries_are_retried():
+    queries = StubQueries({GEDI_DATASET: RuntimeError('Computation timed out'), HANSEN_DATASET: 40.0})
+    heights = make_profiler(queries).get_vegetation_profile(START, END, DISTANCES, ELEVATIONS)
+    # Drawn from the Hansen fallback, 1% tree cover = 0.3 m
+    assert np.allclose(heights, np.full(3, 40.0 * 0.3 * FEET))
+    assert queries.calls == [GEDI_DATASET, HANSEN_DATASET]
+
+    # The error was not cached, so GEDI is asked again; the Hansen result was
+    queries = StubQueries({GEDI_DATASET: GEDI_ROWS})
+    heights = make_profiler(queries).get_vegetation_profile(START, END, DISTANCES, ELEVATIONS)
+    assert np.allclose(heights, np.array([10.0, 15.0, 20.0]) * FEET)
+    assert queries.calls == [GEDI_DATASET]
+
+@with_stubbed_earth_engine
+def test_failed_prefetch_is_retried_when_asked():
+    queries = StubQueries({GEDI_DATASET: RuntimeError('Computation timed out'), HANSEN_DATASET: 40.0})
+    profiler = make_profiler(queries)
+    failed = profiler.prefetch(START, END)
+    assert isinstance(failed.exception(timeout=10), vegetation_profile.EarthEngineQueryError)
+    assert failed.exception().results[HANSEN_DATASET] == 40.0
+
+    # Drawing does not repeat the failed query, but still uses what it fetched
+    heights = profiler.get_vegetation_profile(START, END, DISTANCES, ELEVATIONS)
+    assert np.allclose(heights, np.full(3, 40.0 * 0.3 * FEET))
+    assert profiler.prefetch(START, END, retry_failed=False) is failed
+    assert queries.calls == [GEDI_DATASET, HANSEN_DATASET]
+
+    # An explicit prefetch asks GEDI again
+    queries.results[GEDI_DATASET] = GEDI_ROWS
+    retried = profiler.prefetch(START, END)
+    assert retried is not failed and retried.result(timeout=10)[GEDI_DATASET] == GEDI_ROWS
+    assert queries.calls == [GEDI_DATASET, HANSEN_DATASET, GEDI_DATASET]
+
+    # Finished queries are dropped once done
+    retried.result()
+    for _ in range(100):
+        if not profiler._prefetches and not profiler._failed_prefetches:
+            break
+        threading.Event().wait(0.01)
+    assert profiler._prefetches == {} and profiler._failed_prefetches == {}
+
+@with_stubbed_earth_engine
+def test_non_blocking_profile_draws_zeros_until_the_query_finishes():
+    release = threading.Event()
+
+    def slow_gedi():
+        assert release.wait(10), "query was never released"
+        return GEDI_ROWS
+
+    queries = StubQueries({GEDI_DATASET: slow_gedi})
+    profiler = make_profiler(queries)
+    heights = profiler.get_vegetation_profile(START, END, DISTANCES, ELEVATIONS, block=False)
+    assert np.array_equal(heights, np.zeros(3))
+    future = profiler.pending_prefetch(START, END)
+    assert future is not None
+
+    # Prefetching the same path again shares the running query
+    assert profiler.prefetch(START, END) is future
+
+    release.set()
+    future.result(timeout=10)
+    assert profiler.pending_prefetch(START, END) is None
+    heights = profiler.get_vegetation_profile(START, END, DISTANCES, ELEVATIONS, block=False)
+    assert np.allclose(heights, np.array([10.0, 15.0, 20.0]) * FEET)
+    assert queries.calls == [GEDI_DATASET]
+
+if __name__ == "__main__":
+    for test in (test_cached_path_is_not_queried_again,
+                 test_empty_results_are_cached,
+                 test_failed_queries_are_retried,
+                 test_failed_prefetch_is_retried_when_asked,
+                 test_non_blocking_profile_draws_zeros_until_the_query_finishes):
+        test()
+        print(f"✅ {test.__name__}")
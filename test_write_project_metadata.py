@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test: Writing Project Metadata
+
+Serves ScienceBase-style item JSON and FGDC XML for 40 projects from a local
+HTTP server (with a delay per request) and checks that
+ProjectMetadata.write_project_metadata fetches each project's documents once,
+several at a time, writes every project to tower_parameters.json with
+progress reported for each, and that a second run is answered from the
+ScienceBase metadata cache.
+
+Run with pytest or directly: python test_write_project_metadata.py
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import utilities.sciencebase_cache as sciencebase_cache
+from utilities.metadata import ProjectMetadata
+from utilities.sciencebase_cache import ScienceBaseCache
+
+PROJECT_COUNT = 40
+REQUEST_DELAY = 0.1
+
+XML_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<metadata><idinfo><citation><citeinfo><title>{name}</title><pubdate>20200115</pubdate></citeinfo></citation>
+<timeperd><timeinfo><rngdates><begdate>20191101</begdate><enddate>20191130</enddate></rngdates></timeinfo></timeperd>
+</idinfo></metadata>"""
+
+class ScienceBaseHandler(BaseHTTPRequestHandler):
+    requests = []
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests.append(self.path)
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(REQUEST_DELAY)
+        with cls.lock:
+            cls.active -= 1
+
+        host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        item = self.path.split('?')[0].rsplit('/', 1)[-1]
+        if self.path.startswith('/catalog/item/'):
+            links = [] if item == 'p39' else \
+                [{'type': 'originalMetadata', 'title': 'Product Metadata', 'uri': f"{host}/xml/{item}.xml"}]
+            body = json.dumps({'title': item, 'webLinks': links}).encode()
+        elif self.path.startswith('/xml/'):
+            body = XML_TEMPLATE.format(name=item).encode()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def search_results(host):
+    urls = []
+    for i in range(PROJECT_COUNT):
+        for tile in range(25):
+            url = f"https://example.com/USGS_LPC_CO_Proj{i:02d}_2020_{1000 + tile}_{2000 + tile}.laz"
+            urls.append((url, {'metaUrl': f"{host}/catalog/item/p{i:02d}", 'downloadURL': url,
+                               'title': url.split('/')[-1], 'sourceId': f"{i}_{tile}"}))
+    urls.append(("https://example.com/USGS_LPC_CO_NoMeta_2020_1000_2000.laz", {'downloadURL': ''}))
+    return urls
+
+def test_projects_are_fetched_concurrently_and_cached():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ScienceBaseHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    shared_cache = sciencebase_cache._sciencebase_cache
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        sciencebase_cache._sciencebase_cache = ScienceBaseCache(os.path.join(temp_dir, 'sciencebase_metadata.db'))
+        try:
+            progress = []
+            start = time.time()
+            processed, failed = ProjectMetadata().write_project_metadata(
+                search_results(host), update_progress_callback=lambda *args: progress.append(args))
+            elapsed = time.time() - start
+
+            assert len(processed) == PROJECT_COUNT - 1
+            assert dict(failed) == {'USGS_LPC_CO_Proj39_2020': 'No XML URL found',
+                                    'USGS_LPC_CO_NoMeta_2020': 'No metadata URL found'}
+            # Each project's JSON and XML once, several projects at a time
+            assert len(ScienceBaseHandler.requests) == 2 * PROJECT_COUNT - 1
+            assert ScienceBaseHandler.peak > 1
+            assert elapsed < 2 * PROJECT_COUNT * REQUEST_DELAY
+
+            with open('tower_parameters.json') as f:
+                lidar_data = json.load(f)['lidar_data']
+            assert len(lidar_data) == PROJECT_COUNT - 1
+            assert os.path.exists(os.path.join('XML_Temp', 'USGS_LPC_CO_Proj00_2020_metadata.xml'))
+            finished = [p for p in progress if p[3] in ('Done', 'No XML URL found', 'No metadata URL found')]
+            assert len(finished) == PROJECT_COUNT + 1 and max(p[0] for p in progress) == PROJECT_COUNT + 1
+
+            # A second session writes the same metadata without any request
+            ScienceBaseHandler.requests.clear()
+            processed_again, _ = ProjectMetadata().write_project_metadata(search_results(host))
+            assert sorted(processed_again) == sorted(processed)
+            assert ScienceBaseHandler.requests == []
+        finally:
+            os.chdir(cwd)
+            sciencebase_cache._sciencebase_cache.close()
+            sciencebase_cache._sciencebase_cache = shared_cache
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    test_projects_are_fetched_concurrently_and_cached()
+    print("✅ test_projects_are_fetched_concurrently_and_cached")
@@ -9,13 +9,18 @@ from tkinter import ttk, messagebox, filedialog
 import os
 import logging
 import threading
-import boto3
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
+from utilities.s3_transfer import S3RangeDownloader, create_s3_client, USGS_LIDAR_BUCKET
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Files downloaded at once; each is also split into concurrent ranged GETs,
+# all within the process-wide S3 transfer budget
+FILE_CONCURRENCY = 3
+
 class AWSDownloadDialog:
     """Dialog for downloading files from AWS S3"""
     
@@ -288,70 +293,68 @@ class AWSDownloadDialog:
     def download_files(self, access_key, secret_key, region, download_path):
         """Download selected files in a separate thread"""
         try:
-            # Initialize S3 client
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=access_key,
-                aws_secret_access_key=secret_key,
-                region_name=region
-            )
+            # Initialize S3 client and the shared ranged/resumable transfer backend
+            s3_client = create_s3_client(access_key, secret_key, region)
+            transfer = S3RangeDownloader(s3_client)
             
             # Get selected items
             selected_items = []
             for item_id in self.selected_items:
                 item_idx = int(self.file_list.item(item_id, "tags")[0])
                 if 0 <= item_idx < len(self.items):
-                    selected_items.append(self.items[item_idx])
+                    selected_items.append((item_id, self.items[item_idx]))
             
             total_files = len(selected_items)
-            completed_files = 0
-            failed_files = 0
+            counts = {'completed': 0, 'failed': 0}
+            counts_lock = threading.Lock()
             
             # Update status
             self.update_status(f"Downloading {total_files} files...", 0)
             
-            # Download each file
-            for i, item in enumerate(selected_items):
+            def download_item(entry):
+                item_id, item = entry
                 if self.cancel_download:
-                    self.update_status("Download cancelled", 0)
-                    break
+                    return
                 
+                filename = item.get('title', 'Unknown')
                 try:
                     # Get file info
                     key = item.get('awsKey') or item.get('downloadURL', '').replace('s3://usgs-lidar/', '')
-                    filename = item.get('title', 'Unknown')
                     project = item.get('projectName', 'Unknown')
                     
-                    # Create project directory
-                    project_dir = os.path.join(download_path, project)
-                    if not os.path.exists(project_dir):
-                        os.makedirs(project_dir)
-                    
                     # Output path
-                    output_path = os.path.join(project_dir, filename)
-                    
-                    # Update status
-                    self.update_status(f"Downloading {i+1}/{total_files}: {filename}", (i / total_files) * 100)
+                    output_path = os.path.join(download_path, project, filename)
                     
-                    # Download file with requester pays
-                    s3_client.download_file(
-                        Bucket='usgs-lidar',
-                        Key=key,
-                        Filename=output_path,
-                        ExtraArgs={'RequestPayer': 'requester'}
-                    )
+                    # Download file with requester pays; complete files are skipped by ETag
+                    result = transfer.download_object(USGS_LIDAR_BUCKET, key, output_path,
+                                                      should_stop=lambda: self.cancel_download)
+                    if result.status == 'stopped':
+                        return
+                    if result.status == 'failed':
+                        raise IOError(result.error)
                     
-                    completed_files += 1
-                    
-                    # Update item status in the list
-                    self.dialog.after(0, lambda id=self.selected_items[i], status="✓": self.update_item_status(id, status))
+                    with counts_lock:
+                        counts['completed'] += 1
+                    status = "✓"
                 
                 except Exception as e:
                     logger.error(f"Error downloading file {filename}: {str(e)}", exc_info=True)
-                    failed_files += 1
-                    
-                    # Update item status in the list
-                    self.dialog.after(0, lambda id=self.selected_items[i], status="✗": self.update_item_status(id, status))
+                    with counts_lock:
+                        counts['failed'] += 1
+                    status = "✗"
+                
+                # Update item status in the list
+                self.dialog.after(0, lambda id=item_id, status=status: self.update_item_status(id, status))
+                with counts_lock:
+                    finished = counts['completed'] + counts['failed']
+                self.update_status(f"Downloaded {finished}/{total_files}: {filename}", (finished / total_files) * 100)
+            
+            with ThreadPoolExecutor(max_workers=FILE_CONCURRENCY) as executor:
+                list(executor.map(download_item, selected_items))
+            
+            completed_files, failed_files = counts['completed'], counts['failed']
+            if self.cancel_download:
+                self.update_status("Download cancelled", 0)
             
             # Update final status
             if self.cancel_download:
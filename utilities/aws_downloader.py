@@ -3,9 +3,10 @@ AWS S3 LIDAR Downloader Utility
 
 This module provides functions to download LIDAR data from the USGS 3DEP AWS S3 bucket.
 It uses the AWS SDK (boto3) to access the requester pays bucket and download LIDAR files.
+Objects are fetched with the shared S3 backend (utilities/s3_transfer.py): concurrent
+ranged GETs, resumable partial files, ETag-checked skips and a process-wide budget.
 """
 
-import boto3
 import logging
 import os
 import threading
@@ -13,6 +14,7 @@ import queue
 import time
 from typing import List, Dict, Any, Optional, Callable
 from tkinter import messagebox
+from utilities.s3_transfer import S3RangeDownloader, create_s3_client
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -22,27 +24,29 @@ class AWSDownloader:
     Class for downloading LIDAR data from AWS S3 bucket.
     """
     
-    def __init__(self, output_dir: str, progress_callback: Optional[Callable] = None):
+    def __init__(self, output_dir: str, progress_callback: Optional[Callable] = None, s3_client=None):
         """
         Initialize the AWS downloader.
         
         Args:
             output_dir: Directory to save downloaded files
             progress_callback: Callback function to update progress
+            s3_client: Optional preconfigured S3 client (default from environment credentials)
         """
         self.output_dir = output_dir
         self.progress_callback = progress_callback
         self.download_queue = queue.Queue()
         self.download_threads = []
         self.stop_event = threading.Event()
-        self.s3_client = self._initialize_s3_client()
+        self.s3_client = s3_client or self._initialize_s3_client()
+        self.transfer = S3RangeDownloader(self.s3_client) if self.s3_client else None
     
     def _initialize_s3_client(self):
         """
         Initialize the S3 client with credentials from environment variables.
         
         Returns:
-            boto3.client: Configured S3 client
+            S3 client (see utilities.s3_transfer.create_s3_client), or None
         """
         try:
             # Get credentials from environment variables
@@ -55,12 +59,7 @@ class AWSDownloader:
                 return None
             
             # Create S3 client
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key,
-                region_name=aws_region
-            )
+            s3_client = create_s3_client(aws_access_key_id, aws_secret_access_key, aws_region)
             
             logger.info("S3 client initialized successfully")
             return s3_client
@@ -178,15 +177,16 @@ class AWSDownloader:
                     if self.progress_callback:
                         self.progress_callback(f"Downloading {os.path.basename(key)}...")
                     
-                    # Download with requester pays
-                    self.s3_client.download_file(
-                        Bucket=bucket,
-                        Key=key,
-                        Filename=output_path,
-                        ExtraArgs={'RequestPayer': 'requester'}
-                    )
+                    # Ranged, resumable download with requester pays
+                    result = self.transfer.download_object(bucket, key, output_path,
+                                                           should_stop=self.stop_event.is_set)
+                    if result.status == 'failed':
+                        raise IOError(result.error)
                     
-                    logger.info(f"Downloaded {key} to {output_path}")
+                    if result.status == 'complete':
+                        logger.info(f"Downloaded {key} to {output_path}")
+                    else:
+                        logger.info(f"Download of {key} stopped, partial file kept for resuming")
                     
                     # Mark task as done
                     self.download_queue.task_done()
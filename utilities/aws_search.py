@@ -14,8 +14,11 @@ from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime, date
 from shapely.geometry import Polygon, box
 import re
-from utilities.tile_index_manager import get_tile_boundary_for_file, search_lidar_by_polygon, get_colorado_projects
+from utilities.tile_index_manager import get_tile_boundary_for_file, search_lidar_by_polygon
 from utilities.lidar_index_search import search_lidar_index, database_exists as index_database_exists
+from utilities.search_cache import get_search_cache, make_search_key
+from utilities.project_footprints import get_project_footprint_index
+from utilities.ept_metadata import ept_project_from_key, fetch_ept_metadata
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -995,6 +998,17 @@ def convert_laz_to_tnm_format(laz_files: List[Dict[str, Any]], s3_client=None, r
                 logger.error("Failed to initialize S3 client")
                 return {'items': [], 'total': 0}
 
+        # Fetch EPT metadata for all files up front: concurrently, once per project and cached
+        ept_metadata = {}
+        if retrieve_metadata:
+            try:
+                ept_metadata = fetch_ept_metadata(
+                    ((ept_project_from_key(file['key']), file['key'].split('/')[-1]) for file in laz_files),
+                    s3_client=s3_client
+                )
+            except Exception as e:
+                logger.error(f"Error retrieving EPT metadata: {str(e)}", exc_info=True)
+
         # Process each project
         for project, files in project_files.items():
             # Process each file
@@ -1017,8 +1031,7 @@ def convert_laz_to_tnm_format(laz_files: List[Dict[str, Any]], s3_client=None, r
                 metadata_source = tile_boundary.get('metadata_source', 'unknown')
 
                 # Extract project name for EPT metadata URLs
-                project_parts = key.split('/')
-                project_name_from_key = project_parts[0] if len(project_parts) > 0 else ''
+                project_name_from_key = ept_project_from_key(key)
 
                 # Create EPT metadata URLs
                 ept_json_url = f"s3://usgs-lidar-public/{project_name_from_key}/ept.json"
@@ -1030,15 +1043,9 @@ def convert_laz_to_tnm_format(laz_files: List[Dict[str, Any]], s3_client=None, r
 
                 # Retrieve additional metadata if requested
                 if retrieve_metadata and project_name_from_key and filename:
-                    logger.info(f"Retrieving additional metadata for {filename} in project {project_name_from_key}")
-                    from utilities.lidar_index_search import retrieve_ept_metadata
-                    additional_metadata = retrieve_ept_metadata('usgs-lidar-public', project_name_from_key, filename)
-
-                    # Log metadata retrieval result
-                    if additional_metadata:
-                        logger.info(f"Retrieved additional metadata for {filename}")
-                    else:
-                        logger.warning(f"Failed to retrieve additional metadata for {filename}")
+                    additional_metadata = ept_metadata.get((project_name_from_key, filename), {})
+                    if not additional_metadata:
+                        logger.warning(f"No additional metadata found for {filename}")
 
                 # Get point count from metadata if available
                 point_count = additional_metadata.get('points', size // 100 if size else 0)
@@ -1117,6 +1124,20 @@ def search_aws_lidar(polygon_points: List[Tuple[float, float]], start_date: date
         logger.info(f"Starting AWS LIDAR search with {len(polygon_points)} polygon points")
         logger.info(f"Date range: {start_date} to {end_date}")
 
+        # Create a shapely polygon from the points
+        # Note: shapely uses (x, y) = (lon, lat) order, but our points are (lat, lon)
+        search_polygon = Polygon([(lon, lat) for lat, lon in polygon_points])
+
+        # Repeated searches are answered from the search cache
+        search_cache = get_search_cache()
+        cache_key = make_search_key(search_polygon, start_date, end_date, retrieve_metadata)
+        cached_result = search_cache.get_result(cache_key)
+        if cached_result is not None:
+            logger.info(f"Using cached search result with {cached_result.get('total', 0)} LIDAR files")
+            if progress_callback:
+                progress_callback("Search complete (cached)", 100)
+            return cached_result
+
         # Update progress
         if progress_callback:
             progress_callback("Initializing AWS S3 client...", 5)
@@ -1133,9 +1154,6 @@ def search_aws_lidar(polygon_points: List[Tuple[float, float]], start_date: date
         if progress_callback:
             progress_callback("Creating search polygon...", 10)
 
-        # Create a shapely polygon from the points
-        # Note: shapely uses (x, y) = (lon, lat) order, but our points are (lat, lon)
-        search_polygon = Polygon([(lon, lat) for lat, lon in polygon_points])
         logger.info(f"Created search polygon from {len(polygon_points)} points")
 
         # Log the polygon bounds for debugging
@@ -1146,26 +1164,12 @@ def search_aws_lidar(polygon_points: List[Tuple[float, float]], start_date: date
         if progress_callback:
             progress_callback("Searching for LIDAR files using spatial index...", 20)
 
-        # Check if the search area is in Colorado (based on the coordinates)
-        is_colorado = bounds[0] >= -109.0 and bounds[2] <= -102.0 and bounds[1] >= 37.0 and bounds[3] <= 41.0
-
-        if is_colorado:
-            logger.info("Search area is in Colorado - using Colorado-specific search")
-
-            # Get the list of Colorado projects
-            colorado_projects = get_colorado_projects()
-
-            # Update progress
-            if progress_callback:
-                progress_callback("Searching Colorado LIDAR projects...", 25)
-
-            # Use the spatial search with Colorado projects
-            logger.info(f"Using spatial search with {len(colorado_projects)} Colorado projects")
-            project_files = search_lidar_by_polygon(search_polygon, colorado_projects)
-        else:
-            # Use the regular spatial search
-            logger.info(f"Using spatial search to find LIDAR files that intersect with the search polygon")
-            project_files = search_lidar_by_polygon(search_polygon)
+        # The project footprint index picks the projects covering the search area; while
+        # projects that may cover it have no footprint yet, the result is not cached
+        footprint_index = get_project_footprint_index(s3_client)
+        footprints_complete = footprint_index.resolved_for(search_polygon)
+        logger.info(f"Using spatial search to find LIDAR files that intersect with the search polygon")
+        project_files = search_lidar_by_polygon(search_polygon)
 
         if not project_files:
             logger.warning("No LIDAR files found that intersect with the search polygon")
@@ -1174,61 +1178,18 @@ def search_aws_lidar(polygon_points: List[Tuple[float, float]], start_date: date
             logger.info("Trying with a buffered search polygon...")
             buffered_polygon = search_polygon.buffer(0.05)  # Add a 0.05 degree buffer (about 5km)
             logger.info(f"Buffered polygon area: {buffered_polygon.area:.6f} square degrees")
+            footprints_complete = footprints_complete and footprint_index.resolved_for(buffered_polygon)
 
             # Update progress
             if progress_callback:
                 progress_callback("Searching with buffered polygon...", 30)
 
-            # Try with the buffered polygon (using Colorado projects if in Colorado)
-            if is_colorado:
-                project_files = search_lidar_by_polygon(buffered_polygon, colorado_projects)
-            else:
-                project_files = search_lidar_by_polygon(buffered_polygon)
+            # Try with the buffered polygon
+            project_files = search_lidar_by_polygon(buffered_polygon)
 
             if not project_files:
-                # Try with a direct search of specific projects for the area
                 logger.warning("No LIDAR files found with buffered polygon either")
-                logger.info("Trying direct search of specific projects for the area...")
-
-                # Update progress
-                if progress_callback:
-                    progress_callback("Trying direct project search...", 35)
-
-                # For Colorado, try specific county projects based on the coordinates
-                if is_colorado:
-                    # Determine which Colorado counties to search based on coordinates
-                    county_projects = []
-
-                    # Pueblo County area
-                    if bounds[0] >= -105.0 and bounds[2] <= -104.0 and bounds[1] >= 37.5 and bounds[3] <= 38.5:
-                        county_projects.extend([
-                            'USGS_LPC_CO_PuebloCounty_2014_LAS_2016',
-                            'CO_Pueblo_County_2018'
-                        ])
-
-                    # Las Animas County area (includes your coordinates)
-                    if bounds[0] >= -105.0 and bounds[2] <= -103.5 and bounds[1] >= 37.0 and bounds[3] <= 38.0:
-                        county_projects.extend([
-                            'CO_Las_Animas_County_2018',
-                            'USGS_LPC_CO_SouthernCO_2013_LAS_2015'
-                        ])
-
-                    # Huerfano County area
-                    if bounds[0] >= -105.5 and bounds[2] <= -104.5 and bounds[1] >= 37.0 and bounds[3] <= 38.0:
-                        county_projects.extend([
-                            'CO_Huerfano_County_2018'
-                        ])
-
-                    # Try the county-specific projects
-                    if county_projects:
-                        logger.info(f"Trying {len(county_projects)} county-specific projects: {county_projects}")
-                        project_files = search_lidar_by_polygon(buffered_polygon, county_projects)
-
-                if not project_files:
-                    logger.warning("No LIDAR files found with direct project search either")
-                    return {'items': [], 'total': 0, 'error': 'No LIDAR files found in the search area'}
-                else:
-                    logger.info(f"Found LIDAR files in {len(project_files)} projects with direct project search")
+                return {'items': [], 'total': 0, 'error': 'No LIDAR files found in the search area'}
             else:
                 logger.info(f"Found LIDAR files in {len(project_files)} projects with buffered polygon")
 
@@ -1262,6 +1223,12 @@ def search_aws_lidar(polygon_points: List[Tuple[float, float]], start_date: date
         tnm_format = convert_laz_to_tnm_format(date_filtered_files, s3_client, retrieve_metadata)
         logger.info(f"Final result: {len(tnm_format.get('items', []))} LIDAR files found with actual boundaries")
 
+        if 'error' not in tnm_format:
+            if footprints_complete:
+                search_cache.put_result(cache_key, tnm_format)
+            else:
+                logger.info("Not caching the search result: some projects have no known footprint yet")
+
         # Update progress
         if progress_callback:
             progress_callback("Search complete", 100)
@@ -12,7 +12,7 @@ from shapely.geometry import Polygon
 
 # Import from existing modules
 from utilities.aws_search import initialize_s3_client, convert_laz_to_tnm_format
-from utilities.tile_index_manager import search_lidar_by_polygon, get_colorado_projects
+from utilities.tile_index_manager import search_lidar_by_polygon
 from utilities.lidar_index_search import search_lidar_index, database_exists as index_database_exists
 
 # Configure logging
@@ -90,26 +90,9 @@ def search_aws_lidar_with_index(polygon_points: List[Tuple[float, float]], start
         bounds = search_polygon.bounds
         logger.info(f"Search polygon bounds: minX={bounds[0]}, minY={bounds[1]}, maxX={bounds[2]}, maxY={bounds[3]}")
 
-        # Check if the search area is in Colorado (based on the coordinates)
-        is_colorado = bounds[0] >= -109.0 and bounds[2] <= -102.0 and bounds[1] >= 37.0 and bounds[3] <= 41.0
-
-        if is_colorado:
-            logger.info("Search area is in Colorado - using Colorado-specific search")
-
-            # Get the list of Colorado projects
-            colorado_projects = get_colorado_projects()
-
-            # Update progress
-            if progress_callback:
-                progress_callback("Searching Colorado LIDAR projects...", 25)
-
-            # Use the spatial search with Colorado projects
-            logger.info(f"Using spatial search with {len(colorado_projects)} Colorado projects")
-            project_files = search_lidar_by_polygon(search_polygon, colorado_projects)
-        else:
-            # Use the regular spatial search
-            logger.info(f"Using spatial search to find LIDAR files that intersect with the search polygon")
-            project_files = search_lidar_by_polygon(search_polygon)
+        # The project footprint index picks the projects covering the search area
+        logger.info(f"Using spatial search to find LIDAR files that intersect with the search polygon")
+        project_files = search_lidar_by_polygon(search_polygon)
 
         if not project_files:
             logger.warning("No LIDAR files found that intersect with the search polygon")
@@ -123,56 +106,12 @@ def search_aws_lidar_with_index(polygon_points: List[Tuple[float, float]], start
             if progress_callback:
                 progress_callback("Searching with buffered polygon...", 30)
 
-            # Try with the buffered polygon (using Colorado projects if in Colorado)
-            if is_colorado:
-                project_files = search_lidar_by_polygon(buffered_polygon, colorado_projects)
-            else:
-                project_files = search_lidar_by_polygon(buffered_polygon)
+            # Try with the buffered polygon
+            project_files = search_lidar_by_polygon(buffered_polygon)
 
             if not project_files:
-                # Try with a direct search of specific projects for the area
                 logger.warning("No LIDAR files found with buffered polygon either")
-                logger.info("Trying direct search of specific projects for the area...")
-
-                # Update progress
-                if progress_callback:
-                    progress_callback("Trying direct project search...", 35)
-
-                # For Colorado, try specific county projects based on coordinates
-                if is_colorado:
-                    # Determine which Colorado counties to search based on coordinates
-                    county_projects = []
-
-                    # Pueblo County area
-                    if bounds[0] >= -105.0 and bounds[2] <= -104.0 and bounds[1] >= 37.5 and bounds[3] <= 38.5:
-                        county_projects.extend([
-                            'USGS_LPC_CO_PuebloCounty_2014_LAS_2016',
-                            'CO_Pueblo_County_2018'
-                        ])
-
-                    # Las Animas County area (includes your coordinates)
-                    if bounds[0] >= -105.0 and bounds[2] <= -103.5 and bounds[1] >= 37.0 and bounds[3] <= 38.0:
-                        county_projects.extend([
-                            'CO_Las_Animas_County_2018',
-                            'USGS_LPC_CO_SouthernCO_2013_LAS_2015'
-                        ])
-
-                    # Huerfano County area
-                    if bounds[0] >= -105.5 and bounds[2] <= -104.5 and bounds[1] >= 37.0 and bounds[3] <= 38.0:
-                        county_projects.extend([
-                            'CO_Huerfano_County_2018'
-                        ])
-
-                    # Try the county-specific projects
-                    if county_projects:
-                        logger.info(f"Trying {len(county_projects)} county-specific projects: {county_projects}")
-                        project_files = search_lidar_by_polygon(buffered_polygon, county_projects)
-
-                if not project_files:
-                    logger.warning("No LIDAR files found with direct project search either")
-                    return {'items': [], 'total': 0, 'error': 'No LIDAR files found in the search area'}
-                else:
-                    logger.info(f"Found LIDAR files in {len(project_files)} projects with direct project search")
+                return {'items': [], 'total': 0, 'error': 'No LIDAR files found in the search area'}
             else:
                 logger.info(f"Found LIDAR files in {len(project_files)} projects with buffered polygon")
 
@@ -0,0 +1,177 @@
+"""
+Local Canopy Height Sources
+
+Offline backends for VegetationProfiler that return a canopy/obstruction
+height for every profile sample, instead of the flat path averages from the
+Earth Engine fallbacks.
+
+- CorridorCanopyBackend: canopy height model (first return minus ground) from
+  the LiDAR corridor grid built from our LAZ tiles
+- RasterCanopyBackend: canopy height GeoTIFFs (e.g. 1 m CHM tiles or a
+  national canopy height map) found in CANOPY_HEIGHT_DIR (default:
+  <app>/canopy). Tile bounds are read once; tiles are opened on demand and
+  kept in a small LRU cache, and each tile is sampled with one vectorized
+  windowed read per group of points.
+
+Backends return heights in meters with NaN where they have no coverage, so
+they can be chained and the remaining samples handed to the next source.
+"""
+
+import os
+import glob
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from utilities.terrain_engine import DEMSource, RASTERIO_AVAILABLE
+
+try:
+    import rasterio
+    from rasterio.warp import transform_bounds
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CANOPY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "canopy")
+
+# Open canopy tiles kept in the LRU cache
+DEFAULT_MAX_OPEN_TILES = 32
+
+# Heights above this are treated as noise (birds, power line spikes, bad pixels)
+MAX_CANOPY_HEIGHT_M = 120.0
+
+class CanopyBackend:
+    """Source of canopy heights along a path"""
+
+    name = "canopy"
+
+    def get_heights(self, start_coords: Tuple[float, float], end_coords: Tuple[float, float],
+                    distances: Sequence[float], lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Canopy heights at the profile samples.
+
+        Args:
+            start_coords: (lat, lon) of site A
+            end_coords: (lat, lon) of site B
+            distances: Sample distances from site A in meters
+            lats: Sample latitudes
+            lons: Sample longitudes
+
+        Returns:
+            Heights in meters, NaN where the backend has no data
+        """
+        raise NotImplementedError
+
+class CorridorCanopyBackend(CanopyBackend):
+    """Canopy height model from a LiDAR corridor grid (see utilities.lidar_corridor)"""
+
+    name = "lidar"
+
+    def __init__(self, grid):
+        self.grid = grid
+
+    def get_heights(self, start_coords, end_coords, distances, lats, lons):
+        spec = self.grid.spec
+        if not (np.allclose(spec.start_coords, start_coords, atol=1e-7) and
+                np.allclose(spec.end_coords, end_coords, atol=1e-7)):
+            return np.full(len(distances), np.nan)
+
+        heights = self.grid.obstruction_profile(distances)
+        heights[np.isnan(self.grid.terrain_profile(distances))] = np.nan
+        return heights
+
+class RasterCanopyBackend(CanopyBackend):
+    """Canopy heights sampled from local GeoTIFF tiles"""
+
+    name = "raster"
+
+    def __init__(self, paths: Optional[Sequence[str]] = None, canopy_dir: Optional[str] = None,
+                 max_open_tiles: int = DEFAULT_MAX_OPEN_TILES):
+        """
+        Index canopy height tiles.
+
+        Args:
+            paths: Explicit GeoTIFF paths, highest priority first
+            canopy_dir: Directory searched recursively for .tif/.tiff files
+            max_open_tiles: Number of tiles kept open between profiles
+        """
+        self.max_open_tiles = max_open_tiles
+        self.tiles: List[Tuple[str, Tuple[float, float, float, float]]] = []
+        self._open_tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+        if not RASTERIO_AVAILABLE:
+            logger.warning("rasterio not available, local canopy heights disabled")
+            return
+
+        paths = list(paths or [])
+        if canopy_dir and os.path.isdir(canopy_dir):
+            for pattern in ('*.tif', '*.tiff'):
+                paths.extend(sorted(glob.glob(os.path.join(canopy_dir, '**', pattern), recursive=True)))
+
+        for path in paths:
+            try:
+                with rasterio.open(path) as dataset:
+                    bounds = tuple(dataset.bounds)
+                    if dataset.crs is not None and not dataset.crs.is_geographic:
+                        bounds = transform_bounds(dataset.crs, 'EPSG:4326', *bounds)
+                self.tiles.append((path, bounds))
+            except Exception as e:
+                logger.error(f"Error indexing canopy raster {path}: {e}")
+
+        if self.tiles:
+            logger.info(f"Indexed {len(self.tiles)} canopy height tiles")
+
+    def _get_tile(self, path: str) -> DEMSource:
+        """Open a tile through the LRU cache"""
+        with self._lock:
+            source = self._open_tiles.pop(path, None)
+            if source is None:
+                # Canopy heights are stored in meters regardless of the tile CRS units
+                source = DEMSource(path, z_units='m')
+            self._open_tiles[path] = source
+            while len(self._open_tiles) > self.max_open_tiles:
+                _, evicted = self._open_tiles.popitem(last=False)
+                evicted.close()
+            return source
+
+    def close(self):
+        with self._lock:
+            for source in self._open_tiles.values():
+                source.close()
+            self._open_tiles.clear()
+
+    def get_heights(self, start_coords, end_coords, distances, lats, lons):
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        heights = np.full(len(lats), np.nan)
+
+        for path, (min_lon, min_lat, max_lon, max_lat) in self.tiles:
+            missing = np.isnan(heights)
+            if not missing.any():
+                break
+            candidates = np.flatnonzero(missing & (lons >= min_lon) & (lons <= max_lon) &
+                                        (lats >= min_lat) & (lats <= max_lat))
+            if len(candidates) == 0:
+                continue
+            try:
+                heights[candidates] = self._get_tile(path).sample(lats[candidates], lons[candidates])
+            except Exception as e:
+                logger.error(f"Error sampling canopy raster {path}: {e}")
+
+        heights[heights > MAX_CANOPY_HEIGHT_M] = np.nan
+        return np.where(heights < 0, 0.0, heights)
+
+_raster_backend = None
+_raster_backend_lock = threading.Lock()
+
+def get_raster_canopy_backend() -> RasterCanopyBackend:
+    """Return the shared canopy raster backend for the tiles in CANOPY_HEIGHT_DIR"""
+    global _raster_backend
+    with _raster_backend_lock:
+        if _raster_backend is None:
+            _raster_backend = RasterCanopyBackend(canopy_dir=os.getenv("CANOPY_HEIGHT_DIR") or DEFAULT_CANOPY_DIR)
+        return _raster_backend
@@ -0,0 +1,321 @@
+"""
+Download Scheduler
+
+Event-driven job scheduler for the LiDAR downloader. A fixed pool of worker
+threads takes URLs from a priority queue and hands them to a download
+handler; idle and paused workers block on a condition variable instead of
+polling, so a paused queue of thousands of files costs no CPU.
+
+Jobs are served lowest priority value first (e.g. distance of the tile from
+the path), with a per-host limit on concurrent downloads. Jobs for a host
+that is at its limit are parked until one of its downloads finishes.
+
+UpdateCoalescer collects the URLs whose state changed between UI refreshes,
+so the GUI can redraw only those rows at a fixed rate instead of scheduling
+a Tk callback per progress event.
+"""
+
+import math
+import heapq
+import logging
+import threading
+import itertools
+from urllib.parse import urlsplit
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_PER_HOST_LIMIT = 6
+
+# Fixed UI refresh rate for coalesced progress updates (4 Hz)
+UI_REFRESH_MS = 250
+
+# Mean Earth radius used for the tile-to-path distance
+EARTH_RADIUS_M = 6371000.0
+
+def host_of(url: str) -> str:
+    """Host part of a URL, used as the concurrency-limit key"""
+    return urlsplit(url).netloc.lower()
+
+def path_distance_m(point: Tuple[float, float],
+                    start: Tuple[float, float],
+                    end: Tuple[float, float]) -> float:
+    """
+    Distance in meters from a point to the path segment between two sites.
+
+    Uses a local equirectangular projection, which is accurate to well under
+    a percent over path lengths and is only used for ordering downloads.
+
+    Args:
+        point: (lat, lon) of the point
+        start: (lat, lon) of site A
+        end: (lat, lon) of site B
+    """
+    cos_lat = math.cos(math.radians((start[0] + end[0]) / 2))
+    scale = math.radians(1) * EARTH_RADIUS_M
+
+    def project(coords):
+        return coords[1] * cos_lat * scale, coords[0] * scale
+
+    (px, py), (ax, ay), (bx, by) = project(point), project(start), project(end)
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_sq))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+def tile_priority(bounds: Optional[dict],
+                  start: Tuple[float, float],
+                  end: Tuple[float, float]) -> Optional[float]:
+    """
+    Download priority of a tile: distance in meters from its center to the path.
+
+    Args:
+        bounds: TNM style bounding box dict with minX/minY/maxX/maxY in degrees
+        start: (lat, lon) of site A
+        end: (lat, lon) of site B
+
+    Returns:
+        Distance in meters (lower downloads first), or None if bounds are unusable
+    """
+    try:
+        center = ((float(bounds['minY']) + float(bounds['maxY'])) / 2,
+                  (float(bounds['minX']) + float(bounds['maxX'])) / 2)
+    except (TypeError, KeyError, ValueError):
+        return None
+    return path_distance_m(center, start, end)
+
+class DownloadScheduler:
+    """Priority queue of downloads served by worker threads that block while idle or paused"""
+
+    def __init__(self, handler: Callable[[str], object],
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 per_host_limit: Optional[int] = DEFAULT_PER_HOST_LIMIT,
+                 name: str = "download-worker"):
+        """
+        Create a scheduler; jobs can be queued before the workers are started.
+
+        Args:
+            handler: Called with the URL of each job on a worker thread
+            max_workers: Number of concurrent downloads
+            per_host_limit: Maximum concurrent downloads per host (None for no limit)
+            name: Thread name prefix for the workers
+        """
+        self.handler = handler
+        self.max_workers = max(1, int(max_workers))
+        self.per_host_limit = per_host_limit
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, str]] = []
+        self._queued: Dict[str, Tuple[float, int]] = {}
+        self._parked: Dict[str, List[Tuple[float, int, str]]] = {}
+        self._active: Dict[str, str] = {}
+        self._host_active: Dict[str, int] = {}
+        self._counter = itertools.count()
+        self._workers: List[threading.Thread] = []
+        self._paused = False
+        self._stopped = False
+
+    # Queue management
+
+    def submit(self, url: str, priority: Optional[float] = None) -> bool:
+        """
+        Queue a URL, or move it up if it is already queued with a lower priority.
+
+        Args:
+            url: URL to download
+            priority: Lower values are downloaded first (None queues last)
+
+        Returns:
+            True if the URL was queued or re-prioritized, False if it is active
+        """
+        return self.submit_many([(url, priority)]) > 0
+
+    def submit_many(self, jobs: Iterable[Tuple[str, Optional[float]]]) -> int:
+        """Queue several (url, priority) pairs under one lock; returns how many were queued"""
+        queued = 0
+        with self._cond:
+            if self._stopped:
+                return 0
+            for url, priority in jobs:
+                priority = math.inf if priority is None else float(priority)
+                if url in self._active:
+                    continue
+                current = self._queued.get(url)
+                if current is not None and current[0] <= priority:
+                    continue
+                entry = (priority, next(self._counter), url)
+                self._queued[url] = entry[:2]
+                heapq.heappush(self._heap, entry)
+                queued += 1
+            if queued:
+                self._cond.notify(min(queued, self.max_workers))
+        return queued
+
+    def cancel(self, url: str) -> bool:
+        """Drop a queued URL; returns False if it was not queued"""
+        with self._cond:
+            # Heap and parked entries are skipped lazily once they no longer match _queued
+            removed = self._queued.pop(url, None) is not None
+            self._cond.notify_all()
+            return removed
+
+    def clear(self):
+        """Drop all queued URLs (active downloads are not interrupted)"""
+        with self._cond:
+            self._heap.clear()
+            self._queued.clear()
+            self._parked.clear()
+            self._cond.notify_all()
+
+    # Worker control
+
+    def start(self) -> int:
+        """Start any missing worker threads; returns the number running"""
+        with self._cond:
+            if not self._stopped:
+                self._start_workers()
+            return len(self._workers)
+
+    def pause(self):
+        """Stop handing out jobs; workers finish (or stop) their current download and block"""
+        with self._cond:
+            self._paused = True
+
+    def resume(self):
+        """Wake the workers and continue with the queue"""
+        with self._cond:
+            self._paused = False
+            self._cond.notify_all()
+
+    def shutdown(self, wait: bool = False, timeout: Optional[float] = None):
+        """
+        Stop the workers once their current job finishes.
+
+        Args:
+            wait: Join the worker threads
+            timeout: Per-thread join timeout
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if wait:
+            for worker in list(self._workers):
+                if worker is not threading.current_thread():
+                    worker.join(timeout)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until nothing is queued or active; returns False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queued and not self._active, timeout)
+
+    # State
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    @property
+    def queued_count(self) -> int:
+        with self._cond:
+            return len(self._queued)
+
+    def active_urls(self) -> Set[str]:
+        with self._cond:
+            return set(self._active)
+
+    def is_queued(self, url: str) -> bool:
+        with self._cond:
+            return url in self._queued
+
+    def is_active(self, url: str) -> bool:
+        with self._cond:
+            return url in self._active
+
+    @property
+    def worker_count(self) -> int:
+        return sum(1 for worker in self._workers if worker.is_alive())
+
+    # Internals (called with the condition held)
+
+    def _start_workers(self):
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, daemon=True,
+                                      name=f"{self.name}-{len(self._workers) + 1}")
+            self._workers.append(worker)
+            worker.start()
+
+    def _host_full(self, host: str) -> bool:
+        return self.per_host_limit is not None and self._host_active.get(host, 0) >= self.per_host_limit
+
+    def _next_job(self) -> Optional[Tuple[str, str]]:
+        """Pop the best queued URL whose host has a free slot"""
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            priority, seq, url = entry
+            if self._queued.get(url) != (priority, seq):
+                continue  # cancelled or re-prioritized
+            host = host_of(url)
+            if self._host_full(host):
+                self._parked.setdefault(host, []).append(entry)
+                continue
+            del self._queued[url]
+            return url, host
+        return None
+
+    def _release_host(self, host: str):
+        count = self._host_active.get(host, 0) - 1
+        if count > 0:
+            self._host_active[host] = count
+        else:
+            self._host_active.pop(host, None)
+        for entry in self._parked.pop(host, []):
+            heapq.heappush(self._heap, entry)
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = None
+                while job is None:
+                    if self._stopped:
+                        return
+                    if not self._paused:
+                        job = self._next_job()
+                    if job is None:
+                        self._cond.wait()
+                url, host = job
+                self._active[url] = host
+                self._host_active[host] = self._host_active.get(host, 0) + 1
+
+            try:
+                self.handler(url)
+            except Exception as e:
+                logger.error(f"Download handler failed for {url}: {e}", exc_info=True)
+            finally:
+                with self._cond:
+                    self._active.pop(url, None)
+                    self._release_host(host)
+                    self._cond.notify_all()
+
+class UpdateCoalescer:
+    """Thread-safe set of keys changed since the last UI refresh"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+
+    def mark(self, key: str):
+        with self._lock:
+            self._dirty.add(key)
+
+    def mark_many(self, keys: Iterable[str]):
+        with self._lock:
+            self._dirty.update(keys)
+
+    def drain(self) -> Set[str]:
+        """Return and reset the changed keys"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return dirty
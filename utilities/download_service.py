@@ -0,0 +1,449 @@
+"""
+Headless Download Service
+
+Runs the downloader queue without Tk: the same DownloadScheduler and
+RangeDownloader engine as the GUI downloader (DL2), fed with the
+(url, filename, info) lists that UltraVerboseDownloaderer.add_urls_bulk
+accepts, or with TNM search results / tower_parameters.json projects.
+
+Finished files are appended to a compact JSON-lines journal (one short line
+per file) instead of rewriting tower_parameters.json after every download;
+the journal also lets an interrupted run skip completed files, and can be
+applied to tower_parameters.json once at the end. Throughput (files, bytes,
+MB/s, ETA) is logged periodically and returned as a summary.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utilities.range_downloader import RangeDownloader, DEFAULT_MAX_CONNECTIONS
+from utilities.download_scheduler import (DownloadScheduler, DEFAULT_MAX_WORKERS, DEFAULT_PER_HOST_LIMIT,
+                                          tile_priority)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_NAME = "download_journal.jsonl"
+
+# Seconds between throughput reports
+DEFAULT_REPORT_INTERVAL = 10.0
+
+DEFAULT_MAX_RETRIES = 3
+
+# Public USGS bucket, readable over plain HTTPS
+PUBLIC_BUCKET_URLS = {
+    'usgs-lidar-public': 'https://usgs-lidar-public.s3.amazonaws.com/',
+}
+
+FileEntry = Tuple[str, str, Dict[str, Any]]
+
+def to_http_url(url: str) -> str:
+    """Rewrite s3:// URLs of public buckets to HTTPS; other URLs are returned unchanged"""
+    if url.startswith('s3://'):
+        bucket, _, key = url[5:].partition('/')
+        if bucket in PUBLIC_BUCKET_URLS:
+            return PUBLIC_BUCKET_URLS[bucket] + key
+    return url
+
+def file_info_from_item(item: Dict[str, Any], project: Optional[str] = None) -> Optional[FileEntry]:
+    """
+    Build an add_urls_bulk entry from a TNM search item or a tower_parameters file entry.
+
+    Args:
+        item: Dict with downloadURL/sizeInBytes/boundingBox (TNM) or download_url/size_bytes/bounds
+        project: Project name to record if the item has none
+
+    Returns:
+        (url, filename, info) tuple, or None if the item has no download URL
+    """
+    url = item.get('downloadURL') or item.get('download_url') or item.get('url')
+    if not url:
+        return None
+    url = to_http_url(url)
+    filename = item.get('filename') or url.split('/')[-1]
+    info = {
+        'filename': filename,
+        'status': 'Queued',
+        'progress': 0,
+        'size_on_disk': 0,
+        'total_size': item.get('sizeInBytes') or item.get('size_bytes') or item.get('total_size') or 0,
+        'metadata': {
+            'project': item.get('project') or project,
+            'source_id': item.get('sourceId') or item.get('source_id'),
+            'date': item.get('date'),
+            'bounds': item.get('boundingBox') or item.get('bounds'),
+        }
+    }
+    if item.get('priority') is not None:
+        info['priority'] = item['priority']
+    return url, filename, info
+
+def load_file_list(path: str) -> List[FileEntry]:
+    """
+    Read a download list from JSON.
+
+    Accepted layouts:
+        - a list of [url, filename, info] entries (the add_urls_bulk format)
+        - a list of TNM items / file dicts, or a TNM response with an 'items' list
+        - tower_parameters.json, using the files of every project under 'lidar_data'
+
+    Args:
+        path: Path to the JSON file
+
+    Returns:
+        List of (url, filename, info) tuples
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    entries = []
+    if isinstance(data, dict) and 'lidar_data' in data:
+        for project_name, project_data in data['lidar_data'].items():
+            for file_data in project_data.get('files', []):
+                entry = file_info_from_item(file_data, project_name)
+                if entry:
+                    entries.append(entry)
+    else:
+        items = data.get('items', []) if isinstance(data, dict) else data
+        for item in items:
+            if isinstance(item, (list, tuple)) and len(item) == 3:
+                url, filename, info = item
+                info = dict(info)
+                info.setdefault('filename', filename)
+                info.setdefault('total_size', 0)
+                entries.append((to_http_url(url), filename, info))
+            elif isinstance(item, dict):
+                entry = file_info_from_item(item)
+                if entry:
+                    entries.append(entry)
+
+    logger.info(f"Loaded {len(entries)} files from {path}")
+    return entries
+
+class DownloadJournal:
+    """Append-only JSON-lines record of finished downloads"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Latest record per URL"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records[record['url']] = record
+                except (ValueError, KeyError):
+                    continue  # partial line from an interrupted run
+        return records
+
+    def append(self, record: Dict[str, Any]):
+        line = json.dumps(record, separators=(',', ':'))
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+class TransferMetrics:
+    """Thread-safe throughput counters for a download run"""
+
+    def __init__(self, total_files: int = 0, total_bytes: int = 0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes_downloaded = 0
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+        self._last_report = (self.start_time, 0)
+
+    def restart_clock(self):
+        """Measure rates from now (called when the run starts)"""
+        with self._lock:
+            self.start_time = time.time()
+            self._last_report = (self.start_time, self.bytes_downloaded)
+
+    def add_bytes(self, count: int):
+        with self._lock:
+            self.bytes_downloaded += count
+
+    def count(self, status: str):
+        with self._lock:
+            setattr(self, status, getattr(self, status) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current totals with average and recent rates in bytes per second"""
+        with self._lock:
+            now = time.time()
+            elapsed = max(now - self.start_time, 1e-6)
+            last_time, last_bytes = self._last_report
+            recent = (self.bytes_downloaded - last_bytes) / max(now - last_time, 1e-6)
+            self._last_report = (now, self.bytes_downloaded)
+            average = self.bytes_downloaded / elapsed
+            remaining = max(0, self.total_bytes - self.bytes_downloaded)
+            return {
+                'total_files': self.total_files,
+                'completed': self.completed,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'bytes_downloaded': self.bytes_downloaded,
+                'elapsed': elapsed,
+                'average_speed': average,
+                'recent_speed': recent,
+                'files_per_minute': (self.completed / elapsed) * 60,
+                'eta': remaining / average if average > 0 and self.total_bytes else None,
+            }
+
+def format_metrics(metrics: Dict[str, Any]) -> str:
+    """One-line progress report"""
+    done = metrics['completed'] + metrics['skipped'] + metrics['failed']
+    text = (f"{done}/{metrics['total_files']} files (completed {metrics['completed']}, "
+            f"skipped {metrics['skipped']}, failed {metrics['failed']}) - "
+            f"{metrics['bytes_downloaded'] / 1e6:.1f} MB in {metrics['elapsed']:.0f}s, "
+            f"{metrics['recent_speed'] / 1e6:.2f} MB/s now, {metrics['average_speed'] / 1e6:.2f} MB/s avg, "
+            f"{metrics['files_per_minute']:.1f} files/min")
+    if metrics['eta'] is not None:
+        text += f", ETA {metrics['eta'] / 60:.1f} min"
+    return text
+
+class DownloadService:
+    """Headless downloader queue: scheduler + range engine + journal + metrics"""
+
+    def __init__(self, destination_folder: str,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 per_host_limit: Optional[int] = DEFAULT_PER_HOST_LIMIT,
+                 journal_path: Optional[str] = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 priority_path: Optional[Tuple[Tuple[float, float], Tuple[float, float]]] = None,
+                 range_downloader: Optional[RangeDownloader] = None):
+        """
+        Create a download service.
+
+        Args:
+            destination_folder: Directory the files are written to
+            max_workers: Concurrent file downloads
+            per_host_limit: Maximum concurrent downloads per host
+            journal_path: JSON-lines journal (default <destination>/download_journal.jsonl)
+            max_retries: Retries per file after a failed attempt
+            priority_path: ((lat, lon), (lat, lon)) path; tiles nearest it download first
+            range_downloader: Engine to use (default one sized for max_workers)
+        """
+        self.destination_folder = destination_folder
+        self.max_retries = max_retries
+        self.priority_path = priority_path
+        self.journal = DownloadJournal(journal_path or os.path.join(destination_folder, DEFAULT_JOURNAL_NAME))
+        self.range_downloader = range_downloader or RangeDownloader(pool_size=max_workers * DEFAULT_MAX_CONNECTIONS)
+        self.scheduler = DownloadScheduler(self._download, max_workers=max_workers,
+                                           per_host_limit=per_host_limit, name="headless-download")
+        self.file_info: Dict[str, Dict[str, Any]] = {}
+        self.metrics = TransferMetrics()
+        self._stop = threading.Event()
+        os.makedirs(destination_folder, exist_ok=True)
+
+    def add_files(self, file_info_list: List[FileEntry]) -> Tuple[int, int, int]:
+        """
+        Queue files, skipping ones already complete on disk or in the journal.
+
+        Args:
+            file_info_list: (url, filename, info) tuples as accepted by add_urls_bulk
+
+        Returns:
+            (queued, skipped, errors) counts
+        """
+        journal = self.journal.load()
+        jobs = []
+        queued = skipped = errors = 0
+        for url, filename, info in file_info_list:
+            try:
+                if url in self.file_info:
+                    skipped += 1
+                    continue
+                info = {**info, 'filename': filename}
+                info['local_path'] = os.path.join(self.destination_folder, filename)
+                self.file_info[url] = info
+                self.metrics.total_files += 1
+                self.metrics.total_bytes += int(info.get('total_size') or 0)
+
+                if self._is_complete(url, info, journal.get(url)):
+                    info['status'] = 'Complete'
+                    self.metrics.count('skipped')
+                    self.metrics.total_bytes -= int(info.get('total_size') or 0)
+                    skipped += 1
+                    continue
+
+                priority = info.get('priority')
+                if priority is None and self.priority_path:
+                    priority = tile_priority(info.get('metadata', {}).get('bounds'), *self.priority_path)
+                info['status'] = 'Queued'
+                jobs.append((url, priority))
+                queued += 1
+            except Exception as e:
+                logger.error(f"Error queueing {filename}: {e}", exc_info=True)
+                errors += 1
+
+        self.scheduler.submit_many(jobs)
+        logger.info(f"Queued {queued} files, skipped {skipped} already complete, {errors} errors")
+        return queued, skipped, errors
+
+    def _is_complete(self, url: str, info: Dict[str, Any], record: Optional[Dict[str, Any]]) -> bool:
+        path = info['local_path']
+        if not os.path.exists(path):
+            return False
+        size = os.path.getsize(path)
+        expected = int(info.get('total_size') or 0)
+        if expected > 0:
+            return size == expected
+        return bool(record and record.get('status') == 'complete' and record.get('size') == size)
+
+    def run(self, report_interval: float = DEFAULT_REPORT_INTERVAL,
+            report_callback: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Download everything queued and block until done or stopped.
+
+        Args:
+            report_interval: Seconds between throughput reports
+            report_callback: Called with each metrics snapshot (default logs it)
+
+        Returns:
+            Final metrics snapshot
+        """
+        report = report_callback or (lambda metrics: logger.info(format_metrics(metrics)))
+        self.metrics.restart_clock()
+        self.scheduler.start()
+        try:
+            while not self.scheduler.wait_idle(report_interval):
+                report(self.metrics.snapshot())
+        except KeyboardInterrupt:
+            logger.info("Interrupted, stopping downloads (partial files are kept for resuming)")
+            self.stop()
+            raise
+        finally:
+            self.scheduler.shutdown(wait=True)
+        summary = self.metrics.snapshot()
+        report(summary)
+        return summary
+
+    def stop(self):
+        """Stop all downloads, keeping partial files and their resume state"""
+        self._stop.set()
+        self.scheduler.clear()
+
+    def _download(self, url: str):
+        """Download one file with retries - runs on a scheduler worker thread"""
+        info = self.file_info[url]
+        filename = info['filename']
+        start = time.time()
+        last_done = [None]
+        counted = [0]
+
+        def on_progress(done, total):
+            # Bytes already on disk from an earlier run show up in the first report
+            if last_done[0] is not None and done > last_done[0]:
+                self.metrics.add_bytes(done - last_done[0])
+                counted[0] += done - last_done[0]
+            last_done[0] = done
+
+        # Disable SSL verification for USGS servers, as the GUI downloader does
+        verify_ssl = 'usgs.gov' not in url
+
+        result = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                logger.warning(f"Retry {attempt}/{self.max_retries} for {filename}: {result.error}")
+                if self._stop.wait(2 ** attempt):
+                    break
+            last_done[0], counted[0] = None, 0
+            result = self.range_downloader.download(url, info['local_path'], progress_callback=on_progress,
+                                                    should_stop=self._stop.is_set, verify=verify_ssl)
+            # Settle the live estimate against the bytes this attempt actually fetched
+            self.metrics.add_bytes(result.bytes_downloaded - counted[0])
+            if result.status != 'failed':
+                break
+
+        if result is None or result.status == 'stopped':
+            info['status'] = 'Stopped'
+            logger.info(f"Stopped: {filename}")
+            return
+
+        status = 'completed' if result.status == 'complete' else 'failed'
+        info['status'] = 'Complete' if status == 'completed' else 'Failed'
+        self.metrics.count(status)
+        self.journal.append({
+            'url': url,
+            'filename': filename,
+            'project': info.get('metadata', {}).get('project'),
+            'path': info['local_path'],
+            'status': result.status,
+            'size': result.size,
+            'seconds': round(time.time() - start, 2),
+            'error': result.error,
+            'time': datetime.now().isoformat(timespec='seconds'),
+        })
+        if status == 'completed':
+            logger.info(f"Downloaded {filename} ({result.size / 1e6:.1f} MB at {result.speed / 1e6:.2f} MB/s)")
+        else:
+            logger.error(f"Failed {filename} after {self.max_retries} retries: {result.error}")
+
+def apply_journal_to_tower_parameters(journal_path: str, tower_params_path: str) -> int:
+    """
+    Record the local paths of completed downloads in tower_parameters.json in one write.
+
+    Journal records are matched to file entries by project and filename, so
+    projects that share tile names don't get each other's paths. Records
+    without a project only match a filename that appears in one project.
+    The previous tower_parameters.json is kept as a timestamped .bak file.
+
+    Args:
+        journal_path: Download journal to read
+        tower_params_path: tower_parameters.json to update
+
+    Returns:
+        Number of file entries updated
+    """
+    records = DownloadJournal(journal_path).load()
+    completed = {(record.get('project'), record['filename']): record['path'] for record in records.values()
+                 if record.get('status') == 'complete'}
+    if not completed:
+        return 0
+
+    with open(tower_params_path, 'r') as f:
+        tower_params = json.load(f)
+
+    lidar_data = tower_params.get('lidar_data', {})
+    projects_by_filename = {}
+    for project_name, project_data in lidar_data.items():
+        for file_data in project_data.get('files', []):
+            projects_by_filename.setdefault(file_data.get('filename'), set()).add(project_name)
+
+    updated = 0
+    for project_name, project_data in lidar_data.items():
+        for file_data in project_data.get('files', []):
+            filename = file_data.get('filename')
+            path = completed.get((project_name, filename))
+            if path is None and len(projects_by_filename.get(filename, ())) == 1:
+                path = completed.get((None, filename))
+            if path and file_data.get('local_file_path') != path:
+                file_data['local_file_path'] = path
+                updated += 1
+
+    if updated:
+        backup_path = f"{tower_params_path}.bak.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        shutil.copy2(tower_params_path, backup_path)
+        logger.info(f"Created backup of tower parameters at {backup_path}")
+
+        temp_path = f"{tower_params_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(tower_params, f, indent=2)
+        os.replace(temp_path, tower_params_path)
+        logger.info(f"Recorded {updated} local file paths in {tower_params_path}")
+    return updated
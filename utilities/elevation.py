@@ -17,13 +17,27 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 import subprocess  # For opening files
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from certificates import create_turbine_certificate
 from log_config import setup_logging
 import turbines  # Import the turbines module
+from utilities.terrain_engine import get_terrain_engine, get_elevations
+from utilities.lidar_corridor import build_corridor_grid
 
 # Set up logging
 logger = setup_logging(__name__)
 
+# Milliseconds between checks for background vegetation results
+VEGETATION_POLL_MS = 250
+
+# Milliseconds between checks for a background LiDAR corridor build
+LIDAR_POLL_MS = 250
+
+# Points drawn (and vegetation queried) along the profile; clearances use every sample
+MAX_DRAWN_PROFILE_SAMPLES = 5000
+
 class ElevationProfile:
     def __init__(self, parent_frame):
         self.frame = ttk.LabelFrame(parent_frame, text="Elevation and Vegetation Profile")
@@ -118,7 +132,9 @@ class ElevationProfile:
 
         self.vegetation_profiler = VegetationProfiler()
 
+        # Drawn profile distances (decimated) and the full-resolution distances of elevation_data
         self.distances = None
+        self.elevation_distances = None
 
         self.EARTH_RADIUS = 20902231  # Earth's radius in feet
         # Initialize logger
@@ -132,8 +148,26 @@ class ElevationProfile:
         # Add turbine data storage
         self.turbines = []
 
-    def update_profile(self, start_coords, end_coords, site_a_elev=0, site_b_elev=0, site_a_id="", site_b_id="", samples=100):
-        """Update elevation and vegetation profile with new coordinates"""
+        # Ground/first-return rasters built from downloaded LiDAR tiles
+        self.lidar_grid = None
+
+        # Corridor builds run one at a time off the Tk thread; a new build cancels the previous one
+        self._lidar_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lidar-corridor")
+        self._lidar_cancel_event = None
+
+        # Background vegetation query the profile is waiting on
+        self._vegetation_refresh_future = None
+
+    def update_profile(self, start_coords, end_coords, site_a_elev=0, site_b_elev=0, site_a_id="", site_b_id="", samples=None):
+        """Update elevation and vegetation profile with new coordinates
+
+        Elevations come from the LiDAR corridor grid (see load_lidar_corridor) or
+        local DEMs when they cover the path, otherwise from the Google Elevation
+        API. Without an explicit sample count the profile is sampled at the LiDAR
+        grid or local DEM resolution (100 samples when using Google). Turbine
+        clearances use every sample; longer profiles are drawn decimated to
+        MAX_DRAWN_PROFILE_SAMPLES points.
+        """
         try:
             # Store coordinates for later use
             self.start_coords = start_coords
@@ -151,36 +185,49 @@ class ElevationProfile:
 
             # Calculate distances array
             total_distance_meters = self.calculate_distance(start_coords, end_coords)
-            self.distances = np.linspace(0, total_distance_meters, samples)
+            lidar_grid = self._matching_lidar_grid(start_coords, end_coords)
+            if samples is None:
+                if lidar_grid is not None:
+                    samples = int(math.ceil(total_distance_meters / lidar_grid.spec.resolution_m)) + 1
+                else:
+                    samples = get_terrain_engine().profile_sample_count(start_coords, end_coords)
+            distances = np.linspace(0, total_distance_meters, samples)
 
             # Generate points along the path
-            lat_points = self._interpolate(start_coords[0], end_coords[0], samples)
-            lon_points = self._interpolate(start_coords[1], end_coords[1], samples)
-
-            # Get elevation data
-            locations = "|".join([f"{lat},{lon}" for lat, lon in zip(lat_points, lon_points)])
-            url = "https://maps.googleapis.com/maps/api/elevation/json"
-            params = {
-                "locations": locations,
-                "key": os.getenv("GOOGLE_MAPS_API_KEY")
-            }
+            lat_points = np.array(self._interpolate(start_coords[0], end_coords[0], samples))
+            lon_points = np.array(self._interpolate(start_coords[1], end_coords[1], samples))
+
+            # Ground from LiDAR where the tiles cover the path, then local DEMs / Google Elevation API
+            if lidar_grid is not None:
+                elevations_m = lidar_grid.terrain_profile(distances)
+                missing = np.isnan(elevations_m)
+                if missing.any():
+                    elevations_m[missing] = get_elevations(lat_points[missing], lon_points[missing])
+            else:
+                elevations_m = get_elevations(lat_points, lon_points)
 
-            response = requests.get(url, params=params)
-            data = response.json()
+            if np.isnan(elevations_m).any():
+                logger.error("Elevation data unavailable for part of the profile path")
+            else:
+                elevations_ft = elevations_m * 3.28084  # Convert to feet
 
-            if data.get("status") == "OK" and "results" in data:
-                elevations = [result["elevation"] * 3.28084 for result in data["results"]]  # Convert to feet
+                # Full resolution for turbine clearances, decimated for drawing
+                self.elevation_data = elevations_ft.tolist()
+                self.elevation_distances = distances
+                self.distances, drawn_elevations_ft = self._decimate_profile(distances, elevations_ft)
+                elevations = drawn_elevations_ft.tolist()
 
-                # Get vegetation heights
+                # Get vegetation heights (LiDAR canopy model and local rasters before Earth Engine).
+                # Uncached Earth Engine queries run in the background and redraw the profile when done.
                 vegetation_heights = self.vegetation_profiler.get_vegetation_profile(
                     start_coords,
                     end_coords,
                     self.distances,
-                    elevations
+                    elevations,
+                    block=False
                 )
-
-                # Store elevation data for turbine placement
-                self.elevation_data = elevations
+                self._schedule_vegetation_refresh(start_coords, end_coords, site_a_elev, site_b_elev,
+                                                  site_a_id, site_b_id, samples)
 
                 # Update site B distance to actual distance
                 self.site_b_data = (self.distances[-1], site_b_elev)
@@ -195,6 +242,145 @@ class ElevationProfile:
             logger.error(f"Error updating elevation profile: {e}")
             messagebox.showerror("Error", f"Failed to update elevation profile: {e}")
 
+    @staticmethod
+    def _decimate_profile(distances, elevations_ft, max_samples=MAX_DRAWN_PROFILE_SAMPLES):
+        """Reduce a profile to at most max_samples evenly spaced points for drawing
+
+        Each drawn point is the highest ground of its block of samples, so
+        narrow ridges stay visible; the end points stay at the two sites.
+
+        Returns:
+            Tuple of (distances, elevations_ft) arrays
+        """
+        if len(distances) <= max_samples:
+            return distances, elevations_ft
+        starts = np.linspace(0, len(distances), max_samples + 1).astype(int)[:-1]
+        drawn = np.maximum.reduceat(elevations_ft, starts)
+        drawn[0], drawn[-1] = elevations_ft[0], elevations_ft[-1]
+        return np.linspace(distances[0], distances[-1], max_samples), drawn
+
+    def _schedule_vegetation_refresh(self, start_coords, end_coords, site_a_elev, site_b_elev,
+                                     site_a_id, site_b_id, samples):
+        """Redraw the profile once a background Earth Engine vegetation query finishes"""
+        future = self.vegetation_profiler.pending_prefetch(start_coords, end_coords)
+        if future is None or future is self._vegetation_refresh_future:
+            return
+        self._vegetation_refresh_future = future
+
+        def poll():
+            if not future.done():
+                self.canvas.after(VEGETATION_POLL_MS, poll)
+                return
+            self._vegetation_refresh_future = None
+            # Skip if another path was loaded meanwhile
+            if self.start_coords == start_coords and self.end_coords == end_coords:
+                logger.info("Earth Engine vegetation data ready, redrawing profile")
+                self.update_profile(start_coords, end_coords, site_a_elev, site_b_elev,
+                                    site_a_id, site_b_id, samples)
+
+        self.canvas.after(VEGETATION_POLL_MS, poll)
+
+    def load_lidar_corridor(self, lidar_files, width_ft, resolution_m=1.0, extension_ft=1000,
+                            progress_callback=None):
+        """Build ground/first-return rasters for the current path from downloaded LAS/LAZ tiles
+
+        The tiles are streamed chunk by chunk on a background thread and only
+        points inside the calculate_polygon_points corridor are kept. A build
+        still running for an earlier call is cancelled. Once the grid is ready,
+        and the path has not changed meanwhile, the profile is redrawn with
+        LiDAR terrain and canopy/obstruction heights. Call from the Tk thread.
+
+        Args:
+            lidar_files: LAS/LAZ tile paths
+            width_ft: Corridor half width in feet
+            resolution_m: Grid cell size in meters
+            extension_ft: Corridor extension past each site in feet
+            progress_callback: Called on the Tk thread as (message, percent) as tiles are processed
+
+        Returns:
+            Future of the CorridorGrid (None if cancelled), or None if no path is loaded
+        """
+        if not hasattr(self, 'start_coords') or not hasattr(self, 'end_coords'):
+            logger.warning("No path loaded, cannot build LiDAR corridor")
+            return None
+
+        self._cancel_lidar_corridor()
+        cancel_event = threading.Event()
+        self._lidar_cancel_event = cancel_event
+        start_coords, end_coords = self.start_coords, self.end_coords
+
+        # Progress is reported from the build thread and handed to the callback by poll()
+        progress = queue.Queue()
+        future = self._lidar_executor.submit(
+            build_corridor_grid, lidar_files, start_coords, end_coords, width_ft,
+            extension_ft=extension_ft, resolution_m=resolution_m,
+            progress_callback=lambda message, percent: progress.put((message, percent)),
+            cancel_event=cancel_event
+        )
+
+        def poll():
+            while not progress.empty():
+                message, percent = progress.get_nowait()
+                if progress_callback and not cancel_event.is_set():
+                    progress_callback(message, percent)
+            if not future.done():
+                self.canvas.after(LIDAR_POLL_MS, poll)
+                return
+            if cancel_event.is_set():
+                return
+            self._lidar_cancel_event = None
+
+            try:
+                lidar_grid = future.result()
+            except Exception as e:
+                logger.error(f"Error building LiDAR corridor: {e}", exc_info=True)
+                if progress_callback:
+                    progress_callback(f"LiDAR corridor failed: {e}", 100)
+                return
+
+            # Skip if another path was loaded meanwhile
+            if lidar_grid is None or self.start_coords != start_coords or self.end_coords != end_coords:
+                return
+            self._apply_lidar_grid(lidar_grid)
+
+        self.canvas.after(LIDAR_POLL_MS, poll)
+        return future
+
+    def _apply_lidar_grid(self, lidar_grid):
+        """Use a finished corridor grid for terrain and vegetation and redraw the profile"""
+        self.lidar_grid = lidar_grid
+        self.vegetation_profiler.set_corridor_grid(lidar_grid)
+        self.update_profile(
+            self.start_coords,
+            self.end_coords,
+            self.site_a_data[1] if self.site_a_data else 0,
+            self.site_b_data[1] if self.site_b_data else 0,
+            getattr(self, 'last_site_a_id', "Site A"),
+            getattr(self, 'last_site_b_id', "Site B")
+        )
+
+    def _cancel_lidar_corridor(self):
+        """Stop a corridor build that is still running"""
+        if self._lidar_cancel_event is not None:
+            self._lidar_cancel_event.set()
+            self._lidar_cancel_event = None
+
+    def clear_lidar_corridor(self):
+        """Stop using LiDAR rasters for the profile"""
+        self._cancel_lidar_corridor()
+        self.lidar_grid = None
+        self.vegetation_profiler.set_corridor_grid(None)
+
+    def _matching_lidar_grid(self, start_coords, end_coords):
+        """The LiDAR corridor grid if it was built for this path"""
+        if self.lidar_grid is None:
+            return None
+        spec = self.lidar_grid.spec
+        if (np.allclose(spec.start_coords, start_coords, atol=1e-7) and
+                np.allclose(spec.end_coords, end_coords, atol=1e-7)):
+            return self.lidar_grid
+        return None
+
     def calculate_distance(self, coord1, coord2):
         """Calculate distance between two points in meters"""
         # Import the calculate_distance_meters function from coordinates module
@@ -0,0 +1,264 @@
+"""
+Persistent Elevation Sample Cache
+
+SQLite cache of remote (Google Elevation API) samples so re-opening a project,
+editing a site or refreshing turbines does not re-fetch the same points.
+
+- Points are keyed by lat/lon quantized to a configurable number of decimals
+  (5 decimals is ~1.1 m), packed into a single integer key
+- Only cache misses are sent to the provider, de-duplicated by key
+- Entries expire after a TTL and the least recently used entries are evicted
+  once the cache grows past max_entries
+- Hit/miss counters are kept for the lifetime of the cache object
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+import numpy as np
+from typing import Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "cache", "elevation_cache.db")
+
+DEFAULT_PRECISION = 5
+MAX_PRECISION = 7  # Larger precisions overflow the packed 64-bit key
+DEFAULT_MAX_ENTRIES = 2_000_000
+DEFAULT_TTL_DAYS = 365
+
+# Keys per SELECT ... IN (...) query, below SQLite's host parameter limit
+QUERY_CHUNK_SIZE = 500
+
+# Run eviction after this many new entries
+EVICT_INTERVAL = 10000
+
+class ElevationCache:
+    """On-disk elevation cache keyed by quantized coordinates"""
+
+    def __init__(self,
+                 db_path: str = DEFAULT_CACHE_PATH,
+                 precision: int = DEFAULT_PRECISION,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_days: Optional[float] = DEFAULT_TTL_DAYS):
+        """
+        Open (or create) the cache.
+
+        Args:
+            db_path: Path to the SQLite cache file
+            precision: Decimal places lat/lon are rounded to for the cache key
+            max_entries: Maximum number of cached samples before LRU eviction
+            ttl_days: Age after which samples are refetched (None to never expire)
+        """
+        if not 0 <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between 0 and {MAX_PRECISION}")
+
+        self.db_path = db_path
+        self.precision = precision
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_days * 86400 if ttl_days is not None else None
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._writes_since_evict = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS elevations (
+            precision INTEGER NOT NULL,
+            key INTEGER NOT NULL,
+            elevation_m REAL NOT NULL,
+            source TEXT,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            PRIMARY KEY (precision, key)
+        ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_elevations_last_access ON elevations (last_access)")
+        self._conn.commit()
+        self.evict()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def keys_for(self, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+        """Pack quantized lat/lon pairs into int64 cache keys"""
+        scale = 10 ** self.precision
+        lat_q = np.round(np.asarray(lats, dtype=float) * scale).astype(np.int64) + 90 * scale
+        lon_q = np.round(np.asarray(lons, dtype=float) * scale).astype(np.int64) + 180 * scale
+        return lat_q * (360 * scale + 1) + lon_q
+
+    def get_many(self, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+        """
+        Look up cached elevations.
+
+        Args:
+            lats: Latitudes
+            lons: Longitudes
+
+        Returns:
+            Elevations in meters, NaN for cache misses
+        """
+        keys = self.keys_for(lats, lons)
+        elevations = np.full(len(keys), np.nan)
+        if len(keys) == 0:
+            return elevations
+
+        unique_keys = np.unique(keys)
+        found = {}
+        now = time.time()
+        oldest = now - self.ttl_seconds if self.ttl_seconds is not None else None
+
+        with self._lock:
+            for start in range(0, len(unique_keys), QUERY_CHUNK_SIZE):
+                chunk = [int(k) for k in unique_keys[start:start + QUERY_CHUNK_SIZE]]
+                sql = (f"SELECT key, elevation_m FROM elevations WHERE precision = ? "
+                       f"AND key IN ({','.join('?' * len(chunk))})")
+                params = [self.precision] + chunk
+                if oldest is not None:
+                    sql += " AND created_at >= ?"
+                    params.append(oldest)
+                found.update(self._conn.execute(sql, params).fetchall())
+
+            if found:
+                # Touch the hits for LRU eviction
+                self._conn.executemany(
+                    "UPDATE elevations SET last_access = ? WHERE precision = ? AND key = ?",
+                    [(now, self.precision, key) for key in found]
+                )
+                self._conn.commit()
+
+        for i, key in enumerate(keys):
+            value = found.get(int(key))
+            if value is not None:
+                elevations[i] = value
+
+        hit_count = int(np.count_nonzero(~np.isnan(elevations)))
+        self.hits += hit_count
+        self.misses += len(keys) - hit_count
+        return elevations
+
+    def put_many(self, lats: Sequence[float], lons: Sequence[float], elevations: Sequence[float],
+                 source: str = 'google'):
+        """
+        Store elevations; NaN values are skipped.
+
+        Args:
+            lats: Latitudes
+            lons: Longitudes
+            elevations: Elevations in meters
+            source: Name of the provider the samples came from
+        """
+        keys = self.keys_for(lats, lons)
+        elevations = np.asarray(elevations, dtype=float)
+        now = time.time()
+        rows = [(self.precision, int(key), float(elevation), source, now, now)
+                for key, elevation in zip(keys, elevations) if not np.isnan(elevation)]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany("""
+            INSERT OR REPLACE INTO elevations (precision, key, elevation_m, source, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.commit()
+            self._writes_since_evict += len(rows)
+            evict = self._writes_since_evict >= EVICT_INTERVAL
+
+        if evict:
+            self.evict()
+
+    def get_or_fetch(self, lats: Sequence[float], lons: Sequence[float],
+                     fetch: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                     source: str = 'google') -> np.ndarray:
+        """
+        Return cached elevations, fetching and caching only the misses.
+
+        Misses are de-duplicated by cache key before calling fetch, which is
+        expected to batch its own requests up to the provider's limit.
+
+        Args:
+            lats: Latitudes
+            lons: Longitudes
+            fetch: Function taking (lats, lons) arrays and returning elevations in meters
+            source: Name of the provider used by fetch
+
+        Returns:
+            Elevations in meters, NaN where neither the cache nor fetch had data
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        elevations = self.get_many(lats, lons)
+
+        missing = np.flatnonzero(np.isnan(elevations))
+        if len(missing) == 0:
+            return elevations
+
+        keys = self.keys_for(lats[missing], lons[missing])
+        unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        fetch_idx = missing[first]
+        fetched = np.asarray(fetch(lats[fetch_idx], lons[fetch_idx]), dtype=float)
+        self.put_many(lats[fetch_idx], lons[fetch_idx], fetched, source)
+
+        elevations[missing] = fetched[inverse]
+        return elevations
+
+    def evict(self):
+        """Remove expired entries and trim the cache to max_entries (least recently used first)"""
+        with self._lock:
+            removed = 0
+            if self.ttl_seconds is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM elevations WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                ).rowcount
+
+            count = self._conn.execute("SELECT COUNT(*) FROM elevations").fetchone()[0]
+            if count > self.max_entries:
+                removed += self._conn.execute("""
+                DELETE FROM elevations WHERE (precision, key) IN (
+                    SELECT precision, key FROM elevations ORDER BY last_access LIMIT ?
+                )
+                """, (count - self.max_entries,)).rowcount
+
+            self._conn.commit()
+            self._writes_since_evict = 0
+            self.evicted += removed
+
+        if removed:
+            logger.info(f"Evicted {removed} elevation cache entries")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and cache size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM elevations").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'evicted': self.evicted,
+            'precision': self.precision
+        }
+
+_elevation_cache = None
+_elevation_cache_lock = threading.Lock()
+
+def get_elevation_cache() -> ElevationCache:
+    """Return the shared elevation cache (precision from ELEVATION_CACHE_PRECISION)"""
+    global _elevation_cache
+    with _elevation_cache_lock:
+        if _elevation_cache is None:
+            _elevation_cache = ElevationCache(
+                precision=int(os.getenv("ELEVATION_CACHE_PRECISION", DEFAULT_PRECISION))
+            )
+        return _elevation_cache
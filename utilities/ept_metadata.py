@@ -0,0 +1,356 @@
+"""
+EPT Metadata Retrieval
+
+Batch retrieval of the EPT metadata attached to search results when
+retrieve_metadata is set, from the usgs-lidar-public bucket:
+
+- ept.json of each project (bounds, points, schema, srs) is fetched once per
+  project, however many of its files are in the result.
+- ept-sources/{filename}.json of each file is fetched on a bounded thread
+  pool; files without one are looked up in the project's ept-sources
+  list.json, then manifest.json, each fetched at most once per project.
+  Items are matched on the file name of their path.
+
+Both levels are kept in one SQLite file (cache/ept_metadata.db), so a repeated
+search makes no S3 requests at all.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from utilities.project_footprints import EPT_BUCKET
+from utilities.s3_transfer import create_s3_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "cache", "ept_metadata.db")
+
+# EPT resources are rebuilt rarely
+DEFAULT_TTL_DAYS = 30
+
+# Concurrent metadata GETs (the S3 client pool is sized to match)
+EPT_FETCH_WORKERS = 16
+
+# Fields of ept.json that are copied into each file's metadata
+PROJECT_FIELDS = ['bounds', 'points', 'schema', 'srs']
+
+# Source lists searched, in order, for files without their own ept-sources JSON
+SOURCE_LISTS = ['list.json', 'manifest.json']
+
+# Keys per SELECT ... IN (...) query, below SQLite's host parameter limit
+QUERY_CHUNK_SIZE = 500
+
+# The CO_Eastern_2018 files are published under separate EPT resources per block
+CO_EASTERN_PROJECTS = [
+    ('B1', 'CO_Eastern_B1_2018'),
+    ('B2_QL1_Central', 'CO_Eastern_B2_QL1_Central_2018'),
+    ('B2_QL2_Central', 'CO_Eastern_B2_QL2_Central_2018'),
+    ('B2_QL2_North', 'CO_Eastern_B2_QL2_North_2018'),
+    ('B3', 'CO_Eastern_B3_2018'),
+    ('B4', 'CO_Eastern_B4_2018'),
+    ('B5', 'CO_Eastern_B5_2018'),
+    ('B6', 'CO_Eastern_B6_2018'),
+    ('ElPaso', 'CO_Eastern_ElPaso_2018'),
+    ('North_Priority', 'CO_Eastern_North_Priority_2018'),
+    ('South_Priority2', 'CO_Eastern_South_Priority2_2018'),
+]
+
+def ept_project_from_key(key: str) -> str:
+    """EPT project name of an S3 key ('Projects/{name}/...' or '{name}/...')"""
+    parts = key.split('/')
+    if parts[0] == 'Projects' and len(parts) > 1:
+        return parts[1]
+    return parts[0]
+
+def ept_project_for_file(project_name: str, filename: str) -> str:
+    """
+    EPT resource holding a file's metadata.
+
+    Args:
+        project_name: Project name of the file
+        filename: LAZ file name, e.g. USGS_LPC_CO_EasternColorado_2018_A18_LD31961336.laz
+
+    Returns:
+        str: EPT project name
+    """
+    if 'CO_Eastern' not in filename:
+        return project_name
+    for block, name in CO_EASTERN_PROJECTS:
+        if block in filename:
+            return name
+    return CO_EASTERN_PROJECTS[0][1]  # Default to B1
+
+class EptMetadataCache:
+    """On-disk cache of per-project ept.json fields and per-file ept-sources metadata"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl_days: Optional[float] = DEFAULT_TTL_DAYS):
+        """
+        Open (or create) the cache.
+
+        Args:
+            db_path: Path to the SQLite cache file
+            ttl_days: Age after which entries are fetched again (None to never expire)
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days is not None else None
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+        CREATE TABLE IF NOT EXISTS projects (
+            bucket TEXT NOT NULL,
+            project TEXT NOT NULL,
+            fields TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (bucket, project)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS files (
+            bucket TEXT NOT NULL,
+            project TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            metadata TEXT,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (bucket, project, filename)
+        ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+        self.evict()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds is not None else float('-inf')
+
+    def get_projects(self, bucket: str, projects: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Cached ept.json fields of projects, for the projects that are cached"""
+        projects = list(dict.fromkeys(projects))
+        found = {}
+        with self._lock:
+            for start in range(0, len(projects), QUERY_CHUNK_SIZE):
+                chunk = projects[start:start + QUERY_CHUNK_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT project, fields FROM projects WHERE bucket = ? AND created_at >= ? "
+                    f"AND project IN ({','.join('?' * len(chunk))})", [bucket, self._cutoff()] + chunk
+                ).fetchall()
+                found.update((project, json.loads(fields)) for project, fields in rows)
+        return found
+
+    def put_projects(self, bucket: str, projects: Dict[str, Dict[str, Any]]):
+        """Store ept.json fields by project"""
+        if not projects:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO projects (bucket, project, fields, created_at) VALUES (?, ?, ?, ?)",
+                [(bucket, project, json.dumps(fields), now) for project, fields in projects.items()]
+            )
+            self._conn.commit()
+
+    def get_files(self, bucket: str, files: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Optional[Dict]]:
+        """
+        Cached file metadata.
+
+        Args:
+            bucket: S3 bucket name
+            files: (project, filename) pairs
+
+        Returns:
+            Dict of (project, filename) to its metadata (None if the file has none), for the cached pairs
+        """
+        by_project = {}
+        for project, filename in dict.fromkeys(files):
+            by_project.setdefault(project, []).append(filename)
+
+        found = {}
+        with self._lock:
+            for project, filenames in by_project.items():
+                for start in range(0, len(filenames), QUERY_CHUNK_SIZE):
+                    chunk = filenames[start:start + QUERY_CHUNK_SIZE]
+                    rows = self._conn.execute(
+                        f"SELECT filename, metadata FROM files WHERE bucket = ? AND project = ? AND created_at >= ? "
+                        f"AND filename IN ({','.join('?' * len(chunk))})", [bucket, project, self._cutoff()] + chunk
+                    ).fetchall()
+                    found.update(((project, filename), json.loads(metadata) if metadata else None)
+                                 for filename, metadata in rows)
+        return found
+
+    def put_files(self, bucket: str, files: Dict[Tuple[str, str], Optional[Dict]]):
+        """Store file metadata by (project, filename); None records that a file has none"""
+        if not files:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (bucket, project, filename, metadata, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(bucket, project, filename, json.dumps(metadata) if metadata is not None else None, now)
+                 for (project, filename), metadata in files.items()]
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """Remove expired entries"""
+        if self.ttl_seconds is None:
+            return
+        cutoff = self._cutoff()
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM projects WHERE created_at < ?", (cutoff,)).rowcount
+            removed += self._conn.execute("DELETE FROM files WHERE created_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        if removed:
+            logger.info(f"Evicted {removed} EPT metadata cache entries")
+
+    def clear(self):
+        """Remove all cached metadata"""
+        with self._lock:
+            self._conn.executescript("DELETE FROM projects; DELETE FROM files;")
+            self._conn.commit()
+
+_ept_metadata_cache = None
+_ept_metadata_cache_lock = threading.Lock()
+
+def get_ept_metadata_cache() -> EptMetadataCache:
+    """Return the shared EPT metadata cache"""
+    global _ept_metadata_cache
+    with _ept_metadata_cache_lock:
+        if _ept_metadata_cache is None:
+            _ept_metadata_cache = EptMetadataCache()
+        return _ept_metadata_cache
+
+def _get_json(s3_client, bucket: str, key: str) -> Optional[Any]:
+    """Parsed JSON object, or None if it does not exist (other errors are raised)"""
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key, RequestPayer='requester')
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.loads(response['Body'].read().decode('utf-8'))
+
+def _fetch_project_fields(s3_client, bucket: str, project: str) -> Optional[Dict[str, Any]]:
+    """ept.json fields of a project ({} without ept.json, None on error)"""
+    try:
+        ept_data = _get_json(s3_client, bucket, f"{project}/ept.json") or {}
+        return {field: ept_data[field] for field in PROJECT_FIELDS if ept_data.get(field)}
+    except Exception as e:
+        logger.warning(f"Error getting ept.json for project {project}: {str(e)}")
+        return None
+
+def _fetch_file_metadata(s3_client, bucket: str, project: str, filename: str) -> Tuple[Optional[Dict], bool]:
+    """(ept-sources JSON of a file or None, whether the request succeeded)"""
+    try:
+        return _get_json(s3_client, bucket, f"{project}/ept-sources/{filename}.json"), True
+    except Exception as e:
+        logger.warning(f"Error getting metadata for file {filename}: {str(e)}")
+        return None, False
+
+def _find_in_source_lists(s3_client, bucket: str, project: str,
+                          filenames: List[str]) -> Tuple[Dict[str, Dict], bool]:
+    """
+    Look files up in a project's source lists, stopping at the first list that has them all.
+
+    Returns:
+        (dict of file name to its list item, whether all requests succeeded)
+    """
+    found, ok = {}, True
+    for name in SOURCE_LISTS:
+        try:
+            items = _get_json(s3_client, bucket, f"{project}/ept-sources/{name}") or []
+        except Exception as e:
+            logger.warning(f"Error getting {name} for project {project}: {str(e)}")
+            items, ok = [], False
+        for item in items:
+            found.setdefault(os.path.basename(item.get('path', '')), item)
+        if all(filename in found for filename in filenames):
+            break
+    return {filename: found[filename] for filename in filenames if filename in found}, ok
+
+def fetch_ept_metadata(files: Iterable[Tuple[str, str]],
+                       bucket: str = EPT_BUCKET,
+                       s3_client=None,
+                       max_workers: int = EPT_FETCH_WORKERS) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Retrieve EPT metadata for many files at once.
+
+    Args:
+        files: (project name, filename) pairs
+        bucket: S3 bucket holding the EPT resources
+        s3_client: Initialized boto3 S3 client (created on demand if needed)
+        max_workers: Maximum concurrent S3 requests
+
+    Returns:
+        Dict of (project name, filename) to metadata: the ept.json fields of the
+        project plus 'file_metadata' when the file's source metadata was found
+    """
+    requested = {(project, filename): (ept_project_for_file(project, filename), filename)
+                 for project, filename in files if project and filename}
+    if not requested:
+        return {}
+    pairs = list(dict.fromkeys(requested.values()))
+
+    cache = get_ept_metadata_cache()
+    project_fields = cache.get_projects(bucket, (project for project, _ in pairs))
+    file_metadata = cache.get_files(bucket, pairs)
+    missing_projects = list(dict.fromkeys(project for project, _ in pairs if project not in project_fields))
+    missing_files = [pair for pair in pairs if pair not in file_metadata]
+
+    if missing_projects or missing_files:
+        logger.info(f"Fetching EPT metadata: {len(missing_projects)} projects, {len(missing_files)} files "
+                    f"({len(pairs) - len(missing_files)} cached)")
+        if s3_client is None:
+            s3_client = create_s3_client(max_pool_connections=max_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched_projects = {}
+            for project, fields in zip(missing_projects, executor.map(
+                    lambda project: _fetch_project_fields(s3_client, bucket, project), missing_projects)):
+                if fields is not None:
+                    fetched_projects[project] = fields
+            project_fields.update(fetched_projects)
+            cache.put_projects(bucket, fetched_projects)
+
+            fetched_files = {}
+            unlisted = []
+            for pair, (metadata, ok) in zip(missing_files, executor.map(
+                    lambda pair: _fetch_file_metadata(s3_client, bucket, *pair), missing_files)):
+                if metadata is not None:
+                    fetched_files[pair] = metadata
+                elif ok:
+                    unlisted.append(pair)
+
+            # Files without their own JSON: one list.json/manifest.json lookup per project
+            by_project = {}
+            for project, filename in unlisted:
+                by_project.setdefault(project, []).append(filename)
+            for project, (items, ok) in zip(by_project, executor.map(
+                    lambda project: _find_in_source_lists(s3_client, bucket, project, by_project[project]),
+                    by_project)):
+                for filename in by_project[project]:
+                    if filename in items or ok:
+                        fetched_files[(project, filename)] = items.get(filename)
+
+        file_metadata.update(fetched_files)
+        cache.put_files(bucket, fetched_files)
+        logger.info(f"Fetched EPT metadata for {sum(1 for m in fetched_files.values() if m)} of {len(missing_files)} files")
+
+    results = {}
+    for request, pair in requested.items():
+        metadata = dict(project_fields.get(pair[0], {}))
+        if file_metadata.get(pair) is not None:
+            metadata['file_metadata'] = file_metadata[pair]
+        results[request] = metadata
+    return results
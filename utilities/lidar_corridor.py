@@ -0,0 +1,516 @@
+"""
+LiDAR Corridor Rasters
+
+Builds ground (DTM) and first-return surface (DSM) rasters along a microwave
+path directly from downloaded LAS/LAZ tiles.
+
+- Tiles are streamed with laspy chunk by chunk, so multi-GB tile sets never
+  have to fit in memory
+- Tiles whose header bounds miss the corridor are skipped without reading points
+- Only points inside the geometry.calculate_polygon_points corridor are kept
+- Points are binned into a path-aligned grid (columns along the path from site
+  A, rows across it) at a configurable resolution:
+    * ground raster: lowest ground-classified (class 2) point per cell
+    * surface raster: highest first-return point per cell
+- Tiles, or point ranges of very large tiles, are independent work units run
+  in a process pool; their partial grids are merged with min/max reducers
+- Terrain and canopy/obstruction profiles are sampled from the rasters at the
+  ElevationProfile distances
+
+Each tile is clipped in its own CRS (read from the LAS header): the corridor
+and path are transformed into the tile CRS once, instead of reprojecting every
+point. Grid memory is two float32 arrays of
+(path length + 2 x extension) / resolution by 2 x width / resolution cells.
+"""
+
+import os
+import glob
+import math
+import logging
+import warnings
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+import shapely
+from shapely.geometry import Polygon
+
+from utilities.geometry import calculate_polygon_points
+from utilities.terrain_engine import haversine_distance_m
+
+try:
+    import laspy
+    from pyproj import CRS, Transformer
+    LASPY_AVAILABLE = True
+except ImportError:
+    LASPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+METERS_PER_FOOT = 0.3048
+
+DEFAULT_RESOLUTION_M = 1.0
+DEFAULT_EXTENSION_FT = 1000
+
+# Points decompressed per laspy chunk
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Half width of the band around the path centerline used for profiles
+DEFAULT_PROFILE_BAND_M = 2.0
+
+# Tiles with more points than this are split into several work units
+DEFAULT_MAX_POINTS_PER_UNIT = 20_000_000
+
+# Seconds between cancellation checks while waiting on workers
+CANCEL_POLL_INTERVAL = 0.2
+
+GROUND_CLASS = 2
+
+@dataclass(frozen=True)
+class CorridorSpec:
+    """Path-aligned grid definition for a corridor"""
+    start_coords: Tuple[float, float]
+    end_coords: Tuple[float, float]
+    width_ft: float
+    extension_ft: float = DEFAULT_EXTENSION_FT
+    resolution_m: float = DEFAULT_RESOLUTION_M
+
+    @property
+    def length_m(self) -> float:
+        """Site A to site B distance in meters"""
+        return haversine_distance_m(self.start_coords, self.end_coords)
+
+    @property
+    def half_width_m(self) -> float:
+        return self.width_ft * METERS_PER_FOOT
+
+    @property
+    def extension_m(self) -> float:
+        return self.extension_ft * METERS_PER_FOOT
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(rows across the path, columns along the path)"""
+        rows = int(math.ceil(2 * self.half_width_m / self.resolution_m))
+        cols = int(math.ceil((self.length_m + 2 * self.extension_m) / self.resolution_m))
+        return max(rows, 1), max(cols, 1)
+
+    def polygon_points(self) -> List[Tuple[float, float]]:
+        """Corridor polygon corners as (lat, lon), from geometry.calculate_polygon_points"""
+        return calculate_polygon_points(self.start_coords, self.end_coords, self.width_ft, self.extension_ft)
+
+@dataclass
+class PartialGrid:
+    """Ground/surface values for a window of the corridor grid"""
+    row_off: int
+    col_off: int
+    ground: np.ndarray
+    surface: np.ndarray
+    points_read: int = 0
+    points_kept: int = 0
+    path: Optional[str] = None
+
+class CorridorGrid:
+    """Ground and first-return rasters along a path, in meters"""
+
+    def __init__(self, spec: CorridorSpec):
+        self.spec = spec
+        rows, cols = spec.shape
+        self.ground = np.full((rows, cols), np.nan, dtype=np.float32)
+        self.surface = np.full((rows, cols), np.nan, dtype=np.float32)
+        self.points_read = 0
+        self.points_kept = 0
+        self._tiles_used = set()
+
+    def merge(self, partial: PartialGrid):
+        """Merge a partial grid, keeping the lowest ground and highest surface values"""
+        rows, cols = partial.ground.shape
+        window = (slice(partial.row_off, partial.row_off + rows),
+                  slice(partial.col_off, partial.col_off + cols))
+        # fmin/fmax ignore NaN, so empty cells never overwrite data
+        np.fmin(self.ground[window], partial.ground, out=self.ground[window])
+        np.fmax(self.surface[window], partial.surface, out=self.surface[window])
+        self.points_read += partial.points_read
+        self.points_kept += partial.points_kept
+        if partial.points_kept:
+            self._tiles_used.add(partial.path)
+
+    @property
+    def tiles_used(self) -> int:
+        """Number of tiles that contributed points"""
+        return len(self._tiles_used)
+
+    def coverage(self) -> float:
+        """Fraction of the site A to site B centerline band with ground data"""
+        columns = self._band_values(self.ground, self.spec.half_width_m, DEFAULT_PROFILE_BAND_M)
+        start, end = self._column_range()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            covered = ~np.isnan(np.nanmin(columns[:, start:end], axis=0))
+        return float(covered.mean()) if covered.size else 0.0
+
+    def terrain_profile(self, distances_m: Sequence[float],
+                        band_m: float = DEFAULT_PROFILE_BAND_M) -> np.ndarray:
+        """
+        Ground elevations along the path centerline.
+
+        Args:
+            distances_m: Distances from site A in meters
+            band_m: Half width of the centerline band averaged per column
+
+        Returns:
+            Ground elevations in meters, NaN beyond the data
+        """
+        band = self._band_values(self.ground, self.spec.half_width_m, band_m)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            profile = np.nanmean(band, axis=0)
+        return self._sample_columns(profile, distances_m)
+
+    def surface_profile(self, distances_m: Sequence[float],
+                        band_m: float = DEFAULT_PROFILE_BAND_M) -> np.ndarray:
+        """Highest first-return elevations in meters along the path centerline"""
+        band = self._band_values(self.surface, self.spec.half_width_m, band_m)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            profile = np.nanmax(band, axis=0)
+        return self._sample_columns(profile, distances_m)
+
+    def obstruction_profile(self, distances_m: Sequence[float],
+                            band_m: float = DEFAULT_PROFILE_BAND_M) -> np.ndarray:
+        """
+        Canopy/obstruction heights above ground along the path centerline.
+
+        Returns:
+            Heights in meters (0 where there are no returns above ground)
+        """
+        heights = self.surface_profile(distances_m, band_m) - self.terrain_profile(distances_m, band_m)
+        return np.clip(np.nan_to_num(heights, nan=0.0), 0, None)
+
+    def _band_values(self, raster: np.ndarray, center_m: float, band_m: float) -> np.ndarray:
+        """Rows of the raster within band_m of the centerline (at least one row)"""
+        res = self.spec.resolution_m
+        first = max(int(math.floor((center_m - band_m) / res)), 0)
+        last = min(int(math.ceil((center_m + band_m) / res)), raster.shape[0])
+        return raster[first:max(last, first + 1)]
+
+    def _column_range(self) -> Tuple[int, int]:
+        res = self.spec.resolution_m
+        start = int(self.spec.extension_m / res)
+        end = int(math.ceil((self.spec.extension_m + self.spec.length_m) / res))
+        return start, min(max(end, start + 1), self.ground.shape[1])
+
+    def _sample_columns(self, profile: np.ndarray, distances_m: Sequence[float]) -> np.ndarray:
+        """Linearly interpolate a per-column profile at distances from site A, bridging empty columns"""
+        distances_m = np.asarray(distances_m, dtype=float)
+        centers = (np.arange(len(profile)) + 0.5) * self.spec.resolution_m - self.spec.extension_m
+        valid = ~np.isnan(profile)
+        if not valid.any():
+            return np.full(len(distances_m), np.nan)
+        return np.interp(distances_m, centers[valid], profile[valid].astype(float),
+                         left=np.nan, right=np.nan)
+
+class _TileFrame:
+    """Corridor and path geometry expressed in a tile's CRS"""
+
+    def __init__(self, spec: CorridorSpec, crs: "CRS", z_units: Optional[str] = None):
+        horizontal = crs.to_2d() if hasattr(crs, 'to_2d') else crs
+        to_tile = Transformer.from_crs("EPSG:4326", horizontal, always_xy=True)
+
+        self.unit_m = horizontal.axis_info[0].unit_conversion_factor if horizontal.axis_info else 1.0
+        if z_units is None:
+            z_units = 'ft' if abs(self.unit_m - METERS_PER_FOOT) < 1e-4 else 'm'
+        self.z_scale = METERS_PER_FOOT if z_units == 'ft' else 1.0
+
+        lons, lats = zip(*[(lon, lat) for lat, lon in spec.polygon_points()])
+        xs, ys = to_tile.transform(lons, lats)
+        self.polygon = Polygon(zip(xs, ys))
+        shapely.prepare(self.polygon)
+
+        (x0, x1), (y0, y1) = to_tile.transform([spec.start_coords[1], spec.end_coords[1]],
+                                               [spec.start_coords[0], spec.end_coords[0]])
+        length = math.hypot(x1 - x0, y1 - y0) or 1.0
+        self.origin = (x0, y0)
+        self.along = ((x1 - x0) / length, (y1 - y0) / length)
+        # Scale projected distances so site B lands at the great circle distance
+        self.along_scale = spec.length_m / (length * self.unit_m) if spec.length_m else 1.0
+
+    def grid_indices(self, spec: CorridorSpec, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Grid (row, col) for tile coordinates"""
+        dx = xs - self.origin[0]
+        dy = ys - self.origin[1]
+        along_m = (dx * self.along[0] + dy * self.along[1]) * self.unit_m * self.along_scale
+        # Positive to the left of the path, matching calculate_polygon_points
+        cross_m = (dy * self.along[0] - dx * self.along[1]) * self.unit_m
+        rows = np.floor((cross_m + spec.half_width_m) / spec.resolution_m).astype(np.int64)
+        cols = np.floor((along_m + spec.extension_m) / spec.resolution_m).astype(np.int64)
+        return rows, cols
+
+def _tile_window(spec: CorridorSpec, frame: _TileFrame, bounds: Tuple[float, float, float, float]
+                 ) -> Optional[Tuple[int, int, int, int]]:
+    """Grid window (row_off, col_off, rows, cols) covered by a tile's corridor clip"""
+    clipped = frame.polygon.intersection(shapely.box(*bounds))
+    if clipped.is_empty:
+        return None
+    xs, ys = shapely.get_coordinates(clipped).T
+    rows, cols = frame.grid_indices(spec, xs, ys)
+    grid_rows, grid_cols = spec.shape
+    row_off, col_off = max(int(rows.min()), 0), max(int(cols.min()), 0)
+    row_end, col_end = min(int(rows.max()) + 1, grid_rows), min(int(cols.max()) + 1, grid_cols)
+    if row_end <= row_off or col_end <= col_off:
+        return None
+    return row_off, col_off, row_end - row_off, col_end - col_off
+
+def tile_crs(header, default_crs=None):
+    """CRS from a LAS header (WKT or GeoTIFF keys), falling back to default_crs"""
+    try:
+        crs = header.parse_crs()
+    except Exception as e:
+        logger.warning(f"Could not parse LAS CRS: {e}")
+        crs = None
+    if crs is None and default_crs is not None:
+        crs = CRS.from_user_input(default_crs)
+    return crs
+
+def read_tile_partial(path: str,
+                      spec: CorridorSpec,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      default_crs=None,
+                      z_units: Optional[str] = None,
+                      should_stop: Optional[Callable[[], bool]] = None,
+                      point_range: Optional[Tuple[int, int]] = None) -> Optional[PartialGrid]:
+    """
+    Stream one LAS/LAZ tile (or a range of its points) and bin its corridor points.
+
+    Args:
+        path: LAS/LAZ file
+        spec: Corridor grid definition
+        chunk_size: Points decompressed per chunk
+        default_crs: CRS used when the header has none
+        z_units: Vertical units, 'm' or 'ft' (default: the horizontal CRS units)
+        should_stop: Called between chunks; returning True aborts the tile
+        point_range: (first_point, point_count) to read only part of the tile
+
+    Returns:
+        PartialGrid for the tile's window of the corridor grid, or None if the
+        tile misses the corridor, has no CRS or was aborted
+    """
+    with laspy.open(path) as reader:
+        header = reader.header
+        crs = tile_crs(header, default_crs)
+        if crs is None:
+            logger.warning(f"Skipping {os.path.basename(path)}: no CRS in header")
+            return None
+
+        frame = _TileFrame(spec, crs, z_units)
+        window = _tile_window(spec, frame, (header.x_min, header.y_min, header.x_max, header.y_max))
+        if window is None:
+            return None
+
+        row_off, col_off, rows, cols = window
+        ground = np.full(rows * cols, np.nan, dtype=np.float32)
+        surface = np.full(rows * cols, np.nan, dtype=np.float32)
+        min_x, min_y, max_x, max_y = frame.polygon.bounds
+        points_read = points_kept = 0
+
+        remaining = header.point_count
+        if point_range is not None:
+            reader.seek(point_range[0])
+            remaining = point_range[1]
+
+        while remaining > 0:
+            if should_stop is not None and should_stop():
+                logger.info(f"Stopped reading {os.path.basename(path)}")
+                return None
+            points = reader.read_points(min(chunk_size, remaining))
+            if len(points) == 0:
+                break
+            remaining -= len(points)
+
+            xs = np.asarray(points.x)
+            ys = np.asarray(points.y)
+            points_read += len(xs)
+
+            # Bounding box first, then the exact corridor polygon
+            idx = np.flatnonzero((xs >= min_x) & (xs <= max_x) & (ys >= min_y) & (ys <= max_y))
+            if len(idx) == 0:
+                continue
+            idx = idx[shapely.contains_xy(frame.polygon, xs[idx], ys[idx])]
+            if len(idx) == 0:
+                continue
+
+            grid_rows, grid_cols = frame.grid_indices(spec, xs[idx], ys[idx])
+            grid_rows -= row_off
+            grid_cols -= col_off
+            inside = (grid_rows >= 0) & (grid_rows < rows) & (grid_cols >= 0) & (grid_cols < cols)
+            idx, cells = idx[inside], (grid_rows * cols + grid_cols)[inside]
+            zs = (np.asarray(points.z)[idx] * frame.z_scale).astype(np.float32)
+            points_kept += len(idx)
+
+            is_ground = np.asarray(points.classification)[idx] == GROUND_CLASS
+            np.fmin.at(ground, cells[is_ground], zs[is_ground])
+            is_first = np.asarray(points.return_number)[idx] <= 1
+            np.fmax.at(surface, cells[is_first], zs[is_first])
+
+    return PartialGrid(row_off, col_off, ground.reshape(rows, cols), surface.reshape(rows, cols),
+                       points_read, points_kept, path)
+
+def find_lidar_files(directory: str) -> List[str]:
+    """LAS/LAZ files below a directory, sorted"""
+    files = []
+    for pattern in ('*.laz', '*.las', '*.LAZ', '*.LAS'):
+        files.extend(glob.glob(os.path.join(directory, '**', pattern), recursive=True))
+    return sorted(set(files))
+
+def plan_work_units(lidar_files: Iterable[str],
+                    spec: CorridorSpec,
+                    max_points_per_unit: int = DEFAULT_MAX_POINTS_PER_UNIT,
+                    default_crs=None) -> List[Tuple[str, Optional[Tuple[int, int]]]]:
+    """
+    Split tiles into work units, dropping tiles that miss the corridor.
+
+    Only headers are read. Tiles larger than max_points_per_unit are split into
+    point ranges so a few huge tiles still spread over all workers.
+
+    Returns:
+        List of (path, point_range) units, point_range None for whole tiles
+    """
+    units = []
+    for path in lidar_files:
+        try:
+            with laspy.open(path) as reader:
+                header = reader.header
+                crs = tile_crs(header, default_crs)
+                if crs is None:
+                    logger.warning(f"Skipping {os.path.basename(path)}: no CRS in header")
+                    continue
+                frame = _TileFrame(spec, crs)
+                if _tile_window(spec, frame, (header.x_min, header.y_min, header.x_max, header.y_max)) is None:
+                    continue
+                point_count = header.point_count
+        except Exception as e:
+            logger.error(f"Error reading LiDAR header {path}: {e}")
+            continue
+
+        if point_count <= max_points_per_unit:
+            units.append((path, None))
+        else:
+            for first in range(0, point_count, max_points_per_unit):
+                units.append((path, (first, min(max_points_per_unit, point_count - first))))
+    return units
+
+# Set in each worker process by _init_worker
+_worker_stop_event = None
+
+def _init_worker(stop_event):
+    global _worker_stop_event
+    _worker_stop_event = stop_event
+
+def _process_unit(path, point_range, spec, chunk_size, default_crs, z_units):
+    """Worker entry point: bin one work unit"""
+    return read_tile_partial(path, spec, chunk_size, default_crs, z_units,
+                             should_stop=_worker_stop_event.is_set if _worker_stop_event else None,
+                             point_range=point_range)
+
+def build_corridor_grid(lidar_files: Iterable[str],
+                        start_coords: Tuple[float, float],
+                        end_coords: Tuple[float, float],
+                        width_ft: float,
+                        extension_ft: float = DEFAULT_EXTENSION_FT,
+                        resolution_m: float = DEFAULT_RESOLUTION_M,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        default_crs=None,
+                        z_units: Optional[str] = None,
+                        workers: Optional[int] = None,
+                        max_points_per_unit: int = DEFAULT_MAX_POINTS_PER_UNIT,
+                        progress_callback: Optional[Callable[[str, float], None]] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Optional[CorridorGrid]:
+    """
+    Stream LAS/LAZ tiles into ground and first-return corridor rasters.
+
+    Tiles (or point ranges of large tiles) are processed as independent work
+    units in a process pool; each returns a partial grid for its window, which
+    is merged here with min (ground) and max (surface) reducers.
+
+    Args:
+        lidar_files: LAS/LAZ tile paths
+        start_coords: (lat, lon) of site A
+        end_coords: (lat, lon) of site B
+        width_ft: Corridor half width in feet (as passed to calculate_polygon_points)
+        extension_ft: Corridor extension beyond each site in feet
+        resolution_m: Grid cell size in meters
+        chunk_size: Points decompressed per chunk
+        default_crs: CRS for tiles without one in their header
+        z_units: Vertical units override, 'm' or 'ft'
+        workers: Worker processes (default: CPU count, 1 to run in this process)
+        max_points_per_unit: Tiles with more points are split into several work units
+        progress_callback: Called as (message, percent) after each work unit,
+            like the search progress callbacks in the UI
+        cancel_event: Set to stop processing; pending units are dropped and
+            running units stop at their next chunk
+
+    Returns:
+        CorridorGrid with the merged rasters, or None if cancelled
+    """
+    if not LASPY_AVAILABLE:
+        raise ImportError("laspy and pyproj are required to read LiDAR tiles")
+
+    spec = CorridorSpec(tuple(start_coords), tuple(end_coords), width_ft, extension_ft, resolution_m)
+    grid = CorridorGrid(spec)
+    units = plan_work_units(lidar_files, spec, max_points_per_unit, default_crs)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(units) or 1))
+    logger.info(f"Building {spec.shape[0]}x{spec.shape[1]} corridor grid at {resolution_m} m "
+                f"from {len(units)} LiDAR work units with {workers} workers")
+
+    def report(done):
+        if progress_callback:
+            progress_callback(f"Processed {done} of {len(units)} LiDAR tiles", 100 * done / max(len(units), 1))
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    if workers == 1:
+        for done, (path, point_range) in enumerate(units, 1):
+            try:
+                partial = read_tile_partial(path, spec, chunk_size, default_crs, z_units,
+                                            should_stop=cancelled, point_range=point_range)
+                if partial is not None:
+                    grid.merge(partial)
+            except Exception as e:
+                logger.error(f"Error reading LiDAR tile {path}: {e}", exc_info=True)
+            if cancelled():
+                logger.info("LiDAR corridor processing cancelled")
+                return None
+            report(done)
+    else:
+        stop_event = multiprocessing.Event()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stop_event,))
+        try:
+            futures = {executor.submit(_process_unit, path, point_range, spec, chunk_size, default_crs, z_units): path
+                       for path, point_range in units}
+            pending = set(futures)
+            done_count = 0
+            while pending:
+                finished, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                if cancelled():
+                    logger.info("LiDAR corridor processing cancelled")
+                    stop_event.set()
+                    return None
+                for future in finished:
+                    try:
+                        partial = future.result()
+                        if partial is not None:
+                            grid.merge(partial)
+                    except Exception as e:
+                        logger.error(f"Error reading LiDAR tile {futures[future]}: {e}", exc_info=True)
+                    done_count += 1
+                    report(done_count)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    logger.info(f"Corridor grid: {grid.points_kept} of {grid.points_read} points kept "
+                f"from {grid.tiles_used} tiles, {grid.coverage():.0%} path coverage")
+    return grid
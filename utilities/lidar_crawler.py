@@ -12,7 +12,7 @@ import boto3
 import json
 import re
 import math
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional, Tuple
 import concurrent.futures
 from shapely.geometry import box, Polygon, mapping
@@ -20,10 +20,13 @@ import time
 
 # Import the database module
 from utilities.lidar_index_db import (
-    init_database, add_project, add_file, start_crawl, update_crawl,
-    get_database_stats, database_exists, DEFAULT_DB_PATH
+    init_database, add_project, add_files_bulk, start_crawl, update_crawl,
+    get_database_stats, database_exists, get_file_states, delete_stale_files, DEFAULT_DB_PATH
 )
 
+# Number of files buffered before they are written in one transaction
+FILE_BATCH_SIZE = 1000
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -32,14 +35,19 @@ class LidarCrawler:
     Crawler for indexing LIDAR files in the USGS AWS S3 bucket.
     """
 
-    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, changed_only: bool = False,
+                 since: Optional[datetime] = None):
         """
         Initialize the LIDAR crawler.
 
         Args:
             db_path: Path to the database file
+            changed_only: Skip files whose S3 ETag matches the one already indexed
+            since: Skip files whose S3 LastModified is before this datetime
         """
         self.db_path = db_path
+        self.changed_only = changed_only
+        self.since = since
         self.s3_client = None
         self.crawl_id = None
         self.stats = {
@@ -47,9 +55,24 @@ class LidarCrawler:
             'projects_updated': 0,
             'files_added': 0,
             'files_updated': 0,
+            'files_unchanged': 0,
+            'files_deleted': 0,
             'errors': 0
         }
 
+        # Files waiting to be written, keyed by project ID
+        self.pending_files: Dict[int, List[Dict[str, Any]]] = {}
+
+        # Indexed file states for the project being crawled (incremental mode)
+        self.known_files: Dict[str, Dict[str, Any]] = {}
+
+        # LAZ/LAS keys listed for the project being crawled, and whether the listing finished
+        self.listed_keys = set()
+        self.listing_complete = True
+
+        # EPT bounding boxes already looked up in this run, keyed by project name
+        self.project_bboxes: Dict[str, Optional[Dict[str, float]]] = {}
+
     def initialize_s3_client(self) -> bool:
         """
         Initialize the S3 client with credentials from environment variables.
@@ -277,6 +300,11 @@ class LidarCrawler:
 
             logger.info(f"Crawling files in project: {project_name}")
 
+            # Load what is already indexed so unchanged files can be skipped
+            self.known_files = get_file_states(project_id, self.db_path) if self.changed_only else {}
+            self.listed_keys = set()
+            self.listing_complete = True
+
             # List of possible subdirectories to check for LAZ/LAS files
             subdirs = [
                 '',  # Project root
@@ -295,10 +323,22 @@ class LidarCrawler:
                 prefix = f"{project_prefix}{subdir}"
                 self.crawl_directory(prefix, project_id)
 
+            # Files gone from S3 are removed, but only after a complete listing
+            if self.listing_complete:
+                self.flush_files(project_id)
+                self.stats['files_deleted'] += delete_stale_files(
+                    project_id, self.listed_keys, self.db_path, key_prefix=project_prefix)
+            else:
+                logger.warning(f"Listing of project {project_name} was incomplete; keeping indexed files")
+
         except Exception as e:
             logger.error(f"Error crawling files in project {project_data.get('name')}: {str(e)}", exc_info=True)
             self.stats['errors'] += 1
 
+        finally:
+            # Write whatever is left for this project
+            self.flush_files(project_id)
+
     def crawl_directory(self, prefix: str, project_id: int, max_files: int = None) -> None:
         """
         Crawl files in a directory.
@@ -335,12 +375,18 @@ class LidarCrawler:
                 for item in response.get('Contents', []):
                     key = item.get('Key')
                     if key and (key.lower().endswith('.laz') or key.lower().endswith('.las')):
+                        self.listed_keys.add(key)
+                        if self.is_unchanged(key, item):
+                            self.stats['files_unchanged'] += 1
+                            continue
+
                         # Process the file
                         self.process_file({
                             'bucket': 'usgs-lidar-public',
                             'key': key,
                             'size': item.get('Size'),
-                            'last_modified': item.get('LastModified')
+                            'last_modified': item.get('LastModified'),
+                            'etag': item.get('ETag')
                         }, project_id)
 
                         file_count += 1
@@ -348,6 +394,7 @@ class LidarCrawler:
                         # Check if we've reached the maximum number of files
                         if max_files and file_count >= max_files:
                             logger.info(f"Reached maximum file limit ({max_files})")
+                            self.listing_complete = False
                             return
 
                 # Check if there are more results
@@ -361,6 +408,33 @@ class LidarCrawler:
         except Exception as e:
             logger.error(f"Error crawling directory {prefix}: {str(e)}", exc_info=True)
             self.stats['errors'] += 1
+            self.listing_complete = False
+
+    def is_unchanged(self, key: str, item: Dict[str, Any]) -> bool:
+        """
+        Check whether a listed S3 object can be skipped on an incremental crawl.
+
+        Args:
+            key: S3 key
+            item: Object entry from list_objects_v2
+
+        Returns:
+            bool: True if the object should not be re-processed
+        """
+        last_modified = item.get('LastModified')
+        if self.since and isinstance(last_modified, datetime):
+            if last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+            if last_modified < self.since:
+                return True
+
+        if self.changed_only:
+            etag = item.get('ETag')
+            known = self.known_files.get(key)
+            if etag and known and known.get('etag') == etag:
+                return True
+
+        return False
 
     def process_file(self, file_data: Dict[str, Any], project_id: int) -> None:
         """
@@ -378,8 +452,10 @@ class LidarCrawler:
             key_parts = key.split('/')
             project_name = key_parts[0] if len(key_parts) > 0 else ''
 
-            # Extract bounding box from EPT data
-            bbox = self.extract_bbox_from_ept(project_name)
+            # Extract bounding box from EPT data (once per project and run)
+            if project_name not in self.project_bboxes:
+                self.project_bboxes[project_name] = self.extract_bbox_from_ept(project_name)
+            bbox = self.project_bboxes[project_name]
             if not bbox:
                 # Fall back to filename-based extraction
                 bbox = self.extract_bbox_from_filename(filename, key)
@@ -407,19 +483,40 @@ class LidarCrawler:
             # Add metadata source
             file_data['metadata_source'] = 'ept' if bbox else 'filename'
 
-            # Add file to database
-            file_id = add_file(file_data, project_id, self.db_path)
+            # Queue file for the next bulk write
+            pending = self.pending_files.setdefault(project_id, [])
+            pending.append(file_data)
 
-            # Update stats
-            if file_id > 0:
-                self.stats['files_added'] += 1
-            else:
-                self.stats['files_updated'] += 1
+            if len(pending) >= FILE_BATCH_SIZE:
+                self.flush_files(project_id)
 
         except Exception as e:
             logger.error(f"Error processing file {file_data.get('key')}: {str(e)}", exc_info=True)
             self.stats['errors'] += 1
 
+    def flush_files(self, project_id: int) -> None:
+        """
+        Write the queued files for a project to the database in one transaction.
+
+        Args:
+            project_id: Project ID in the database
+        """
+        pending = self.pending_files.pop(project_id, [])
+        if not pending:
+            return
+
+        try:
+            batch_stats = add_files_bulk(pending, project_id, self.db_path)
+
+            # Update stats
+            self.stats['files_added'] += batch_stats['files_added']
+            self.stats['files_updated'] += batch_stats['files_updated']
+            self.stats['errors'] += batch_stats['errors']
+
+        except Exception as e:
+            logger.error(f"Error writing {len(pending)} files for project ID {project_id}: {str(e)}", exc_info=True)
+            self.stats['errors'] += len(pending)
+
     def extract_bbox_from_ept(self, project_name: str) -> Optional[Dict[str, float]]:
         """
         Extract bounding box from EPT data.
@@ -682,6 +779,8 @@ class LidarCrawler:
             logger.info(f"  Projects updated: {self.stats['projects_updated']}")
             logger.info(f"  Files added: {self.stats['files_added']}")
             logger.info(f"  Files updated: {self.stats['files_updated']}")
+            logger.info(f"  Files unchanged: {self.stats['files_unchanged']}")
+            logger.info(f"  Files deleted: {self.stats['files_deleted']}")
             logger.info(f"  Errors: {self.stats['errors']}")
 
             # Print database stats
@@ -703,8 +802,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='LIDAR Crawler')
     parser.add_argument('--max-projects', type=int, help='Maximum number of projects to crawl')
     parser.add_argument('--db-path', type=str, default=DEFAULT_DB_PATH, help='Path to the database file')
+    parser.add_argument('--changed-only', action='store_true', help='Skip files whose ETag is unchanged')
+    parser.add_argument('--since', type=lambda value: datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc),
+                        help='Skip files last modified before this date (YYYY-MM-DD)')
     args = parser.parse_args()
 
     # Run crawler
-    crawler = LidarCrawler(args.db_path)
+    crawler = LidarCrawler(args.db_path, args.changed_only, args.since)
     crawler.run(args.max_projects)
@@ -9,6 +9,7 @@ import os
 import sqlite3
 import logging
 import json
+import threading
 from typing import List, Dict, Any, Optional, Tuple, Set
 from datetime import datetime
 
@@ -19,6 +20,285 @@ logger = logging.getLogger(__name__)
 DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
                               '..', 'DATABASE', 'lidar_index.db')
 
+# SQLite tuning applied once to every pooled connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',       # Readers don't block the crawler's writes
+    'synchronous': 'NORMAL',     # Safe with WAL, far fewer fsyncs than FULL
+    'cache_size': -65536,        # 64 MB page cache (negative = KiB)
+    'mmap_size': 268435456,      # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY'
+}
+
+# Number of prepared statements cached per connection
+STATEMENT_CACHE_SIZE = 256
+
+# Seconds to wait for a lock held by another connection
+BUSY_TIMEOUT = 30
+
+class ConnectionManager:
+    """
+    Thread-aware pool of SQLite connections.
+
+    Each thread gets one long-lived connection per database file, held in
+    thread-local storage so a new thread never sees another thread's
+    connection (even when the OS reuses its thread id). PRAGMAs are applied
+    when the connection is opened and sqlite3 keeps its prepared statements
+    cached, so repeated calls don't pay connect/prepare costs.
+
+    Connections are closed by close_thread() (the calling thread's), by
+    close_all(), or when a connection is opened after its owning thread has
+    exited.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Every open connection with the thread that owns it
+        self._open: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+
+    def get_connection(self, db_path: str) -> sqlite3.Connection:
+        """
+        Get the calling thread's connection to a database, opening it if needed.
+
+        Args:
+            db_path: Path to the database file
+
+        Returns:
+            sqlite3.Connection: Pooled connection
+        """
+        local = self._local
+        connections = getattr(local, 'connections', None)
+        if connections is None:
+            connections = local.connections = {}
+
+        key = os.path.abspath(db_path)
+        conn = connections.get(key)
+
+        if conn is None:
+            conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            for name, value in SQLITE_PRAGMAS.items():
+                try:
+                    conn.execute(f"PRAGMA {name} = {value}")
+                except sqlite3.DatabaseError as e:
+                    logger.warning(f"Could not set PRAGMA {name} on {db_path}: {str(e)}")
+
+            connections[key] = conn
+            with self._lock:
+                # Close connections left behind by threads that have exited
+                dead = [c for thread, c in self._open if not thread.is_alive()]
+                self._open = [(thread, c) for thread, c in self._open if thread.is_alive()]
+                self._open.append((threading.current_thread(), conn))
+            self._close(dead)
+
+        return conn
+
+    def close_thread(self) -> None:
+        """
+        Close the calling thread's pooled connections.
+        """
+        connections = list(getattr(self._local, 'connections', {}).values())
+        self._local.connections = {}
+
+        with self._lock:
+            self._open = [(thread, c) for thread, c in self._open if c not in connections]
+        self._close(connections)
+
+    def close_all(self) -> None:
+        """
+        Close every pooled connection.
+        """
+        with self._lock:
+            connections = [conn for _, conn in self._open]
+            self._open = []
+            # Drop every thread's references to the closed connections
+            self._local = threading.local()
+
+        self._close(connections)
+
+    @staticmethod
+    def _close(connections: List[sqlite3.Connection]) -> None:
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Error closing database connection: {str(e)}")
+
+# Shared connection manager used by all functions in this module
+_connection_manager = ConnectionManager()
+
+def get_connection(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """
+    Get the calling thread's pooled connection to the LIDAR index database.
+
+    Args:
+        db_path: Path to the database file
+
+    Returns:
+        sqlite3.Connection: Pooled connection
+    """
+    return _connection_manager.get_connection(db_path)
+
+def close_thread_connections() -> None:
+    """
+    Close the calling thread's pooled connections (e.g. when a worker thread finishes).
+    """
+    _connection_manager.close_thread()
+
+def close_connections() -> None:
+    """
+    Close all pooled connections (e.g. before deleting or replacing the database file).
+    """
+    _connection_manager.close_all()
+
+# Columns added after the original schema, added in place to older databases
+MIGRATED_COLUMNS = {
+    'projects': [
+        ('ept_etag', 'TEXT'),
+        ('manifest_etag', 'TEXT'),
+        ('manifest_last_modified', 'TEXT'),
+        ('manifest_hash', 'TEXT'),
+        ('last_crawled', 'TIMESTAMP')
+    ],
+    'files': [
+        ('etag', 'TEXT'),
+        ('source_hash', 'TEXT')
+    ]
+}
+
+# Databases whose schema has been checked/migrated in this process
+_schema_status: Set[str] = set()
+
+# R*Tree virtual table mirroring the bounding boxes in the files table
+RTREE_TABLE = 'files_rtree'
+
+# Databases whose R*Tree index has been checked/migrated in this process
+_rtree_status: Dict[str, bool] = {}
+
+def _valid_bbox_sql(alias: str) -> str:
+    """
+    SQL condition that is true when a files row has a bounding box the R*Tree can store.
+
+    Args:
+        alias: Table alias or trigger row name (e.g. 'f' or 'NEW')
+
+    Returns:
+        str: SQL boolean expression
+    """
+    return (f"{alias}.min_x IS NOT NULL AND {alias}.max_x IS NOT NULL AND "
+            f"{alias}.min_y IS NOT NULL AND {alias}.max_y IS NOT NULL AND "
+            f"{alias}.min_x <= {alias}.max_x AND {alias}.min_y <= {alias}.max_y")
+
+def _ensure_rtree_index(cursor: sqlite3.Cursor) -> bool:
+    """
+    Create the R*Tree spatial index for files and backfill it from existing rows.
+
+    Triggers on the files table keep the index in sync with every insert,
+    update and delete. Databases created before the R*Tree index existed are
+    migrated here by inserting every file that is not yet present in the index.
+
+    Args:
+        cursor: Database cursor
+
+    Returns:
+        bool: True if the R*Tree index is available, False otherwise
+    """
+    try:
+        cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(
+            id, min_x, max_x, min_y, max_y
+        )
+        """)
+
+        # Keep the spatial index in sync with every write to the files table
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_insert AFTER INSERT ON files
+        WHEN {_valid_bbox_sql('NEW')}
+        BEGIN
+            INSERT OR REPLACE INTO {RTREE_TABLE} (id, min_x, max_x, min_y, max_y)
+            VALUES (NEW.id, NEW.min_x, NEW.max_x, NEW.min_y, NEW.max_y);
+        END
+        """)
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_update
+        AFTER UPDATE OF min_x, min_y, max_x, max_y ON files
+        BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+            INSERT INTO {RTREE_TABLE} (id, min_x, max_x, min_y, max_y)
+            SELECT NEW.id, NEW.min_x, NEW.max_x, NEW.min_y, NEW.max_y
+            WHERE {_valid_bbox_sql('NEW')};
+        END
+        """)
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_delete AFTER DELETE ON files
+        BEGIN
+            DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+        END
+        """)
+
+        # Backfill files that are missing from the spatial index
+        cursor.execute(f"""
+        INSERT INTO {RTREE_TABLE} (id, min_x, max_x, min_y, max_y)
+        SELECT f.id, f.min_x, f.max_x, f.min_y, f.max_y
+        FROM files f
+        LEFT JOIN {RTREE_TABLE} r ON r.id = f.id
+        WHERE r.id IS NULL AND {_valid_bbox_sql('f')}
+        """)
+        if cursor.rowcount > 0:
+            logger.info(f"Added {cursor.rowcount} files to the R*Tree spatial index")
+
+        return True
+
+    except sqlite3.OperationalError as e:
+        logger.warning(f"R*Tree spatial index not available, using bbox scan: {str(e)}")
+        return False
+
+def _has_rtree_index(cursor: sqlite3.Cursor, db_path: str) -> bool:
+    """
+    Check (and migrate, on first use) the R*Tree spatial index for a database.
+
+    Args:
+        cursor: Database cursor
+        db_path: Path to the database file
+
+    Returns:
+        bool: True if the R*Tree index can be used
+    """
+    key = os.path.abspath(db_path)
+    if key not in _rtree_status:
+        _rtree_status[key] = _ensure_rtree_index(cursor)
+    return _rtree_status[key]
+
+def _ensure_schema(cursor: sqlite3.Cursor, db_path: str) -> None:
+    """
+    Bring an existing database up to the current schema (once per process).
+
+    Adds any missing MIGRATED_COLUMNS and the R*Tree spatial index.
+
+    Args:
+        cursor: Database cursor
+        db_path: Path to the database file
+    """
+    key = os.path.abspath(db_path)
+    if key in _schema_status:
+        return
+
+    for table, columns in MIGRATED_COLUMNS.items():
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+
+        # Table not created yet - nothing to migrate
+        if not existing:
+            continue
+
+        for name, column_type in columns:
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+                logger.info(f"Added column {table}.{name} to {db_path}")
+
+    _has_rtree_index(cursor, db_path)
+    _schema_status.add(key)
+
 def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
     """
     Initialize the LIDAR index database.
@@ -32,13 +312,10 @@ def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
 
         logger.info(f"Initializing LIDAR index database at {db_path}")
 
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
-        # Enable foreign keys
-        cursor.execute("PRAGMA foreign_keys = ON")
-
         # Create projects table
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS projects (
@@ -50,7 +327,12 @@ def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
             source TEXT,
             date_added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             date_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            metadata TEXT
+            metadata TEXT,
+            ept_etag TEXT,
+            manifest_etag TEXT,
+            manifest_last_modified TEXT,
+            manifest_hash TEXT,
+            last_crawled TIMESTAMP
         )
         """)
 
@@ -81,6 +363,8 @@ def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
             resolution REAL,
             point_spacing REAL,
             coordinate_system TEXT,
+            etag TEXT,
+            source_hash TEXT,
             FOREIGN KEY (project_id) REFERENCES projects(id) ON DELETE CASCADE
         )
         """)
@@ -100,6 +384,11 @@ def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
         CREATE INDEX IF NOT EXISTS idx_files_format ON files (format)
         """)
 
+        # Migrate existing databases and create the R*Tree spatial index
+        _schema_status.discard(os.path.abspath(db_path))
+        _rtree_status.pop(os.path.abspath(db_path), None)
+        _ensure_schema(cursor, db_path)
+
         # Create crawl_history table
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS crawl_history (
@@ -124,11 +413,6 @@ def init_database(db_path: str = DEFAULT_DB_PATH) -> None:
         logger.error(f"Error initializing LIDAR index database: {str(e)}", exc_info=True)
         raise
 
-    finally:
-        # Close connection
-        if conn:
-            conn.close()
-
 def add_project(project_data: Dict[str, Any], db_path: str = DEFAULT_DB_PATH) -> int:
     """
     Add a project to the database.
@@ -141,8 +425,8 @@ def add_project(project_data: Dict[str, Any], db_path: str = DEFAULT_DB_PATH) ->
         int: Project ID
     """
     try:
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
         # Extract project data
@@ -187,10 +471,97 @@ def add_project(project_data: Dict[str, Any], db_path: str = DEFAULT_DB_PATH) ->
             conn.rollback()
         raise
 
-    finally:
-        # Close connection
-        if conn:
-            conn.close()
+def _upsert_file(cursor: sqlite3.Cursor, file_data: Dict[str, Any], project_id: int) -> Tuple[int, bool]:
+    """
+    Insert or update a single file row using the given cursor (no commit).
+
+    Args:
+        cursor: Database cursor
+        file_data: File data
+        project_id: Project ID
+
+    Returns:
+        Tuple[int, bool]: File ID and whether the file was newly added
+    """
+    # Extract file data
+    bucket = file_data.get('bucket')
+    key = file_data.get('key')
+    filename = key.split('/')[-1] if key else ''
+    size = file_data.get('size')
+    last_modified = file_data.get('last_modified')
+    format = filename.split('.')[-1].lower() if filename else ''
+
+    # Extract bounding box
+    bbox = file_data.get('boundingBox', {})
+    min_x = bbox.get('minX')
+    min_y = bbox.get('minY')
+    max_x = bbox.get('maxX')
+    max_y = bbox.get('maxY')
+
+    # Extract polygon
+    polygon = json.dumps(file_data.get('polygon_points', []))
+
+    # Extract metadata source
+    metadata_source = file_data.get('metadata_source')
+
+    # Extract metadata URLs
+    ept_json_url = file_data.get('eptJsonUrl')
+    ept_sources_url = file_data.get('eptSourcesUrl')
+    ept_metadata_url = file_data.get('eptMetadataUrl')
+
+    # Extract point cloud information
+    point_count = file_data.get('pointCount')
+    resolution = file_data.get('resolution')
+    point_spacing = file_data.get('pointSpacing')
+    coordinate_system = file_data.get('coordinateSystem')
+
+    # Extract metadata
+    metadata = json.dumps(file_data.get('metadata', {}))
+
+    # Extract change-detection fields
+    etag = file_data.get('etag')
+    source_hash = file_data.get('source_hash')
+
+    # Check if file already exists
+    cursor.execute("SELECT id FROM files WHERE key = ?", (key,))
+    result = cursor.fetchone()
+
+    if result:
+        # Update existing file
+        file_id = result[0]
+        cursor.execute("""
+        UPDATE files
+        SET project_id = ?, bucket = ?, filename = ?, size = ?, last_modified = ?,
+            format = ?, min_x = ?, min_y = ?, max_x = ?, max_y = ?, polygon = ?,
+            metadata_source = ?, date_updated = CURRENT_TIMESTAMP, metadata = ?,
+            ept_json_url = ?, ept_sources_url = ?, ept_metadata_url = ?,
+            point_count = ?, resolution = ?, point_spacing = ?, coordinate_system = ?,
+            etag = ?, source_hash = ?
+        WHERE id = ?
+        """, (project_id, bucket, filename, size, last_modified, format,
+             min_x, min_y, max_x, max_y, polygon, metadata_source, metadata,
+             ept_json_url, ept_sources_url, ept_metadata_url,
+             point_count, resolution, point_spacing, coordinate_system,
+             etag, source_hash, file_id))
+        logger.debug(f"Updated file {key} (ID: {file_id})")
+        return file_id, False
+
+    # Insert new file
+    cursor.execute("""
+    INSERT INTO files (project_id, bucket, key, filename, size, last_modified,
+                      format, min_x, min_y, max_x, max_y, polygon,
+                      metadata_source, metadata, ept_json_url, ept_sources_url, ept_metadata_url,
+                      point_count, resolution, point_spacing, coordinate_system,
+                      etag, source_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (project_id, bucket, key, filename, size, last_modified, format,
+         min_x, min_y, max_x, max_y, polygon, metadata_source, metadata,
+         ept_json_url, ept_sources_url, ept_metadata_url,
+         point_count, resolution, point_spacing, coordinate_system,
+         etag, source_hash))
+    file_id = cursor.lastrowid
+    logger.debug(f"Added file {key} (ID: {file_id})")
+    return file_id, True
 
 def add_file(file_data: Dict[str, Any], project_id: int, db_path: str = DEFAULT_DB_PATH) -> int:
     """
@@ -205,79 +576,14 @@ def add_file(file_data: Dict[str, Any], project_id: int, db_path: str = DEFAULT_
         int: File ID
     """
     try:
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
-        # Extract file data
-        bucket = file_data.get('bucket')
-        key = file_data.get('key')
-        filename = key.split('/')[-1] if key else ''
-        size = file_data.get('size')
-        last_modified = file_data.get('last_modified')
-        format = filename.split('.')[-1].lower() if filename else ''
-
-        # Extract bounding box
-        bbox = file_data.get('boundingBox', {})
-        min_x = bbox.get('minX')
-        min_y = bbox.get('minY')
-        max_x = bbox.get('maxX')
-        max_y = bbox.get('maxY')
-
-        # Extract polygon
-        polygon = json.dumps(file_data.get('polygon_points', []))
-
-        # Extract metadata source
-        metadata_source = file_data.get('metadata_source')
-
-        # Extract metadata URLs
-        ept_json_url = file_data.get('eptJsonUrl')
-        ept_sources_url = file_data.get('eptSourcesUrl')
-        ept_metadata_url = file_data.get('eptMetadataUrl')
-
-        # Extract point cloud information
-        point_count = file_data.get('pointCount')
-        resolution = file_data.get('resolution')
-        point_spacing = file_data.get('pointSpacing')
-        coordinate_system = file_data.get('coordinateSystem')
-
-        # Extract metadata
-        metadata = json.dumps(file_data.get('metadata', {}))
-
-        # Check if file already exists
-        cursor.execute("SELECT id FROM files WHERE key = ?", (key,))
-        result = cursor.fetchone()
+        # Make sure the schema (crawl-state columns, R*Tree index) is current before writing
+        _ensure_schema(cursor, db_path)
 
-        if result:
-            # Update existing file
-            file_id = result[0]
-            cursor.execute("""
-            UPDATE files
-            SET project_id = ?, bucket = ?, filename = ?, size = ?, last_modified = ?,
-                format = ?, min_x = ?, min_y = ?, max_x = ?, max_y = ?, polygon = ?,
-                metadata_source = ?, date_updated = CURRENT_TIMESTAMP, metadata = ?,
-                ept_json_url = ?, ept_sources_url = ?, ept_metadata_url = ?,
-                point_count = ?, resolution = ?, point_spacing = ?, coordinate_system = ?
-            WHERE id = ?
-            """, (project_id, bucket, filename, size, last_modified, format,
-                 min_x, min_y, max_x, max_y, polygon, metadata_source, metadata,
-                 ept_json_url, ept_sources_url, ept_metadata_url,
-                 point_count, resolution, point_spacing, coordinate_system, file_id))
-            logger.debug(f"Updated file {key} (ID: {file_id})")
-        else:
-            # Insert new file
-            cursor.execute("""
-            INSERT INTO files (project_id, bucket, key, filename, size, last_modified,
-                              format, min_x, min_y, max_x, max_y, polygon,
-                              metadata_source, metadata, ept_json_url, ept_sources_url, ept_metadata_url,
-                              point_count, resolution, point_spacing, coordinate_system)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (project_id, bucket, key, filename, size, last_modified, format,
-                 min_x, min_y, max_x, max_y, polygon, metadata_source, metadata,
-                 ept_json_url, ept_sources_url, ept_metadata_url,
-                 point_count, resolution, point_spacing, coordinate_system))
-            file_id = cursor.lastrowid
-            logger.debug(f"Added file {key} (ID: {file_id})")
+        file_id, _ = _upsert_file(cursor, file_data, project_id)
 
         # Commit changes
         conn.commit()
@@ -290,10 +596,62 @@ def add_file(file_data: Dict[str, Any], project_id: int, db_path: str = DEFAULT_
             conn.rollback()
         raise
 
-    finally:
-        # Close connection
+def add_files_bulk(files_data: List[Dict[str, Any]], project_id: int,
+                   db_path: str = DEFAULT_DB_PATH) -> Dict[str, int]:
+    """
+    Add many files to the database in a single transaction.
+
+    A row that fails is logged and counted as an error without aborting the
+    rest of the batch.
+
+    Args:
+        files_data: List of file data dictionaries
+        project_id: Project ID
+        db_path: Path to the database file
+
+    Returns:
+        Dict[str, int]: Counts of files added, updated and errors
+    """
+    stats = {
+        'files_added': 0,
+        'files_updated': 0,
+        'errors': 0
+    }
+
+    if not files_data:
+        return stats
+
+    try:
+        # Get pooled connection
+        conn = get_connection(db_path)
+        cursor = conn.cursor()
+
+        # Make sure the schema (crawl-state columns, R*Tree index) is current before writing
+        _ensure_schema(cursor, db_path)
+
+        for file_data in files_data:
+            try:
+                _, added = _upsert_file(cursor, file_data, project_id)
+                if added:
+                    stats['files_added'] += 1
+                else:
+                    stats['files_updated'] += 1
+            except Exception as e:
+                logger.error(f"Error adding file {file_data.get('key')}: {str(e)}")
+                stats['errors'] += 1
+
+        # Commit the whole batch at once
+        conn.commit()
+
+        logger.info(f"Bulk added {len(files_data)} files for project ID {project_id}: {stats}")
+
+        return stats
+
+    except Exception as e:
+        logger.error(f"Error bulk adding files for project ID {project_id}: {str(e)}", exc_info=True)
         if conn:
-            conn.close()
+            conn.rollback()
+        raise
 
 def start_crawl(db_path: str = DEFAULT_DB_PATH) -> int:
     """
@@ -306,8 +664,8 @@ def start_crawl(db_path: str = DEFAULT_DB_PATH) -> int:
         int: Crawl ID
     """
     try:
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
         # Insert new crawl record
@@ -331,11 +689,6 @@ def start_crawl(db_path: str = DEFAULT_DB_PATH) -> int:
             conn.rollback()
         raise
 
-    finally:
-        # Close connection
-        if conn:
-            conn.close()
-
 def update_crawl(crawl_id: int, status: str, stats: Dict[str, int] = None,
                 error: str = None, db_path: str = DEFAULT_DB_PATH) -> None:
     """
@@ -349,8 +702,8 @@ def update_crawl(crawl_id: int, status: str, stats: Dict[str, int] = None,
         db_path: Path to the database file
     """
     try:
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
         # Extract stats
@@ -384,11 +737,6 @@ def update_crawl(crawl_id: int, status: str, stats: Dict[str, int] = None,
             conn.rollback()
         raise
 
-    finally:
-        # Close connection
-        if conn:
-            conn.close()
-
 def search_files_by_bbox(min_x: float, min_y: float, max_x: float, max_y: float,
                         format: str = None, db_path: str = DEFAULT_DB_PATH) -> List[Dict[str, Any]]:
     """
@@ -406,33 +754,45 @@ def search_files_by_bbox(min_x: float, min_y: float, max_x: float, max_y: float,
         List[Dict[str, Any]]: List of matching files
     """
     try:
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row  # Return rows as dictionaries
 
         # Log the search parameters
         logger.info(f"Searching for files in bbox: {min_x}, {min_y}, {max_x}, {max_y}")
 
-        # Build query - use intersection logic
         # Two boxes intersect if one's min is <= the other's max and one's max is >= the other's min
-        query = """
-        SELECT f.*, p.name as project_name, p.year as project_year
-        FROM files f
-        JOIN projects p ON f.project_id = p.id
-        WHERE
-            f.min_x <= ? AND f.max_x >= ? AND
-            f.min_y <= ? AND f.max_y >= ?
-        """
-        params = [max_x, min_x, max_y, min_y]
-
-        # Log the query parameters
-        logger.info(f"Query parameters: max_x={max_x}, min_x={min_x}, max_y={max_y}, min_y={min_y}")
-
-        # Explain the intersection logic
-        logger.info("Using intersection logic: file intersects with search area if:")
-        logger.info(f"  file.min_x <= search.max_x ({max_x}) AND file.max_x >= search.min_x ({min_x}) AND")
-        logger.info(f"  file.min_y <= search.max_y ({max_y}) AND file.max_y >= search.min_y ({min_y})")
+        if _has_rtree_index(cursor, db_path):
+            conn.commit()
+
+            # The R*Tree stores 32-bit floats rounded outward, so the exact check
+            # against the files table removes any false positives at the edges
+            query = f"""
+            SELECT f.*, p.name as project_name, p.year as project_year
+            FROM {RTREE_TABLE} r
+            JOIN files f ON f.id = r.id
+            JOIN projects p ON f.project_id = p.id
+            WHERE
+                r.min_x <= ? AND r.max_x >= ? AND
+                r.min_y <= ? AND r.max_y >= ? AND
+                f.min_x <= ? AND f.max_x >= ? AND
+                f.min_y <= ? AND f.max_y >= ?
+            """
+            params = [max_x, min_x, max_y, min_y] * 2
+            logger.debug("Using R*Tree spatial index for bbox search")
+        else:
+            query = """
+            SELECT f.*, p.name as project_name, p.year as project_year
+            FROM files f
+            JOIN projects p ON f.project_id = p.id
+            WHERE
+                f.min_x <= ? AND f.max_x >= ? AND
+                f.min_y <= ? AND f.max_y >= ?
+            """
+            params = [max_x, min_x, max_y, min_y]
+
+        logger.debug(f"Query parameters: max_x={max_x}, min_x={min_x}, max_y={max_y}, min_y={min_y}")
 
         # Add format filter if specified
         if format and format.strip():
@@ -446,8 +806,8 @@ def search_files_by_bbox(min_x: float, min_y: float, max_x: float, max_y: float,
             cursor.execute(query, params)
 
             # Log the SQL query
-            logger.info(f"SQL query: {query}")
-            logger.info(f"SQL params: {params}")
+            logger.debug(f"SQL query: {query}")
+            logger.debug(f"SQL params: {params}")
 
             # Fetch results
             results = []
@@ -483,11 +843,6 @@ def search_files_by_bbox(min_x: float, min_y: float, max_x: float, max_y: float,
         logger.error(f"Error searching files by bbox: {str(e)}", exc_info=True)
         raise
 
-    finally:
-        # Close connection
-        if conn:
-            conn.close()
-
 def get_database_stats(db_path: str = DEFAULT_DB_PATH) -> Dict[str, Any]:
     """
     Get statistics about the database.
@@ -499,8 +854,8 @@ def get_database_stats(db_path: str = DEFAULT_DB_PATH) -> Dict[str, Any]:
         Dict[str, Any]: Database statistics
     """
     try:
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
         # Get project count
@@ -559,11 +914,6 @@ def get_database_stats(db_path: str = DEFAULT_DB_PATH) -> Dict[str, Any]:
         logger.error(f"Error getting database stats: {str(e)}", exc_info=True)
         raise
 
-    finally:
-        # Close connection
-        if conn:
-            conn.close()
-
 def database_exists(db_path: str = DEFAULT_DB_PATH) -> bool:
     """
     Check if the database exists.
@@ -618,17 +968,14 @@ def get_indexed_projects(db_path: str = DEFAULT_DB_PATH) -> Set[str]:
     try:
         logger.info(f"Getting indexed projects from {db_path}")
 
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
         # Get all project names
         cursor.execute("SELECT name FROM projects")
         results = cursor.fetchall()
 
-        # Close connection
-        conn.close()
-
         # Return set of project names
         return {result[0] for result in results}
 
@@ -636,6 +983,163 @@ def get_indexed_projects(db_path: str = DEFAULT_DB_PATH) -> Set[str]:
         logger.error(f"Error getting indexed projects: {str(e)}", exc_info=True)
         return set()
 
+def get_project_crawl_states(db_path: str = DEFAULT_DB_PATH) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the change-detection state recorded for every indexed project.
+
+    Args:
+        db_path: Path to the database file
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Project name -> ETags, manifest LastModified/hash and last crawl time
+    """
+    try:
+        # Get pooled connection
+        conn = get_connection(db_path)
+        cursor = conn.cursor()
+        _ensure_schema(cursor, db_path)
+        conn.commit()
+
+        cursor.execute("""
+        SELECT id, name, ept_etag, manifest_etag, manifest_last_modified, manifest_hash, last_crawled
+        FROM projects
+        """)
+
+        return {
+            row[1]: {
+                'id': row[0],
+                'ept_etag': row[2],
+                'manifest_etag': row[3],
+                'manifest_last_modified': row[4],
+                'manifest_hash': row[5],
+                'last_crawled': row[6]
+            }
+            for row in cursor.fetchall()
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting project crawl states: {str(e)}", exc_info=True)
+        return {}
+
+def update_project_crawl_state(project_name: str, crawl_state: Dict[str, Any],
+                               db_path: str = DEFAULT_DB_PATH) -> None:
+    """
+    Record the change-detection state of a project after it has been crawled.
+
+    Args:
+        project_name: Project name
+        crawl_state: ept_etag, manifest_etag, manifest_last_modified and manifest_hash
+        db_path: Path to the database file
+    """
+    try:
+        # Get pooled connection
+        conn = get_connection(db_path)
+        cursor = conn.cursor()
+        _ensure_schema(cursor, db_path)
+
+        cursor.execute("""
+        UPDATE projects
+        SET ept_etag = ?, manifest_etag = ?, manifest_last_modified = ?, manifest_hash = ?,
+            last_crawled = CURRENT_TIMESTAMP
+        WHERE name = ?
+        """, (crawl_state.get('ept_etag'), crawl_state.get('manifest_etag'),
+              crawl_state.get('manifest_last_modified'), crawl_state.get('manifest_hash'),
+              project_name))
+
+        # Commit changes
+        conn.commit()
+
+    except Exception as e:
+        logger.error(f"Error updating crawl state for project {project_name}: {str(e)}", exc_info=True)
+        if conn:
+            conn.rollback()
+        raise
+
+def get_file_states(project_id: int, db_path: str = DEFAULT_DB_PATH) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the change-detection state of every file in a project.
+
+    Args:
+        project_id: Project ID
+        db_path: Path to the database file
+
+    Returns:
+        Dict[str, Dict[str, Any]]: S3 key -> ETag, source hash, size and LastModified
+    """
+    try:
+        # Get pooled connection
+        conn = get_connection(db_path)
+        cursor = conn.cursor()
+        _ensure_schema(cursor, db_path)
+        conn.commit()
+
+        cursor.execute("""
+        SELECT key, etag, source_hash, size, last_modified
+        FROM files
+        WHERE project_id = ?
+        """, (project_id,))
+
+        return {
+            row[0]: {
+                'etag': row[1],
+                'source_hash': row[2],
+                'size': row[3],
+                'last_modified': row[4]
+            }
+            for row in cursor.fetchall()
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting file states for project ID {project_id}: {str(e)}", exc_info=True)
+        return {}
+
+def delete_stale_files(project_id: int, current_keys, db_path: str = DEFAULT_DB_PATH,
+                       key_prefix: str = None) -> int:
+    """
+    Delete a project's files that are no longer in its source listing.
+
+    Call this only with a complete listing (manifest or S3 listing), otherwise
+    files that still exist would be removed. The R*Tree rows go with them
+    through the delete trigger.
+
+    Args:
+        project_id: Project ID
+        current_keys: Every S3 key currently in the project's source listing
+        db_path: Path to the database file
+        key_prefix: Only consider indexed keys starting with this prefix
+
+    Returns:
+        int: Number of files deleted
+    """
+    conn = None
+    try:
+        # Get pooled connection
+        conn = get_connection(db_path)
+        cursor = conn.cursor()
+        _ensure_schema(cursor, db_path)
+
+        current_keys = set(current_keys)
+        cursor.execute("SELECT id, key FROM files WHERE project_id = ?", (project_id,))
+        stale_ids = [
+            (row[0],) for row in cursor.fetchall()
+            if row[1] not in current_keys and (key_prefix is None or row[1].startswith(key_prefix))
+        ]
+
+        if stale_ids:
+            cursor.executemany("DELETE FROM files WHERE id = ?", stale_ids)
+            logger.info(f"Deleted {len(stale_ids)} files no longer listed for project ID {project_id}")
+
+        # Commit changes
+        conn.commit()
+
+        return len(stale_ids)
+
+    except Exception as e:
+        logger.error(f"Error deleting stale files for project ID {project_id}: {str(e)}", exc_info=True)
+        if conn:
+            conn.rollback()
+        raise
+
 def optimize_database(db_path: str = DEFAULT_DB_PATH) -> bool:
     """
     Optimize the database for production use.
@@ -649,10 +1153,13 @@ def optimize_database(db_path: str = DEFAULT_DB_PATH) -> bool:
     try:
         logger.info(f"Optimizing database at {db_path}")
 
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
+        # Get pooled connection
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
+        # VACUUM cannot run inside an open transaction
+        conn.commit()
+
         # Run VACUUM to rebuild the database file
         logger.info("Running VACUUM to rebuild the database file")
         cursor.execute("VACUUM")
@@ -703,9 +1210,6 @@ def optimize_database(db_path: str = DEFAULT_DB_PATH) -> bool:
         # Commit changes
         conn.commit()
 
-        # Close connection
-        conn.close()
-
         logger.info("Database optimization completed successfully")
         return True
 
@@ -6,18 +6,18 @@ with the existing search functionality.
 """
 
 import logging
-import json
-import boto3
-import os
+import numpy as np
+import shapely
 from typing import List, Dict, Any, Tuple
-from shapely.geometry import Polygon
+from shapely.geometry import Polygon, box
+from shapely.prepared import prep
 from datetime import date
-from functools import lru_cache
 
 # Import the database module
 from utilities.lidar_index_db import (
     search_files_by_bbox, database_exists, DEFAULT_DB_PATH
 )
+from utilities.ept_metadata import ept_project_from_key, fetch_ept_metadata
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -125,42 +125,8 @@ def search_lidar_index(polygon_points: List[Tuple[float, float]],
         # Now filter the results to only include files that actually intersect with the polygon
         if files:
             logger.info(f"Found {len(files)} files in bounding box, filtering by actual polygon...")
-            filtered_files = []
-            intersection_count = 0
-
-            for idx, file in enumerate(files):
-                # Log file details for debugging
-                logger.info(f"File {idx+1}/{len(files)}: {file.get('key')}")
-                logger.info(f"  File bounds: {file.get('min_x')}, {file.get('min_y')} to {file.get('max_x')}, {file.get('max_y')}")
-
-                # Create a polygon for the file using its bounding box
-                file_bbox = [
-                    (file['min_x'], file['min_y']),
-                    (file['min_x'], file['max_y']),
-                    (file['max_x'], file['max_y']),
-                    (file['max_x'], file['min_y'])
-                ]
-                logger.info(f"  File bbox points: {file_bbox}")
-
-                try:
-                    file_polygon = Polygon(file_bbox)
-                    logger.info(f"  File polygon created: {file_polygon}")
-
-                    # Check if the file polygon intersects with the search polygon
-                    does_intersect = polygon.intersects(file_polygon)
-                    logger.info(f"  Intersection check result: {does_intersect}")
-
-                    if does_intersect:
-                        logger.info(f"  File {file['key']} INTERSECTS with the polygon")
-                        filtered_files.append(file)
-                        intersection_count += 1
-                    else:
-                        logger.info(f"  File {file['key']} DOES NOT intersect with the polygon")
-                except Exception as e:
-                    logger.error(f"  Error creating or checking file polygon: {str(e)}")
-
+            filtered_files = filter_files_by_polygon(files, polygon)
             logger.info(f"Filtered to {len(filtered_files)} files that intersect with the actual polygon")
-            logger.info(f"Intersection count: {intersection_count}")
             files = filtered_files
 
         # Convert to TNM API format
@@ -174,11 +140,50 @@ def search_lidar_index(polygon_points: List[Tuple[float, float]],
         logger.error(f"Error searching LIDAR index: {str(e)}", exc_info=True)
         return {'items': [], 'total': 0, 'error': str(e)}
 
-# Create a cache directory for metadata
-METADATA_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'metadata_cache')
-os.makedirs(METADATA_CACHE_DIR, exist_ok=True)
+def filter_files_by_polygon(files: List[Dict[str, Any]], polygon: Polygon) -> List[Dict[str, Any]]:
+    """
+    Keep only the files whose bounding box intersects the search polygon.
+
+    With shapely 2 all candidate boxes are built and tested in a single
+    vectorized call; older shapely versions fall back to a prepared-polygon loop.
+
+    Args:
+        files: Files from the database, each with min_x/min_y/max_x/max_y
+        polygon: Search polygon in (lon, lat) order
+
+    Returns:
+        List[Dict[str, Any]]: Files that intersect the polygon
+    """
+    if not files:
+        return []
+
+    bounds = np.array(
+        [(file.get('min_x'), file.get('min_y'), file.get('max_x'), file.get('max_y')) for file in files],
+        dtype=float
+    )
+
+    if hasattr(shapely, 'box') and hasattr(shapely, 'prepare'):
+        # Shapely 2: build every file box at once and test them in one call
+        file_boxes = shapely.box(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3])
+        shapely.prepare(polygon)
+        mask = shapely.intersects(polygon, file_boxes)
+    else:
+        prepared_polygon = prep(polygon)
+        mask = np.array([
+            not np.isnan(b).any() and prepared_polygon.intersects(box(*b))
+            for b in bounds
+        ], dtype=bool)
+
+    # Files with missing bounds can never match
+    mask &= ~np.isnan(bounds).any(axis=1)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for file, does_intersect in zip(files, mask):
+            logger.debug(f"File {file.get('key')} bounds {file.get('min_x')}, {file.get('min_y')} to "
+                         f"{file.get('max_x')}, {file.get('max_y')}: intersects={bool(does_intersect)}")
+
+    return [file for file, does_intersect in zip(files, mask) if does_intersect]
 
-@lru_cache(maxsize=128)
 def retrieve_ept_metadata(bucket: str, project_name: str, filename: str) -> Dict[str, Any]:
     """
     Retrieve metadata from EPT files.
@@ -191,145 +196,8 @@ def retrieve_ept_metadata(bucket: str, project_name: str, filename: str) -> Dict
     Returns:
         Dict[str, Any]: Metadata from EPT files
     """
-    # Extract the actual project name from the filename
-    # Example: USGS_LPC_CO_EasternColorado_2018_A18_LD31961336.laz
-    # Project name should be CO_Eastern_B5_2018 or similar
-    if 'CO_Eastern' in filename:
-        if 'B1' in filename:
-            actual_project_name = 'CO_Eastern_B1_2018'
-        elif 'B2_QL1_Central' in filename:
-            actual_project_name = 'CO_Eastern_B2_QL1_Central_2018'
-        elif 'B2_QL2_Central' in filename:
-            actual_project_name = 'CO_Eastern_B2_QL2_Central_2018'
-        elif 'B2_QL2_North' in filename:
-            actual_project_name = 'CO_Eastern_B2_QL2_North_2018'
-        elif 'B3' in filename:
-            actual_project_name = 'CO_Eastern_B3_2018'
-        elif 'B4' in filename:
-            actual_project_name = 'CO_Eastern_B4_2018'
-        elif 'B5' in filename:
-            actual_project_name = 'CO_Eastern_B5_2018'
-        elif 'B6' in filename:
-            actual_project_name = 'CO_Eastern_B6_2018'
-        elif 'ElPaso' in filename:
-            actual_project_name = 'CO_Eastern_ElPaso_2018'
-        elif 'North_Priority' in filename:
-            actual_project_name = 'CO_Eastern_North_Priority_2018'
-        elif 'South_Priority2' in filename:
-            actual_project_name = 'CO_Eastern_South_Priority2_2018'
-        else:
-            actual_project_name = 'CO_Eastern_B1_2018'  # Default to B1
-    else:
-        # Use the provided project name
-        actual_project_name = project_name
     try:
-        # Check if we have cached metadata
-        cache_key = f"{bucket}_{project_name}_{filename}"
-        cache_file = os.path.join(METADATA_CACHE_DIR, f"{cache_key.replace('/', '_')}.json")
-
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r') as f:
-                    metadata = json.load(f)
-                logger.info(f"Retrieved metadata from cache for {filename}")
-                return metadata
-            except Exception as e:
-                logger.warning(f"Error reading cached metadata for {filename}: {str(e)}")
-
-        # Initialize S3 client
-        s3_client = boto3.client('s3')
-
-        # Initialize metadata dictionary
-        metadata = {}
-
-        # Try to get ept.json
-        try:
-            ept_json_key = f"{actual_project_name}/ept.json"
-            logger.info(f"Trying to get ept.json from {ept_json_key}")
-            response = s3_client.get_object(
-                Bucket=bucket,
-                Key=ept_json_key,
-                RequestPayer='requester'
-            )
-            ept_data = json.loads(response['Body'].read().decode('utf-8'))
-
-            # Extract metadata from ept.json
-            if ept_data.get('bounds'):
-                metadata['bounds'] = ept_data['bounds']
-            if ept_data.get('points'):
-                metadata['points'] = ept_data['points']
-            if ept_data.get('schema'):
-                metadata['schema'] = ept_data['schema']
-            if ept_data.get('srs'):
-                metadata['srs'] = ept_data['srs']
-        except Exception as e:
-            logger.warning(f"Error getting ept.json for project {actual_project_name}: {str(e)}")
-
-        # Try to get individual metadata file
-        try:
-            metadata_key = f"{actual_project_name}/ept-sources/{filename}.json"
-            logger.info(f"Trying to get metadata from {metadata_key}")
-            response = s3_client.get_object(
-                Bucket=bucket,
-                Key=metadata_key,
-                RequestPayer='requester'
-            )
-            file_metadata = json.loads(response['Body'].read().decode('utf-8'))
-
-            # Extract metadata from file metadata
-            metadata['file_metadata'] = file_metadata
-        except Exception as e:
-            logger.warning(f"Error getting metadata for file {filename}: {str(e)}")
-
-        # If we couldn't get the individual file metadata, try to get the list.json file
-        if 'file_metadata' not in metadata:
-            try:
-                list_key = f"{actual_project_name}/ept-sources/list.json"
-                logger.info(f"Trying to get list.json from {list_key}")
-                response = s3_client.get_object(
-                    Bucket=bucket,
-                    Key=list_key,
-                    RequestPayer='requester'
-                )
-                list_data = json.loads(response['Body'].read().decode('utf-8'))
-
-                # Find the file in the list
-                for item in list_data:
-                    if filename in item.get('path', ''):
-                        metadata['file_metadata'] = item
-                        break
-            except Exception as e:
-                logger.warning(f"Error getting list.json for project {actual_project_name}: {str(e)}")
-
-        # If we still couldn't get the file metadata, try to get the manifest.json file
-        if 'file_metadata' not in metadata:
-            try:
-                manifest_key = f"{actual_project_name}/ept-sources/manifest.json"
-                logger.info(f"Trying to get manifest.json from {manifest_key}")
-                response = s3_client.get_object(
-                    Bucket=bucket,
-                    Key=manifest_key,
-                    RequestPayer='requester'
-                )
-                manifest_data = json.loads(response['Body'].read().decode('utf-8'))
-
-                # Find the file in the manifest
-                for item in manifest_data:
-                    if filename in item.get('path', ''):
-                        metadata['file_metadata'] = item
-                        break
-            except Exception as e:
-                logger.warning(f"Error getting manifest.json for project {actual_project_name}: {str(e)}")
-
-        # Save metadata to cache
-        try:
-            with open(cache_file, 'w') as f:
-                json.dump(metadata, f)
-            logger.info(f"Saved metadata to cache for {filename}")
-        except Exception as e:
-            logger.warning(f"Error saving metadata to cache for {filename}: {str(e)}")
-
-        return metadata
+        return fetch_ept_metadata([(project_name, filename)], bucket).get((project_name, filename), {})
     except Exception as e:
         logger.error(f"Error retrieving EPT metadata: {str(e)}", exc_info=True)
         return {}
@@ -348,6 +216,17 @@ def convert_to_tnm_format(files: List[Dict[str, Any]], retrieve_metadata: bool =
     try:
         items = []
 
+        # Fetch EPT metadata for all files up front: concurrently, once per project and cached
+        ept_metadata = {}
+        if retrieve_metadata:
+            try:
+                ept_metadata = fetch_ept_metadata(
+                    (ept_project_from_key(file['key']), file.get('filename'))
+                    for file in files if file.get('key')
+                )
+            except Exception as e:
+                logger.error(f"Error retrieving EPT metadata: {str(e)}", exc_info=True)
+
         # Process each file
 
         for file in files:
@@ -366,8 +245,7 @@ def convert_to_tnm_format(files: List[Dict[str, Any]], retrieve_metadata: bool =
             polygon_points = file.get('polygon_points')
 
             # Extract project name from key for EPT metadata URLs
-            project_parts = key.split('/')
-            project_name_from_key = project_parts[0] if len(project_parts) > 0 else ''
+            project_name_from_key = ept_project_from_key(key)
 
             # Get EPT metadata URLs from database or create them
             ept_json_url = file.get('ept_json_url') or f"https://s3-us-west-2.amazonaws.com/{bucket}/{project_name_from_key}/ept.json"
@@ -377,23 +255,24 @@ def convert_to_tnm_format(files: List[Dict[str, Any]], retrieve_metadata: bool =
             # Initialize additional metadata
             additional_metadata = {}
 
-            # Store metadata URLs without fetching the actual metadata
-            # This avoids errors when metadata files don't exist
+            # Store the metadata URLs alongside the file's own ept-sources metadata.
+            # The project-wide ept.json fields are left out: its 'points' counts the whole project.
             if retrieve_metadata and project_name_from_key and filename:
-                logger.info(f"Storing metadata URLs for {filename} in project {project_name_from_key}")
-                # Instead of fetching metadata, just store the URLs
                 additional_metadata = {
                     'ept_json_url': ept_json_url,
                     'ept_sources_url': ept_sources_url,
                     'ept_metadata_url': ept_metadata_url
                 }
-                logger.info(f"Stored metadata URLs for {filename}")
+                file_metadata = ept_metadata.get((project_name_from_key, filename), {}).get('file_metadata')
+                if file_metadata is not None:
+                    additional_metadata['file_metadata'] = file_metadata
+            file_metadata = additional_metadata.get('file_metadata') or {}
 
-            # Get point cloud information from database or metadata
-            point_count = file.get('point_count') or additional_metadata.get('points', size // 100 if size else 0)
+            # Get point cloud information from database or the file's metadata
+            point_count = file.get('point_count') or file_metadata.get('points') or (size // 100 if size else 0)
             resolution = file.get('resolution') or 1.0
             point_spacing = file.get('point_spacing') or 1.0
-            coordinate_system = file.get('coordinate_system') or additional_metadata.get('srs', {}).get('wkt', '')
+            coordinate_system = file.get('coordinate_system') or (file_metadata.get('srs') or {}).get('wkt', '')
 
             # Create item in TNM API format
             item = {
@@ -435,7 +314,7 @@ def convert_to_tnm_format(files: List[Dict[str, Any]], retrieve_metadata: bool =
                 'coordinateSystem': coordinate_system,  # Coordinate system from database or metadata
                 'acquisitionDate': file.get('acquisition_date', ''),  # Acquisition date from metadata
                 'hasMetadata': True,  # Flag indicating metadata is available
-                'schema': additional_metadata.get('schema', []),  # Schema from metadata
+                'schema': file_metadata.get('schema', []),  # Schema from metadata
                 'rawMetadata': additional_metadata  # Raw metadata for advanced users
             }
 
@@ -12,6 +12,12 @@ from shapely.geometry import box
 import math
 from state_boundaries import get_state_from_coordinates
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utilities.sciencebase_cache import (
+    METADATA_FETCH_WORKERS,
+    fetch_sciencebase_metadata,
+    get_http_session
+)
 from utilities.extract_dates import (
     extract_year_from_project_name,
     create_year_dates,
@@ -338,6 +344,7 @@ class ProjectMetadata:
                         logger.error(f"Error fetching metadata from S3: {e}")
 
                 # Try to fetch and parse XML metadata for dates
+                sciencebase_record = None
                 try:
                     # Check if meta_url is an S3 URL
                     if meta_url and meta_url.startswith('s3://'):
@@ -377,14 +384,14 @@ class ProjectMetadata:
                             json_data = json.loads(response['Body'].read().decode('utf-8'))
                             logger.info("Successfully fetched JSON from S3 with requester pays")
                     else:
-                        # Regular HTTP URL
+                        # Regular HTTP URL (ScienceBase item, usually already cached)
                         json_url = f"{meta_url}?format=json"
                         logger.info(f"Fetching JSON from HTTP URL: {json_url}")
-                        json_response = requests.get(json_url, timeout=30)
-                        if json_response.status_code == 200:
-                            json_data = json_response.json()
+                        sciencebase_record = fetch_sciencebase_metadata(meta_url)
+                        if sciencebase_record['json_data'] is not None:
+                            json_data = sciencebase_record['json_data']
                         else:
-                            logger.error(f"Failed to fetch JSON from {json_url}: {json_response.status_code}")
+                            logger.error(f"Failed to fetch JSON from {json_url}: {sciencebase_record['error']}")
                             json_data = {}
 
                     # Process the JSON data to find XML URL
@@ -433,8 +440,14 @@ class ProjectMetadata:
                         else:
                             # Regular HTTP URL
                             logger.info(f"Fetching XML from HTTP URL: {xml_url}")
-                            xml_response = requests.get(xml_url, timeout=30)
-                            if xml_response.status_code == 200:
+                            # The ScienceBase item's XML was already fetched (and cached) with its JSON
+                            if sciencebase_record and sciencebase_record['xml_root'] is not None:
+                                xml_response = None
+                            else:
+                                xml_response = get_http_session().get(xml_url, timeout=30)
+                            if xml_response is None:
+                                root = sciencebase_record['xml_root']
+                            elif xml_response.status_code == 200:
                                 root = ET.fromstring(xml_response.content)
                             else:
                                 logger.error(f"Failed to fetch XML from {xml_url}: {xml_response.status_code}")
@@ -1883,6 +1896,10 @@ class ProjectMetadata:
     def write_project_metadata(self, urls, root=None, update_progress_callback=None):
         """Sample project metadata and write it to the tower_parameters.json file
 
+        The ScienceBase JSON and XML of the projects are fetched concurrently
+        through the ScienceBase metadata cache, and each project is written to
+        tower_parameters.json on this thread as its metadata arrives.
+
         Args:
             urls: List of (url, item) tuples containing LIDAR data
             root: Optional root window for displaying progress dialog
@@ -1897,20 +1914,20 @@ class ProjectMetadata:
                 logger.warning("No LIDAR Data available for metadata extraction")
                 return [], []
 
-            # Get all unique project names
-            project_names = set()
+            # Group the items by project in one pass, keeping the first item of each
+            project_items = {}
             for url, item in urls:
                 filename = url.split('/')[-1]
-                project_name = get_project_name(filename)
-                project_names.add(project_name)
+                project_items.setdefault(get_project_name(filename), item)
 
-            if not project_names:
+            if not project_items:
                 logger.warning("No projects found in the LIDAR data")
                 return [], []
 
             # Create progress tracking variables
             processed_projects = []
             failed_projects = []
+            total = len(project_items)
 
             # Create a local update_progress function if no callback provided
             if update_progress_callback is None:
@@ -1919,118 +1936,45 @@ class ProjectMetadata:
             else:
                 update_progress = update_progress_callback
 
-            # Process each project
-            for i, project_name in enumerate(project_names):
-                try:
-                    update_progress(i, len(project_names), project_name, "Finding item data...")
-
-                    # Find an item for this project
-                    project_item = None
-                    for url, item in urls:
-                        filename = url.split('/')[-1]
-                        if project_name == get_project_name(filename):
-                            project_item = item
-                            break
-
-                    if project_item:
-                        # Extract metadata URL
-                        meta_url = project_item.get('metaUrl')
-                        if meta_url:
-                            update_progress(i, len(project_names), project_name, "Fetching JSON metadata...")
-
-                            # Construct JSON URL
-                            json_url = f"{meta_url}?format=json"
+            # Projects sharing a metaUrl share one fetch
+            projects_by_meta_url = {}
+            for project_name, project_item in project_items.items():
+                meta_url = project_item.get('metaUrl')
+                if meta_url:
+                    projects_by_meta_url.setdefault(meta_url, []).append(project_name)
+                else:
+                    logger.warning(f"No metadata URL found for project {project_name}")
+                    failed_projects.append((project_name, "No metadata URL found"))
+                    update_progress(len(processed_projects) + len(failed_projects), total,
+                                    project_name, "No metadata URL found")
+
+            if projects_by_meta_url:
+                update_progress(len(failed_projects), total, f"{total} projects", "Fetching JSON and XML metadata...")
+
+            session = get_http_session()
+            with ThreadPoolExecutor(max_workers=METADATA_FETCH_WORKERS) as executor:
+                futures = {executor.submit(fetch_sciencebase_metadata, meta_url, session): meta_url
+                           for meta_url in projects_by_meta_url}
+
+                # Write each project as soon as its metadata arrives (on this thread)
+                for future in as_completed(futures):
+                    for project_name in projects_by_meta_url[futures[future]]:
+                        current = len(processed_projects) + len(failed_projects)
+                        try:
+                            error = self._write_sciencebase_metadata(
+                                project_name, project_items[project_name], future.result(),
+                                lambda status: update_progress(current, total, project_name, status)
+                            )
+                        except Exception as e:
+                            logger.error(f"Error processing project {project_name}: {e}")
+                            error = f"Processing error: {str(e)}"
 
-                            # Fetch JSON metadata
-                            try:
-                                json_response = requests.get(json_url, timeout=30)
-                                json_response.raise_for_status()
-                                json_data = json_response.json()
-
-                                update_progress(i, len(project_names), project_name, "Finding XML URL...")
-
-                                # Find XML URL in webLinks
-                                xml_url = None
-                                for link in json_data.get('webLinks', []):
-                                    if (link.get('type') == 'originalMetadata' and
-                                        link.get('title') == 'Product Metadata'):
-                                        xml_url = link.get('uri')
-                                        break
-
-                                if xml_url:
-                                    update_progress(i, len(project_names), project_name, "Fetching XML metadata...")
-
-                                    # Fetch XML metadata
-                                    try:
-                                        xml_response = requests.get(xml_url, timeout=30)
-                                        xml_response.raise_for_status()
-
-                                        # Save XML to file
-                                        xml_temp_dir = "XML_Temp"
-                                        if not os.path.exists(xml_temp_dir):
-                                            os.makedirs(xml_temp_dir)
-
-                                        xml_path = os.path.join(xml_temp_dir, f"{project_name}_metadata.xml")
-                                        with open(xml_path, 'w', encoding='utf-8') as f:
-                                            f.write(xml_response.text)
-
-                                        logger.info(f"Saved XML to: {xml_path}")
-
-                                        update_progress(i, len(project_names), project_name, "Parsing XML metadata...")
-
-                                        # Parse XML
-                                        try:
-                                            root = ET.fromstring(xml_response.text)
-
-                                            # Add project to metadata if not already there
-                                            if project_name not in self.projects:
-                                                update_progress(i, len(project_names), project_name, "Adding project metadata...")
-                                                self.add_project(project_name, project_item)
-
-                                            # Update metadata with URLs and XML path
-                                            if project_name in self.projects:
-                                                update_progress(i, len(project_names), project_name, "Updating metadata...")
-                                                metadata = self.projects[project_name]
-                                                metadata['json_url'] = json_url
-                                                metadata['xml_url'] = xml_url
-                                                metadata['meta_url'] = meta_url
-                                                metadata['local_xml_path'] = xml_path
-
-                                                # Update metadata from XML
-                                                self._update_metadata_from_xml(metadata, root)
-
-                                                # Update tower_parameters.json with enhanced metadata
-                                                update_progress(i, len(project_names), project_name, "Writing to tower_parameters.json...")
-                                                self._update_tower_parameters(project_name)
-                                                processed_projects.append(project_name)
-                                        except ET.ParseError as e:
-                                            logger.error(f"Error parsing XML for project {project_name}: {e}")
-                                            failed_projects.append((project_name, f"XML parsing error: {str(e)}"))
-                                            update_progress(i, len(project_names), project_name, "XML parsing error")
-                                    except Exception as e:
-                                        logger.error(f"Error fetching XML for project {project_name}: {e}")
-                                        failed_projects.append((project_name, f"XML fetch error: {str(e)}"))
-                                        update_progress(i, len(project_names), project_name, "XML fetch error")
-                                else:
-                                    logger.warning(f"No XML URL found for project {project_name}")
-                                    failed_projects.append((project_name, "No XML URL found"))
-                                    update_progress(i, len(project_names), project_name, "No XML URL found")
-                            except Exception as e:
-                                logger.error(f"Error fetching JSON for project {project_name}: {e}")
-                                failed_projects.append((project_name, f"JSON fetch error: {str(e)}"))
-                                update_progress(i, len(project_names), project_name, "JSON fetch error")
+                        if error:
+                            failed_projects.append((project_name, error))
+                            update_progress(current + 1, total, project_name, error.split(':')[0])
                         else:
-                            logger.warning(f"No metadata URL found for project {project_name}")
-                            failed_projects.append((project_name, "No metadata URL found"))
-                            update_progress(i, len(project_names), project_name, "No metadata URL found")
-                    else:
-                        logger.warning(f"No item found for project {project_name}")
-                        failed_projects.append((project_name, "No item found"))
-                        update_progress(i, len(project_names), project_name, "No item found")
-                except Exception as e:
-                    logger.error(f"Error processing project {project_name}: {e}")
-                    failed_projects.append((project_name, f"Processing error: {str(e)}"))
-                    update_progress(i, len(project_names), project_name, "Processing error")
+                            processed_projects.append(project_name)
+                            update_progress(current + 1, total, project_name, "Done")
 
             logger.info(f"Processed {len(processed_projects)} projects, {len(failed_projects)} failed")
             return processed_projects, failed_projects
@@ -2039,6 +1983,61 @@ class ProjectMetadata:
             logger.error(f"Error writing project metadata: {e}", exc_info=True)
             return [], [("general_error", str(e))]
 
+    def _write_sciencebase_metadata(self, project_name, project_item, record, update_status):
+        """Apply fetched ScienceBase metadata to a project and write it to tower_parameters.json
+
+        Args:
+            project_name: Name of the project
+            project_item: First search result item of the project
+            record: Result of fetch_sciencebase_metadata for the item's metaUrl
+            update_status: Callback taking a status message
+
+        Returns:
+            Error message, or None on success
+        """
+        if record['error']:
+            logger.error(f"Error fetching metadata for project {project_name}: {record['error']}")
+            return record['error']
+
+        if not record['xml_url']:
+            logger.warning(f"No XML URL found for project {project_name}")
+            return "No XML URL found"
+
+        # Save XML to file
+        xml_temp_dir = "XML_Temp"
+        if not os.path.exists(xml_temp_dir):
+            os.makedirs(xml_temp_dir)
+
+        xml_path = os.path.join(xml_temp_dir, f"{project_name}_metadata.xml")
+        with open(xml_path, 'w', encoding='utf-8') as f:
+            f.write(record['xml_text'])
+
+        logger.info(f"Saved XML to: {xml_path}")
+
+        # Add project to metadata if not already there
+        if project_name not in self.projects:
+            update_status("Adding project metadata...")
+            self.add_project(project_name, project_item)
+
+        if project_name not in self.projects:
+            return "Processing error: project could not be added"
+
+        # Update metadata with URLs and XML path
+        update_status("Updating metadata...")
+        metadata = self.projects[project_name]
+        metadata['json_url'] = record['json_url']
+        metadata['xml_url'] = record['xml_url']
+        metadata['meta_url'] = record['meta_url']
+        metadata['local_xml_path'] = xml_path
+
+        # Update metadata from XML
+        self._update_metadata_from_xml(metadata, record['xml_root'])
+
+        # Update tower_parameters.json with enhanced metadata
+        update_status("Writing to tower_parameters.json...")
+        self._update_tower_parameters(project_name)
+        return None
+
 # Example usage
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
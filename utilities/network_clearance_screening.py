@@ -0,0 +1,459 @@
+"""
+Network-Wide Turbine Clearance Screening
+
+Screens every microwave link in a network against a turbine set in one batch
+job instead of running calculate_turbine_clearances_from_json link by link.
+
+How it works:
+- Links are loaded from a directory of tower_parameters.json files or a CSV
+- Each link gets a corridor envelope wide enough that any turbine outside it
+  cannot come within the near-failure margin (margin + rotor + Fresnel radius)
+- Ground elevations along each link are sampled from the local DEMs of the
+  terrain engine; the billable Google Elevation API is only used as fallback
+  with --google-fallback
+- Turbine/link candidate pairs come from a spatial index over those envelopes
+- Candidates are grouped by link and computed in chunked, vectorized
+  calculate_clearances_batch passes spread across a process pool
+- Only failing or near-failing pairs are returned / written to CSV
+
+Usage:
+    python -m utilities.network_clearance_screening --links links_dir/ --turbines uswtdb.geojson
+    python -m utilities.network_clearance_screening --links links.csv --turbines uswtdb.geojson --margin-ft 200 --workers 8 --output screening.csv
+"""
+
+import os
+import csv
+import sys
+import json
+import math
+import glob
+import logging
+import argparse
+import numpy as np
+import shapely
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from utilities.terrain_engine import get_elevations
+from utilities.turbine_clearance_calculator import (
+    TurbineClearanceCalculator,
+    TurbineData,
+    PathData,
+    create_turbine_from_dict,
+    create_path_from_tower_params
+)
+
+logger = logging.getLogger(__name__)
+
+# Pairs whose 3D Fresnel clearance is below this are reported as near-failing
+DEFAULT_MARGIN_FT = 100.0
+
+# Maximum number of turbine/link pairs computed per process-pool task
+DEFAULT_CHUNK_SIZE = 20000
+
+# Default rotor diameter used by the calculator when none is known
+DEFAULT_ROTOR_DIAMETER_M = 100.0
+
+METERS_PER_DEGREE = 111320.0
+
+# Spacing of the terrain samples taken along each link (3DEP 1 arc-second is ~30 m)
+TERRAIN_SAMPLE_SPACING_M = 30.0
+
+# Columns expected in a links CSV (frequency_ghz is optional)
+LINK_CSV_COLUMNS = [
+    'link_id', 'start_lat', 'start_lon', 'end_lat', 'end_lon',
+    'start_elevation_ft', 'end_elevation_ft',
+    'start_antenna_height_ft', 'end_antenna_height_ft'
+]
+
+SCREENING_COLUMNS = [
+    'link_id', 'turbine_id', 'status', 'latitude', 'longitude',
+    'distance_to_path_ft', 'distance_along_path_ft', 'fresnel_radius_ft',
+    'clearance_3d_straight_ft', 'clearance_3d_curved_ft', 'clearance_3d_fresnel_ft'
+]
+
+def load_links_from_directory(directory: str) -> List[Tuple[str, PathData]]:
+    """
+    Load every tower_parameters-style JSON file found under a directory.
+
+    Args:
+        directory: Directory searched recursively for *.json files
+
+    Returns:
+        List of (link_id, PathData) tuples; files that are not tower parameters are skipped
+    """
+    links = []
+    for file_path in sorted(glob.glob(os.path.join(directory, '**', '*.json'), recursive=True)):
+        try:
+            with open(file_path, 'r') as f:
+                data = json.load(f)
+            if not isinstance(data, dict) or 'site_A' not in data or 'site_B' not in data:
+                continue
+
+            path = create_path_from_tower_params(file_path)
+            general = data.get('general_parameters', {})
+            link_id = str(general.get('link_id') or os.path.splitext(os.path.relpath(file_path, directory))[0])
+            links.append((link_id, path))
+        except Exception as e:
+            logger.warning(f"Skipping {file_path}: {e}")
+
+    logger.info(f"Loaded {len(links)} links from {directory}")
+    return links
+
+def load_links_from_csv(csv_path: str) -> List[Tuple[str, PathData]]:
+    """
+    Load links from a CSV file with one row per link.
+
+    Required columns are LINK_CSV_COLUMNS; frequency_ghz defaults to 11.0
+    like create_path_from_tower_params.
+
+    Args:
+        csv_path: Path to the CSV file
+
+    Returns:
+        List of (link_id, PathData) tuples
+    """
+    links = []
+    with open(csv_path, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in LINK_CSV_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Links CSV {csv_path} is missing columns: {', '.join(missing)}")
+
+        for row_number, row in enumerate(reader, start=2):
+            try:
+                links.append((row['link_id'], PathData(
+                    start_lat=float(row['start_lat']),
+                    start_lon=float(row['start_lon']),
+                    end_lat=float(row['end_lat']),
+                    end_lon=float(row['end_lon']),
+                    start_elevation_ft=float(row['start_elevation_ft']),
+                    end_elevation_ft=float(row['end_elevation_ft']),
+                    start_antenna_height_ft=float(row['start_antenna_height_ft']),
+                    end_antenna_height_ft=float(row['end_antenna_height_ft']),
+                    frequency_ghz=float(row.get('frequency_ghz') or 11.0)
+                )))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Skipping row {row_number} of {csv_path}: {e}")
+
+    logger.info(f"Loaded {len(links)} links from {csv_path}")
+    return links
+
+def load_links(source: str) -> List[Tuple[str, PathData]]:
+    """Load links from a directory of tower parameter files or a links CSV"""
+    if os.path.isdir(source):
+        return load_links_from_directory(source)
+    return load_links_from_csv(source)
+
+def load_turbines(turbines_path: str) -> List[TurbineData]:
+    """
+    Load turbines from a USWTDB GeoJSON file or a JSON list of turbine dictionaries.
+
+    Args:
+        turbines_path: Path to a .geojson FeatureCollection, a JSON list, or a
+            JSON object with a 'turbines' list (e.g. tower_parameters.json)
+
+    Returns:
+        List of TurbineData
+    """
+    with open(turbines_path, 'r') as f:
+        data = json.load(f)
+
+    if isinstance(data, dict) and 'features' in data:
+        turbine_dicts = []
+        for feature in data['features']:
+            coords = (feature.get('geometry') or {}).get('coordinates', [])
+            if coords and len(coords) >= 2:
+                # GeoJSON coordinates are [lon, lat]
+                turbine_dicts.append(dict(feature.get('properties') or {}, ylat=coords[1], xlong=coords[0]))
+    elif isinstance(data, dict):
+        turbine_dicts = data.get('turbines', [])
+    else:
+        turbine_dicts = data
+
+    turbines = [create_turbine_from_dict(turbine_dict) for turbine_dict in turbine_dicts]
+    logger.info(f"Loaded {len(turbines)} turbines from {turbines_path}")
+    return turbines
+
+def _corridor_envelope(path: PathData, buffer_m: float) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lon, min_lat, max_lon, max_lat) of a link grown by buffer_m on every side"""
+    buffer_lat = buffer_m / METERS_PER_DEGREE
+    max_abs_lat = min(max(abs(path.start_lat), abs(path.end_lat)) + buffer_lat, 89.0)
+    buffer_lon = buffer_m / (METERS_PER_DEGREE * math.cos(math.radians(max_abs_lat)))
+    return (min(path.start_lon, path.end_lon) - buffer_lon,
+            min(path.start_lat, path.end_lat) - buffer_lat,
+            max(path.start_lon, path.end_lon) + buffer_lon,
+            max(path.start_lat, path.end_lat) + buffer_lat)
+
+def find_candidate_pairs(links: List[Tuple[str, PathData]],
+                         latitudes: np.ndarray,
+                         longitudes: np.ndarray,
+                         max_rotor_radius_m: float,
+                         margin_ft: float = DEFAULT_MARGIN_FT) -> List[np.ndarray]:
+    """
+    Prefilter turbine/link pairs with a spatial index on corridor envelopes.
+
+    A turbine's 3D Fresnel clearance is at least its horizontal distance to the
+    path minus its rotor radius and the Fresnel radius, so a turbine further than
+    margin + max rotor radius + midpoint Fresnel radius from a link can never be
+    near-failing. The calculator measures turbines beyond the ends of a link to
+    the nearer end, so the envelope (grown around both ends) holds all of them.
+
+    Args:
+        links: List of (link_id, PathData)
+        latitudes: Turbine latitudes
+        longitudes: Turbine longitudes
+        max_rotor_radius_m: Largest rotor radius in the turbine set
+        margin_ft: Near-failure margin in feet
+
+    Returns:
+        One array of candidate turbine indices per link
+    """
+    calculator = TurbineClearanceCalculator()
+    envelopes = []
+    for _, path in links:
+        path_length_km = calculator._haversine_distance(path.start_lat, path.start_lon,
+                                                        path.end_lat, path.end_lon) / 1000
+        fresnel_m = calculator._calculate_fresnel_radius(path_length_km / 2, path_length_km / 2,
+                                                         path.frequency_ghz) / 3.28084
+        envelopes.append(_corridor_envelope(path, margin_ft / 3.28084 + max_rotor_radius_m + fresnel_m))
+
+    envelopes = np.asarray(envelopes, dtype=float).reshape(-1, 4)
+    if len(latitudes) == 0 or len(envelopes) == 0:
+        return [np.empty(0, dtype=np.intp) for _ in links]
+
+    if hasattr(shapely, 'STRtree') and hasattr(shapely, 'box'):
+        # Shapely 2: one bulk query of every envelope against a tree of turbine points
+        tree = shapely.STRtree(shapely.points(longitudes, latitudes))
+        link_idx, turbine_idx = tree.query(shapely.box(*envelopes.T))
+        order = np.lexsort((turbine_idx, link_idx))
+        link_idx, turbine_idx = link_idx[order], turbine_idx[order]
+        splits = np.searchsorted(link_idx, np.arange(1, len(links)))
+        return np.split(turbine_idx, splits)
+
+    # Shapely 1.x: plain envelope test per link
+    return [np.flatnonzero((longitudes >= min_lon) & (longitudes <= max_lon) &
+                           (latitudes >= min_lat) & (latitudes <= max_lat))
+            for min_lon, min_lat, max_lon, max_lat in envelopes]
+
+def sample_link_profiles(links: List[Tuple[str, PathData]],
+                         spacing_m: float = TERRAIN_SAMPLE_SPACING_M,
+                         use_google_fallback: bool = False) -> List[np.ndarray]:
+    """
+    Sample ground elevation profiles along every link in one terrain engine call.
+
+    Points without terrain data are filled in between the two site elevations.
+
+    Args:
+        links: List of (link_id, PathData)
+        spacing_m: Distance between samples along each link
+        use_google_fallback: Fetch points without local DEM coverage from the Google
+            Elevation API (one billable lookup per uncached sample across the network)
+
+    Returns:
+        One array of evenly spaced ground elevations in feet (start to end) per link
+    """
+    calculator = TurbineClearanceCalculator()
+    fractions, lats, lons = [], [], []
+    for _, path in links:
+        length_m = calculator._haversine_distance(path.start_lat, path.start_lon, path.end_lat, path.end_lon)
+        f = np.linspace(0, 1, max(int(math.ceil(length_m / spacing_m)) + 1, 2))
+        # Linear interpolation in lat/lon, matching TerrainEngine.get_profile
+        fractions.append(f)
+        lats.append(path.start_lat + (path.end_lat - path.start_lat) * f)
+        lons.append(path.start_lon + (path.end_lon - path.start_lon) * f)
+    if not fractions:
+        return []
+
+    elevations_m = get_elevations(np.concatenate(lats), np.concatenate(lons), use_fallback=use_google_fallback)
+
+    profiles = []
+    offset = 0
+    for f, (link_id, path) in zip(fractions, links):
+        profile_ft = elevations_m[offset:offset + len(f)] * 3.28084
+        offset += len(f)
+        missing = np.isnan(profile_ft)
+        if missing.any():
+            logger.warning(f"Missing terrain for {missing.sum()} of {len(f)} samples along link {link_id}, "
+                           f"interpolating between site elevations")
+            profile_ft[missing] = path.start_elevation_ft + (path.end_elevation_ft - path.start_elevation_ft) * f[missing]
+        profiles.append(profile_ft)
+    return profiles
+
+def _screen_chunk(tasks: List[Dict], margin_ft: float) -> List[Dict]:
+    """
+    Compute clearances for a chunk of links and keep only failing or near-failing pairs.
+
+    Runs in a worker process, so it only receives plain arrays and PathData.
+    Ground elevation comes from the link's sampled terrain profile, or is
+    interpolated between the two site elevations without one.
+    """
+    calculator = TurbineClearanceCalculator()
+    rows = []
+    for task in tasks:
+        path = task['path']
+        results = calculator.calculate_clearances_batch(
+            latitudes=task['latitudes'],
+            longitudes=task['longitudes'],
+            total_heights_m=task['total_heights_m'],
+            rotor_diameters_m=task['rotor_diameters_m'],
+            path=path,
+            hub_heights_m=task['hub_heights_m'],
+            turbine_ids=task['turbine_ids'],
+            elevation_data=task.get('elevation_ft', [path.start_elevation_ft, path.end_elevation_ft])
+        )
+
+        flagged = np.flatnonzero(results['clearance_3d_fresnel_ft'] < margin_ft)
+        for i in flagged:
+            result = results[i]
+            rows.append({
+                'link_id': task['link_id'],
+                'turbine_id': result['turbine_id'],
+                'status': 'FAIL' if result['clearance_3d_fresnel_ft'] <= 0 else 'NEAR',
+                'latitude': float(task['latitudes'][i]),
+                'longitude': float(task['longitudes'][i]),
+                'distance_to_path_ft': round(float(result['distance_to_path_ft']), 1),
+                'distance_along_path_ft': round(float(result['distance_along_path_ft']), 1),
+                'fresnel_radius_ft': round(float(result['fresnel_radius_ft']), 1),
+                'clearance_3d_straight_ft': round(float(result['clearance_3d_straight_ft']), 1),
+                'clearance_3d_curved_ft': round(float(result['clearance_3d_curved_ft']), 1),
+                'clearance_3d_fresnel_ft': round(float(result['clearance_3d_fresnel_ft']), 1)
+            })
+    return rows
+
+def screen_network(links: List[Tuple[str, PathData]],
+                   turbines: List[TurbineData],
+                   margin_ft: float = DEFAULT_MARGIN_FT,
+                   workers: int = 1,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   sample_terrain: bool = True,
+                   use_google_fallback: bool = False) -> List[Dict]:
+    """
+    Screen every link against every turbine and return the failing or near-failing pairs.
+
+    Args:
+        links: List of (link_id, PathData)
+        turbines: Turbine set to screen against
+        margin_ft: Pairs with 3D Fresnel clearance below this are reported
+        workers: Number of worker processes (1 computes in-process)
+        chunk_size: Maximum number of turbine/link pairs per process-pool task
+        sample_terrain: Sample ground elevations along the links (otherwise the
+            ground is interpolated between the two site elevations)
+        use_google_fallback: Sample points without local DEM coverage from the
+            Google Elevation API instead of interpolating them
+
+    Returns:
+        List of row dictionaries (SCREENING_COLUMNS), worst clearance first
+    """
+    if not links or not turbines:
+        return []
+
+    turbine_ids = np.array([t.id for t in turbines], dtype=object)
+    latitudes = np.array([t.latitude for t in turbines], dtype=float)
+    longitudes = np.array([t.longitude for t in turbines], dtype=float)
+    total_heights_m = np.array([t.total_height_m for t in turbines], dtype=float)
+    rotor_diameters_m = np.array([np.nan if t.rotor_diameter_m is None else t.rotor_diameter_m
+                                  for t in turbines], dtype=float)
+    hub_heights_m = np.array([np.nan if t.hub_height_m is None else t.hub_height_m
+                              for t in turbines], dtype=float)
+    max_rotor_radius_m = float(np.nanmax(np.append(rotor_diameters_m, DEFAULT_ROTOR_DIAMETER_M))) / 2
+
+    candidates = find_candidate_pairs(links, latitudes, longitudes, max_rotor_radius_m, margin_ft)
+    pair_count = sum(len(idx) for idx in candidates)
+    logger.info(f"Screening {len(links)} links x {len(turbines)} turbines: "
+                f"{pair_count} candidate pairs after corridor prefilter")
+
+    # Terrain only matters for links with candidates
+    screened = [i for i, idx in enumerate(candidates) if len(idx)]
+    profiles = {}
+    if sample_terrain:
+        profiles = dict(zip(screened, sample_link_profiles([links[i] for i in screened],
+                                                           use_google_fallback=use_google_fallback)))
+
+    # Group per-link tasks into chunks of roughly chunk_size pairs
+    chunks, chunk, chunk_pairs = [], [], 0
+    for i in screened:
+        link_id, path = links[i]
+        idx = candidates[i]
+        task = {
+            'link_id': link_id,
+            'path': path,
+            'turbine_ids': turbine_ids[idx],
+            'latitudes': latitudes[idx],
+            'longitudes': longitudes[idx],
+            'total_heights_m': total_heights_m[idx],
+            'rotor_diameters_m': rotor_diameters_m[idx],
+            'hub_heights_m': hub_heights_m[idx]
+        }
+        if i in profiles:
+            task['elevation_ft'] = profiles[i]
+        chunk.append(task)
+        chunk_pairs += len(idx)
+        if chunk_pairs >= chunk_size:
+            chunks.append(chunk)
+            chunk, chunk_pairs = [], 0
+    if chunk:
+        chunks.append(chunk)
+
+    rows = []
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            rows.extend(_screen_chunk(chunk, margin_ft))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_screen_chunk, chunk, margin_ft) for chunk in chunks]
+            for future in as_completed(futures):
+                rows.extend(future.result())
+
+    rows.sort(key=lambda row: (row['clearance_3d_fresnel_ft'], row['link_id'], row['turbine_id']))
+    failing = sum(1 for row in rows if row['status'] == 'FAIL')
+    logger.info(f"Found {failing} failing and {len(rows) - failing} near-failing turbine/link pairs")
+    return rows
+
+def write_screening_csv(rows: List[Dict], output_path: str):
+    """Write screening rows to a CSV file"""
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SCREENING_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    logger.info(f"Wrote {len(rows)} screening rows to {output_path}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Screen a microwave network against a turbine set')
+    parser.add_argument('--links', required=True,
+                        help='Directory of tower_parameters JSON files or a CSV of links')
+    parser.add_argument('--turbines', required=True,
+                        help='USWTDB GeoJSON file or JSON list of turbines')
+    parser.add_argument('--margin-ft', type=float, default=DEFAULT_MARGIN_FT,
+                        help='Report pairs with 3D Fresnel clearance below this many feet')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Maximum turbine/link pairs per worker task')
+    parser.add_argument('--no-terrain', action='store_true',
+                        help='Interpolate ground between the site elevations instead of sampling terrain')
+    parser.add_argument('--google-fallback', action='store_true',
+                        help='Fetch terrain the local DEMs do not cover from the (billable) Google Elevation API')
+    parser.add_argument('--output', help='Write the table to this CSV file instead of stdout')
+    args = parser.parse_args(argv)
+
+    try:
+        links = load_links(args.links)
+        turbines = load_turbines(args.turbines)
+        rows = screen_network(links, turbines, args.margin_ft, args.workers, args.chunk_size,
+                              sample_terrain=not args.no_terrain, use_google_fallback=args.google_fallback)
+    except Exception as e:
+        logger.error(f"Error screening network: {e}", exc_info=True)
+        return 1
+
+    if args.output:
+        write_screening_csv(rows, args.output)
+    else:
+        writer = csv.DictWriter(sys.stdout, fieldnames=SCREENING_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
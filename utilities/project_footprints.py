@@ -0,0 +1,518 @@
+"""
+USGS Project Footprint Index
+
+One simplified footprint polygon (WGS84) per USGS LiDAR project, held in an
+STRtree so a search only opens the tile indexes of projects that actually
+cover the search area, anywhere in the country.
+
+Searches open tile indexes under Projects/{name}/, so the index covers the
+projects listed there. Footprints come from the project's tile index when it
+is already in the tile index cache (the union of its tiles), otherwise from
+the EPT bounds in {name}/ept.json when the EPT layout has a project of the
+same name. The shipped cache/lidar_registry.json only has whole-world
+placeholder boundaries; the built registry, with the footprints, is written
+to cache/lidar_registry.local.json (not tracked) so they are fetched once.
+Both project lists are re-listed weekly to pick up new projects.
+
+The index is built on a background thread; searches use the registry as it
+is meanwhile. A project without a footprint is only considered by searches
+inside the bounding box of the state(s) in its name: they fetch its EPT
+bounds, and projects without EPT bounds are searched and take their
+footprint from the tile index the search cached. Run this module to build
+the index ahead of time:
+
+    python -m utilities.project_footprints [--refresh]
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pyproj import CRS, Transformer
+from shapely.geometry import box, mapping, shape
+from shapely.geometry.base import BaseGeometry
+from shapely.ops import unary_union
+from shapely.strtree import STRtree
+
+from utilities.tile_index_cache import get_tile_index_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+
+# Shipped registry (placeholders) and the built one that replaces it locally
+DEFAULT_REGISTRY_PATH = os.path.join(CACHE_DIR, "lidar_registry.json")
+BUILT_REGISTRY_PATH = os.path.join(CACHE_DIR, "lidar_registry.local.json")
+
+EPT_BUCKET = 'usgs-lidar-public'
+
+# Footprints are buffered by this much before simplifying, so they still cover the data (~200 m)
+FOOTPRINT_TOLERANCE_DEG = 0.002
+
+# Re-list the bucket (and retry projects without a footprint) after this long
+PROJECT_LIST_REFRESH_DAYS = 7
+
+# Concurrent ept.json requests when building the index
+FOOTPRINT_FETCH_WORKERS = 16
+
+# Bounding boxes (min_lon, min_lat, max_lon, max_lat) of the states and territories in project
+# names, used for projects without a footprint; min_lon > max_lon crosses the antimeridian
+STATE_BOUNDS = {
+    'AL': (-88.5, 30.1, -84.9, 35.0), 'AK': (172.4, 51.2, -129.9, 71.4), 'AZ': (-114.9, 31.3, -109.0, 37.0),
+    'AR': (-94.7, 33.0, -89.6, 36.5), 'CA': (-124.5, 32.5, -114.1, 42.0), 'CO': (-109.1, 37.0, -102.0, 41.0),
+    'CT': (-73.8, 40.9, -71.8, 42.1), 'DE': (-75.8, 38.4, -75.0, 39.9), 'DC': (-77.2, 38.8, -76.9, 39.0),
+    'FL': (-87.7, 24.4, -80.0, 31.0), 'GA': (-85.7, 30.3, -80.8, 35.0), 'HI': (-178.4, 18.9, -154.8, 28.5),
+    'ID': (-117.3, 42.0, -111.0, 49.0), 'IL': (-91.6, 36.9, -87.0, 42.5), 'IN': (-88.1, 37.7, -84.8, 41.8),
+    'IA': (-96.7, 40.3, -90.1, 43.6), 'KS': (-102.1, 36.9, -94.6, 40.0), 'KY': (-89.6, 36.4, -81.9, 39.2),
+    'LA': (-94.1, 28.9, -88.8, 33.1), 'ME': (-71.1, 43.0, -66.9, 47.5), 'MD': (-79.5, 37.9, -75.0, 39.8),
+    'MA': (-73.6, 41.2, -69.9, 42.9), 'MI': (-90.5, 41.6, -82.1, 48.3), 'MN': (-97.3, 43.5, -89.5, 49.4),
+    'MS': (-91.7, 30.1, -88.1, 35.0), 'MO': (-95.8, 36.0, -89.1, 40.7), 'MT': (-116.1, 44.3, -104.0, 49.0),
+    'NE': (-104.1, 40.0, -95.3, 43.0), 'NV': (-120.0, 35.0, -114.0, 42.0), 'NH': (-72.6, 42.7, -70.6, 45.4),
+    'NJ': (-75.6, 38.9, -73.9, 41.4), 'NM': (-109.1, 31.3, -103.0, 37.0), 'NY': (-79.8, 40.5, -71.8, 45.0),
+    'NC': (-84.3, 33.8, -75.4, 36.6), 'ND': (-104.1, 45.9, -96.5, 49.0), 'OH': (-84.8, 38.4, -80.5, 42.3),
+    'OK': (-103.0, 33.6, -94.4, 37.0), 'OR': (-124.6, 41.9, -116.5, 46.3), 'PA': (-80.5, 39.7, -74.7, 42.3),
+    'RI': (-71.9, 41.1, -71.1, 42.0), 'SC': (-83.4, 32.0, -78.5, 35.2), 'SD': (-104.1, 42.5, -96.4, 45.9),
+    'TN': (-90.3, 35.0, -81.6, 36.7), 'TX': (-106.6, 25.8, -93.5, 36.5), 'UT': (-114.1, 37.0, -109.0, 42.0),
+    'VT': (-73.4, 42.7, -71.5, 45.0), 'VA': (-83.7, 36.5, -75.2, 39.5), 'WA': (-124.8, 45.5, -116.9, 49.0),
+    'WV': (-82.6, 37.2, -77.7, 40.6), 'WI': (-92.9, 42.5, -86.2, 47.3), 'WY': (-111.1, 41.0, -104.1, 45.0),
+    'PR': (-67.95, 17.9, -65.2, 18.5), 'VI': (-65.1, 17.7, -64.6, 18.4), 'GU': (144.6, 13.2, 145.0, 13.7),
+    'MP': (144.9, 14.1, 146.1, 20.6), 'AS': (-171.1, -14.6, -168.1, -11.0),
+}
+
+# Margin around the state boxes for projects that extend past the state line
+STATE_MARGIN_DEG = 0.5
+
+# State codes leading a project name, e.g. USGS_LPC_CO_..., ARRA-CA_... or VA-WV-MD_...
+PROJECT_STATES_PATTERN = re.compile(r'^(?:USGS_LPC_|ARRA-)?((?:[A-Z]{2}-)*[A-Z]{2})_')
+
+def is_placeholder_boundary(geometry: Optional[BaseGeometry]) -> bool:
+    """Whether a registry boundary is missing or the whole-world placeholder"""
+    if geometry is None or geometry.is_empty:
+        return True
+    min_x, min_y, max_x, max_y = geometry.bounds
+    return min_x <= -180 and min_y <= -90 and max_x >= 180 and max_y >= 90
+
+def simplify_footprint(geometry: BaseGeometry, tolerance: float = FOOTPRINT_TOLERANCE_DEG) -> BaseGeometry:
+    """Simplified footprint that still covers the input geometry"""
+    return geometry.buffer(tolerance, join_style='mitre').simplify(tolerance, preserve_topology=True)
+
+def ept_footprint(ept: Dict[str, Any]) -> Optional[BaseGeometry]:
+    """
+    WGS84 footprint from the bounds of an ept.json document.
+
+    Args:
+        ept: Parsed ept.json (bounds are [minX, minY, minZ, maxX, maxY, maxZ] in its srs)
+
+    Returns:
+        Optional[BaseGeometry]: Footprint polygon, or None without usable bounds
+    """
+    bounds = ept.get('bounds')
+    if not bounds or len(bounds) != 6:
+        return None
+    srs = ept.get('srs') or {}
+    if srs.get('authority') and srs.get('horizontal'):
+        crs = CRS.from_user_input(f"{srs['authority']}:{srs['horizontal']}")
+    elif srs.get('wkt'):
+        crs = CRS.from_wkt(srs['wkt'])
+    else:
+        crs = CRS.from_epsg(3857)  # The USGS EPT resources are Web Mercator
+    transformer = Transformer.from_crs(crs, "EPSG:4326", always_xy=True)
+    min_x, min_y, max_x, max_y = transformer.transform_bounds(bounds[0], bounds[1], bounds[3], bounds[4],
+                                                             densify_pts=21)
+    return simplify_footprint(box(min_x, min_y, max_x, max_y))
+
+def tile_index_footprint(project_name: str) -> Optional[BaseGeometry]:
+    """Union of the tiles of a project's tile index, if it is in the tile index cache"""
+    cache = get_tile_index_cache()
+    entry = cache.lookup(project_name)
+    if entry is None or not entry['file_name']:
+        return None
+    tiles = cache.read(entry)
+    if tiles is None or tiles.empty:
+        return None
+    return simplify_footprint(unary_union(tiles.geometry.values))
+
+def state_region(state: str) -> Optional[BaseGeometry]:
+    """Bounding box of a state or territory (with STATE_MARGIN_DEG), None if not in STATE_BOUNDS"""
+    bounds = STATE_BOUNDS.get(state)
+    if bounds is None:
+        return None
+    min_x, min_y, max_x, max_y = bounds
+    min_y, max_y = min_y - STATE_MARGIN_DEG, max_y + STATE_MARGIN_DEG
+    if min_x > max_x:
+        return unary_union([box(min_x - STATE_MARGIN_DEG, min_y, 180, max_y),
+                            box(-180, min_y, max_x + STATE_MARGIN_DEG, max_y)])
+    return box(min_x - STATE_MARGIN_DEG, min_y, max_x + STATE_MARGIN_DEG, max_y)
+
+def project_region(name: str, resource: Optional[Dict[str, Any]] = None) -> Optional[BaseGeometry]:
+    """
+    Area a project without a footprint can cover, from the state(s) in its name.
+
+    Args:
+        name: Project name
+        resource: Its registry resource (its 'state' is used when the name has none)
+
+    Returns:
+        Optional[BaseGeometry]: Union of the state boxes, or None if a state is unknown
+    """
+    match = PROJECT_STATES_PATTERN.match(name)
+    states = match.group(1).split('-') if match else [(resource or {}).get('state')]
+    regions = [state_region(state) for state in states]
+    if any(region is None for region in regions):
+        return None
+    return regions[0] if len(regions) == 1 else unary_union(regions)
+
+def fetch_ept_footprint(s3_client, project_name: str) -> Optional[BaseGeometry]:
+    """Footprint from the bounds in a project's ept.json (None if it has none)"""
+    try:
+        response = s3_client.get_object(Bucket=EPT_BUCKET, Key=f"{project_name}/ept.json",
+                                        RequestPayer='requester')
+        return ept_footprint(json.loads(response['Body'].read().decode('utf-8')))
+    except Exception as e:
+        logger.warning(f"Could not get EPT bounds for project {project_name}: {str(e)}")
+        return None
+
+class ProjectFootprintIndex:
+    """STRtree over project footprints"""
+
+    def __init__(self, footprints: Dict[str, Optional[BaseGeometry]],
+                 regions: Optional[Dict[str, Optional[BaseGeometry]]] = None,
+                 without_ept: Iterable[str] = ()):
+        """
+        Args:
+            footprints: Project name to WGS84 footprint (None if unknown)
+            regions: Area each project without a footprint can cover (None or missing: anywhere)
+            without_ept: Projects known to have no EPT bounds
+        """
+        self._lock = threading.Lock()
+        self.footprints = {name: geom for name, geom in footprints.items() if geom is not None}
+        self.unresolved = sorted(name for name, geom in footprints.items() if geom is None)
+        self.regions = {name: (regions or {}).get(name) for name in self.unresolved}
+        self.without_ept = set(without_ept)
+        self._build_tree()
+
+    def _build_tree(self):
+        self.names = list(self.footprints)
+        self.tree = STRtree([self.footprints[name] for name in self.names])
+
+    def __len__(self) -> int:
+        return len(self.names) + len(self.unresolved)
+
+    @property
+    def complete(self) -> bool:
+        """Whether every project has a known footprint"""
+        with self._lock:
+            return not self.unresolved
+
+    def _unresolved_near(self, geometry: BaseGeometry) -> List[str]:
+        """Projects without a footprint that may cover a geometry (call with the lock held)"""
+        return [name for name in self.unresolved
+                if self.regions[name] is None or self.regions[name].intersects(geometry)]
+
+    def resolved_for(self, geometry: BaseGeometry) -> bool:
+        """Whether every project that may cover a geometry has a known footprint"""
+        with self._lock:
+            return not self._unresolved_near(geometry)
+
+    def query(self, geometry: BaseGeometry) -> List[str]:
+        """
+        Projects whose footprint intersects a geometry.
+
+        Projects without a known footprint are included when their region
+        intersects the geometry, so a search never leaves out a project that
+        may cover it; see fetch_ept_footprints() and resolve().
+        """
+        with self._lock:
+            hits = self.tree.query(geometry, predicate='intersects')
+            matches = sorted(self.names[i] for i in hits)
+            unresolved = self._unresolved_near(geometry)
+        if unresolved:
+            logger.info(f"Also searching {len(unresolved)} projects without a known footprint")
+        return matches + unresolved
+
+    def candidates(self, geometry: BaseGeometry, projects: Iterable[str]) -> List[str]:
+        """Subset of projects that may cover a geometry (unknown projects are kept)"""
+        with self._lock:
+            footprints = dict(self.footprints)
+        return [name for name in projects
+                if name not in footprints or footprints[name].intersects(geometry)]
+
+    def fetch_ept_footprints(self, s3_client, projects: Iterable[str]) -> int:
+        """
+        Fetch the EPT bounds of the projects among the given ones without a footprint.
+
+        Projects without EPT bounds are left unresolved (a search resolves
+        them from their tile index) and are not fetched again.
+
+        Args:
+            s3_client: Initialized boto3 S3 client
+            projects: Project names, typically the result of query()
+
+        Returns:
+            int: Number of footprints resolved
+        """
+        with self._lock:
+            pending = [name for name in projects if name in self.regions and name not in self.without_ept]
+        if not pending:
+            return 0
+
+        logger.info(f"Fetching EPT bounds for {len(pending)} projects without a known footprint")
+        with ThreadPoolExecutor(max_workers=min(FOOTPRINT_FETCH_WORKERS, len(pending))) as executor:
+            footprints = list(executor.map(lambda name: fetch_ept_footprint(s3_client, name), pending))
+        for name, footprint in zip(pending, footprints):
+            if footprint is None:
+                with self._lock:
+                    self.without_ept.add(name)
+            else:
+                self.resolve(name, footprint)
+        return sum(1 for footprint in footprints if footprint is not None)
+
+    def resolve(self, name: str, footprint: Optional[BaseGeometry]):
+        """
+        Record what a search learned about a project without a footprint.
+
+        Args:
+            name: Project name
+            footprint: Its footprint, or None when it has no usable tile index
+                (it is not searched again until the index is rebuilt)
+        """
+        with self._lock:
+            if name not in self.unresolved:
+                return
+            self.unresolved.remove(name)
+            del self.regions[name]
+            if footprint is not None:
+                self.footprints[name] = footprint
+                self._build_tree()
+
+def load_registry(path: str = DEFAULT_REGISTRY_PATH) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Read the project registry.
+
+    Returns:
+        (resources by project name, top-level fields) tuple
+    """
+    try:
+        with open(path) as f:
+            registry = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    resources = {r['name']: r for r in registry.get('resources', []) if r.get('name')}
+    return resources, {k: v for k, v in registry.items() if k != 'resources'}
+
+def save_registry(resources: Dict[str, Dict[str, Any]], fields: Dict[str, Any], path: str = BUILT_REGISTRY_PATH):
+    """Write the project registry atomically"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({**fields, 'resources': [resources[name] for name in sorted(resources)]}, f)
+    os.replace(temp_path, path)
+
+def registry_footprint(resource: Dict[str, Any]) -> Optional[BaseGeometry]:
+    """Footprint stored in a registry resource (None for placeholders)"""
+    geometry = (resource.get('boundary') or {}).get('geometry')
+    if not geometry:
+        return None
+    footprint = shape(geometry)
+    return None if is_placeholder_boundary(footprint) else footprint
+
+def list_ept_projects(s3_client) -> List[str]:
+    """
+    List the top-level (EPT) project directories of the bucket.
+
+    Args:
+        s3_client: Initialized boto3 S3 client
+
+    Returns:
+        List[str]: Project names
+    """
+    projects = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=EPT_BUCKET, Delimiter='/', RequestPayer='requester'):
+        for prefix in page.get('CommonPrefixes', []):
+            name = prefix['Prefix'].rstrip('/')
+            # Projects/ holds the tile-index layout of the same projects
+            if name and name != 'Projects':
+                projects.append(name)
+    return projects
+
+def list_tile_index_projects(s3_client) -> List[str]:
+    """
+    List the projects under Projects/, where tile indexes and LAZ files live.
+
+    Args:
+        s3_client: Initialized boto3 S3 client
+
+    Returns:
+        List[str]: Project names
+    """
+    # Imported here: tile_index_manager uses this module for its searches
+    from utilities.tile_index_manager import list_all_projects
+    return list_all_projects(s3_client)
+
+def resolve_footprint(s3_client, project_name: str,
+                      has_ept: bool = True) -> Tuple[Optional[BaseGeometry], Optional[str]]:
+    """
+    Derive a project's footprint from its cached tile index or its EPT bounds.
+
+    Args:
+        s3_client: Initialized boto3 S3 client (None to use cached tile indexes only)
+        project_name: Name of the project
+        has_ept: Whether the EPT layout has a project of this name
+
+    Returns:
+        (footprint, source) tuple; source is 'tile_index' or 'ept_bounds'
+    """
+    try:
+        footprint = tile_index_footprint(project_name)
+        if footprint is not None:
+            return footprint, 'tile_index'
+    except Exception as e:
+        logger.warning(f"Error reading cached tile index for project {project_name}: {str(e)}")
+
+    # Tile indexes are not fetched here: searches fetch those of the projects they need
+    if s3_client is not None and has_ept:
+        footprint = fetch_ept_footprint(s3_client, project_name)
+        if footprint is not None:
+            return footprint, 'ept_bounds'
+    return None, None
+
+def build_footprint_index(s3_client=None, path: Optional[str] = None,
+                          refresh: bool = False) -> ProjectFootprintIndex:
+    """
+    Load the footprint index, fetching the EPT bounds of projects without a footprint.
+
+    Args:
+        s3_client: Initialized boto3 S3 client (None to use the registry and cached tile indexes only)
+        path: Built registry path (BUILT_REGISTRY_PATH if None); the shipped
+            registry is read until it exists
+        refresh: Re-list the bucket and retry unresolved projects now
+
+    Returns:
+        ProjectFootprintIndex: Index over the searchable (Projects/) projects
+    """
+    path = path or BUILT_REGISTRY_PATH
+    resources, fields = load_registry(path if os.path.exists(path) else DEFAULT_REGISTRY_PATH)
+    now = time.time()
+    stale = refresh or fields.get('generated', True) or \
+        now - fields.get('projects_listed_at', 0) > PROJECT_LIST_REFRESH_DAYS * 86400
+
+    if s3_client is not None and stale:
+        try:
+            ept_names = set(list_ept_projects(s3_client))
+            tile_index_names = set(list_tile_index_projects(s3_client))
+            if not tile_index_names:
+                raise ValueError("no projects found under Projects/")
+            for name in ept_names | tile_index_names:
+                prefix = f"Projects/{name}/" if name in tile_index_names else f"{name}/"
+                resource = resources.setdefault(name, {'name': name, 'url': f"s3://{EPT_BUCKET}/{prefix}"})
+                resource['ept'] = name in ept_names
+                resource['tile_index'] = name in tile_index_names
+            for name, resource in resources.items():
+                if name not in ept_names and name not in tile_index_names:
+                    resource['ept'] = resource['tile_index'] = False
+            fields.update(generated=False, source='project_footprints', projects_listed_at=now)
+            logger.info(f"Listed {len(tile_index_names)} tile index projects and {len(ept_names)} EPT projects "
+                        f"({len(tile_index_names & ept_names)} in both) for the footprint index")
+        except Exception as e:
+            logger.error(f"Error listing projects for the footprint index: {str(e)}", exc_info=True)
+
+    # Only projects with a Projects/ directory have tile indexes to search
+    # (registries that were never listed don't know, so all of theirs are kept)
+    searchable = [name for name, resource in resources.items() if resource.get('tile_index', True)]
+    footprints = {name: registry_footprint(resources[name]) for name in searchable}
+
+    # Projects without a footprint: cached tile indexes are always checked, EPT bounds with the project list
+    missing = [name for name, footprint in footprints.items() if footprint is None]
+    if missing:
+        def resolve(name):
+            remote = s3_client is not None and (stale or 'footprint_checked_at' not in resources[name])
+            return remote, resolve_footprint(s3_client if remote else None, name,
+                                             resources[name].get('ept', True))
+
+        logger.info(f"Resolving footprints for {len(missing)} projects")
+        with ThreadPoolExecutor(max_workers=FOOTPRINT_FETCH_WORKERS) as executor:
+            resolved = list(executor.map(resolve, missing))
+        for name, (remote, (footprint, source)) in zip(missing, resolved):
+            if remote:
+                resources[name]['footprint_checked_at'] = now
+            if footprint is not None:
+                footprints[name] = footprint
+                resources[name]['boundary'] = {'geometry': mapping(footprint)}
+                resources[name]['footprint_source'] = source
+        resolved_count = sum(1 for _, (footprint, _) in resolved if footprint is not None)
+        checked = any(remote for remote, _ in resolved)
+        logger.info(f"Resolved {resolved_count} of {len(missing)} project footprints")
+    else:
+        resolved_count, checked = 0, False
+
+    if resolved_count or checked or (s3_client is not None and stale):
+        fields['timestamp'] = now
+        try:
+            save_registry(resources, fields, path)
+        except OSError as e:
+            logger.warning(f"Could not save the project registry: {str(e)}")
+
+    index = ProjectFootprintIndex(footprints,
+                                  {name: project_region(name, resources[name])
+                                   for name, footprint in footprints.items() if footprint is None},
+                                  [name for name in searchable if resources[name].get('ept') is False])
+    logger.info(f"Project footprint index: {len(index.names)} footprints, {len(index.unresolved)} unresolved")
+    return index
+
+_footprint_index = None
+_footprint_index_lock = threading.Lock()
+
+def refresh_footprint_index(s3_client, refresh: bool = False) -> ProjectFootprintIndex:
+    """Build the footprint index with S3 access and make it the shared index"""
+    global _footprint_index
+    index = build_footprint_index(s3_client, refresh=refresh)
+    with _footprint_index_lock:
+        _footprint_index = index
+    return index
+
+def get_project_footprint_index(s3_client=None) -> ProjectFootprintIndex:
+    """
+    Return the shared footprint index.
+
+    The first call loads the registry and cached tile indexes without S3
+    requests. With an S3 client, the registry is then built on a background
+    thread (EPT bounds of projects without a footprint, new projects) and
+    replaces the index when ready; searches meanwhile fetch the EPT bounds
+    of the projects they need (see ProjectFootprintIndex.fetch_ept_footprints).
+    """
+    global _footprint_index
+    with _footprint_index_lock:
+        if _footprint_index is not None:
+            return _footprint_index
+        index = _footprint_index = build_footprint_index(None)
+
+    if s3_client is not None:
+        def background_refresh():
+            try:
+                refresh_footprint_index(s3_client)
+            except Exception as e:
+                logger.error(f"Error refreshing the project footprint index: {str(e)}", exc_info=True)
+
+        threading.Thread(target=background_refresh, name='footprint-index', daemon=True).start()
+    return index
+
+if __name__ == "__main__":
+    import argparse
+    from utilities.tile_index_manager import initialize_s3_client
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Build the USGS project footprint index')
+    parser.add_argument('--refresh', action='store_true', help='Re-list the bucket and retry unresolved projects now')
+    args = parser.parse_args()
+
+    client = initialize_s3_client()
+    if client is None:
+        raise SystemExit("Failed to initialize S3 client")
+    built = refresh_footprint_index(client, refresh=args.refresh)
+    print(f"{len(built.names)} project footprints, {len(built.unresolved)} unresolved")
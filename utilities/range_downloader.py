@@ -0,0 +1,374 @@
+"""
+Parallel Range Downloader
+
+Download engine for large LiDAR tiles. Files are split into HTTP Range
+segments fetched in parallel over one pooled requests.Session, so a single
+multi-GB tile uses several TCP streams instead of trickling on one.
+
+- Data goes to <file>.part; the sidecar <file>.part.json records the server
+  size/ETag and the bytes completed per segment, so an interrupted download
+  (crash, pause, cancel) resumes where each segment stopped
+- Resume state is discarded if the server's size or ETag changed
+- On completion the size is checked, single-part S3 ETags (plain MD5) are
+  verified against the file contents, and the .part file is moved into place
+- Servers without Range support (or unknown sizes) fall back to one stream
+- Other transports subclass it and override probe() and _open_range()
+  (see utilities/s3_transfer.py)
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_CONNECTIONS = 8
+
+# Files smaller than this are fetched on a single connection
+MIN_SEGMENTED_SIZE = 32 * 1024 * 1024
+
+READ_CHUNK_SIZE = 256 * 1024
+SEGMENT_RETRIES = 3
+REQUEST_TIMEOUT = 30
+
+# Seconds between resume state checkpoints while segments are in flight
+STATE_SAVE_INTERVAL = 1.0
+
+USER_AGENT = 'UltraVerboseDownloaderer/1.0'
+
+class DownloadStopped(Exception):
+    """Raised internally when should_stop asks a download to stop"""
+
+@dataclass
+class RemoteFileInfo:
+    """What the server reports about a file"""
+    size: int
+    etag: Optional[str]
+    accepts_ranges: bool
+
+@dataclass
+class DownloadResult:
+    """Outcome of RangeDownloader.download"""
+    status: str  # 'complete', 'stopped' or 'failed'
+    path: str
+    size: int = 0
+    bytes_downloaded: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def speed(self) -> float:
+        """Average bytes per second fetched in this call"""
+        return self.bytes_downloaded / self.elapsed if self.elapsed > 0 else 0.0
+
+def _is_md5_etag(etag: Optional[str]) -> bool:
+    """Single-part S3 ETags are the hex MD5 of the object"""
+    if not etag:
+        return False
+    value = etag.strip('"')
+    return len(value) == 32 and all(c in '0123456789abcdef' for c in value.lower())
+
+class RangeDownloader:
+    """Segmented, resumable HTTP downloader sharing one connection pool"""
+
+    def __init__(self,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 segment_size: int = DEFAULT_SEGMENT_SIZE,
+                 min_segmented_size: int = MIN_SEGMENTED_SIZE,
+                 session: Optional[requests.Session] = None,
+                 pool_size: Optional[int] = None):
+        """
+        Create the engine.
+
+        Args:
+            max_connections: Parallel segment requests per file
+            segment_size: Bytes per Range segment
+            min_segmented_size: Files smaller than this use a single connection
+            session: Session to reuse (a pooled one is created otherwise)
+            pool_size: Connections kept per host, defaults to max_connections.
+                Raise it when several files download at once.
+        """
+        self.max_connections = max(1, max_connections)
+        self.segment_size = segment_size
+        self.min_segmented_size = min_segmented_size
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size or self.max_connections)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+        self.session = session
+
+    def probe(self, url: str, verify: bool = True) -> RemoteFileInfo:
+        """Size, ETag and Range support from a HEAD request (or a one-byte GET if HEAD is refused)"""
+        size, etag, accepts_ranges = 0, None, False
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT, verify=verify)
+            response.raise_for_status()
+            size = int(response.headers.get('Content-Length', 0))
+            etag = response.headers.get('ETag')
+            accepts_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+        except requests.RequestException as e:
+            logger.debug(f"HEAD failed for {url}, probing with a range request: {e}")
+
+        if not accepts_ranges or size == 0:
+            with self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True,
+                                  timeout=REQUEST_TIMEOUT, verify=verify) as response:
+                response.raise_for_status()
+                etag = response.headers.get('ETag', etag)
+                content_range = response.headers.get('Content-Range', '')
+                if response.status_code == 206 and '/' in content_range and not content_range.endswith('*'):
+                    size = int(content_range.split('/')[-1])
+                    accepts_ranges = True
+                elif response.status_code == 200:
+                    size = int(response.headers.get('Content-Length', size or 0))
+                    accepts_ranges = False
+
+        return RemoteFileInfo(size, etag, accepts_ranges)
+
+    @contextmanager
+    def _open_range(self, url: str, first: int, last: Optional[int], etag: Optional[str],
+                    verify: bool) -> Iterator[Tuple[bool, Iterator[bytes]]]:
+        """
+        Open a GET for bytes first..last (last=None reads to the end).
+
+        Yields:
+            (partial, chunks): partial is False when the server sent the whole file instead
+        """
+        headers = {}
+        if first or last is not None:
+            headers['Range'] = f"bytes={first}-{'' if last is None else last}"
+            if etag:
+                headers['If-Range'] = etag
+        with self.session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT, verify=verify) as response:
+            response.raise_for_status()
+            yield response.status_code == 206, response.iter_content(READ_CHUNK_SIZE)
+
+    def _is_complete(self, path: str, remote: RemoteFileInfo) -> bool:
+        """Whether an existing file at path is already the remote file"""
+        return bool(remote.size) and os.path.getsize(path) == remote.size
+
+    def _on_complete(self, path: str, remote: RemoteFileInfo):
+        """Hook called after a file has been downloaded and moved into place"""
+
+    def download(self,
+                 url: str,
+                 path: str,
+                 progress_callback: Optional[Callable[[int, int], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 verify: bool = True) -> DownloadResult:
+        """
+        Download url to path, resuming from a previous partial download.
+
+        Args:
+            url: File URL
+            path: Destination path
+            progress_callback: Called as (bytes_on_disk, total_size) while downloading
+            should_stop: Polled while downloading; returning True stops the
+                download and keeps the resume state (used for pause/cancel)
+            verify: Verify TLS certificates
+
+        Returns:
+            DownloadResult with status 'complete', 'stopped' or 'failed'
+        """
+        start = time.time()
+        part_path = path + '.part'
+        state_path = part_path + '.json'
+        fetched = [0]
+
+        try:
+            remote = self.probe(url, verify)
+            if os.path.exists(path) and self._is_complete(path, remote):
+                return DownloadResult('complete', path, remote.size, 0, time.time() - start)
+
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if remote.accepts_ranges and remote.size >= self.min_segmented_size and self.max_connections > 1:
+                self._download_segmented(url, part_path, state_path, remote, progress_callback,
+                                         should_stop, verify, fetched)
+            else:
+                self._download_single(url, part_path, state_path, remote, progress_callback,
+                                      should_stop, verify, fetched)
+
+            self._verify(part_path, remote)
+            os.replace(part_path, path)
+            if os.path.exists(state_path):
+                os.remove(state_path)
+            self._on_complete(path, remote)
+            size = os.path.getsize(path)
+            logger.info(f"Downloaded {os.path.basename(path)} ({size} bytes) in {time.time() - start:.1f}s")
+            return DownloadResult('complete', path, size, fetched[0], time.time() - start)
+
+        except DownloadStopped:
+            logger.info(f"Download stopped, resume state kept: {os.path.basename(path)}")
+            return DownloadResult('stopped', path, 0, fetched[0], time.time() - start)
+        except Exception as e:
+            logger.error(f"Download failed for {url}: {e}")
+            return DownloadResult('failed', path, 0, fetched[0], time.time() - start, str(e))
+
+    def _load_state(self, part_path: str, state_path: str, url: str, remote: RemoteFileInfo) -> Optional[Dict]:
+        """Resume state if it matches the server's current file"""
+        if not (os.path.exists(state_path) and os.path.exists(part_path)):
+            return None
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable resume state {state_path}: {e}")
+            return None
+        if (state.get('url') != url or state.get('size') != remote.size or state.get('etag') != remote.etag
+                or state.get('segment_size') != self.segment_size):
+            logger.info(f"Remote file changed since the partial download, restarting: {os.path.basename(part_path)}")
+            return None
+        return state
+
+    def _save_state(self, state_path: str, state: Dict):
+        temp_path = state_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, state_path)
+
+    def _download_segmented(self, url, part_path, state_path, remote, progress_callback, should_stop, verify, fetched):
+        segment_count = (remote.size + self.segment_size - 1) // self.segment_size
+        state = self._load_state(part_path, state_path, url, remote)
+        if state is None:
+            state = {'url': url, 'size': remote.size, 'etag': remote.etag,
+                     'segment_size': self.segment_size, 'segments': {}}
+            with open(part_path, 'wb') as f:
+                f.truncate(remote.size)
+            self._save_state(state_path, state)
+        else:
+            logger.info(f"Resuming {os.path.basename(part_path)} from "
+                        f"{sum(state['segments'].values())} of {remote.size} bytes")
+
+        # Bytes written per segment, keyed by str(index) to match the JSON state
+        done = {str(i): int(state['segments'].get(str(i), 0)) for i in range(segment_count)}
+        lock = threading.Lock()
+        stop = threading.Event()
+        last_save = [time.time()]
+
+        def segment_length(index):
+            return min(self.segment_size, remote.size - index * self.segment_size)
+
+        def checkpoint(force=False):
+            with lock:
+                if not force and time.time() - last_save[0] < STATE_SAVE_INTERVAL:
+                    return
+                state['segments'] = dict(done)
+                self._save_state(state_path, state)
+                last_save[0] = time.time()
+
+        def report():
+            if progress_callback:
+                progress_callback(sum(done.values()), remote.size)
+
+        def fetch_segment(index):
+            key = str(index)
+            length = segment_length(index)
+            for attempt in range(SEGMENT_RETRIES + 1):
+                if done[key] >= length:
+                    return
+                first = index * self.segment_size + done[key]
+                last = index * self.segment_size + length - 1
+                try:
+                    with self._open_range(url, first, last, remote.etag, verify) as (partial, chunks):
+                        if not partial:
+                            raise IOError("Server ignored range request")
+                        with open(part_path, 'r+b') as f:
+                            f.seek(first)
+                            for chunk in chunks:
+                                if stop.is_set() or (should_stop and should_stop()):
+                                    stop.set()
+                                    raise DownloadStopped()
+                                chunk = chunk[:length - done[key]]
+                                f.write(chunk)
+                                with lock:
+                                    done[key] += len(chunk)
+                                    fetched[0] += len(chunk)
+                                report()
+                                checkpoint()
+                    if done[key] >= length:
+                        return
+                    raise IOError(f"Segment {index} ended early")
+                except DownloadStopped:
+                    raise
+                except Exception as e:
+                    if attempt == SEGMENT_RETRIES or stop.is_set():
+                        stop.set()
+                        raise
+                    logger.warning(f"Segment {index} of {os.path.basename(part_path)} failed ({e}), retrying")
+                    time.sleep(2 ** attempt)
+
+        pending = [i for i in range(segment_count) if done[str(i)] < segment_length(i)]
+        report()
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_connections, max(len(pending), 1))) as executor:
+                futures = [executor.submit(fetch_segment, i) for i in pending]
+                errors = []
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+        finally:
+            checkpoint(force=True)
+
+        if any(isinstance(e, DownloadStopped) for e in errors):
+            raise DownloadStopped()
+        if errors:
+            raise errors[0]
+
+    def _download_single(self, url, part_path, state_path, remote, progress_callback, should_stop, verify, fetched):
+        """One stream, resuming with a Range request when the server allows it"""
+        offset = 0
+        if remote.accepts_ranges and self._load_state(part_path, state_path, url, remote) is not None:
+            offset = os.path.getsize(part_path)
+        else:
+            self._save_state(state_path, {'url': url, 'size': remote.size, 'etag': remote.etag,
+                                          'segment_size': self.segment_size, 'segments': {}})
+
+        if offset and offset == remote.size:
+            return
+
+        with self._open_range(url, offset, None, remote.etag, verify) as (partial, chunks):
+            if not partial:
+                offset = 0
+            with open(part_path, 'r+b' if offset else 'wb') as f:
+                f.seek(offset)
+                f.truncate()
+                written = offset
+                for chunk in chunks:
+                    if should_stop and should_stop():
+                        raise DownloadStopped()
+                    f.write(chunk)
+                    written += len(chunk)
+                    fetched[0] += len(chunk)
+                    if progress_callback:
+                        progress_callback(written, remote.size or written)
+
+    def _verify(self, part_path: str, remote: RemoteFileInfo, discard: bool = True):
+        """Check the size and, for plain MD5 ETags, the checksum of a finished download (discarding it on mismatch)"""
+        size = os.path.getsize(part_path)
+        if remote.size and size != remote.size:
+            raise IOError(f"Size mismatch: {size} bytes vs expected {remote.size}")
+        if _is_md5_etag(remote.etag):
+            md5 = hashlib.md5()
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(READ_CHUNK_SIZE * 4), b''):
+                    md5.update(block)
+            if md5.hexdigest() != remote.etag.strip('"').lower():
+                if not discard:
+                    raise IOError("ETag checksum mismatch")
+                # Drop the resume state so the next attempt starts over
+                os.remove(part_path)
+                raise IOError("ETag checksum mismatch, partial file discarded")
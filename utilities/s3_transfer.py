@@ -0,0 +1,227 @@
+"""
+S3 Transfer Backend
+
+Shared download backend for AWS-sourced tiles (requester-pays usgs-lidar
+bucket), used by AWSDownloader and the AWS download dialog.
+
+S3RangeDownloader runs the RangeDownloader engine over boto3: objects are
+fetched as concurrent ranged GetObject calls (tunable part size and
+concurrency), partial downloads resume from their .part/.part.json state,
+and files already on disk are skipped when their recorded ETag matches.
+
+boto3's TransferManager isn't used directly because it cannot resume a
+partial download. Instead every S3 GET in the process draws from one
+TransferBudget: a cap on concurrent connections and an optional bandwidth
+limit, so several dialogs or downloaders running at once share the link
+instead of oversubscribing it.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+from utilities.range_downloader import (RangeDownloader, RemoteFileInfo, DownloadResult, _is_md5_etag,
+                                        DEFAULT_SEGMENT_SIZE, DEFAULT_MAX_CONNECTIONS, MIN_SEGMENTED_SIZE,
+                                        READ_CHUNK_SIZE)
+
+logger = logging.getLogger(__name__)
+
+USGS_LIDAR_BUCKET = 'usgs-lidar'
+
+# Process-wide limits shared by every S3 download
+DEFAULT_GLOBAL_CONNECTIONS = int(os.getenv('S3_MAX_CONNECTIONS', '16'))
+DEFAULT_BANDWIDTH_LIMIT_MBPS = float(os.getenv('S3_BANDWIDTH_LIMIT_MBPS') or 0) or None
+
+# Seconds of unused bandwidth that may be spent in a burst
+BANDWIDTH_BURST_SECONDS = 0.5
+
+# Per-directory record of the ETags of completed downloads
+ETAG_MANIFEST_NAME = '.s3_etags.json'
+
+def parse_s3_url(url: str) -> Tuple[str, str]:
+    """Split s3://bucket/key into (bucket, key)"""
+    if not url.startswith('s3://'):
+        raise ValueError(f"Not an S3 URL: {url}")
+    bucket, _, key = url[5:].partition('/')
+    if not bucket or not key:
+        raise ValueError(f"Invalid S3 URL format: {url}")
+    return bucket, key
+
+def create_s3_client(access_key: Optional[str] = None,
+                     secret_key: Optional[str] = None,
+                     region: Optional[str] = None,
+                     max_pool_connections: int = DEFAULT_GLOBAL_CONNECTIONS):
+    """
+    S3 client with a connection pool large enough for concurrent ranged GETs.
+
+    Args:
+        access_key: AWS access key ID (default: environment/AWS config)
+        secret_key: AWS secret access key
+        region: AWS region (default AWS_REGION or us-west-2)
+        max_pool_connections: Connection pool size
+    """
+    kwargs = {'region_name': region or os.environ.get('AWS_REGION', 'us-west-2'),
+              'config': Config(max_pool_connections=max_pool_connections, retries={'max_attempts': 5})}
+    if access_key and secret_key:
+        kwargs.update(aws_access_key_id=access_key, aws_secret_access_key=secret_key)
+    return boto3.client('s3', **kwargs)
+
+class TransferBudget:
+    """Process-wide cap on concurrent S3 connections and total bandwidth"""
+
+    def __init__(self, max_connections: int = DEFAULT_GLOBAL_CONNECTIONS,
+                 bandwidth_limit: Optional[float] = None):
+        """
+        Args:
+            max_connections: Concurrent GET requests allowed across all downloads
+            bandwidth_limit: Bytes per second across all downloads (None for unlimited)
+        """
+        self.max_connections = max(1, max_connections)
+        self.bandwidth_limit = bandwidth_limit
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+        self._available_at = time.monotonic()
+
+    @contextmanager
+    def connection(self):
+        """Hold one connection slot"""
+        self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def consume(self, nbytes: int):
+        """Wait until nbytes fit within the bandwidth limit"""
+        if not self.bandwidth_limit:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._available_at, now - BANDWIDTH_BURST_SECONDS)
+            self._available_at = start + nbytes / self.bandwidth_limit
+            delay = self._available_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def throttled(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.consume(len(chunk))
+            yield chunk
+
+_transfer_budget = None
+_transfer_budget_lock = threading.Lock()
+
+def get_transfer_budget() -> TransferBudget:
+    """Return the shared budget (S3_MAX_CONNECTIONS / S3_BANDWIDTH_LIMIT_MBPS)"""
+    global _transfer_budget
+    with _transfer_budget_lock:
+        if _transfer_budget is None:
+            limit = DEFAULT_BANDWIDTH_LIMIT_MBPS * 1e6 / 8 if DEFAULT_BANDWIDTH_LIMIT_MBPS else None
+            _transfer_budget = TransferBudget(DEFAULT_GLOBAL_CONNECTIONS, limit)
+        return _transfer_budget
+
+_manifest_lock = threading.Lock()
+
+def _read_manifest(directory: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(directory, ETAG_MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def recorded_etag(path: str) -> Optional[str]:
+    """ETag recorded when path was downloaded, if any"""
+    with _manifest_lock:
+        return _read_manifest(os.path.dirname(os.path.abspath(path))).get(os.path.basename(path))
+
+def record_etag(path: str, etag: Optional[str]):
+    """Remember the ETag of a completed download"""
+    if not etag:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    with _manifest_lock:
+        manifest = _read_manifest(directory)
+        manifest[os.path.basename(path)] = etag
+        temp_path = os.path.join(directory, ETAG_MANIFEST_NAME + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, os.path.join(directory, ETAG_MANIFEST_NAME))
+
+class S3RangeDownloader(RangeDownloader):
+    """Concurrent, resumable ranged GetObject downloads within the shared transfer budget"""
+
+    def __init__(self, s3_client=None,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 segment_size: int = DEFAULT_SEGMENT_SIZE,
+                 min_segmented_size: int = MIN_SEGMENTED_SIZE,
+                 requester_pays: bool = True,
+                 budget: Optional[TransferBudget] = None):
+        """
+        Args:
+            s3_client: boto3 S3 client (default from environment credentials)
+            max_connections: Concurrent ranged GETs per object
+            segment_size: Bytes per ranged GET (the multipart chunk size)
+            min_segmented_size: Objects smaller than this use a single GET
+            requester_pays: Send RequestPayer=requester (needed for usgs-lidar)
+            budget: Connection/bandwidth budget (default the process-wide one)
+        """
+        super().__init__(max_connections=max_connections, segment_size=segment_size,
+                         min_segmented_size=min_segmented_size)
+        self.client = s3_client or create_s3_client()
+        self.extra_args = {'RequestPayer': 'requester'} if requester_pays else {}
+        self.budget = budget or get_transfer_budget()
+
+    def probe(self, url: str, verify: bool = True) -> RemoteFileInfo:
+        bucket, key = parse_s3_url(url)
+        with self.budget.connection():
+            head = self.client.head_object(Bucket=bucket, Key=key, **self.extra_args)
+        return RemoteFileInfo(int(head['ContentLength']), head.get('ETag'), True)
+
+    @contextmanager
+    def _open_range(self, url, first, last, etag, verify):
+        bucket, key = parse_s3_url(url)
+        kwargs = dict(Bucket=bucket, Key=key, **self.extra_args)
+        if first or last is not None:
+            kwargs['Range'] = f"bytes={first}-{'' if last is None else last}"
+        if etag:
+            # Fails instead of mixing bytes if the object changed mid-download
+            kwargs['IfMatch'] = etag
+        with self.budget.connection():
+            response = self.client.get_object(**kwargs)
+            body = response['Body']
+            try:
+                yield 'ContentRange' in response, self.budget.throttled(body.iter_chunks(READ_CHUNK_SIZE))
+            finally:
+                body.close()
+
+    def _is_complete(self, path: str, remote: RemoteFileInfo) -> bool:
+        if not super()._is_complete(path, remote):
+            return False
+        etag = recorded_etag(path)
+        if etag is not None:
+            return etag == remote.etag
+        # Files from before the manifest: verify single-part uploads by checksum
+        if _is_md5_etag(remote.etag):
+            try:
+                self._verify(path, remote, discard=False)
+            except IOError:
+                return False
+        record_etag(path, remote.etag)
+        return True
+
+    def _on_complete(self, path: str, remote: RemoteFileInfo):
+        record_etag(path, remote.etag)
+
+    def download_object(self, bucket: str, key: str, path: str,
+                        progress_callback: Optional[Callable[[int, int], None]] = None,
+                        should_stop: Optional[Callable[[], bool]] = None) -> DownloadResult:
+        """Download s3://bucket/key to path (see RangeDownloader.download)"""
+        return self.download(f"s3://{bucket}/{key}", path, progress_callback=progress_callback,
+                             should_stop=should_stop)
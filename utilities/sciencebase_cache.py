@@ -0,0 +1,197 @@
+"""
+ScienceBase Metadata Cache
+
+Project metadata for search results lives on ScienceBase: the item's JSON
+(metaUrl?format=json) links to the FGDC XML ("Product Metadata"). This module
+fetches both over one pooled HTTP session and keeps them in a SQLite file
+(cache/sciencebase_metadata.db) keyed by metaUrl, so writing metadata for a
+result fetches each project's documents once, concurrently, and never again
+until they expire.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "cache", "sciencebase_metadata.db")
+
+# Published project metadata is rarely revised
+DEFAULT_TTL_DAYS = 30
+
+# Concurrent projects fetched from ScienceBase (the session pool is sized to match)
+METADATA_FETCH_WORKERS = 8
+
+REQUEST_TIMEOUT = 30
+
+def create_http_session(pool_size: int = METADATA_FETCH_WORKERS) -> requests.Session:
+    """requests.Session with a connection pool large enough for the fetch workers"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session() -> requests.Session:
+    """Return the shared metadata HTTP session"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = create_http_session()
+        return _http_session
+
+def find_xml_url(json_data: Dict[str, Any]) -> Optional[str]:
+    """URL of the FGDC XML ("Product Metadata" web link) of a ScienceBase item"""
+    for link in json_data.get('webLinks', []):
+        if link.get('type') == 'originalMetadata' and link.get('title') == 'Product Metadata':
+            return link.get('uri')
+    return None
+
+class ScienceBaseCache:
+    """On-disk cache of ScienceBase item JSON and FGDC XML, keyed by metaUrl"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl_days: Optional[float] = DEFAULT_TTL_DAYS):
+        """
+        Open (or create) the cache.
+
+        Args:
+            db_path: Path to the SQLite cache file
+            ttl_days: Age after which metadata is fetched again (None to never expire)
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days is not None else None
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS metadata (
+            meta_url TEXT PRIMARY KEY,
+            json_data TEXT NOT NULL,
+            xml_url TEXT,
+            xml_text TEXT,
+            created_at REAL NOT NULL
+        )
+        """)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, meta_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached metadata of an item.
+
+        Returns:
+            Dict with json_data, xml_url and xml_text (None without an XML link), or None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT json_data, xml_url, xml_text, created_at FROM metadata WHERE meta_url = ?",
+                                     (meta_url,)).fetchone()
+        if row is None or (self.ttl_seconds is not None and row[3] < time.time() - self.ttl_seconds):
+            return None
+        return {'json_data': json.loads(row[0]), 'xml_url': row[1], 'xml_text': row[2]}
+
+    def put(self, meta_url: str, json_data: Dict[str, Any], xml_url: Optional[str], xml_text: Optional[str]):
+        """Store the metadata of an item"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (meta_url, json_data, xml_url, xml_text, created_at) VALUES (?, ?, ?, ?, ?)",
+                (meta_url, json.dumps(json_data), xml_url, xml_text, time.time())
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove all cached metadata"""
+        with self._lock:
+            self._conn.execute("DELETE FROM metadata")
+            self._conn.commit()
+
+_sciencebase_cache = None
+_sciencebase_cache_lock = threading.Lock()
+
+def get_sciencebase_cache() -> ScienceBaseCache:
+    """Return the shared ScienceBase metadata cache"""
+    global _sciencebase_cache
+    with _sciencebase_cache_lock:
+        if _sciencebase_cache is None:
+            _sciencebase_cache = ScienceBaseCache()
+        return _sciencebase_cache
+
+def fetch_sciencebase_metadata(meta_url: str, session: Optional[requests.Session] = None) -> Dict[str, Any]:
+    """
+    JSON and parsed XML metadata of a ScienceBase item, from the cache or fetched.
+
+    Safe to call from worker threads; only successful fetches are cached.
+
+    Args:
+        meta_url: ScienceBase item URL (the metaUrl of a search result)
+        session: HTTP session (default: the shared session)
+
+    Returns:
+        Dict with meta_url, json_url, json_data, xml_url, xml_text, xml_root
+        (ElementTree root) and error ('JSON fetch error: ...', 'XML fetch error: ...'
+        or 'XML parsing error: ...', None on success). xml_url is None when the
+        item has no XML link.
+    """
+    record = {'meta_url': meta_url, 'json_url': f"{meta_url}?format=json", 'json_data': None,
+              'xml_url': None, 'xml_text': None, 'xml_root': None, 'error': None}
+    cache = get_sciencebase_cache()
+
+    cached = None
+    try:
+        cached = cache.get(meta_url)
+    except Exception as e:
+        logger.warning(f"Error reading cached metadata for {meta_url}: {str(e)}")
+
+    if cached is not None:
+        record.update(cached)
+    else:
+        session = session or get_http_session()
+        try:
+            response = session.get(record['json_url'], timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            record['json_data'] = response.json()
+        except Exception as e:
+            record['error'] = f"JSON fetch error: {str(e)}"
+            return record
+
+        record['xml_url'] = find_xml_url(record['json_data'])
+        if record['xml_url']:
+            try:
+                response = session.get(record['xml_url'], timeout=REQUEST_TIMEOUT)
+                response.raise_for_status()
+                record['xml_text'] = response.text
+            except Exception as e:
+                record['error'] = f"XML fetch error: {str(e)}"
+                return record
+
+    if record['xml_text']:
+        try:
+            record['xml_root'] = ET.fromstring(record['xml_text'])
+        except ET.ParseError as e:
+            record['error'] = f"XML parsing error: {str(e)}"
+            return record
+
+    if cached is None:
+        try:
+            cache.put(meta_url, record['json_data'], record['xml_url'], record['xml_text'])
+        except Exception as e:
+            logger.warning(f"Error caching metadata for {meta_url}: {str(e)}")
+    return record
@@ -0,0 +1,289 @@
+"""
+AWS LiDAR Search Cache
+
+Two-level SQLite cache for AWS polygon searches (aws_search.search_aws_lidar),
+so repeating a search after a UI tweak does not repeat the S3 listings, LAZ
+key matching and metadata lookups.
+
+- Search results are keyed by the normalized search polygon (coordinates
+  rounded to a fixed number of decimals), the date window and the metadata
+  flag, and hold the finished TNM-format result.
+- Below that, each project keeps its LAZ file listing and the LAZ files
+  matched to each tile id (key, size, last modified and tile metadata).
+  A near-duplicate corridor (the same path at a slightly different width)
+  misses the result cache but finds its tiles here, without any S3 request.
+
+Both levels expire after a TTL, and the least recently used entries are
+evicted once a level grows past its size limit.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "cache", "search_cache.db")
+
+# 6 decimals is ~0.1 m, so only genuinely identical polygons share a result
+DEFAULT_PRECISION = 6
+
+# New tiles are published occasionally; listings live longer than finished results
+DEFAULT_RESULT_TTL_HOURS = 24
+DEFAULT_PROJECT_TTL_DAYS = 30
+
+DEFAULT_MAX_RESULTS = 200
+DEFAULT_MAX_PROJECTS = 500
+
+# Keys per SELECT ... IN (...) query, below SQLite's host parameter limit
+QUERY_CHUNK_SIZE = 500
+
+def make_search_key(search_polygon: BaseGeometry,
+                    start_date: Optional[date],
+                    end_date: Optional[date],
+                    retrieve_metadata: bool,
+                    precision: int = DEFAULT_PRECISION) -> str:
+    """
+    Cache key for one search.
+
+    Args:
+        search_polygon: Search polygon in lon/lat
+        start_date: Start of the date window
+        end_date: End of the date window
+        retrieve_metadata: Whether EPT metadata was requested
+        precision: Decimal places the polygon coordinates are rounded to
+    """
+    polygon = shapely.set_precision(search_polygon, 10 ** -precision).normalize()
+    window = f"{start_date.isoformat() if start_date else '-'}/{end_date.isoformat() if end_date else '-'}"
+    return f"{shapely.to_wkt(polygon, rounding_precision=precision)}|{window}|{int(bool(retrieve_metadata))}"
+
+def _encode_file(laz_file: Dict[str, Any]) -> Dict[str, Any]:
+    last_modified = laz_file.get('last_modified')
+    if isinstance(last_modified, datetime):
+        return {**laz_file, 'last_modified': last_modified.isoformat()}
+    return laz_file
+
+def _decode_file(laz_file: Dict[str, Any]) -> Dict[str, Any]:
+    last_modified = laz_file.get('last_modified')
+    if isinstance(last_modified, str):
+        try:
+            laz_file['last_modified'] = datetime.fromisoformat(last_modified)
+        except ValueError:
+            pass
+    return laz_file
+
+class SearchCache:
+    """On-disk cache of AWS search results and per-project tile-to-LAZ matches"""
+
+    def __init__(self,
+                 db_path: str = DEFAULT_CACHE_PATH,
+                 result_ttl_hours: Optional[float] = DEFAULT_RESULT_TTL_HOURS,
+                 project_ttl_days: Optional[float] = DEFAULT_PROJECT_TTL_DAYS,
+                 max_results: int = DEFAULT_MAX_RESULTS,
+                 max_projects: int = DEFAULT_MAX_PROJECTS):
+        """
+        Open (or create) the cache.
+
+        Args:
+            db_path: Path to the SQLite cache file
+            result_ttl_hours: Age after which search results are recomputed (None to never expire)
+            project_ttl_days: Age after which project listings are refetched (None to never expire)
+            max_results: Maximum number of cached search results before LRU eviction
+            max_projects: Maximum number of cached projects before LRU eviction
+        """
+        self.db_path = db_path
+        self.result_ttl_seconds = result_ttl_hours * 3600 if result_ttl_hours is not None else None
+        self.project_ttl_seconds = project_ttl_days * 86400 if project_ttl_days is not None else None
+        self.max_results = max_results
+        self.max_projects = max_projects
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+        CREATE TABLE IF NOT EXISTS search_results (
+            key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS projects (
+            project TEXT PRIMARY KEY,
+            files TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tile_files (
+            project TEXT NOT NULL,
+            tile_id TEXT NOT NULL,
+            files TEXT NOT NULL,
+            PRIMARY KEY (project, tile_id)
+        ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+        self.evict()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _expired(self, created_at: float, ttl_seconds: Optional[float]) -> bool:
+        return ttl_seconds is not None and created_at < time.time() - ttl_seconds
+
+    def get_result(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached search result for a key from make_search_key(), or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT payload, created_at FROM search_results WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is not None and not self._expired(row[1], self.result_ttl_seconds):
+                self._conn.execute("UPDATE search_results SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+                self.hits += 1
+                return json.loads(row[0])
+        self.misses += 1
+        return None
+
+    def put_result(self, key: str, result: Dict[str, Any]):
+        """Store a finished (JSON-serializable) search result"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results (key, payload, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result, default=str), now, now)
+            )
+            self._conn.commit()
+        self.evict()
+
+    def _project_created_at(self, project: str) -> Optional[float]:
+        row = self._conn.execute("SELECT created_at FROM projects WHERE project = ?", (project,)).fetchone()
+        if row is None or self._expired(row[0], self.project_ttl_seconds):
+            return None
+        self._conn.execute("UPDATE projects SET last_access = ? WHERE project = ?", (time.time(), project))
+        return row[0]
+
+    def get_project_files(self, project: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached LAZ file listing of a project, or None"""
+        with self._lock:
+            if self._project_created_at(project) is None:
+                return None
+            row = self._conn.execute("SELECT files FROM projects WHERE project = ?", (project,)).fetchone()
+            self._conn.commit()
+        return [_decode_file(f) for f in json.loads(row[0])]
+
+    def put_project_files(self, project: str, laz_files: List[Dict[str, Any]]):
+        """Store a project's LAZ file listing (drops its previous tile matches)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM tile_files WHERE project = ?", (project,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO projects (project, files, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (project, json.dumps([_encode_file(f) for f in laz_files], default=str), now, now)
+            )
+            self._conn.commit()
+        self.evict()
+
+    def get_tile_files(self, project: str, tile_ids: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        LAZ files matched to tiles of a project.
+
+        Returns:
+            Dict of tile id to its LAZ files, for the tile ids that are cached
+        """
+        tile_ids = list(dict.fromkeys(tile_ids))
+        found = {}
+        with self._lock:
+            if self._project_created_at(project) is None:
+                return found
+            for start in range(0, len(tile_ids), QUERY_CHUNK_SIZE):
+                chunk = tile_ids[start:start + QUERY_CHUNK_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT tile_id, files FROM tile_files WHERE project = ? "
+                    f"AND tile_id IN ({','.join('?' * len(chunk))})", [project] + chunk
+                ).fetchall()
+                found.update(rows)
+            self._conn.commit()
+        return {tile_id: [_decode_file(f) for f in json.loads(files)] for tile_id, files in found.items()}
+
+    def put_tile_files(self, project: str, tile_files: Dict[str, List[Dict[str, Any]]]):
+        """Store the LAZ files matched to tiles of a project (the project listing must be cached)"""
+        if not tile_files:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tile_files (project, tile_id, files) VALUES (?, ?, ?)",
+                [(project, tile_id, json.dumps([_encode_file(f) for f in files], default=str))
+                 for tile_id, files in tile_files.items()]
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """Remove expired entries and trim both levels to their size limits (least recently used first)"""
+        now = time.time()
+        with self._lock:
+            removed = 0
+            if self.result_ttl_seconds is not None:
+                removed += self._conn.execute("DELETE FROM search_results WHERE created_at < ?",
+                                              (now - self.result_ttl_seconds,)).rowcount
+            if self.project_ttl_seconds is not None:
+                removed += self._conn.execute("DELETE FROM projects WHERE created_at < ?",
+                                              (now - self.project_ttl_seconds,)).rowcount
+
+            removed += self._conn.execute("""
+            DELETE FROM search_results WHERE key NOT IN (
+                SELECT key FROM search_results ORDER BY last_access DESC LIMIT ?
+            )
+            """, (self.max_results,)).rowcount
+            removed += self._conn.execute("""
+            DELETE FROM projects WHERE project NOT IN (
+                SELECT project FROM projects ORDER BY last_access DESC LIMIT ?
+            )
+            """, (self.max_projects,)).rowcount
+            self._conn.execute("DELETE FROM tile_files WHERE project NOT IN (SELECT project FROM projects)")
+            self._conn.commit()
+
+        if removed:
+            logger.info(f"Evicted {removed} search cache entries")
+
+    def clear(self):
+        """Remove all cached searches and project listings"""
+        with self._lock:
+            self._conn.executescript("DELETE FROM search_results; DELETE FROM projects; DELETE FROM tile_files;")
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and cache size"""
+        with self._lock:
+            results = self._conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+            projects = self._conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'results': results,
+            'projects': projects
+        }
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+def get_search_cache() -> SearchCache:
+    """Return the shared search cache"""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+        return _search_cache
@@ -0,0 +1,400 @@
+"""
+Local DEM Terrain Engine
+
+Samples ground elevations from local GeoTIFF DEMs (USGS 3DEP 1/3 arc-second
+tiles or LiDAR-derived DTMs) instead of calling the Google Elevation API for
+every profile and site.
+
+- DEMs are opened once and read in small windows around the requested
+  points, so only the raster blocks along a path are touched
+- Elevations are bilinearly interpolated between pixel centres
+- DEMs in any CRS are supported; points are reprojected as needed
+- Points not covered by any DEM can fall back to the Google Elevation API,
+  through the persistent elevation cache
+
+DEMs are discovered in the directory named by the TERRAIN_DEM_DIR environment
+variable (default: <app>/dem), searched recursively for .tif/.tiff files.
+Files listed first (alphabetically) take priority where DEMs overlap.
+"""
+
+import os
+import glob
+import math
+import logging
+import threading
+import requests
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+
+from utilities.elevation_cache import get_elevation_cache
+
+try:
+    import rasterio
+    from rasterio.windows import Window
+    from rasterio.warp import transform as warp_transform, transform_bounds
+    RASTERIO_AVAILABLE = True
+except ImportError:
+    RASTERIO_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEM_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dem")
+
+GOOGLE_ELEVATION_URL = "https://maps.googleapis.com/maps/api/elevation/json"
+
+# Locations per Google Elevation request (the API allows 512, URLs get long before that)
+GOOGLE_BATCH_SIZE = 256
+
+# Profile sample count used when no local DEM covers the path
+DEFAULT_PROFILE_SAMPLES = 100
+
+# Points sampled per raster window read
+SAMPLE_CHUNK_SIZE = 4096
+
+# Windows spanning more pixels than this are split so far-apart points don't read the whole raster
+MAX_WINDOW_PIXELS = 1024
+
+METERS_PER_FOOT = 0.3048
+EARTH_RADIUS_M = 6371000
+
+class DEMSource:
+    """A single GeoTIFF DEM opened for windowed bilinear sampling"""
+
+    def __init__(self, path: str, z_units: Optional[str] = None):
+        """
+        Open a DEM.
+
+        Args:
+            path: Path to the GeoTIFF
+            z_units: Vertical units, 'm' or 'ft'. Defaults to feet for DEMs in a
+                foot-based projected CRS (typical of state plane LiDAR DTMs),
+                otherwise meters.
+        """
+        self.path = path
+        self.dataset = rasterio.open(path)
+        self.lock = threading.Lock()
+        self.transform = self.dataset.transform
+        self.inverse_transform = ~self.dataset.transform
+        self.nodata = self.dataset.nodata
+        self.crs = self.dataset.crs
+        self.is_geographic = self.crs is None or self.crs.is_geographic
+
+        if z_units is None:
+            linear_units = '' if self.is_geographic else (self.crs.linear_units or '').lower()
+            z_units = 'ft' if 'foot' in linear_units or 'feet' in linear_units else 'm'
+        self.z_scale = METERS_PER_FOOT if z_units == 'ft' else 1.0
+
+        # WGS84 bounds for quick coverage checks
+        if self.is_geographic:
+            self.bounds_wgs84 = tuple(self.dataset.bounds)
+        else:
+            self.bounds_wgs84 = transform_bounds(self.crs, 'EPSG:4326', *self.dataset.bounds)
+
+        # Approximate pixel size in meters
+        pixel_x, pixel_y = abs(self.transform.a), abs(self.transform.e)
+        if self.is_geographic:
+            center_lat = (self.bounds_wgs84[1] + self.bounds_wgs84[3]) / 2
+            meters_per_degree = math.pi * EARTH_RADIUS_M / 180
+            self.resolution_m = min(pixel_x * meters_per_degree * math.cos(math.radians(center_lat)),
+                                    pixel_y * meters_per_degree)
+        else:
+            self.resolution_m = min(pixel_x, pixel_y) * (self.crs.linear_units_factor[1] if self.crs else 1.0)
+
+    def close(self):
+        self.dataset.close()
+
+    def intersects(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """Mask of points inside this DEM's WGS84 bounding box"""
+        min_lon, min_lat, max_lon, max_lat = self.bounds_wgs84
+        return (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat)
+
+    def sample(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        """
+        Bilinearly interpolate elevations at WGS84 points.
+
+        Args:
+            lats: Latitudes
+            lons: Longitudes
+
+        Returns:
+            Elevations in meters, NaN outside the DEM or next to nodata pixels
+        """
+        if self.is_geographic:
+            xs, ys = lons, lats
+        else:
+            xs, ys = warp_transform('EPSG:4326', self.crs, lons, lats)
+            xs, ys = np.asarray(xs), np.asarray(ys)
+
+        # Fractional pixel coordinates relative to pixel centres
+        cols, rows = self.inverse_transform * (xs, ys)
+        cols = np.asarray(cols, dtype=float) - 0.5
+        rows = np.asarray(rows, dtype=float) - 0.5
+
+        height, width = self.dataset.height, self.dataset.width
+        result = np.full(len(lats), np.nan)
+        inside = (cols >= -0.5) & (cols <= width - 0.5) & (rows >= -0.5) & (rows <= height - 0.5)
+
+        for start in range(0, len(lats), SAMPLE_CHUNK_SIZE):
+            chunk = np.flatnonzero(inside[start:start + SAMPLE_CHUNK_SIZE]) + start
+            if len(chunk) == 0:
+                continue
+            result[chunk] = self._sample_points(rows[chunk], cols[chunk])
+
+        return result * self.z_scale
+
+    def _sample_points(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Sample points, splitting them until each window stays small"""
+        span = max(rows.max() - rows.min(), cols.max() - cols.min())
+        if span > MAX_WINDOW_PIXELS and len(rows) > 1:
+            mid = len(rows) // 2
+            return np.concatenate([self._sample_points(rows[:mid], cols[:mid]),
+                                   self._sample_points(rows[mid:], cols[mid:])])
+        return self._sample_window(rows, cols)
+
+    def _sample_window(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Read the window covering the given pixel coordinates and interpolate"""
+        height, width = self.dataset.height, self.dataset.width
+        row_off = max(int(math.floor(rows.min())), 0)
+        col_off = max(int(math.floor(cols.min())), 0)
+        row_end = min(int(math.floor(rows.max())) + 2, height)
+        col_end = min(int(math.floor(cols.max())) + 2, width)
+
+        with self.lock:
+            data = self.dataset.read(1, window=Window(col_off, row_off, col_end - col_off, row_end - row_off),
+                                     out_dtype='float64')
+        if self.nodata is not None:
+            data[data == self.nodata] = np.nan
+
+        # Clamp to the window so edge half-pixels use the nearest pixel row/column
+        r = np.clip(rows - row_off, 0, data.shape[0] - 1)
+        c = np.clip(cols - col_off, 0, data.shape[1] - 1)
+        r0 = np.minimum(np.floor(r).astype(int), max(data.shape[0] - 2, 0))
+        c0 = np.minimum(np.floor(c).astype(int), max(data.shape[1] - 2, 0))
+        r1 = np.minimum(r0 + 1, data.shape[0] - 1)
+        c1 = np.minimum(c0 + 1, data.shape[1] - 1)
+        dr = r - r0
+        dc = c - c0
+
+        top = data[r0, c0] * (1 - dc) + data[r0, c1] * dc
+        bottom = data[r1, c0] * (1 - dc) + data[r1, c1] * dc
+        return top * (1 - dr) + bottom * dr
+
+class TerrainEngine:
+    """Elevation sampling from a prioritized set of local DEMs"""
+
+    def __init__(self, dem_paths: Optional[Sequence[str]] = None, dem_dir: Optional[str] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            dem_paths: Explicit list of GeoTIFF paths, highest priority first
+            dem_dir: Directory searched recursively for .tif/.tiff files
+        """
+        self.sources: List[DEMSource] = []
+
+        if not RASTERIO_AVAILABLE:
+            logger.warning("rasterio not available, local DEM terrain engine disabled")
+            return
+
+        paths = list(dem_paths or [])
+        if dem_dir and os.path.isdir(dem_dir):
+            for pattern in ('*.tif', '*.tiff'):
+                paths.extend(sorted(glob.glob(os.path.join(dem_dir, '**', pattern), recursive=True)))
+
+        for path in paths:
+            self.add_dem(path)
+
+        if self.sources:
+            logger.info(f"Terrain engine loaded {len(self.sources)} DEMs")
+
+    def add_dem(self, path: str, z_units: Optional[str] = None) -> bool:
+        """
+        Add a DEM with lower priority than the ones already loaded.
+
+        Args:
+            path: Path to the GeoTIFF
+            z_units: Vertical units, 'm' or 'ft' (see DEMSource)
+
+        Returns:
+            bool: True if the DEM was opened
+        """
+        if not RASTERIO_AVAILABLE:
+            return False
+        try:
+            self.sources.append(DEMSource(path, z_units))
+            return True
+        except Exception as e:
+            logger.error(f"Error opening DEM {path}: {e}")
+            return False
+
+    def close(self):
+        for source in self.sources:
+            source.close()
+        self.sources = []
+
+    @property
+    def resolution_m(self) -> Optional[float]:
+        """Finest DEM resolution in meters, or None without DEMs"""
+        return min((source.resolution_m for source in self.sources), default=None)
+
+    def sample_elevations(self, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+        """
+        Sample elevations at WGS84 points from the local DEMs.
+
+        Args:
+            lats: Latitudes
+            lons: Longitudes
+
+        Returns:
+            Elevations in meters, NaN where no DEM has data
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        elevations = np.full(len(lats), np.nan)
+
+        for source in self.sources:
+            missing = np.isnan(elevations)
+            if not missing.any():
+                break
+            candidates = np.flatnonzero(missing & source.intersects(lats, lons))
+            if len(candidates) == 0:
+                continue
+            try:
+                elevations[candidates] = source.sample(lats[candidates], lons[candidates])
+            except Exception as e:
+                logger.error(f"Error sampling DEM {source.path}: {e}")
+
+        return elevations
+
+    def profile_sample_count(self, start_coords: Tuple[float, float], end_coords: Tuple[float, float]) -> int:
+        """
+        Number of profile samples for a path.
+
+        One sample per pixel of the finest DEM covering both ends of the path,
+        or the legacy 100 samples when the path is not covered locally.
+        Profiles are not capped, so clearances see every DEM pixel; callers
+        that draw them decimate as needed.
+        """
+        lats = np.array([start_coords[0], end_coords[0]], dtype=float)
+        lons = np.array([start_coords[1], end_coords[1]], dtype=float)
+        resolutions = [source.resolution_m for source in self.sources if source.intersects(lats, lons).all()]
+        if not resolutions:
+            return DEFAULT_PROFILE_SAMPLES
+
+        samples = int(math.ceil(haversine_distance_m(start_coords, end_coords) / min(resolutions))) + 1
+        return max(DEFAULT_PROFILE_SAMPLES, samples)
+
+    def get_profile(self,
+                    start_coords: Tuple[float, float],
+                    end_coords: Tuple[float, float],
+                    samples: Optional[int] = None,
+                    spacing_m: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sample a straight terrain profile between two points.
+
+        Args:
+            start_coords: (lat, lon) of the start point
+            end_coords: (lat, lon) of the end point
+            samples: Number of samples (overrides spacing_m)
+            spacing_m: Sample spacing in meters
+
+        Returns:
+            Tuple of (distances_m, lats, lons, elevations_m) arrays
+        """
+        distance_m = haversine_distance_m(start_coords, end_coords)
+        if samples is None:
+            if spacing_m:
+                samples = int(math.ceil(distance_m / spacing_m)) + 1
+            else:
+                samples = self.profile_sample_count(start_coords, end_coords)
+        samples = max(int(samples), 2)
+
+        # Linear interpolation in lat/lon, matching ElevationProfile._interpolate
+        fractions = np.linspace(0, 1, samples)
+        lats = start_coords[0] + (end_coords[0] - start_coords[0]) * fractions
+        lons = start_coords[1] + (end_coords[1] - start_coords[1]) * fractions
+        return fractions * distance_m, lats, lons, self.sample_elevations(lats, lons)
+
+def haversine_distance_m(coord1: Tuple[float, float], coord2: Tuple[float, float]) -> float:
+    """Great circle distance in meters between two (lat, lon) points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (coord1[0], coord1[1], coord2[0], coord2[1]))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def fetch_google_elevations(lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """
+    Fetch elevations from the Google Elevation API in batches.
+
+    Args:
+        lats: Latitudes
+        lons: Longitudes
+
+    Returns:
+        Elevations in meters, NaN for points that could not be fetched
+    """
+    elevations = np.full(len(lats), np.nan)
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+    if not api_key:
+        logger.error("Google Maps API key not found in environment variables")
+        return elevations
+
+    for start in range(0, len(lats), GOOGLE_BATCH_SIZE):
+        batch_lats = lats[start:start + GOOGLE_BATCH_SIZE]
+        batch_lons = lons[start:start + GOOGLE_BATCH_SIZE]
+        try:
+            response = requests.get(GOOGLE_ELEVATION_URL, params={
+                "locations": "|".join(f"{lat},{lon}" for lat, lon in zip(batch_lats, batch_lons)),
+                "key": api_key
+            }, timeout=30)
+            data = response.json()
+            if data.get("status") != "OK" or "results" not in data:
+                logger.error(f"Google Elevation API returned error: {data.get('status')}")
+                continue
+            for offset, result in enumerate(data["results"][:len(batch_lats)]):
+                elevations[start + offset] = result["elevation"]
+        except Exception as e:
+            logger.error(f"Error fetching elevations from Google: {e}")
+
+    return elevations
+
+_terrain_engine = None
+_terrain_engine_lock = threading.Lock()
+
+def get_terrain_engine() -> TerrainEngine:
+    """Return the shared terrain engine for the DEMs in TERRAIN_DEM_DIR"""
+    global _terrain_engine
+    with _terrain_engine_lock:
+        if _terrain_engine is None:
+            _terrain_engine = TerrainEngine(dem_dir=os.getenv("TERRAIN_DEM_DIR") or DEFAULT_DEM_DIR)
+        return _terrain_engine
+
+def get_elevations(lats: Sequence[float], lons: Sequence[float], use_fallback: bool = True) -> np.ndarray:
+    """
+    Elevations for WGS84 points from local DEMs, with the Google API as fallback.
+
+    Google samples go through the persistent elevation cache, so only points
+    never fetched before cause network requests.
+
+    Args:
+        lats: Latitudes
+        lons: Longitudes
+        use_fallback: Fetch points without local DEM coverage from Google
+
+    Returns:
+        Elevations in meters, NaN where no source had data
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    elevations = get_terrain_engine().sample_elevations(lats, lons)
+
+    missing = np.flatnonzero(np.isnan(elevations))
+    if use_fallback and len(missing):
+        logger.info(f"{len(missing)} of {len(lats)} points not covered by local DEMs, using cached Google elevations")
+        cache = get_elevation_cache()
+        elevations[missing] = cache.get_or_fetch(lats[missing], lons[missing], fetch_google_elevations)
+        # The in-memory counters only; cache.stats() counts the whole table
+        lookups = cache.hits + cache.misses
+        logger.info(f"Elevation cache: {cache.hits} hits, {cache.misses} misses "
+                    f"({cache.hits / lookups if lookups else 0.0:.0%} hit rate)")
+
+    return elevations
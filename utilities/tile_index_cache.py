@@ -0,0 +1,229 @@
+"""
+Persistent Tile Index Cache
+
+On-disk cache of parsed USGS project tile indexes, so a new session does not
+download and re-parse every project's shapefile/GeoJSON/GeoPackage index.
+
+Each parsed index is stored as a FlatGeobuf file in EPSG:4326. FlatGeobuf
+carries a packed R-tree, so a bbox read only touches the tiles around the
+search area instead of loading the whole index. A SQLite manifest records,
+per project, the S3 key and ETag the file was built from, the index bounds
+and when it was last checked. Entries older than the revalidation interval
+are checked with a conditional HEAD (If-None-Match on the ETag) and rebuilt
+only when the object changed. Projects without a tile index are recorded too,
+so they are not re-listed on every search.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+import geopandas as gpd
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 "cache", "tile_indexes")
+
+MANIFEST_NAME = "tile_indexes.db"
+
+# Tile indexes rarely change; check the ETag at most once a week
+DEFAULT_REVALIDATE_HOURS = 24 * 7
+
+TILE_INDEX_CRS = "EPSG:4326"
+
+def _file_name(project_name: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', project_name) + ".fgb"
+
+def _bounds_intersect(a: Sequence[float], b: Sequence[float]) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+class TileIndexCache:
+    """FlatGeobuf tile indexes with a SQLite manifest keyed by S3 key and ETag"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR,
+                 revalidate_hours: Optional[float] = DEFAULT_REVALIDATE_HOURS):
+        """
+        Open (or create) the cache.
+
+        Args:
+            cache_dir: Directory for the FlatGeobuf files and the manifest
+            revalidate_hours: Age after which an entry is checked against S3 (None to never check)
+        """
+        self.cache_dir = cache_dir
+        self.revalidate_seconds = revalidate_hours * 3600 if revalidate_hours is not None else None
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, MANIFEST_NAME), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS tile_indexes (
+            project TEXT PRIMARY KEY,
+            s3_key TEXT,
+            etag TEXT,
+            file_name TEXT,
+            feature_count INTEGER,
+            min_x REAL, min_y REAL, max_x REAL, max_y REAL,
+            validated_at REAL NOT NULL
+        )
+        """)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, project_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Manifest entry for a project.
+
+        Returns:
+            Entry dict (s3_key/file_name are None for projects without a tile
+            index), or None if the project has never been cached
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM tile_indexes WHERE project = ?", (project_name,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        if entry['file_name'] and not os.path.exists(self.path_for(entry)):
+            return None
+        return entry
+
+    def path_for(self, entry: Dict[str, Any]) -> str:
+        return os.path.join(self.cache_dir, entry['file_name'])
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """Whether an entry was validated recently enough to use without asking S3"""
+        if self.revalidate_seconds is None:
+            return True
+        return entry['validated_at'] >= time.time() - self.revalidate_seconds
+
+    def validate(self, s3_client, entry: Dict[str, Any], bucket: str) -> bool:
+        """
+        Check a cached index against S3 with a conditional HEAD.
+
+        Args:
+            s3_client: boto3 S3 client
+            entry: Manifest entry with an s3_key and etag
+            bucket: Bucket the tile index lives in
+
+        Returns:
+            bool: True if the object is unchanged (the entry is marked validated)
+        """
+        try:
+            s3_client.head_object(Bucket=bucket, Key=entry['s3_key'], IfNoneMatch=entry['etag'],
+                                  RequestPayer='requester')
+            logger.info(f"Tile index {entry['s3_key']} changed since it was cached")
+            return False
+        except ClientError as e:
+            status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            if status != 304 and e.response.get('Error', {}).get('Code') != '304':
+                logger.info(f"Cached tile index {entry['s3_key']} is no longer valid: {str(e)}")
+                return False
+        self.touch(entry['project'])
+        return True
+
+    def touch(self, project_name: str):
+        """Mark an entry as just validated"""
+        with self._lock:
+            self._conn.execute("UPDATE tile_indexes SET validated_at = ? WHERE project = ?",
+                               (time.time(), project_name))
+            self._conn.commit()
+
+    def store(self, project_name: str, s3_key: str, etag: Optional[str], gdf: gpd.GeoDataFrame) -> Dict[str, Any]:
+        """
+        Write a parsed tile index to the cache.
+
+        Args:
+            project_name: Name of the project
+            s3_key: S3 key the index was parsed from
+            etag: ETag of that object
+            gdf: Parsed tile index
+
+        Returns:
+            Dict[str, Any]: The new manifest entry
+        """
+        gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+        if gdf.crs is None:
+            gdf = gdf.set_crs(TILE_INDEX_CRS)
+        elif not gdf.crs.equals(TILE_INDEX_CRS):
+            gdf = gdf.to_crs(TILE_INDEX_CRS)
+
+        file_name = _file_name(project_name)
+        path = os.path.join(self.cache_dir, file_name)
+        # FlatGeobuf needs the .fgb suffix (other names become a directory)
+        temp_path = path[:-len(".fgb")] + ".tmp.fgb"
+        gdf.to_file(temp_path, driver="FlatGeobuf", engine="pyogrio")
+        os.replace(temp_path, path)
+
+        min_x, min_y, max_x, max_y = (float(v) for v in gdf.total_bounds)
+        self._put(project_name, s3_key, etag, file_name, len(gdf), (min_x, min_y, max_x, max_y))
+        logger.info(f"Cached tile index for project {project_name} ({len(gdf)} tiles) in {path}")
+        return self.lookup(project_name)
+
+    def store_missing(self, project_name: str):
+        """Record that a project has no usable tile index"""
+        self._put(project_name, None, None, None, 0, (None, None, None, None))
+
+    def _put(self, project_name, s3_key, etag, file_name, feature_count, bounds):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tile_indexes (project, s3_key, etag, file_name, feature_count, "
+                "min_x, min_y, max_x, max_y, validated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (project_name, s3_key, etag, file_name, feature_count, *bounds, time.time())
+            )
+            self._conn.commit()
+
+    def read(self, entry: Dict[str, Any], bbox: Optional[Sequence[float]] = None) -> Optional[gpd.GeoDataFrame]:
+        """
+        Read a cached tile index.
+
+        Args:
+            entry: Manifest entry from lookup()
+            bbox: (minx, miny, maxx, maxy) in EPSG:4326 to read only the tiles
+                  intersecting it (None reads the whole index)
+
+        Returns:
+            Optional[gpd.GeoDataFrame]: Tiles, or None if the project has no index
+        """
+        if not entry or not entry['file_name']:
+            return None
+        path = self.path_for(entry)
+        if bbox is not None:
+            if entry['min_x'] is None or not _bounds_intersect(
+                    bbox, (entry['min_x'], entry['min_y'], entry['max_x'], entry['max_y'])):
+                # Outside the index: skip opening the file
+                return gpd.GeoDataFrame(geometry=[], crs=TILE_INDEX_CRS)
+            return gpd.read_file(path, bbox=tuple(bbox), engine="pyogrio")
+        return gpd.read_file(path, engine="pyogrio")
+
+    def clear(self):
+        """Remove all cached tile indexes"""
+        with self._lock:
+            rows = self._conn.execute("SELECT file_name FROM tile_indexes WHERE file_name IS NOT NULL").fetchall()
+            self._conn.execute("DELETE FROM tile_indexes")
+            self._conn.commit()
+        for row in rows:
+            try:
+                os.remove(os.path.join(self.cache_dir, row['file_name']))
+            except OSError:
+                pass
+
+_tile_index_cache = None
+_tile_index_cache_lock = threading.Lock()
+
+def get_tile_index_cache() -> TileIndexCache:
+    """Return the shared tile index cache"""
+    global _tile_index_cache
+    with _tile_index_cache_lock:
+        if _tile_index_cache is None:
+            _tile_index_cache = TileIndexCache()
+        return _tile_index_cache
@@ -5,10 +5,12 @@ and use it to get precise tile boundaries for LIDAR files.
 """
 
 import os
+import shutil
 import logging
 import tempfile
 import json
 import boto3
+from botocore.exceptions import BotoCoreError, ClientError
 import geopandas as gpd
 import pandas as pd
 from shapely.geometry import box, Polygon, mapping, Point
@@ -18,6 +20,10 @@ import re
 import concurrent.futures
 import time
 
+from utilities.tile_index_cache import get_tile_index_cache
+from utilities.project_footprints import get_project_footprint_index, tile_index_footprint
+from utilities.search_cache import get_search_cache
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -30,6 +36,9 @@ SPATIAL_INDEX_CACHE = {}
 # Cache for project metadata
 PROJECT_METADATA_CACHE = {}
 
+# Files a shapefile tile index needs besides the .shp
+SHAPEFILE_SIDECARS = ['.shx', '.dbf', '.prj']
+
 def initialize_s3_client():
     """Initialize the S3 client with credentials from environment variables."""
     try:
@@ -75,7 +84,10 @@ def find_tile_index_files(s3_client, project_name: str) -> List[Dict[str, Any]]:
         project_name: Name of the project
 
     Returns:
-        List[Dict[str, Any]]: List of tile index file information
+        List[Dict[str, Any]]: List of tile index file information (empty if the project has none)
+
+    Raises:
+        Exception: If listing the bucket fails, so a failed listing is not mistaken for an empty one
     """
     try:
         logger.info(f"Finding tile index files for project: {project_name}")
@@ -117,12 +129,14 @@ def find_tile_index_files(s3_client, project_name: str) -> List[Dict[str, Any]]:
                                 tile_index_files.append({
                                     'key': key,
                                     'size': item.get('Size'),
-                                    'last_modified': item.get('LastModified')
+                                    'last_modified': item.get('LastModified'),
+                                    'etag': item.get('ETag')
                                 })
                                 logger.info(f"Found tile index file: {key}")
 
             except Exception as e:
                 logger.warning(f"Error listing objects with prefix {prefix}: {str(e)}")
+                raise
 
         # If no tile index files found with keywords, include any files with the right extensions
         if not tile_index_files:
@@ -145,19 +159,21 @@ def find_tile_index_files(s3_client, project_name: str) -> List[Dict[str, Any]]:
                             tile_index_files.append({
                                 'key': key,
                                 'size': item.get('Size'),
-                                'last_modified': item.get('LastModified')
+                                'last_modified': item.get('LastModified'),
+                                'etag': item.get('ETag')
                             })
                             logger.info(f"Found potential tile index file: {key}")
 
                 except Exception as e:
                     logger.warning(f"Error listing objects with prefix {prefix}: {str(e)}")
+                    raise
 
         logger.info(f"Found {len(tile_index_files)} tile index files for project {project_name}")
         return tile_index_files
 
     except Exception as e:
         logger.error(f"Error finding tile index files: {str(e)}", exc_info=True)
-        return []
+        raise
 
 def download_and_parse_tile_index(s3_client, tile_index_file: Dict[str, Any]) -> Optional[gpd.GeoDataFrame]:
     """
@@ -168,149 +184,210 @@ def download_and_parse_tile_index(s3_client, tile_index_file: Dict[str, Any]) ->
         tile_index_file: Tile index file information
 
     Returns:
-        Optional[gpd.GeoDataFrame]: GeoDataFrame containing tile index data
+        Optional[gpd.GeoDataFrame]: GeoDataFrame containing tile index data, or None if it can't be parsed
+
+    Raises:
+        ClientError, BotoCoreError: If the download fails
     """
+    temp_dir = tempfile.mkdtemp(prefix='tile_index_')
     try:
         key = tile_index_file.get('key')
         logger.info(f"Downloading and parsing tile index file: {key}")
 
-        # Create a temporary file to store the tile index
-        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(key)[1], delete=False) as temp_file:
-            # Download the tile index file
-            s3_client.download_file(
-                Bucket='usgs-lidar-public',
-                Key=key,
-                Filename=temp_file.name,
-                ExtraArgs={'RequestPayer': 'requester'}
-            )
+        # Download the tile index file into a temporary directory, where
+        # shapefile sidecars can sit next to the .shp
+        local_path = os.path.join(temp_dir, os.path.basename(key))
+        s3_client.download_file(
+            Bucket='usgs-lidar-public',
+            Key=key,
+            Filename=local_path,
+            ExtraArgs={'RequestPayer': 'requester'}
+        )
 
-            # Parse the tile index file based on its extension
-            ext = os.path.splitext(key)[1].lower()
+        # Parse the tile index file based on its extension
+        ext = os.path.splitext(key)[1].lower()
 
-            if ext == '.shp':
-                # Parse shapefile
-                gdf = gpd.read_file(temp_file.name)
-                logger.info(f"Parsed shapefile with {len(gdf)} features")
+        if ext == '.shp':
+            # The .shp alone has no attributes or CRS; fetch the sidecar files
+            for sidecar_ext in SHAPEFILE_SIDECARS:
+                sidecar_key = os.path.splitext(key)[0] + sidecar_ext
+                try:
+                    s3_client.download_file(
+                        Bucket='usgs-lidar-public',
+                        Key=sidecar_key,
+                        Filename=os.path.splitext(local_path)[0] + sidecar_ext,
+                        ExtraArgs={'RequestPayer': 'requester'}
+                    )
+                except Exception as e:
+                    logger.debug(f"No {sidecar_ext} for shapefile {key}: {str(e)}")
 
-                # Check if the shapefile has a valid geometry column
-                if 'geometry' not in gdf.columns or gdf.geometry.isna().all():
-                    logger.warning(f"Shapefile {key} has no valid geometry column")
-                    return None
+            # Parse shapefile
+            gdf = gpd.read_file(local_path)
+            logger.info(f"Parsed shapefile with {len(gdf)} features")
 
-                # Log the columns for debugging
-                logger.info(f"Shapefile columns: {list(gdf.columns)}")
+            # Check if the shapefile has a valid geometry column
+            if 'geometry' not in gdf.columns or gdf.geometry.isna().all():
+                logger.warning(f"Shapefile {key} has no valid geometry column")
+                return None
 
-                return gdf
+            # Log the columns for debugging
+            logger.info(f"Shapefile columns: {list(gdf.columns)}")
 
-            elif ext in ['.geojson', '.json']:
-                # Parse GeoJSON
-                try:
-                    gdf = gpd.read_file(temp_file.name)
-                    logger.info(f"Parsed GeoJSON with {len(gdf)} features")
+            return gdf
 
-                    # Check if the GeoJSON has a valid geometry column
-                    if 'geometry' not in gdf.columns or gdf.geometry.isna().all():
-                        logger.warning(f"GeoJSON {key} has no valid geometry column")
-                        return None
-
-                    # Log the columns for debugging
-                    logger.info(f"GeoJSON columns: {list(gdf.columns)}")
+        elif ext in ['.geojson', '.json']:
+            # Parse GeoJSON
+            try:
+                gdf = gpd.read_file(local_path)
+                logger.info(f"Parsed GeoJSON with {len(gdf)} features")
 
-                    return gdf
-                except Exception as e:
-                    logger.warning(f"Error parsing GeoJSON {key}: {str(e)}")
-
-                    # Try parsing as regular JSON
-                    try:
-                        with open(temp_file.name, 'r') as f:
-                            data = json.load(f)
-
-                        # Check if the JSON has a features array
-                        if 'features' in data:
-                            # Convert to GeoDataFrame
-                            gdf = gpd.GeoDataFrame.from_features(data['features'])
-                            logger.info(f"Parsed JSON with {len(gdf)} features")
-
-                            # Check if the GeoDataFrame has a valid geometry column
-                            if 'geometry' not in gdf.columns or gdf.geometry.isna().all():
-                                logger.warning(f"JSON {key} has no valid geometry column")
-                                return None
-
-                            # Log the columns for debugging
-                            logger.info(f"JSON columns: {list(gdf.columns)}")
-
-                            return gdf
-                    except Exception as e2:
-                        logger.warning(f"Error parsing JSON {key}: {str(e2)}")
-                        return None
-
-            elif ext == '.gpkg':
-                # Parse GeoPackage
-                gdf = gpd.read_file(temp_file.name)
-                logger.info(f"Parsed GeoPackage with {len(gdf)} features")
-
-                # Check if the GeoPackage has a valid geometry column
+                # Check if the GeoJSON has a valid geometry column
                 if 'geometry' not in gdf.columns or gdf.geometry.isna().all():
-                    logger.warning(f"GeoPackage {key} has no valid geometry column")
+                    logger.warning(f"GeoJSON {key} has no valid geometry column")
                     return None
 
                 # Log the columns for debugging
-                logger.info(f"GeoPackage columns: {list(gdf.columns)}")
+                logger.info(f"GeoJSON columns: {list(gdf.columns)}")
 
                 return gdf
+            except Exception as e:
+                logger.warning(f"Error parsing GeoJSON {key}: {str(e)}")
 
-            else:
-                logger.warning(f"Unsupported file format: {ext}")
+                # Try parsing as regular JSON
+                try:
+                    with open(local_path, 'r') as f:
+                        data = json.load(f)
+
+                    # Check if the JSON has a features array
+                    if 'features' in data:
+                        # Convert to GeoDataFrame
+                        gdf = gpd.GeoDataFrame.from_features(data['features'])
+                        logger.info(f"Parsed JSON with {len(gdf)} features")
+
+                        # Check if the GeoDataFrame has a valid geometry column
+                        if 'geometry' not in gdf.columns or gdf.geometry.isna().all():
+                            logger.warning(f"JSON {key} has no valid geometry column")
+                            return None
+
+                        # Log the columns for debugging
+                        logger.info(f"JSON columns: {list(gdf.columns)}")
+
+                        return gdf
+                except Exception as e2:
+                    logger.warning(f"Error parsing JSON {key}: {str(e2)}")
+                    return None
+
+        elif ext == '.gpkg':
+            # Parse GeoPackage
+            gdf = gpd.read_file(local_path)
+            logger.info(f"Parsed GeoPackage with {len(gdf)} features")
+
+            # Check if the GeoPackage has a valid geometry column
+            if 'geometry' not in gdf.columns or gdf.geometry.isna().all():
+                logger.warning(f"GeoPackage {key} has no valid geometry column")
                 return None
 
+            # Log the columns for debugging
+            logger.info(f"GeoPackage columns: {list(gdf.columns)}")
+
+            return gdf
+
+        else:
+            logger.warning(f"Unsupported file format: {ext}")
+            return None
+
+    except (ClientError, BotoCoreError) as e:
+        logger.error(f"Error downloading tile index file {tile_index_file.get('key')}: {str(e)}")
+        raise
     except Exception as e:
         logger.error(f"Error downloading and parsing tile index file: {str(e)}", exc_info=True)
         return None
     finally:
-        # Clean up temporary file
-        try:
-            os.unlink(temp_file.name)
-        except Exception as e:
-            logger.warning(f"Failed to delete temporary file: {str(e)}")
+        # Clean up temporary files
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-def get_tile_index_for_project(project_name: str) -> Optional[gpd.GeoDataFrame]:
+def get_cached_tile_index_entry(project_name: str, s3_client=None) -> Optional[Dict[str, Any]]:
     """
-    Get the tile index for a project.
+    Make sure a project's tile index is in the persistent tile index cache.
+
+    Recently validated entries are used as they are. Older ones are checked
+    with a conditional HEAD and only re-downloaded if the S3 object changed.
+    Without S3 access, whatever is cached is used. Only a listing that finds
+    no tile index files, or files none of which parse, is recorded as
+    missing; S3 errors leave the cache as it was.
 
     Args:
         project_name: Name of the project
+        s3_client: Initialized boto3 S3 client (optional)
 
     Returns:
-        Optional[gpd.GeoDataFrame]: GeoDataFrame containing tile index data
+        Optional[Dict[str, Any]]: Cache entry, or None if the project has no tile index
     """
-    try:
-        # Check if the tile index is already in the cache
-        if project_name in TILE_INDEX_CACHE:
-            logger.info(f"Using cached tile index for project {project_name}")
-            return TILE_INDEX_CACHE[project_name]
+    cache = get_tile_index_cache()
+    entry = cache.lookup(project_name)
+    if entry is not None and cache.is_fresh(entry):
+        return entry if entry['file_name'] else None
 
-        # Initialize S3 client
+    # Initialize S3 client if not provided
+    if s3_client is None:
         s3_client = initialize_s3_client()
-        if not s3_client:
+        if s3_client is None:
             logger.error("Failed to initialize S3 client")
-            return None
+            return entry if entry is not None and entry['file_name'] else None
+
+    if entry is not None and entry['s3_key'] and cache.validate(s3_client, entry, 'usgs-lidar-public'):
+        logger.info(f"Cached tile index for project {project_name} is up to date")
+        return entry
 
+    try:
         # Find tile index files
         tile_index_files = find_tile_index_files(s3_client, project_name)
         if not tile_index_files:
             logger.warning(f"No tile index files found for project {project_name}")
+            cache.store_missing(project_name)
             return None
 
         # Try to download and parse each tile index file
         for tile_index_file in tile_index_files:
             gdf = download_and_parse_tile_index(s3_client, tile_index_file)
             if gdf is not None:
-                # Cache the tile index
-                TILE_INDEX_CACHE[project_name] = gdf
-                return gdf
+                return cache.store(project_name, tile_index_file['key'], tile_index_file.get('etag'), gdf)
+    except Exception as e:
+        # Don't record the project as missing over a transient error; retry on the next search
+        logger.warning(f"Could not fetch the tile index for project {project_name}: {str(e)}")
+        return entry if entry is not None and entry['file_name'] else None
 
-        logger.warning(f"Failed to parse any tile index files for project {project_name}")
-        return None
+    logger.warning(f"Failed to parse any tile index files for project {project_name}")
+    cache.store_missing(project_name)
+    return None
+
+def get_tile_index_for_project(project_name: str, bbox: Optional[Tuple[float, float, float, float]] = None) -> Optional[gpd.GeoDataFrame]:
+    """
+    Get the tile index for a project.
+
+    Args:
+        project_name: Name of the project
+        bbox: (minX, minY, maxX, maxY) in WGS84 to read only the tiles intersecting it (optional)
+
+    Returns:
+        Optional[gpd.GeoDataFrame]: GeoDataFrame containing tile index data
+    """
+    try:
+        # Check if the tile index is already in the cache
+        if project_name in TILE_INDEX_CACHE:
+            logger.info(f"Using cached tile index for project {project_name}")
+            gdf = TILE_INDEX_CACHE[project_name]
+            return gdf if bbox is None else gdf.iloc[list(gdf.sindex.intersection(bbox))]
+
+        entry = get_cached_tile_index_entry(project_name)
+        if entry is None:
+            return None
+
+        gdf = get_tile_index_cache().read(entry, bbox)
+        if bbox is None:
+            # Only whole indexes are kept in memory
+            TILE_INDEX_CACHE[project_name] = gdf
+        return gdf
 
     except Exception as e:
         logger.error(f"Error getting tile index for project {project_name}: {str(e)}", exc_info=True)
@@ -585,95 +662,6 @@ def get_project_bounding_box(tile_index: gpd.GeoDataFrame) -> Optional[Dict[str,
         logger.error(f"Error getting project bounding box: {str(e)}", exc_info=True)
         return None
 
-def get_colorado_projects() -> List[str]:
-    """
-    Get a list of known Colorado LIDAR projects.
-
-    Returns:
-        List[str]: List of Colorado project names
-    """
-    # List of known Colorado LIDAR projects
-    colorado_projects = [
-        'USGS_LPC_CO_SoPlatteRiver_Lot1_2013_LAS_2015',
-        'USGS_LPC_CO_SoPlatteRiver_Lot2_2013_LAS_2015',
-        'USGS_LPC_CO_SoPlatteRiver_Lot3_2013_LAS_2015',
-        'USGS_LPC_CO_SoPlatteRiver_Lot4_2013_LAS_2015',
-        'USGS_LPC_CO_SoPlatteRiver_Lot5_2013_LAS_2015',
-        'USGS_LPC_CO_SoPlatteRiver_Lot6_2013_LAS_2015',
-        'USGS_LPC_CO_SoPlatteRiver_Lot7_2013_LAS_2015',
-        'USGS_LPC_CO_SoPlatteRiver_Lot8_2013_LAS_2015',
-        'USGS_LPC_CO_SanLuis_2011',
-        'USGS_LPC_CO_GrandMesa_2016_LAS_2017',
-        'USGS_LPC_CO_WesternCO_2016_LAS_2017',
-        'USGS_LPC_CO_NorthernCO_2013_LAS_2015',
-        'USGS_LPC_CO_CentralCO_2013_LAS_2015',
-        'USGS_LPC_CO_SouthernCO_2013_LAS_2015',
-        'USGS_LPC_CO_EasternCO_2013_LAS_2015',
-        'USGS_LPC_CO_FrontRange_2013_LAS_2015',
-        'USGS_LPC_CO_Denver_2013_LAS_2015',
-        'USGS_LPC_CO_PuebloCounty_2014_LAS_2016',
-        'USGS_LPC_CO_ElPasoCounty_2014_LAS_2016',
-        'CO_Eastern_Plains_2018',
-        'CO_Montezuma_County_2018',
-        'CO_Routt_County_2018',
-        'CO_Weld_County_2018',
-        'CO_Mesa_County_2018',
-        'CO_Larimer_County_2018',
-        'CO_Huerfano_County_2018',
-        'CO_Fremont_County_2018',
-        'CO_Custer_County_2018',
-        'CO_Chaffee_County_2018',
-        'CO_Alamosa_County_2018',
-        'CO_Pueblo_County_2018',
-        'CO_Otero_County_2018',
-        'CO_Las_Animas_County_2018',
-        'CO_Crowley_County_2018',
-        'CO_Bent_County_2018',
-        'CO_Baca_County_2018',
-        'CO_Prowers_County_2018',
-        'CO_Kiowa_County_2018',
-        'CO_Costilla_County_2018',
-        'CO_Conejos_County_2018',
-        'CO_Rio_Grande_County_2018',
-        'CO_Mineral_County_2018',
-        'CO_Saguache_County_2018',
-        'CO_Gunnison_County_2018',
-        'CO_Hinsdale_County_2018',
-        'CO_San_Juan_County_2018',
-        'CO_Dolores_County_2018',
-        'CO_San_Miguel_County_2018',
-        'CO_Ouray_County_2018',
-        'CO_Montrose_County_2018',
-        'CO_Delta_County_2018',
-        'CO_Garfield_County_2018',
-        'CO_Eagle_County_2018',
-        'CO_Pitkin_County_2018',
-        'CO_Summit_County_2018',
-        'CO_Grand_County_2018',
-        'CO_Jackson_County_2018',
-        'CO_Moffat_County_2018',
-        'CO_Rio_Blanco_County_2018',
-        'CO_Boulder_County_2018',
-        'CO_Jefferson_County_2018',
-        'CO_Denver_County_2018',
-        'CO_Arapahoe_County_2018',
-        'CO_Adams_County_2018',
-        'CO_Douglas_County_2018',
-        'CO_Elbert_County_2018',
-        'CO_Lincoln_County_2018',
-        'CO_Kit_Carson_County_2018',
-        'CO_Cheyenne_County_2018',
-        'CO_Yuma_County_2018',
-        'CO_Washington_County_2018',
-        'CO_Morgan_County_2018',
-        'CO_Logan_County_2018',
-        'CO_Sedgwick_County_2018',
-        'CO_Phillips_County_2018'
-    ]
-
-    logger.info(f"Using {len(colorado_projects)} known Colorado LIDAR projects")
-    return colorado_projects
-
 def list_all_projects(s3_client=None) -> List[str]:
     """
     List all available LIDAR projects in the USGS AWS S3 bucket.
@@ -744,12 +732,16 @@ def list_all_projects(s3_client=None) -> List[str]:
         logger.error(f"Error listing all projects: {str(e)}", exc_info=True)
         return []
 
-def build_spatial_index_for_project(project_name: str) -> Optional[gpd.GeoDataFrame]:
+def build_spatial_index_for_project(project_name: str, bbox: Optional[Tuple[float, float, float, float]] = None) -> Optional[gpd.GeoDataFrame]:
     """
     Build a spatial index for a project.
 
+    With a bbox only the tiles intersecting it are read from the on-disk
+    tile index cache, so searches don't load whole national-scale indexes.
+
     Args:
         project_name: Name of the project
+        bbox: (minX, minY, maxX, maxY) in WGS84 of the search area (optional)
 
     Returns:
         Optional[gpd.GeoDataFrame]: GeoDataFrame with spatial index
@@ -761,13 +753,13 @@ def build_spatial_index_for_project(project_name: str) -> Optional[gpd.GeoDataFr
             return SPATIAL_INDEX_CACHE[project_name]
 
         # Get the tile index for the project
-        tile_index = get_tile_index_for_project(project_name)
+        tile_index = get_tile_index_for_project(project_name, bbox)
         if tile_index is None:
             logger.warning(f"No tile index found for project {project_name}")
             return None
 
         # Make sure the tile index has a valid geometry column
-        if 'geometry' not in tile_index.columns or tile_index.geometry.isna().all():
+        if 'geometry' not in tile_index.columns or (len(tile_index) and tile_index.geometry.isna().all()):
             logger.warning(f"Tile index for project {project_name} has no valid geometry column")
             return None
 
@@ -775,8 +767,9 @@ def build_spatial_index_for_project(project_name: str) -> Optional[gpd.GeoDataFr
         logger.info(f"Building spatial index for project {project_name}")
         tile_index.sindex  # This builds the spatial index
 
-        # Cache the spatial index
-        SPATIAL_INDEX_CACHE[project_name] = tile_index
+        # Cache the spatial index (bbox reads are partial and not cached)
+        if bbox is None:
+            SPATIAL_INDEX_CACHE[project_name] = tile_index
 
         return tile_index
 
@@ -790,7 +783,8 @@ def find_tiles_intersecting_polygon(search_polygon: Polygon, projects: List[str]
 
     Args:
         search_polygon: Shapely Polygon defining the search area
-        projects: List of project names to search (optional, searches all projects if None)
+        projects: List of project names to search (optional, searches every project whose
+                  footprint covers the polygon if None)
 
     Returns:
         Dict[str, List[Dict[str, Any]]]: Dictionary of project names to lists of tile information
@@ -809,22 +803,17 @@ def find_tiles_intersecting_polygon(search_polygon: Polygon, projects: List[str]
             logger.error("Failed to initialize S3 client")
             return {}
 
-        # Get all projects if not provided
+        # Choose the projects whose footprint covers the search area
+        footprint_index = get_project_footprint_index(s3_client)
         if projects is None:
-            projects = list_all_projects(s3_client)
-            logger.info(f"Found {len(projects)} total projects in AWS S3 bucket")
+            projects = footprint_index.query(search_polygon)
+            # Projects near the search area without a footprint: fetch their EPT bounds first
+            if footprint_index.fetch_ept_footprints(s3_client, projects):
+                projects = footprint_index.candidates(search_polygon, projects)
+            logger.info(f"{len(projects)} of {len(footprint_index)} projects cover the search polygon")
         else:
-            logger.info(f"Using {len(projects)} provided projects for search")
-
-        # For debugging, log the first few projects
-        if projects:
-            logger.info(f"First few projects: {projects[:5]}")
-
-        # Limit the number of projects for testing
-        max_projects = 20  # Increased from 10 to 20 for better coverage
-        if len(projects) > max_projects:
-            logger.info(f"Limiting to {max_projects} projects for testing")
-            projects = projects[:max_projects]
+            projects = footprint_index.candidates(search_polygon, projects)
+            logger.info(f"Using {len(projects)} provided projects that may cover the search polygon")
 
         # Find tiles in each project
         results = {}
@@ -832,8 +821,16 @@ def find_tiles_intersecting_polygon(search_polygon: Polygon, projects: List[str]
         for project in projects:
             logger.info(f"Searching project {project} for tiles intersecting with polygon")
 
-            # Build spatial index for the project
-            tile_index = build_spatial_index_for_project(project)
+            # Build spatial index for the tiles of the project around the search area
+            tile_index = build_spatial_index_for_project(project, search_polygon.bounds)
+
+            # The search cached the tile index of a project without a footprint; learn its footprint
+            if project in footprint_index.unresolved:
+                try:
+                    footprint_index.resolve(project, tile_index_footprint(project))
+                except Exception as e:
+                    logger.warning(f"Could not derive a footprint for project {project}: {str(e)}")
+
             if tile_index is None:
                 logger.warning(f"No spatial index available for project {project}")
                 continue
@@ -887,10 +884,80 @@ def find_tiles_intersecting_polygon(search_polygon: Polygon, projects: List[str]
         logger.error(f"Error finding tiles intersecting with polygon: {str(e)}", exc_info=True)
         return {}
 
+def list_laz_files_for_project(project_name: str, s3_client) -> List[Dict[str, Any]]:
+    """
+    List the LAZ/LAS files of a project in the AWS S3 bucket.
+
+    Args:
+        project_name: Name of the project
+        s3_client: Initialized boto3 S3 client
+
+    Returns:
+        List[Dict[str, Any]]: LAZ file information (key, size, last_modified, project)
+    """
+    # Possible locations for LAZ files
+    prefixes = [
+        f"Projects/{project_name}/laz/",
+        f"Projects/{project_name}/las/",
+        f"Projects/{project_name}/las/tiled/",
+        f"Projects/{project_name}/pointcloud/",
+        f"Projects/{project_name}/data/",
+        f"Projects/{project_name}/"
+    ]
+
+    # Find all LAZ files in the project (the prefixes overlap)
+    all_laz_files = []
+    seen_keys = set()
+
+    for prefix in prefixes:
+        logger.info(f"Searching for LAZ files in {prefix}")
+
+        continuation_token = None
+        while True:
+            # Parameters for list_objects_v2
+            params = {
+                'Bucket': 'usgs-lidar-public',
+                'Prefix': prefix,
+                'RequestPayer': 'requester',
+                'MaxKeys': 1000  # Maximum allowed by S3 API
+            }
+
+            # Add continuation token if we have one
+            if continuation_token:
+                params['ContinuationToken'] = continuation_token
+
+            # Make the request
+            response = s3_client.list_objects_v2(**params)
+
+            # Process the files
+            for item in response.get('Contents', []):
+                key = item.get('Key')
+                if key and (key.endswith('.laz') or key.endswith('.las')) and key not in seen_keys:
+                    seen_keys.add(key)
+                    all_laz_files.append({
+                        'key': key,
+                        'size': item.get('Size'),
+                        'last_modified': item.get('LastModified'),
+                        'project': project_name
+                    })
+
+            # Check if there are more results
+            if response.get('IsTruncated'):
+                continuation_token = response.get('NextContinuationToken')
+            else:
+                break
+
+    logger.info(f"Found {len(all_laz_files)} LAZ files in project {project_name}")
+    return all_laz_files
+
 def find_laz_files_for_tiles(project_name: str, tiles: List[Dict[str, Any]], s3_client=None) -> List[Dict[str, Any]]:
     """
     Find LAZ files for tiles in a project.
 
+    Tile matches and the project's LAZ listing come from the search cache
+    when available, so only tiles never seen before need the listing and
+    only an uncached project is listed on S3.
+
     Args:
         project_name: Name of the project
         tiles: List of tile information
@@ -902,66 +969,38 @@ def find_laz_files_for_tiles(project_name: str, tiles: List[Dict[str, Any]], s3_
     try:
         logger.info(f"Finding LAZ files for {len(tiles)} tiles in project {project_name}")
 
-        # Initialize S3 client if not provided
-        if s3_client is None:
-            s3_client = initialize_s3_client()
-            if s3_client is None:
-                logger.error("Failed to initialize S3 client")
-                return []
-
-        # Possible locations for LAZ files
-        prefixes = [
-            f"Projects/{project_name}/laz/",
-            f"Projects/{project_name}/las/",
-            f"Projects/{project_name}/las/tiled/",
-            f"Projects/{project_name}/pointcloud/",
-            f"Projects/{project_name}/data/",
-            f"Projects/{project_name}/"
-        ]
-
-        # Find all LAZ files in the project
-        all_laz_files = []
-
-        for prefix in prefixes:
-            logger.info(f"Searching for LAZ files in {prefix}")
-
-            continuation_token = None
-            while True:
-                # Parameters for list_objects_v2
-                params = {
-                    'Bucket': 'usgs-lidar-public',
-                    'Prefix': prefix,
-                    'RequestPayer': 'requester',
-                    'MaxKeys': 1000  # Maximum allowed by S3 API
-                }
+        search_cache = get_search_cache()
+        tile_ids = [tile['file_id'] for tile in tiles if tile.get('file_id')]
+        tile_files = search_cache.get_tile_files(project_name, tile_ids)
+        new_tile_ids = [tile_id for tile_id in dict.fromkeys(tile_ids) if tile_id not in tile_files]
+
+        if new_tile_ids:
+            all_laz_files = search_cache.get_project_files(project_name)
+            if all_laz_files is None:
+                # Initialize S3 client if not provided
+                if s3_client is None:
+                    s3_client = initialize_s3_client()
+                    if s3_client is None:
+                        logger.error("Failed to initialize S3 client")
+                        return []
+                all_laz_files = list_laz_files_for_project(project_name, s3_client)
+                search_cache.put_project_files(project_name, all_laz_files)
+            else:
+                logger.info(f"Using {len(all_laz_files)} cached LAZ files for project {project_name}")
 
-                # Add continuation token if we have one
-                if continuation_token:
-                    params['ContinuationToken'] = continuation_token
+            # Match LAZ files to the new tile IDs
+            new_tile_files = {}
+            for tile_id in new_tile_ids:
+                new_tile_files[tile_id] = [
+                    laz_file for laz_file in all_laz_files
+                    if tile_id in os.path.basename(laz_file['key']) or os.path.basename(laz_file['key']) in tile_id
+                ]
+            search_cache.put_tile_files(project_name, new_tile_files)
+            tile_files.update(new_tile_files)
 
-                # Make the request
-                response = s3_client.list_objects_v2(**params)
+        logger.info(f"{len(tile_ids) - len(new_tile_ids)} of {len(tile_ids)} tiles matched from the search cache")
 
-                # Process the files
-                for item in response.get('Contents', []):
-                    key = item.get('Key')
-                    if key and (key.endswith('.laz') or key.endswith('.las')):
-                        all_laz_files.append({
-                            'key': key,
-                            'size': item.get('Size'),
-                            'last_modified': item.get('LastModified'),
-                            'project': project_name
-                        })
-
-                # Check if there are more results
-                if response.get('IsTruncated'):
-                    continuation_token = response.get('NextContinuationToken')
-                else:
-                    break
-
-        logger.info(f"Found {len(all_laz_files)} LAZ files in project {project_name}")
-
-        # Match LAZ files to tiles
+        # Add tile information to the matched LAZ files
         matched_files = []
 
         for tile in tiles:
@@ -969,19 +1008,13 @@ def find_laz_files_for_tiles(project_name: str, tiles: List[Dict[str, Any]], s3_
             if not file_id:
                 continue
 
-            # Find LAZ files that match the tile ID
-            for laz_file in all_laz_files:
-                key = laz_file.get('key')
-                filename = os.path.basename(key)
-
-                # Check if the filename contains the tile ID
-                if file_id in filename or filename in file_id:
-                    # Add tile information to the LAZ file
-                    laz_file['boundingBox'] = tile.get('boundingBox')
-                    laz_file['polygon_points'] = tile.get('polygon_points')
-                    laz_file['metadata_source'] = 'tile_index'
-
-                    matched_files.append(laz_file)
+            for laz_file in tile_files.get(file_id, []):
+                matched_files.append({
+                    **laz_file,
+                    'boundingBox': tile.get('boundingBox'),
+                    'polygon_points': tile.get('polygon_points'),
+                    'metadata_source': 'tile_index'
+                })
 
         logger.info(f"Matched {len(matched_files)} LAZ files to tiles in project {project_name}")
         return matched_files
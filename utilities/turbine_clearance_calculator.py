@@ -16,7 +16,8 @@ Key Features:
 import math
 import logging
 import json
-from typing import Dict, List, Tuple, Optional, Union
+import numpy as np
+from typing import Dict, List, Tuple, Optional, Union, Sequence
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
@@ -150,6 +151,24 @@ class ClearanceResult:
             'path_side': self.path_side
         }
 
+# Structured array layout returned by the batch API (one field per ClearanceResult attribute)
+CLEARANCE_DTYPE = np.dtype(
+    [('turbine_id', object)] +
+    [(name, np.float64) for name in (
+        'distance_to_path_m', 'distance_to_path_ft', 'distance_along_path_m', 'distance_along_path_ft',
+        'ground_elevation_ft', 'turbine_center_height_ft', 'path_height_straight_ft', 'path_height_curved_ft',
+        'earth_curvature_bulge_ft', 'fresnel_radius_ft',
+        'clearance_straight_ft', 'clearance_curved_ft', 'clearance_fresnel_ft',
+        'clearance_3d_straight_ft', 'clearance_3d_curved_ft', 'clearance_3d_fresnel_ft'
+    )] +
+    [('has_los_clearance', bool), ('has_earth_clearance', bool), ('has_fresnel_clearance', bool),
+     ('path_side', np.int8)]
+)
+
+def clearance_results_from_array(results: np.ndarray) -> List[ClearanceResult]:
+    """Convert a CLEARANCE_DTYPE structured array into ClearanceResult objects"""
+    return [ClearanceResult(*row) for row in results.tolist()]
+
 class TurbineClearanceCalculator:
     """
     Unified calculator for all turbine clearance calculations.
@@ -188,27 +207,256 @@ class TurbineClearanceCalculator:
         Returns:
             List of clearance results for each turbine
         """
+        # Skip turbines with unusable coordinates or heights one by one, so they don't fail the batch
+        valid_turbines, values = [], []
+        for turbine in turbines:
+            try:
+                turbine_values = (
+                    float(turbine.latitude),
+                    float(turbine.longitude),
+                    float(turbine.total_height_m),
+                    float(turbine.rotor_diameter_m) if turbine.rotor_diameter_m is not None else np.nan,
+                    float(turbine.hub_height_m) if turbine.hub_height_m is not None else np.nan
+                )
+            except (TypeError, ValueError) as e:
+                self.logger.error(f"Error calculating clearance for turbine {turbine.id}: {e}")
+                continue
+            if not np.all(np.isfinite(turbine_values[:3])):
+                self.logger.error(f"Error calculating clearance for turbine {turbine.id}: invalid turbine data")
+                continue
+            valid_turbines.append(turbine)
+            values.append(turbine_values)
+        
+        if not valid_turbines:
+            return []
+        
+        latitudes, longitudes, total_heights_m, rotor_diameters_m, hub_heights_m = zip(*values)
+        clearances = self.calculate_clearances_batch(
+            latitudes=latitudes,
+            longitudes=longitudes,
+            total_heights_m=total_heights_m,
+            rotor_diameters_m=rotor_diameters_m,
+            path=path,
+            hub_heights_m=hub_heights_m,
+            turbine_ids=[t.id for t in valid_turbines],
+            elevation_data=elevation_data,
+            elevation_distances=elevation_distances
+        )
+        
         results = []
+        for turbine, result in zip(valid_turbines, clearance_results_from_array(clearances)):
+            if not np.isfinite(result.clearance_3d_fresnel_ft):
+                self.logger.error(f"Error calculating clearance for turbine {turbine.id}: invalid turbine data")
+                continue
+            results.append(result)
+            self.logger.debug(f"Calculated clearances for turbine {turbine.id}: Fresnel={result.clearance_fresnel_ft:.1f}ft")
         
-        # Calculate total path distance
+        return results
+    
+    def calculate_clearances_batch(self,
+                                   latitudes: Sequence[float],
+                                   longitudes: Sequence[float],
+                                   total_heights_m: Sequence[float],
+                                   rotor_diameters_m: Sequence[float],
+                                   path: PathData,
+                                   hub_heights_m: Optional[Sequence[float]] = None,
+                                   turbine_ids: Optional[Sequence[str]] = None,
+                                   elevation_data: Optional[List[float]] = None,
+                                   elevation_distances: Optional[List[float]] = None,
+                                   as_dataframe: bool = False):
+        """
+        Calculate clearances for many turbines against one path in a single vectorized pass.
+        
+        Uses the same formulas as _calculate_single_turbine_clearance, applied to
+        NumPy arrays. NaN rotor diameters default to 100 m and NaN hub heights
+        default to total height minus rotor radius, matching TurbineData.
+        
+        Args:
+            latitudes: Turbine latitudes in decimal degrees
+            longitudes: Turbine longitudes in decimal degrees
+            total_heights_m: Turbine total (tip) heights in meters
+            rotor_diameters_m: Rotor diameters in meters (NaN for unknown)
+            path: Path data including start/end coordinates and heights
+            hub_heights_m: Optional hub heights in meters (NaN for unknown)
+            turbine_ids: Optional turbine identifiers (defaults to array index)
+            elevation_data: Optional elevation profile data
+            elevation_distances: Optional distances corresponding to elevation data
+            as_dataframe: Return a pandas DataFrame instead of a structured array
+            
+        Returns:
+            Structured array with CLEARANCE_DTYPE (or DataFrame), one row per turbine
+        """
+        lat_t = np.asarray(latitudes, dtype=float)
+        lon_t = np.asarray(longitudes, dtype=float)
+        n = lat_t.size
+        
+        # Turbine geometry in feet
+        total_height_ft = np.asarray(total_heights_m, dtype=float) * 3.28084
+        rotor_diameter_m = np.asarray(rotor_diameters_m, dtype=float)
+        rotor_radius_ft = np.where(np.isnan(rotor_diameter_m), 100.0, rotor_diameter_m) * 3.28084 / 2
+        if hub_heights_m is None:
+            hub_height_m = np.full(n, np.nan)
+        else:
+            hub_height_m = np.asarray(hub_heights_m, dtype=float)
+        hub_height_ft = np.where(np.isnan(hub_height_m), total_height_ft - rotor_radius_ft, hub_height_m * 3.28084)
+        
+        # Total path distance
         path_length_m = self._haversine_distance(
             path.start_lat, path.start_lon,
             path.end_lat, path.end_lon
         )
         
-        self.logger.info(f"Calculating clearances for {len(turbines)} turbines along {path_length_m/1000:.2f}km path")
+        self.logger.info(f"Calculating clearances for {n} turbines along {path_length_m/1000:.2f}km path")
+        
+        # 1. Distance from turbines to path
+        distance_to_path_m, distance_along_path_m, path_side = self._calculate_distances_to_path_batch(
+            lat_t, lon_t, path, path_length_m
+        )
+        
+        # 2. Distance along path ratio, clamped to [0, 1]
+        if path_length_m > 0:
+            distance_ratio = np.clip(distance_along_path_m / path_length_m, 0, 1)
+        else:
+            distance_ratio = np.zeros(n)
+        
+        # 3. Ground elevation at turbine positions
+        if elevation_data is None or len(elevation_data) == 0:
+            ground_elevation_ft = np.zeros(n)
+        else:
+            elevations = np.asarray(elevation_data, dtype=float)
+            ground_elevation_ft = np.interp(distance_ratio * (len(elevations) - 1),
+                                            np.arange(len(elevations)), elevations)
+        
+        # 4. Straight-line path height
+        path_height_straight_ft = path.start_total_height_ft + (
+            path.end_total_height_ft - path.start_total_height_ft
+        ) * distance_ratio
+        
+        # 5. Earth curvature bulge (4/3 earth radius model)
+        distance_along_path_ft = distance_along_path_m * 3.28084
+        path_length_ft = path_length_m * 3.28084
+        if path_length_ft > 0:
+            earth_curvature_bulge_ft = (distance_along_path_ft * (path_length_ft - distance_along_path_ft)) / (
+                2 * self.K_FACTOR * self.EARTH_RADIUS_FT
+            )
+        else:
+            earth_curvature_bulge_ft = np.zeros(n)
+        
+        # 6. Curved path height
+        path_height_curved_ft = path_height_straight_ft - earth_curvature_bulge_ft
+        
+        # 7. First Fresnel zone radius
+        d1_km = distance_along_path_m / 1000
+        d2_km = (path_length_m - distance_along_path_m) / 1000
+        fresnel_valid = (d1_km > 0) & (d2_km > 0) & (path.frequency_ghz > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fresnel_radius_ft = np.where(
+                fresnel_valid,
+                17.32 * np.sqrt((d1_km * d2_km) / (path.frequency_ghz * (d1_km + d2_km))) * 3.28084,
+                0.0
+            )
+        
+        # 8. Turbine center height
+        turbine_center_height_ft = ground_elevation_ft + hub_height_ft
+        
+        # 9. Clearances
+        distance_to_path_ft = distance_to_path_m * 3.28084
+        
+        clearance_straight_ft = path_height_straight_ft - turbine_center_height_ft - rotor_radius_ft
+        clearance_curved_ft = path_height_curved_ft - turbine_center_height_ft - rotor_radius_ft
+        clearance_fresnel_ft = clearance_curved_ft - fresnel_radius_ft
+        
+        clearance_3d_straight_ft = np.hypot(
+            distance_to_path_ft, path_height_straight_ft - turbine_center_height_ft
+        ) - rotor_radius_ft
+        clearance_3d_curved_ft = np.hypot(
+            distance_to_path_ft, path_height_curved_ft - turbine_center_height_ft
+        ) - rotor_radius_ft
+        clearance_3d_fresnel_ft = clearance_3d_curved_ft - fresnel_radius_ft
+        
+        # 10. Assemble results
+        results = np.empty(n, dtype=CLEARANCE_DTYPE)
+        results['turbine_id'] = list(turbine_ids) if turbine_ids is not None else [str(i) for i in range(n)]
+        results['distance_to_path_m'] = distance_to_path_m
+        results['distance_to_path_ft'] = distance_to_path_ft
+        results['distance_along_path_m'] = distance_along_path_m
+        results['distance_along_path_ft'] = distance_along_path_ft
+        results['ground_elevation_ft'] = ground_elevation_ft
+        results['turbine_center_height_ft'] = turbine_center_height_ft
+        results['path_height_straight_ft'] = path_height_straight_ft
+        results['path_height_curved_ft'] = path_height_curved_ft
+        results['earth_curvature_bulge_ft'] = earth_curvature_bulge_ft
+        results['fresnel_radius_ft'] = fresnel_radius_ft
+        results['clearance_straight_ft'] = clearance_straight_ft
+        results['clearance_curved_ft'] = clearance_curved_ft
+        results['clearance_fresnel_ft'] = clearance_fresnel_ft
+        results['clearance_3d_straight_ft'] = clearance_3d_straight_ft
+        results['clearance_3d_curved_ft'] = clearance_3d_curved_ft
+        results['clearance_3d_fresnel_ft'] = clearance_3d_fresnel_ft
+        results['has_los_clearance'] = clearance_3d_straight_ft > 0
+        results['has_earth_clearance'] = clearance_3d_curved_ft > 0
+        results['has_fresnel_clearance'] = clearance_3d_fresnel_ft > 0
+        results['path_side'] = path_side
+        
+        if as_dataframe:
+            import pandas as pd
+            return pd.DataFrame(results)
         
-        for turbine in turbines:
-            try:
-                result = self._calculate_single_turbine_clearance(turbine, path, path_length_m, elevation_data, elevation_distances)
-                results.append(result)
-                self.logger.debug(f"Calculated clearances for turbine {turbine.id}: Fresnel={result.clearance_fresnel_ft:.1f}ft")
-            except Exception as e:
-                self.logger.error(f"Error calculating clearance for turbine {turbine.id}: {e}", exc_info=True)
-                continue
-                
         return results
     
+    def _calculate_distances_to_path_batch(self,
+                                           lat_t: np.ndarray, lon_t: np.ndarray,
+                                           path: PathData,
+                                           path_length_m: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized version of _calculate_distance_to_path for arrays of turbine positions.
+        
+        Returns:
+            Tuple of (distance_to_path_m, distance_along_path_m, path_side) arrays
+        """
+        lat1, lon1 = math.radians(path.start_lat), math.radians(path.start_lon)
+        lat2, lon2 = math.radians(path.end_lat), math.radians(path.end_lon)
+        lat_r, lon_r = np.radians(lat_t), np.radians(lon_t)
+        
+        # Unit-sphere Cartesian coordinates
+        start = np.array([math.cos(lat1) * math.cos(lon1), math.cos(lat1) * math.sin(lon1), math.sin(lat1)])
+        end = np.array([math.cos(lat2) * math.cos(lon2), math.cos(lat2) * math.sin(lon2), math.sin(lat2)])
+        points = np.column_stack([np.cos(lat_r) * np.cos(lon_r), np.cos(lat_r) * np.sin(lon_r), np.sin(lat_r)])
+        
+        path_vector = end - start
+        turbine_vectors = points - start
+        path_magnitude = math.sqrt(float(np.dot(path_vector, path_vector)))
+        
+        if path_magnitude == 0:
+            # Start and end are the same point
+            dlat = lat_r - lat1
+            dlon = lon_r - lon1
+            a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat_r) * np.sin(dlon / 2) ** 2
+            distance_to_path = self.EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+            zeros = np.zeros(lat_r.size)
+            return distance_to_path, zeros, zeros.astype(np.int8)
+        
+        # Projection along path, clamped to path bounds
+        projection_ratio = (turbine_vectors @ path_vector) / (path_magnitude * path_magnitude)
+        distance_along_path = np.clip(projection_ratio * path_length_m, 0, path_length_m)
+        
+        # Cross product gives side and perpendicular distance
+        cross_product = np.cross(path_vector, turbine_vectors)
+        perpendicular_distance = (np.linalg.norm(cross_product, axis=1) / path_magnitude) * self.EARTH_RADIUS_M
+        path_side = np.where(cross_product[:, 2] > 0, 1, -1).astype(np.int8)
+        
+        # Beyond either end the nearest point of the path is that end
+        beyond_start = projection_ratio < 0
+        beyond_end = projection_ratio > 1
+        if beyond_start.any() or beyond_end.any():
+            end_lat = np.where(beyond_start, lat1, lat2)
+            end_lon = np.where(beyond_start, lon1, lon2)
+            a = np.sin((lat_r - end_lat) / 2) ** 2 + np.cos(end_lat) * np.cos(lat_r) * np.sin((lon_r - end_lon) / 2) ** 2
+            end_distance = self.EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+            perpendicular_distance = np.where(beyond_start | beyond_end, end_distance, perpendicular_distance)
+        
+        return perpendicular_distance, distance_along_path, path_side
+    
     def _calculate_single_turbine_clearance(self, 
                                           turbine: TurbineData, 
                                           path: PathData,
@@ -332,6 +580,8 @@ class TurbineClearanceCalculator:
         """
         Calculate perpendicular distance from turbine to path using spherical coordinate geometry.
         
+        Turbines beyond either end of the path are measured to that end.
+        
         Returns:
             Tuple of (distance_to_path_m, distance_along_path_m, path_side)
             path_side: +1 for right side, -1 for left side when looking from start to end
@@ -390,6 +640,12 @@ class TurbineClearanceCalculator:
         # Calculate perpendicular distance
         perpendicular_distance = (cross_magnitude / path_magnitude) * self.EARTH_RADIUS_M
         
+        # Beyond either end the nearest point of the path is that end
+        if projection_ratio < 0:
+            perpendicular_distance = self._haversine_distance(turbine_lat, turbine_lon, start_lat, start_lon)
+        elif projection_ratio > 1:
+            perpendicular_distance = self._haversine_distance(turbine_lat, turbine_lon, end_lat, end_lon)
+        
         # Determine which side of path (using z-component of cross product)
         path_side = 1 if cross_product[2] > 0 else -1
         
@@ -26,6 +26,7 @@ from .turbine_clearance_calculator import (
     create_turbine_from_dict,
     create_path_from_tower_params
 )
+from .turbine_store import TurbineStore
 
 # Create logger
 logger = setup_logging(__name__)
@@ -52,6 +53,8 @@ class TurbineProcessor:
         self.turbine_db_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "turbine_db")
         self.geojson_dir = os.path.join(self.turbine_db_dir, "uswtdbGeoJSON")
         self.geojson_file = None  # Will be set when needed
+        self._geojson_dir_mtime = None  # Directory modification time of the last scan
+        self.turbine_store = TurbineStore(os.path.join(self.turbine_db_dir, "turbines.db"))
 
         # Find the most recent GeoJSON file
         self._find_latest_geojson_file()
@@ -72,13 +75,21 @@ class TurbineProcessor:
         self.file_list = file_list
 
     def _find_latest_geojson_file(self):
-        """Find the most recent GeoJSON file in the turbine database directory"""
+        """Find the most recent GeoJSON file in the turbine database directory
+
+        The directory is only scanned again once its modification time changes,
+        i.e. after a file was added, removed or renamed.
+        """
         try:
             # Check if the geojson directory exists
             if not os.path.exists(self.geojson_dir):
                 logger.warning(f"GeoJSON directory does not exist: {self.geojson_dir}")
                 return
 
+            dir_mtime = os.stat(self.geojson_dir).st_mtime_ns
+            if dir_mtime == self._geojson_dir_mtime and self.geojson_file:
+                return
+
             # Look for GeoJSON files
             geojson_files = []
             for filename in os.listdir(self.geojson_dir):
@@ -92,6 +103,7 @@ class TurbineProcessor:
                 # Sort by modification time and get the latest
                 geojson_files.sort(reverse=True)
                 self.geojson_file = geojson_files[0][1]
+                self._geojson_dir_mtime = dir_mtime
                 logger.info(f"Using GeoJSON file: {self.geojson_file}")
             else:
                 logger.warning("No GeoJSON files found in directory")
@@ -145,79 +157,33 @@ class TurbineProcessor:
             state_name: State abbreviation to filter by (e.g., 'CO')
 
         Returns:
-            list: List of turbine dictionaries
+            list: List of turbine dictionaries ([] without a GeoJSON file), or
+                None if the turbine store could not be queried
         """
-        # Make sure we have a GeoJSON file
-        if not self.geojson_file:
-            self._find_latest_geojson_file()
+        # Pick up any newer GeoJSON file dropped into the directory
+        self._find_latest_geojson_file()
 
         if not self.geojson_file or not os.path.exists(self.geojson_file):
             logger.warning("No GeoJSON file found in expected locations")
             # Do not attempt to download - just return empty list
             return []
 
-        # Load the GeoJSON file
+        # Query the indexed turbine store, rebuilding it if the GeoJSON file changed
         try:
-            logger.info(f"Loading turbines from {self.geojson_file}")
-            with open(self.geojson_file, 'r') as f:
-                geojson_data = json.load(f)
-
-            # Extract features
-            features = geojson_data.get('features', [])
-            logger.info(f"Loaded {len(features)} turbines from GeoJSON file")
-
-            # Convert to the format expected by the rest of the code
-            turbines = []
-            for feature in features:
-                # GeoJSON coordinates are [lon, lat]
-                coords = feature.get('geometry', {}).get('coordinates', [])
-                properties = feature.get('properties', {})
-
-                if coords and len(coords) >= 2:
-                    # Create a turbine dictionary with the expected fields
-                    turbine = {
-                        'case_id': properties.get('case_id'),
-                        'ylat': coords[1],  # Latitude
-                        'xlong': coords[0],  # Longitude
-                        't_state': properties.get('t_state'),
-                        'p_name': properties.get('p_name'),
-                        'p_year': properties.get('p_year'),
-                        't_manu': properties.get('t_manu'),
-                        't_model': properties.get('t_model'),
-                        't_cap': properties.get('t_cap'),
-                        't_hh': properties.get('t_hh'),
-                        't_rd': properties.get('t_rd'),
-                        't_rsa': properties.get('t_rsa'),
-                        't_ttlh': properties.get('t_ttlh')
-                    }
-                    turbines.append(turbine)
-
-            logger.info(f"Converted {len(turbines)} turbines to the expected format")
-
-            # Apply filters
-            filtered_turbines = turbines
-
-            # Filter by bounding box if provided
-            if min_lat is not None and max_lat is not None and min_lon is not None and max_lon is not None:
-                filtered_turbines = [
-                    t for t in filtered_turbines
-                    if min_lat <= t['ylat'] <= max_lat and min_lon <= t['xlong'] <= max_lon
-                ]
-                logger.info(f"Filtered to {len(filtered_turbines)} turbines in bounding box")
+            if self.turbine_store.ensure_current(self.geojson_file):
+                logger.info(f"Rebuilt turbine store from {self.geojson_file}")
 
-            # Filter by state if provided
-            if state_name:
-                filtered_turbines = [
-                    t for t in filtered_turbines
-                    if t['t_state'] == state_name
-                ]
-                logger.info(f"Filtered to {len(filtered_turbines)} turbines in state {state_name}")
-
-            return filtered_turbines
+            turbines = self.turbine_store.query(
+                min_lat=min_lat, max_lat=max_lat,
+                min_lon=min_lon, max_lon=max_lon,
+                state_name=state_name
+            )
+            logger.info(f"Found {len(turbines)} turbines in turbine store")
+            return turbines
 
         except Exception as e:
-            logger.error(f"Error loading turbines from GeoJSON file: {e}")
-            return []
+            logger.error(f"Error querying turbine store: {e}", exc_info=True)
+            return None
 
     def set_elevation_profile(self, elevation_profile):
         """Set the elevation profile for displaying turbines on the profile"""
@@ -456,8 +422,8 @@ class TurbineProcessor:
             elevation_distances = None
             if self.elevation_profile and hasattr(self.elevation_profile, 'elevation_data'):
                 elevation_data = self.elevation_profile.elevation_data
-                if hasattr(self.elevation_profile, 'distances'):
-                    elevation_distances = self.elevation_profile.distances
+                if hasattr(self.elevation_profile, 'elevation_distances'):
+                    elevation_distances = self.elevation_profile.elevation_distances
             
             # Calculate clearances
             results = self.clearance_calculator.calculate_turbine_clearances(
@@ -780,8 +746,76 @@ Coordinates: {lat:.6f}°, {lon:.6f}°"""
 
         return inside
 
+    def _query_state_turbines_online(self, state_name, state_boundary):
+        """Query the USWTDB online endpoints for all turbines in a state
+
+        Args:
+            state_name: State abbreviation (e.g., 'CO')
+            state_boundary: Dict with min_lat, max_lat, min_lon and max_lon of the state
+
+        Returns:
+            list: List of turbine dictionaries, or None if all endpoints failed
+        """
+        logger.info(f"Querying turbine data for state: {state_name}")
+
+        # Primary USWTDB API endpoint (updated 2025)
+        primary_url = "https://energy.usgs.gov/api/uswtdb/v1/turbines"
+        # Backup endpoint (updated 2025)
+        backup_url = "https://energy.usgs.gov/arcgis/rest/services/Hosted/uswtdbDyn/FeatureServer/0/query"
+
+        # Query parameters for entire state
+        params = {
+            "select": "*",
+            "and": (f"(ylat.gte.{state_boundary['min_lat']},"
+                   f"ylat.lte.{state_boundary['max_lat']},"
+                   f"xlong.gte.{state_boundary['min_lon']},"
+                   f"xlong.lte.{state_boundary['max_lon']})")
+        }
+
+        # Reduced timeout to 5 seconds
+        timeout = 5
+
+        # Try primary endpoint first
+        try:
+            logger.info(f"Querying turbines for {state_name} from primary endpoint with {timeout}s timeout")
+            response = requests.get(primary_url, params=params, timeout=timeout)
+            response.raise_for_status()
+            turbines = response.json()
+            logger.info(f"Primary endpoint response status: {response.status_code}")
+            # The bbox query also returns turbines from neighbouring states
+            return [t for t in turbines if t.get('t_state') in (None, state_name)]
+        except Exception as e:
+            logger.warning(f"Primary endpoint failed: {e}, trying backup endpoint")
+
+        # If primary endpoint failed, try the backup (ArcGIS REST API has different parameters)
+        try:
+            logger.info(f"Querying turbines for {state_name} from backup endpoint with {timeout}s timeout")
+            # ArcGIS REST API uses different parameters
+            arcgis_params = {
+                "where": f"t_state = '{state_name}'",
+                "outFields": "*",
+                "returnGeometry": "true",
+                "f": "json"
+            }
+            response = requests.get(backup_url, params=arcgis_params, timeout=timeout)
+            response.raise_for_status()
+            arcgis_response = response.json()
+
+            # Convert ArcGIS format to match the API format
+            if 'features' in arcgis_response:
+                turbines = [feature['attributes'] for feature in arcgis_response['features']]
+                logger.info(f"Backup endpoint response status: {response.status_code}, found {len(turbines)} turbines")
+                return turbines
+        except Exception as e:
+            logger.warning(f"Backup endpoint failed: {e}")
+
+        return None
+
     def find_state_turbines(self, state_name=None, site_a=None, site_b=None, obstruction_text=None):
         """Search for all wind turbines in the state containing the LOS path"""
+        # Loading the state boundaries is only worth it for state searches
+        from state_boundaries import find_state, get_state_bounds
+
         try:
             if not self.polygon_points and not state_name:
                 if self.root:
@@ -799,35 +833,12 @@ Coordinates: {lat:.6f}°, {lon:.6f}°"""
 
                 logger.info(f"Finding state for coordinates: {center_lat:.6f}, {center_lon:.6f}")
 
-                # State boundary definitions
-                state_bounds = {
-                    'WY': {'min_lat': 41.00, 'max_lat': 45.01, 'min_lon': -111.06, 'max_lon': -104.05},
-                    'CO': {'min_lat': 36.99, 'max_lat': 41.00, 'min_lon': -109.05, 'max_lon': -102.04},
-                    'NE': {'min_lat': 40.00, 'max_lat': 43.00, 'min_lon': -104.05, 'max_lon': -95.31},
-                    'SD': {'min_lat': 42.48, 'max_lat': 45.94, 'min_lon': -104.06, 'max_lon': -96.44},
-                    'MT': {'min_lat': 44.36, 'max_lat': 49.00, 'min_lon': -116.05, 'max_lon': -104.04},
-                    # Add more states as needed
-                }
-
-                # Find which state contains the center point
-                state_boundary = None
-                for state, bounds in state_bounds.items():
-                    if (bounds['min_lat'] <= center_lat <= bounds['max_lat'] and
-                        bounds['min_lon'] <= center_lon <= bounds['max_lon']):
-                        state_name = state
-                        state_boundary = bounds
-                        break
-            else:
-                # Use state name to get boundary
-                state_bounds = {
-                    'WY': {'min_lat': 41.00, 'max_lat': 45.01, 'min_lon': -111.06, 'max_lon': -104.05},
-                    'CO': {'min_lat': 36.99, 'max_lat': 41.00, 'min_lon': -109.05, 'max_lon': -102.04},
-                    'NE': {'min_lat': 40.00, 'max_lat': 43.00, 'min_lon': -104.05, 'max_lon': -95.31},
-                    'SD': {'min_lat': 42.48, 'max_lat': 45.94, 'min_lon': -104.06, 'max_lon': -96.44},
-                    'MT': {'min_lat': 44.36, 'max_lat': 49.00, 'min_lon': -116.05, 'max_lon': -104.04},
-                    # Add more states as needed
-                }
-                state_boundary = state_bounds.get(state_name)
+                # Look the point up in the local state boundary index
+                state_info = find_state(center_lat, center_lon)
+                if state_info:
+                    state_name = state_info['state_code']
+
+            state_boundary = get_state_bounds(state_name) if state_name else None
 
             if not state_name or not state_boundary:
                 if self.root:
@@ -835,82 +846,26 @@ Coordinates: {lat:.6f}°, {lon:.6f}°"""
                                          "Could not determine state for the given coordinates.")
                 return []
 
-            # Query turbine data for the state
-            logger.info(f"Querying turbine data for state: {state_name}")
-
-            # Primary USWTDB API endpoint (updated 2025)
-            primary_url = "https://energy.usgs.gov/api/uswtdb/v1/turbines"
-            # Backup endpoint (updated 2025)
-            backup_url = "https://energy.usgs.gov/arcgis/rest/services/Hosted/uswtdbDyn/FeatureServer/0/query"
-
-            # Query parameters for entire state
-            params = {
-                "select": "*",
-                "and": (f"(ylat.gte.{state_boundary['min_lat']},"
-                       f"ylat.lte.{state_boundary['max_lat']},"
-                       f"xlong.gte.{state_boundary['min_lon']},"
-                       f"xlong.lte.{state_boundary['max_lon']})")
-            }
-
-            # Reduced timeout to 5 seconds
-            timeout = 5
             turbines = None
 
-            # Try primary endpoint first
-            try:
-                logger.info(f"Querying turbines for {state_name} from primary endpoint with {timeout}s timeout")
-                response = requests.get(primary_url, params=params, timeout=timeout)
-                response.raise_for_status()
-                turbines = response.json()
-                logger.info(f"Primary endpoint response status: {response.status_code}")
-            except Exception as e:
-                logger.warning(f"Primary endpoint failed: {e}, trying backup endpoint")
-
-            # If primary endpoint failed, try the backup (ArcGIS REST API has different parameters)
-            if turbines is None:
-                try:
-                    logger.info(f"Querying turbines for {state_name} from backup endpoint with {timeout}s timeout")
-                    # ArcGIS REST API uses different parameters
-                    arcgis_params = {
-                        "where": f"t_state = '{state_name}'",
-                        "outFields": "*",
-                        "returnGeometry": "true",
-                        "f": "json"
-                    }
-                    response = requests.get(backup_url, params=arcgis_params, timeout=timeout)
-                    response.raise_for_status()
-                    arcgis_response = response.json()
-
-                    # Convert ArcGIS format to match the API format
-                    if 'features' in arcgis_response:
-                        turbines = [feature['attributes'] for feature in arcgis_response['features']]
-                        logger.info(f"Backup endpoint response status: {response.status_code}, found {len(turbines)} turbines")
-                except Exception as e:
-                    logger.warning(f"Backup endpoint failed: {e}, trying GeoJSON file fallback")
+            # Use the local turbine store first: works offline for every state
+            self._find_latest_geojson_file()
+            if self.geojson_file and os.path.exists(self.geojson_file):
+                logger.info(f"Querying local turbine store for state: {state_name}")
+                turbines = self._load_turbines_from_geojson(state_name=state_name)
 
-            # If both online endpoints failed, try the GeoJSON file fallback
+            # No GeoJSON file, or the store query failed
             if turbines is None:
-                try:
-                    logger.info("Trying GeoJSON file fallback")
-                    # Try to load turbines from the GeoJSON file
-                    turbines = self._load_turbines_from_geojson(state_name=state_name)
+                turbines = self._query_state_turbines_online(state_name, state_boundary)
 
-                    if turbines:
-                        logger.info(f"GeoJSON file fallback successful, found {len(turbines)} turbines for {state_name}")
-                    else:
-                        # Show a message to the user
-                        if obstruction_text:
-                            obstruction_text.config(state="normal")
-                            obstruction_text.delete("1.0", tk.END)
-                            obstruction_text.insert(tk.END, f"Turbine data service is currently unavailable.\n\nPlease check your internet connection or try again later.")
-                            obstruction_text.config(state="disabled")
-                        logger.warning("No turbines found in GeoJSON file and not attempting to download")
-                except Exception as e:
-                    logger.error(f"All endpoints and GeoJSON fallback failed. Error: {str(e)}")
-                    raise Exception("Failed to fetch turbine data. Please check your internet connection or try again later.")
-
-            # If we still don't have turbines, raise an error
             if turbines is None:
+                # Show a message to the user
+                if obstruction_text:
+                    obstruction_text.config(state="normal")
+                    obstruction_text.delete("1.0", tk.END)
+                    obstruction_text.insert(tk.END, f"Turbine data service is currently unavailable.\n\nPlease check your internet connection or try again later.")
+                    obstruction_text.config(state="disabled")
+                logger.warning("No local turbine database and all online endpoints failed")
                 raise Exception("Failed to fetch turbine data from all endpoints")
 
             logger.info(f"Found {len(turbines)} turbines in {state_name}")
@@ -0,0 +1,245 @@
+"""
+Persistent Turbine Store
+
+SQLite store of the USWTDB turbine database, built once from the GeoJSON file
+and rebuilt automatically when a different (newer) GeoJSON file is supplied.
+
+Bounding-box queries go through an R*Tree index and state queries through a
+t_state index, so a search only touches the matching rows instead of loading
+and converting the whole national dataset.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+from contextlib import closing
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when the table layout changes so existing stores are rebuilt
+STORE_VERSION = 1
+
+# USWTDB properties kept for each turbine (ylat/xlong come from the geometry)
+TURBINE_FIELDS = [
+    'case_id', 'ylat', 'xlong', 't_state', 'p_name', 'p_year', 't_manu',
+    't_model', 't_cap', 't_hh', 't_rd', 't_rsa', 't_ttlh'
+]
+
+RTREE_TABLE = 'turbines_rtree'
+
+class TurbineStore:
+    """SQLite turbine store with R*Tree bbox and t_state lookups"""
+
+    def __init__(self, db_path: str):
+        """
+        Initialize the store.
+
+        Args:
+            db_path: Path to the SQLite store file (created on first build)
+        """
+        self.db_path = db_path
+        # Metadata of the store file it was read from, see _read_metadata
+        self._metadata = {}
+        self._metadata_stamp = None
+
+    def _connect(self, db_path: Optional[str] = None) -> sqlite3.Connection:
+        conn = sqlite3.connect(db_path or self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _source_signature(self, geojson_file: str) -> Dict[str, str]:
+        """Identify a GeoJSON file by path, size and modification time"""
+        stat = os.stat(geojson_file)
+        return {
+            'version': str(STORE_VERSION),
+            'source_path': os.path.abspath(geojson_file),
+            'source_size': str(stat.st_size),
+            'source_mtime': str(stat.st_mtime)
+        }
+
+    def _read_metadata(self) -> Dict[str, str]:
+        """Store metadata, read again only when the store file changes (a rebuild replaces it)"""
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return {}
+        stamp = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if stamp != self._metadata_stamp:
+            try:
+                with closing(self._connect()) as conn:
+                    metadata = {row['key']: row['value'] for row in conn.execute("SELECT key, value FROM metadata")}
+            except sqlite3.Error:
+                return {}
+            self._metadata, self._metadata_stamp = metadata, stamp
+        return self._metadata
+
+    def is_current(self, geojson_file: str) -> bool:
+        """Check whether the store was built from this exact GeoJSON file"""
+        metadata = self._read_metadata()
+        return bool(metadata) and all(
+            metadata.get(key) == value for key, value in self._source_signature(geojson_file).items()
+        )
+
+    def has_rtree(self) -> bool:
+        """Check whether the store has an R*Tree index"""
+        metadata = self._read_metadata()
+        return metadata.get('rtree') == '1'
+
+    def ensure_current(self, geojson_file: str) -> bool:
+        """
+        Build or rebuild the store if it was not built from this GeoJSON file.
+
+        Args:
+            geojson_file: Path to the USWTDB GeoJSON file
+
+        Returns:
+            bool: True if the store was rebuilt
+        """
+        if self.is_current(geojson_file):
+            return False
+        self.build(geojson_file)
+        return True
+
+    def build(self, geojson_file: str) -> int:
+        """
+        Build the store from a GeoJSON file.
+
+        The store is written to a temporary file and moved into place, so
+        concurrent readers never see a half-built store.
+
+        Args:
+            geojson_file: Path to the USWTDB GeoJSON file
+
+        Returns:
+            int: Number of turbines stored
+        """
+        logger.info(f"Building turbine store {self.db_path} from {geojson_file}")
+        signature = self._source_signature(geojson_file)
+
+        with open(geojson_file, 'r') as f:
+            geojson_data = json.load(f)
+
+        rows = []
+        for feature in geojson_data.get('features', []):
+            # GeoJSON coordinates are [lon, lat]
+            coords = (feature.get('geometry') or {}).get('coordinates', [])
+            if not coords or len(coords) < 2:
+                continue
+            properties = feature.get('properties') or {}
+            rows.append(tuple(
+                coords[1] if field == 'ylat' else coords[0] if field == 'xlong' else properties.get(field)
+                for field in TURBINE_FIELDS
+            ))
+        del geojson_data
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        temp_path = f"{self.db_path}.{os.getpid()}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        try:
+            with closing(self._connect(temp_path)) as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                CREATE TABLE turbines (
+                    id INTEGER PRIMARY KEY,
+                    case_id,
+                    ylat REAL,
+                    xlong REAL,
+                    t_state TEXT,
+                    p_name TEXT,
+                    p_year,
+                    t_manu TEXT,
+                    t_model TEXT,
+                    t_cap,
+                    t_hh,
+                    t_rd,
+                    t_rsa,
+                    t_ttlh
+                )
+                """)
+                cursor.execute("CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)")
+                cursor.executemany(
+                    f"INSERT INTO turbines ({', '.join(TURBINE_FIELDS)}) VALUES ({', '.join('?' * len(TURBINE_FIELDS))})",
+                    rows
+                )
+                cursor.execute("CREATE INDEX idx_turbines_state ON turbines (t_state)")
+
+                try:
+                    cursor.execute(f"""
+                    CREATE VIRTUAL TABLE {RTREE_TABLE} USING rtree(id, min_lon, max_lon, min_lat, max_lat)
+                    """)
+                    cursor.execute(f"""
+                    INSERT INTO {RTREE_TABLE} (id, min_lon, max_lon, min_lat, max_lat)
+                    SELECT id, xlong, xlong, ylat, ylat FROM turbines
+                    WHERE xlong IS NOT NULL AND ylat IS NOT NULL
+                    """)
+                    signature['rtree'] = '1'
+                except sqlite3.OperationalError as e:
+                    # SQLite built without the R*Tree module, fall back to a latitude index
+                    logger.warning(f"R*Tree not available, using a latitude index: {e}")
+                    cursor.execute("CREATE INDEX idx_turbines_lat ON turbines (ylat)")
+                    signature['rtree'] = '0'
+
+                cursor.executemany("INSERT INTO metadata (key, value) VALUES (?, ?)", signature.items())
+                conn.commit()
+
+            os.replace(temp_path, self.db_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        logger.info(f"Turbine store built with {len(rows)} turbines")
+        return len(rows)
+
+    def query(self,
+              min_lat: Optional[float] = None, max_lat: Optional[float] = None,
+              min_lon: Optional[float] = None, max_lon: Optional[float] = None,
+              state_name: Optional[str] = None) -> List[Dict]:
+        """
+        Query turbines by bounding box and/or state.
+
+        Args:
+            min_lat: Minimum latitude for bounding box filter
+            max_lat: Maximum latitude for bounding box filter
+            min_lon: Minimum longitude for bounding box filter
+            max_lon: Maximum longitude for bounding box filter
+            state_name: State abbreviation to filter by (e.g., 'CO')
+
+        Returns:
+            list: Turbine dictionaries with the USWTDB field names
+        """
+        columns = ', '.join(f"t.{field}" for field in TURBINE_FIELDS)
+        conditions = []
+        params = []
+        use_bbox = None not in (min_lat, max_lat, min_lon, max_lon)
+
+        if use_bbox and self.has_rtree():
+            sql = f"SELECT {columns} FROM {RTREE_TABLE} r JOIN turbines t ON t.id = r.id"
+            # R*Tree boxes are stored as float32, so overlap there and check exactly on turbines
+            conditions.append("r.max_lon >= ? AND r.min_lon <= ? AND r.max_lat >= ? AND r.min_lat <= ?")
+            params.extend([min_lon, max_lon, min_lat, max_lat])
+        else:
+            sql = f"SELECT {columns} FROM turbines t"
+
+        if use_bbox:
+            conditions.append("t.ylat BETWEEN ? AND ? AND t.xlong BETWEEN ? AND ?")
+            params.extend([min_lat, max_lat, min_lon, max_lon])
+
+        if state_name:
+            conditions.append("t.t_state = ?")
+            params.append(state_name)
+
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY t.id"
+
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def count(self) -> int:
+        """Number of turbines in the store"""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM turbines").fetchone()[0]
@@ -0,0 +1,126 @@
+"""
+Earth Engine Vegetation Result Cache
+
+Persistent SQLite cache of the raw Earth Engine results used for vegetation
+profiles (GEDI getRegion rows, Hansen/MODIS region means), so redrawing a
+profile or re-opening a project does not repeat the getInfo() round-trips.
+
+Entries are keyed on the path endpoints rounded to a fixed number of
+decimals, the buffer around the path, the dataset and its date window.
+Empty results are cached too, so datasets without coverage are not
+re-queried; entries expire after a TTL.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "cache", "vegetation_cache.db")
+
+# 5 decimals is ~1 m, well below the 90-250 m sampling scales
+DEFAULT_PRECISION = 5
+DEFAULT_TTL_DAYS = 180
+
+def make_key(start_coords: Tuple[float, float],
+             end_coords: Tuple[float, float],
+             buffer_m: float,
+             dataset: str,
+             date_window: Optional[Sequence[str]] = None,
+             precision: int = DEFAULT_PRECISION) -> str:
+    """
+    Cache key for one dataset query along a path.
+
+    Args:
+        start_coords: (lat, lon) of site A
+        end_coords: (lat, lon) of site B
+        buffer_m: Buffer around the path in meters
+        dataset: Earth Engine dataset id (plus any band/scale qualifiers)
+        date_window: (start_date, end_date) filter, None for single images
+        precision: Decimal places the endpoints are rounded to
+    """
+    endpoints = ",".join(f"{round(float(value), precision):.{precision}f}"
+                         for value in (*start_coords, *end_coords))
+    window = "/".join(date_window) if date_window else "-"
+    return f"{dataset}|{endpoints}|{float(buffer_m):g}|{window}"
+
+class VegetationCache:
+    """On-disk cache of raw Earth Engine vegetation results"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl_days: Optional[float] = DEFAULT_TTL_DAYS):
+        """
+        Open (or create) the cache.
+
+        Args:
+            db_path: Path to the SQLite cache file
+            ttl_days: Age after which results are re-queried (None to never expire)
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS ee_results (
+            key TEXT PRIMARY KEY,
+            dataset TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a cached result.
+
+        Returns:
+            (found, payload) tuple; payload may itself be None or empty
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT payload, created_at FROM ee_results WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl_seconds is not None and row[1] < time.time() - self.ttl_seconds):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, json.loads(row[0])
+
+    def put(self, key: str, dataset: str, payload: Any):
+        """Store a JSON-serializable result"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ee_results (key, dataset, payload, created_at) VALUES (?, ?, ?, ?)",
+                (key, dataset, json.dumps(payload), time.time())
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove all cached results"""
+        with self._lock:
+            self._conn.execute("DELETE FROM ee_results")
+            self._conn.commit()
+
+_vegetation_cache = None
+_vegetation_cache_lock = threading.Lock()
+
+def get_vegetation_cache() -> VegetationCache:
+    """Return the shared vegetation result cache"""
+    global _vegetation_cache
+    with _vegetation_cache_lock:
+        if _vegetation_cache is None:
+            _vegetation_cache = VegetationCache()
+        return _vegetation_cache
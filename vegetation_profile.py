@@ -15,6 +15,10 @@ from dotenv import load_dotenv
 from log_config import setup_logging
 from pathlib import Path
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utilities.canopy_height import CorridorCanopyBackend, get_raster_canopy_backend
+from utilities.vegetation_cache import get_vegetation_cache, make_key
 
 # Get the directory containing the script
 SCRIPT_DIR = Path(__file__).parent.absolute()
@@ -42,11 +46,82 @@ if not all(k in os.environ for k in ['GOOGLE_MAPS_API_KEY', 'EE_SERVICE_ACCOUNT'
     logger.error("Direct environment check failed")
     logger.error(f"Current environment keys: {list(os.environ.keys())}")
 
+# Buffer around the path for Earth Engine queries (increased from 500m for better coverage)
+EE_BUFFER_M = 1000
+
+GEDI_DATASET = 'LARSE/GEDI/GEDI02_A_002_MONTHLY'
+HANSEN_DATASET = 'UMD/hansen/global_forest_change_2021_v1_9'
+MODIS_DATASET = 'MODIS/006/MOD44B'
+
+# Failed path queries remembered so prefetch(retry_failed=False) does not repeat them
+MAX_FAILED_PREFETCHES = 100
+
+# Earth Engine datasets in fallback order, with their date windows
+EE_DATASETS = [
+    (GEDI_DATASET, ('2019-01-01', '2024-12-31')),
+    (HANSEN_DATASET, None),
+    (MODIS_DATASET, ('2020-01-01', '2023-12-31')),
+]
+
+class EarthEngineQueryError(Exception):
+    """Some Earth Engine dataset queries for a path failed; results holds what was fetched"""
+
+    def __init__(self, message, results):
+        super().__init__(message)
+        self.results = results
+
 class VegetationProfiler:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self._ee_initialized = False
 
+        # Local canopy height sources, tried in order before Earth Engine
+        self.backends = []
+        self.corridor_backend = None
+
+        # Running background Earth Engine queries, and the last failed one, keyed by path
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vegetation-prefetch")
+        self._prefetches = {}
+        self._failed_prefetches = {}
+        self._prefetch_lock = threading.Lock()
+
+    def add_backend(self, backend):
+        """Add a local canopy height backend (see utilities.canopy_height), after existing ones"""
+        self.backends.append(backend)
+
+    def set_corridor_grid(self, grid):
+        """Use the canopy height model of a LiDAR corridor grid, or None to stop using it"""
+        self.corridor_backend = CorridorCanopyBackend(grid) if grid is not None else None
+
+    def _local_backends(self):
+        backends = [self.corridor_backend] if self.corridor_backend else []
+        backends.extend(self.backends)
+        raster_backend = get_raster_canopy_backend()
+        if raster_backend.tiles:
+            backends.append(raster_backend)
+        return backends
+
+    def get_local_vegetation_heights(self, start_coords, end_coords, distances):
+        """Vegetation heights in meters from the local backends, NaN where none has data"""
+        distances = np.asarray(distances, dtype=float)
+        fractions = distances / distances[-1] if len(distances) and distances[-1] > 0 else np.zeros(len(distances))
+        lats = start_coords[0] + (end_coords[0] - start_coords[0]) * fractions
+        lons = start_coords[1] + (end_coords[1] - start_coords[1]) * fractions
+
+        heights = np.full(len(distances), np.nan)
+        for backend in self._local_backends():
+            missing = np.isnan(heights)
+            if not missing.any():
+                break
+            try:
+                values = np.asarray(backend.get_heights(start_coords, end_coords, distances, lats, lons), dtype=float)
+                heights[missing] = values[missing]
+                self.logger.info(f"{backend.name} canopy backend covered "
+                                 f"{np.count_nonzero(~np.isnan(values[missing]))} of {len(distances)} samples")
+            except Exception as e:
+                self.logger.error(f"Error sampling {backend.name} canopy backend: {e}")
+        return heights
+
     def initialize_ee(self):
         """Initialize Earth Engine only when needed"""
         # Skip if already initialized
@@ -69,131 +144,230 @@ class VegetationProfiler:
             self.logger.error(f"Error initializing Earth Engine: {str(e)}")
             raise
 
-    def get_vegetation_profile(self, start_coords, end_coords, distances, elevations):
-        """Get vegetation height profile between two points."""
-        try:
-            # Initialize Earth Engine if not already initialized
-            if not self._ee_initialized:
-                self.initialize_ee()
+    def get_vegetation_profile(self, start_coords, end_coords, distances, elevations, block=True):
+        """Get vegetation height profile between two points.
 
-            # Create a buffer around the line
-            roi = ee.Geometry.LineString([
-                [start_coords[1], start_coords[0]],
-                [end_coords[1], end_coords[0]]
-            ]).buffer(1000)  # Increased from 500m to 1000m buffer for better coverage
+        Local canopy backends (LiDAR corridor CHM, canopy height rasters) are
+        sampled first at every distance; Earth Engine is only queried for the
+        samples they don't cover. Raw Earth Engine results are cached per path.
 
-            # Try to get vegetation data from multiple sources
-            vegetation_heights = None
+        Args:
+            block: Wait for Earth Engine results that are not cached yet. When
+                False the query runs in the background (see pending_prefetch)
+                and uncovered samples are returned as zero.
 
-            # First try: GEDI dataset (most accurate when available)
-            try:
-                self.logger.info("Attempting to use GEDI dataset for vegetation data")
-                # Load GEDI dataset with reduced resolution
-                gedi = ee.ImageCollection('LARSE/GEDI/GEDI02_A_002_MONTHLY')\
-                    .filterBounds(roi)\
-                    .filterDate('2019-01-01', '2024-12-31')\
-                    .limit(20)  # Increased limit for more data points
-
-                # Get raw values with reduced resolution
-                raw_values = gedi.select(['rh98']).getRegion(roi, 90).getInfo()  # Increased scale to 90m
-
-                if len(raw_values) > 1:  # First row is headers
-                    # Extract height values (skip header row)
-                    values = [row[4] for row in raw_values[1:] if row[4] is not None and row[4] > 0]
-
-                    if len(values) >= 2:
-                        self.logger.info(f"Found {len(values)} GEDI data points")
-                        # Create interpolation points
-                        sample_distances = np.linspace(0, distances[-1], len(values))
-
-                        # Interpolate to match elevation points
-                        interp_func = interp1d(sample_distances, values,
-                                            kind='linear',
-                                            fill_value='extrapolate')
-
-                        vegetation_heights = interp_func(distances)
-                    else:
-                        self.logger.warning("Insufficient GEDI data points for interpolation")
+        Returns:
+            Vegetation heights in feet
+        """
+        try:
+            heights = self.get_local_vegetation_heights(start_coords, end_coords, distances)
+            missing = np.isnan(heights)
+            if missing.any():
+                ee_results = self._cached_earth_engine_results(start_coords, end_coords)
+                if ee_results is None:
+                    future = self.prefetch(start_coords, end_coords, retry_failed=False)
+                    if block or future.done():
+                        try:
+                            ee_results = future.result()
+                        except EarthEngineQueryError as e:
+                            self.logger.error(f"Earth Engine vegetation query failed: {e}")
+                            ee_results = e.results
+                        except Exception as e:
+                            self.logger.error(f"Earth Engine vegetation query failed: {e}")
+                            ee_results = {}
+                if ee_results is not None:
+                    ee_heights = self._earth_engine_heights(ee_results, distances)
+                    heights[missing] = ee_heights[missing]
                 else:
-                    self.logger.warning("No GEDI data points found in region")
-            except Exception as e:
-                self.logger.error(f"Error accessing GEDI dataset: {e}")
+                    self.logger.info("Earth Engine vegetation query still running, drawing without it")
+                    heights[missing] = 0
 
-            # Second try: Use Hansen Global Forest Change dataset as fallback
-            if vegetation_heights is None:
-                try:
-                    self.logger.info("Attempting to use Hansen Forest dataset as fallback")
-                    # Load Hansen Global Forest Change dataset
-                    hansen = ee.Image('UMD/hansen/global_forest_change_2021_v1_9')
-                    treeHeight = hansen.select(['treecover2000'])
-
-                    # Sample points along the line
-                    points = ee.FeatureCollection.multiPoint(
-                        [ee.List([start_coords[1], start_coords[0]]),
-                         ee.List([end_coords[1], end_coords[0]])]
-                    )
-
-                    # Get tree height values
-                    tree_values = treeHeight.reduceRegion(
-                        reducer=ee.Reducer.mean(),
-                        geometry=roi,
-                        scale=30,
-                        maxPixels=1e9
-                    ).get('treecover2000').getInfo()
-
-                    if tree_values is not None:
-                        self.logger.info(f"Found Hansen tree cover data: {tree_values}")
-                        # Convert percentage to approximate height (rough estimate: 1% = 0.3m)
-                        avg_height = float(tree_values) * 0.3
-
-                        # Create a simple height profile based on average height
-                        vegetation_heights = np.ones_like(distances) * avg_height
-                    else:
-                        self.logger.warning("No Hansen tree cover data found")
-                except Exception as e:
-                    self.logger.error(f"Error accessing Hansen dataset: {e}")
+            # Clean up the data
+            heights[heights < 0] = 0
+            return heights * 3.28084  # Convert meters to feet
 
-            # Third try: Use MODIS Vegetation Continuous Fields as last resort
-            if vegetation_heights is None:
+        except Exception as e:
+            self.logger.error(f"Error getting vegetation profile: {e}")
+            return np.zeros_like(distances)
+
+    def prefetch(self, start_coords, end_coords, retry_failed=True):
+        """Start the Earth Engine vegetation queries for a path in the background
+
+        Call this as soon as a project is loaded so the results are cached by
+        the time the profile is drawn. Repeated calls for the same path share
+        one query while it runs.
+
+        Args:
+            retry_failed: Start a new query if the previous one for this path
+                failed; otherwise the failed future is returned again
+
+        Returns:
+            concurrent.futures.Future resolving to the raw results (raises
+            EarthEngineQueryError if a dataset query failed)
+        """
+        key = self._path_key(start_coords, end_coords)
+        with self._prefetch_lock:
+            future = self._prefetches.get(key) or self._failed_prefetches.get(key)
+            if future is not None and (not future.done() or (not retry_failed and future.exception() is not None)):
+                return future
+            future = self._executor.submit(self._fetch_earth_engine_results, start_coords, end_coords)
+            self._prefetches[key] = future
+        # Outside the lock: the callback runs right away if the query already finished
+        future.add_done_callback(lambda done: self._prefetch_done(key, done))
+        return future
+
+    def _prefetch_done(self, key, future):
+        """Forget a finished query; remember it if it failed so retry_failed can tell"""
+        with self._prefetch_lock:
+            if self._prefetches.get(key) is future:
+                del self._prefetches[key]
+            if future.exception() is not None:
+                self._failed_prefetches.pop(key, None)
+                self._failed_prefetches[key] = future
+                while len(self._failed_prefetches) > MAX_FAILED_PREFETCHES:
+                    del self._failed_prefetches[next(iter(self._failed_prefetches))]
+            else:
+                self._failed_prefetches.pop(key, None)
+
+    def pending_prefetch(self, start_coords, end_coords):
+        """The running Earth Engine query for a path, or None if there is none"""
+        with self._prefetch_lock:
+            future = self._prefetches.get(self._path_key(start_coords, end_coords))
+        return future if future is not None and not future.done() else None
+
+    def _path_key(self, start_coords, end_coords):
+        return make_key(start_coords, end_coords, EE_BUFFER_M, "path")
+
+    def _cached_earth_engine_results(self, start_coords, end_coords):
+        """Raw results of the dataset chain from the cache, or None if a query is needed"""
+        cache = get_vegetation_cache()
+        results = {}
+        for dataset, date_window in EE_DATASETS:
+            found, payload = cache.get(make_key(start_coords, end_coords, EE_BUFFER_M, dataset, date_window))
+            if not found:
+                return None
+            results[dataset] = payload
+            if _has_data(dataset, payload):
+                # Later datasets are only fallbacks
+                break
+        return results
+
+    def _fetch_earth_engine_results(self, start_coords, end_coords):
+        """Query the dataset chain (GEDI, then Hansen, then MODIS) and cache each raw result
+
+        Raises:
+            EarthEngineQueryError: If a dataset query failed (with the results that were fetched)
+        """
+        cache = get_vegetation_cache()
+        results = {}
+        failed = []
+        roi = None
+        for dataset, date_window in EE_DATASETS:
+            key = make_key(start_coords, end_coords, EE_BUFFER_M, dataset, date_window)
+            found, payload = cache.get(key)
+            if not found:
+                if roi is None:
+                    # Initialize Earth Engine if not already initialized
+                    if not self._ee_initialized:
+                        self.initialize_ee()
+
+                    # Create a buffer around the line
+                    roi = ee.Geometry.LineString([
+                        [start_coords[1], start_coords[0]],
+                        [end_coords[1], end_coords[0]]
+                    ]).buffer(EE_BUFFER_M)
                 try:
-                    self.logger.info("Attempting to use MODIS VCF dataset as last resort")
-                    # Load MODIS Vegetation Continuous Fields
-                    modis_vcf = ee.ImageCollection('MODIS/006/MOD44B')\
-                        .filterDate('2020-01-01', '2023-12-31')\
-                        .select('Percent_Tree_Cover')\
-                        .mean()
-
-                    # Get tree cover percentage
-                    vcf_values = modis_vcf.reduceRegion(
-                        reducer=ee.Reducer.mean(),
-                        geometry=roi,
-                        scale=250,
-                        maxPixels=1e9
-                    ).get('Percent_Tree_Cover').getInfo()
-
-                    if vcf_values is not None:
-                        self.logger.info(f"Found MODIS VCF data: {vcf_values}")
-                        # Convert percentage to approximate height (rough estimate: 1% = 0.25m)
-                        avg_height = float(vcf_values) * 0.25
-
-                        # Create a simple height profile based on average height
-                        vegetation_heights = np.ones_like(distances) * avg_height
-                    else:
-                        self.logger.warning("No MODIS VCF data found")
+                    payload = self._query_dataset(dataset, date_window, roi)
                 except Exception as e:
-                    self.logger.error(f"Error accessing MODIS VCF dataset: {e}")
+                    # Errors are not cached so the dataset is retried next time
+                    self.logger.error(f"Error accessing {dataset} dataset: {e}")
+                    results[dataset] = None
+                    failed.append(f"{dataset}: {e}")
+                    continue
+                cache.put(key, dataset, payload)
+            results[dataset] = payload
+            if _has_data(dataset, payload):
+                break
+        if failed:
+            raise EarthEngineQueryError(f"{len(failed)} dataset queries failed ({'; '.join(failed)})", results)
+        return results
 
-            # If all attempts failed, return zeros
-            if vegetation_heights is None:
-                self.logger.warning("All vegetation data sources failed, returning zeros")
-                vegetation_heights = np.zeros_like(distances)
+    def _query_dataset(self, dataset, date_window, roi):
+        """Run one Earth Engine query and return its JSON-serializable raw result"""
+        if dataset == GEDI_DATASET:
+            self.logger.info("Querying GEDI dataset for vegetation data")
+            # Load GEDI dataset with reduced resolution
+            gedi = ee.ImageCollection(GEDI_DATASET)\
+                .filterBounds(roi)\
+                .filterDate(*date_window)\
+                .limit(20)  # Increased limit for more data points
 
-            # Clean up the data
-            vegetation_heights[vegetation_heights < 0] = 0
-            vegetation_heights *= 3.28084  # Convert meters to feet
+            # Get raw values with reduced resolution
+            return gedi.select(['rh98']).getRegion(roi, 90).getInfo()  # Increased scale to 90m
 
-            return vegetation_heights
+        if dataset == HANSEN_DATASET:
+            self.logger.info("Querying Hansen Forest dataset as fallback")
+            # Load Hansen Global Forest Change dataset
+            tree_cover = ee.Image(HANSEN_DATASET).select(['treecover2000'])
+            return tree_cover.reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=roi,
+                scale=30,
+                maxPixels=1e9
+            ).get('treecover2000').getInfo()
 
-        except Exception as e:
-            self.logger.error(f"Error getting vegetation profile: {e}")
-            return np.zeros_like(distances)
\ No newline at end of file
+        self.logger.info("Querying MODIS VCF dataset as last resort")
+        # Load MODIS Vegetation Continuous Fields
+        modis_vcf = ee.ImageCollection(MODIS_DATASET)\
+            .filterDate(*date_window)\
+            .select('Percent_Tree_Cover')\
+            .mean()
+        return modis_vcf.reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=roi,
+            scale=250,
+            maxPixels=1e9
+        ).get('Percent_Tree_Cover').getInfo()
+
+    def _earth_engine_heights(self, results, distances):
+        """Vegetation heights in meters from raw Earth Engine results"""
+        distances = np.asarray(distances, dtype=float)
+
+        # First choice: GEDI canopy heights (most accurate when available)
+        raw_values = results.get(GEDI_DATASET)
+        if raw_values and len(raw_values) > 1:  # First row is headers
+            # Extract height values (skip header row)
+            values = [row[4] for row in raw_values[1:] if row[4] is not None and row[4] > 0]
+            if len(values) >= 2:
+                self.logger.info(f"Using {len(values)} GEDI data points")
+                # Create interpolation points
+                sample_distances = np.linspace(0, distances[-1], len(values))
+
+                # Interpolate to match elevation points
+                interp_func = interp1d(sample_distances, values,
+                                       kind='linear',
+                                       fill_value='extrapolate')
+                return interp_func(distances)
+            self.logger.warning("Insufficient GEDI data points for interpolation")
+
+        # Hansen tree cover: percentage to approximate height (rough estimate: 1% = 0.3m)
+        tree_values = results.get(HANSEN_DATASET)
+        if tree_values is not None:
+            self.logger.info(f"Using Hansen tree cover data: {tree_values}")
+            return np.ones(len(distances)) * float(tree_values) * 0.3
+
+        # MODIS VCF: percentage to approximate height (rough estimate: 1% = 0.25m)
+        vcf_values = results.get(MODIS_DATASET)
+        if vcf_values is not None:
+            self.logger.info(f"Using MODIS VCF data: {vcf_values}")
+            return np.ones(len(distances)) * float(vcf_values) * 0.25
+
+        # If all sources failed, return zeros
+        self.logger.warning("All vegetation data sources failed, returning zeros")
+        return np.zeros(len(distances))
+
+def _has_data(dataset, payload):
+    """Whether a raw result is usable, so the fallback datasets can be skipped"""
+    if dataset == GEDI_DATASET:
+        return bool(payload) and sum(1 for row in payload[1:] if row[4] is not None and row[4] > 0) >= 2
+    return payload is not None